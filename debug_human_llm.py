@@ -7,6 +7,7 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.llm_client import LLMClient
+from src.response_parsers import iter_human_tokens, parse_human_response
 import json
 
 def debug_human_llm():
@@ -22,20 +23,16 @@ def debug_human_llm():
         model=config["model"]
     )
     
-    # 读取提示模板和参考表
-    with open("prompt/HumanLLM.txt", "r", encoding="utf-8") as f:
-        prompt_template = f.read()
-    
-    with open("prompt/ref_scoring_table.txt", "r", encoding="utf-8") as f:
-        ref_table = f.read()
+    # 读取提示模板和参考表（与游戏中使用同一模板注册表）
+    ref_table = llm_client.prompts.text("ref_scoring_table")
+    prompt_template = llm_client.prompts.bind("HumanLLM", ref_scoring_table=ref_table)
     
     # 构建完整提示词
-    prompt = prompt_template.format(
+    prompt = prompt_template.render(
         country_score=60,
         shoreline_score=100,
         shoreline_opportunities="海岸线提供丰富的渔业资源和旅游潜力",
-        shoreline_challenges="海岸侵蚀和海洋污染威胁生态平衡",
-        ref_scoring_table=ref_table
+        shoreline_challenges="海岸侵蚀和海洋污染威胁生态平衡"
     )
     
     print("=== 完整提示词 ===")
@@ -50,45 +47,18 @@ def debug_human_llm():
     print(f"回复字符: {repr(raw_response)}")
     print("\n" + "="*80 + "\n")
     
-    # 测试解析逻辑
+    # 测试解析逻辑（与游戏中使用同一解析器）
     print("=== 解析过程 ===")
-    actions = {}
-    lines = raw_response.split('\n')
-    current_action = None
-    
-    print(f"总行数: {len(lines)}")
-    for i, line in enumerate(lines):
-        line_stripped = line.strip()
-        print(f"行{i}: '{line}' -> 去空格: '{line_stripped}'")
-        
-        # 跳过代码块标记和空行
-        if line_stripped in ['```', ''] or not line_stripped:
-            print(f"  -> 跳过空行或代码块标记")
-            continue
-            
-        if line_stripped.startswith('ACTION_1:'):
-            current_action = 'action_1'
-            content = line_stripped.replace('ACTION_1:', '').strip()
-            actions[current_action] = content
-            print(f"  -> 发现ACTION_1: '{content}'")
-        elif line_stripped.startswith('ACTION_2:'):
-            current_action = 'action_2'
-            content = line_stripped.replace('ACTION_2:', '').strip()
-            actions[current_action] = content
-            print(f"  -> 发现ACTION_2: '{content}'")
-        elif current_action and line_stripped and not line_stripped.startswith('```'):
-            # 只在不是代码块标记的情况下才添加内容
-            if current_action in actions:
-                actions[current_action] += ' ' + line_stripped
-            else:
-                actions[current_action] = line_stripped
-            print(f"  -> 添加到{current_action}: '{line_stripped}'")
+    labels = {
+        "skip": "跳过空行或代码块标记",
+        "action": "发现行动",
+        "continuation": "接续上一行动",
+        "ignored": "忽略行动之前的内容",
+    }
+    for i, (kind, key, content) in enumerate(iter_human_tokens(raw_response)):
+        print(f"行{i}: '{content}' -> {labels[kind]}" + (f" ({key})" if key else ""))
     
-    # 确保两个行动都存在
-    if 'action_1' not in actions:
-        actions['action_1'] = ''
-    if 'action_2' not in actions:
-        actions['action_2'] = ''
+    actions = parse_human_response(raw_response)
     
     print(f"\n最终解析结果: {actions}")
 
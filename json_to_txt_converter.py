@@ -5,26 +5,51 @@ JSON游戏记录转换器
 将游戏记录JSON文件转换为简洁的TXT表格格式
 """
 
+import argparse
+import fnmatch
+import hashlib
 import json
 import sys
 import os
-from typing import Dict, Any
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-def convert_json_to_txt(json_file_path: str, output_file_path: str = None) -> str:
+from src.json_stream import iter_top_level, ArrayStream
+
+# 批量模式默认匹配的游戏记录文件名
+DEFAULT_PATTERNS = ("game_record_*.json", "game_[0-9]*.json")
+MANIFEST_NAME = ".json_to_txt_manifest.json"
+
+def convert_json_to_txt(json_file_path: str, output_file_path: str = None, verbose: bool = True) -> str:
     """
     将JSON游戏记录转换为TXT表格格式
     
     Args:
         json_file_path: JSON文件路径
         output_file_path: 输出TXT文件路径（可选）
+        verbose: 是否打印转换结果
         
     Returns:
         生成的TXT文件路径
     """
-    # 读取JSON文件
+    # 流式读取JSON文件，年度记录逐条解析，只保留表格需要的分数字段
+    game_summary = {}
+    yearly_records = []
     try:
         with open(json_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+            for key, value in iter_top_level(f, stream_keys=('yearly_records',)):
+                if key == 'game_summary':
+                    game_summary = value
+                elif key == 'yearly_records':
+                    records = value if isinstance(value, ArrayStream) else value or []
+                    for record in records:
+                        yearly_records.append({
+                            'year': record.get('year', 0),
+                            'country_score': record.get('country_score', 0),
+                            'shoreline_score': record.get('shoreline_score', 0)
+                        })
     except FileNotFoundError:
         print(f"❌ 错误: 文件 {json_file_path} 不存在")
         return None
@@ -37,10 +62,6 @@ def convert_json_to_txt(json_file_path: str, output_file_path: str = None) -> st
         base_name = os.path.splitext(json_file_path)[0]
         output_file_path = f"{base_name}_table.txt"
     
-    # 提取游戏数据
-    game_summary = data.get('game_summary', {})
-    yearly_records = data.get('yearly_records', [])
-    
     # 创建表格内容
     lines = []
     
@@ -110,27 +131,213 @@ def convert_json_to_txt(json_file_path: str, output_file_path: str = None) -> st
         with open(output_file_path, 'w', encoding='utf-8') as f:
             f.write('\n'.join(lines))
         
-        print(f"✅ 转换成功!")
-        print(f"📄 输入文件: {json_file_path}")
-        print(f"📊 输出文件: {output_file_path}")
+        if verbose:
+            print(f"✅ 转换成功!")
+            print(f"📄 输入文件: {json_file_path}")
+            print(f"📊 输出文件: {output_file_path}")
         return output_file_path
         
     except Exception as e:
         print(f"❌ 写入文件失败: {e}")
         return None
 
+def find_record_files(root: str, patterns=DEFAULT_PATTERNS) -> List[str]:
+    """
+    递归查找目录下的游戏记录JSON文件
+    
+    Args:
+        root: 根目录
+        patterns: 文件名匹配模式
+        
+    Returns:
+        排序后的文件路径列表
+    """
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.') and d != '__pycache__']
+        for filename in filenames:
+            if any(fnmatch.fnmatch(filename, pattern) for pattern in patterns):
+                found.append(os.path.join(dirpath, filename))
+    return sorted(found)
+
+def _file_sha1(path: str) -> str:
+    """计算文件内容哈希"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(root: str) -> Dict[str, Any]:
+    """读取转换清单（记录已转换文件的mtime/大小/哈希）"""
+    path = os.path.join(root, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(root: str, manifest: Dict[str, Any]):
+    """原子写入转换清单"""
+    path = os.path.join(root, MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def _default_output_path(json_file_path: str) -> str:
+    return f"{os.path.splitext(json_file_path)[0]}_table.txt"
+
+def _convert_worker(json_file_path: str) -> Optional[str]:
+    """进程池中执行的转换任务"""
+    try:
+        return convert_json_to_txt(json_file_path, verbose=False)
+    except Exception as e:
+        print(f"❌ 转换 {json_file_path} 失败: {e}")
+        return None
+
+def _pending_files(root: str, manifest: Dict[str, Any], patterns, force: bool) -> List[str]:
+    """
+    根据清单筛选需要转换的文件（mtime和大小未变、或内容哈希未变且输出存在时跳过）
+    """
+    pending = []
+    for path in find_record_files(root, patterns):
+        key = os.path.relpath(path, root)
+        entry = manifest.get(key)
+        if force or entry is None or not os.path.exists(_default_output_path(path)):
+            pending.append(path)
+            continue
+        stat = os.stat(path)
+        if entry.get('mtime') == stat.st_mtime and entry.get('size') == stat.st_size:
+            continue
+        if entry.get('sha1') == _file_sha1(path):
+            entry['mtime'] = stat.st_mtime
+            entry['size'] = stat.st_size
+            continue
+        pending.append(path)
+    return pending
+
+def convert_batch(root: str, workers: int = None, force: bool = False,
+                  patterns=DEFAULT_PATTERNS) -> Dict[str, int]:
+    """
+    批量转换目录树下的游戏记录，使用进程池并行，并通过清单跳过未变化的文件
+    
+    Args:
+        root: 根目录
+        workers: 进程数（默认CPU核数）
+        force: 是否忽略清单强制全部转换
+        patterns: 文件名匹配模式
+        
+    Returns:
+        统计信息 {"converted", "failed", "skipped"}
+    """
+    manifest = load_manifest(root)
+    all_files = find_record_files(root, patterns)
+    pending = _pending_files(root, manifest, patterns, force)
+    
+    converted = 0
+    failed = 0
+    if pending:
+        # 少量文件时直接在当前进程转换，避免进程池启动开销
+        if len(pending) == 1 or workers == 1:
+            outputs = [_convert_worker(path) for path in pending]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                outputs = list(executor.map(_convert_worker, pending, chunksize=16))
+        
+        for path, output in zip(pending, outputs):
+            if output is None:
+                # 转换失败（如文件仍在写入）不写入清单，下次重试
+                failed += 1
+                continue
+            stat = os.stat(path)
+            manifest[os.path.relpath(path, root)] = {
+                'mtime': stat.st_mtime,
+                'size': stat.st_size,
+                'sha1': _file_sha1(path),
+                'output': os.path.relpath(output, root)
+            }
+            converted += 1
+    
+    save_manifest(root, manifest)
+    return {
+        'converted': converted,
+        'failed': failed,
+        'skipped': len(all_files) - len(pending)
+    }
+
+def watch_directory(root: str, interval: float = 2.0, workers: int = None,
+                    patterns=DEFAULT_PATTERNS, max_rounds: int = None):
+    """
+    监视目录，持续转换新出现或有变化的游戏记录（Ctrl+C退出）
+    
+    Args:
+        root: 根目录
+        interval: 轮询间隔（秒）
+        workers: 进程数
+        patterns: 文件名匹配模式
+        max_rounds: 最多轮询次数（None表示一直运行）
+    """
+    print(f"👀 正在监视 {root} (间隔{interval}秒，按Ctrl+C退出)")
+    rounds = 0
+    try:
+        while max_rounds is None or rounds < max_rounds:
+            stats = convert_batch(root, workers=workers, patterns=patterns)
+            if stats['converted'] or stats['failed']:
+                print(f"🔄 新转换 {stats['converted']} 个文件，失败 {stats['failed']} 个")
+            rounds += 1
+            if max_rounds is None or rounds < max_rounds:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n停止监视")
+
+def run_batch_cli(argv: List[str]):
+    """批量/监视模式的命令行入口"""
+    parser = argparse.ArgumentParser(prog="json_to_txt_converter.py",
+                                     description="批量转换游戏记录JSON为TXT表格")
+    parser.add_argument("--batch", metavar="DIR", help="批量转换目录树下的游戏记录")
+    parser.add_argument("--watch", metavar="DIR", help="监视目录并转换新出现的游戏记录")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数（默认CPU核数）")
+    parser.add_argument("--interval", type=float, default=2.0, help="监视模式轮询间隔（秒）")
+    parser.add_argument("--force", action="store_true", help="忽略清单，重新转换所有文件")
+    parser.add_argument("--pattern", action="append", help="文件名匹配模式（可多次指定）")
+    args = parser.parse_args(argv)
+    patterns = tuple(args.pattern) if args.pattern else DEFAULT_PATTERNS
+    
+    directory = args.watch or args.batch
+    if not directory or not os.path.isdir(directory):
+        print(f"❌ 错误: 目录 {directory} 不存在")
+        return
+    
+    if args.watch:
+        watch_directory(directory, interval=args.interval, workers=args.workers, patterns=patterns)
+        return
+    
+    start = time.time()
+    stats = convert_batch(directory, workers=args.workers, force=args.force, patterns=patterns)
+    print(f"✅ 批量转换完成: 转换 {stats['converted']} 个, 跳过 {stats['skipped']} 个, "
+          f"失败 {stats['failed']} 个 ({time.time() - start:.1f}秒)")
+
 def main():
     """主函数"""
     print("JSON游戏记录转TXT表格转换器")
     print("=" * 40)
     
+    # 批量/监视模式
+    if len(sys.argv) > 1 and sys.argv[1] in ("--batch", "--watch"):
+        run_batch_cli(sys.argv[1:])
+        return
+    
     # 检查命令行参数
     if len(sys.argv) < 2:
         print("用法: python json_to_txt_converter.py <JSON文件路径> [输出文件路径]")
+        print("      python json_to_txt_converter.py --batch <目录> [--workers N] [--force]")
+        print("      python json_to_txt_converter.py --watch <目录> [--interval 秒]")
         print()
         print("示例:")
         print("  python json_to_txt_converter.py game_record_20250709_013521.json")
         print("  python json_to_txt_converter.py game_record_20250709_013521.json output.txt")
+        print("  python json_to_txt_converter.py --batch history --workers 8")
         print()
         
         # 查找当前目录下的JSON文件
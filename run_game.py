@@ -8,7 +8,9 @@ import json
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.game_controller import ShorlineEcologyGame
+from src.llm_client import LLMClient
 from src.game_state import GameState
+from src.early_stopping import SequentialStopper
 
 def validate_input(value, value_type, min_val=None, max_val=None, default=None):
     """验证并转换用户输入"""
@@ -269,7 +271,22 @@ def get_game_parameters(config):
         'victory_threshold': config.get('victory_threshold', 100),
         'failure_threshold': config.get('failure_threshold', 75),
         'enable_random_events': config.get('enable_random_events', True),
-        'disaster_probability_modifier': config.get('disaster_probability_modifier', 1.0)
+        'disaster_probability_modifier': config.get('disaster_probability_modifier', 1.0),
+        'record_stream_path': config.get('record_stream_path'),
+        'record_stream_flush_every': config.get('record_stream_flush_every', 10),
+        'retain_records': config.get('retain_records', True),
+        'keep_detailed_results': config.get('keep_detailed_results', True),
+        'trajectory_store_path': config.get('trajectory_store_path'),
+        'history_db_path': config.get('history_db_path'),
+        'early_stopping': config.get('early_stopping'),
+        'judge_surrogate': config.get('judge_surrogate'),
+        'prompt_layout': config.get('prompt_layout', 'inline'),
+        'prompt_profile': config.get('prompt_profile', 'standard'),
+        'structured_output': config.get('structured_output', False),
+        'judge_samples': config.get('judge_samples', 1),
+        'judge_aggregate': config.get('judge_aggregate', 'median'),
+        'decision_memory': config.get('decision_memory'),
+        'lookahead_planner': config.get('lookahead_planner')
     }
 
 def show_config(config):
@@ -364,6 +381,102 @@ def manage_config():
         else:
             print("❌ 无效选择，请重试")
 
+def run_sweep(spec_path):
+    """按扫描描述文件运行参数扫描（基础配置取自game_config.json）"""
+    from src.sweep import sweep_from_spec
+    
+    with open(spec_path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    config = load_config()
+    
+    sweep = sweep_from_spec(spec, base_config=config)
+    try:
+        print(f"🔬 参数扫描: {len(sweep.configs)}个配置 × {sweep.replicates}次重复，并发{sweep.workers}")
+        result = sweep.run(progress_callback=lambda done, total: print(f"   进度: {done}/{total}"))
+    finally:
+        sweep.close()
+    
+    print(f"\n=== 参数扫描结果 ===")
+    print(f"运行任务: {result['jobs_run']}，跳过已完成: {result['jobs_skipped']}，出错: {result['errors']}")
+    print(f"耗时: {result['elapsed']:.1f}秒，缓存命中率: {result['cache']['hit_rate']:.2%}")
+    for row in result['by_config']:
+        params = ", ".join(f"{name}={row['config'][name]}" for name in spec['parameters'])
+        print(f"{params}: 胜利率{row['victory_rate']:.2%} ({row['games']}局), 平均时长{row['average_duration'] or 0:.1f}年")
+    print(f"\n结果表已保存到: {sweep.results.path}")
+
+def run_rejudge(path):
+    """用当前的裁判提示词和参考评分表重新评分历史游戏（目录中有meta.json时按轨迹存储读取）"""
+    from src.counterfactual import CounterfactualRejudger, load_history_games, load_store_games
+    from src.response_cache import LLMResponseCache
+    
+    config = load_config()
+    if os.path.exists(os.path.join(path, "meta.json")):
+        from src.trajectory_store import TrajectoryStore
+        games = load_store_games(TrajectoryStore(path))
+    else:
+        games = load_history_games(path)
+    if not games:
+        print(f"❌ 没有找到可重新评分的游戏记录: {path}")
+        return
+    
+    # 评分缓存持久化，重复运行只请求新的行动组合
+    cache = LLMResponseCache(path=config.get("rejudge_cache_path", "rejudge_cache.jsonl"))
+    llm_client = LLMClient(api_key=config.get("api_key"), base_url=config.get("base_url"),
+                           model=config.get("model", "gpt-3.5-turbo"), response_cache=cache,
+                           prompt_layout=config.get("prompt_layout", "inline"),
+                           prompt_profile=config.get("prompt_profile", "standard"),
+                           judge_samples=config.get("judge_samples", 1),
+                           judge_aggregate=config.get("judge_aggregate", "median"))
+    ref_table = llm_client.prompts.text("ref_scoring_table")
+    rejudger = CounterfactualRejudger(llm_client, ref_table, workers=config.get("rejudge_workers", 8))
+    try:
+        print(f"⚖️ 重新评分: {len(games)}局游戏")
+        report = rejudger.run(games)
+    finally:
+        cache.close()
+    
+    baseline, counterfactual = report['baseline'], report['counterfactual']
+    print(f"\n=== 反事实重新评分结果 ===")
+    print(f"游戏: {report['games']}局 (跳过{report['skipped_games']}局), 不同行动组合: {report['unique_pairs']}组, "
+          f"评分改变: {report['changed_pairs']}组")
+    print(f"胜利率: {baseline['victory_rate']:.2%} -> {counterfactual['victory_rate']:.2%} "
+          f"({report['victory_rate_shift']:+.2%})")
+    print(f"结果分布: {baseline['outcomes']} -> {counterfactual['outcomes']}")
+    if report['transitions']:
+        print(f"结果变化: {report['transitions']}")
+    if report['baseline_mismatches']:
+        print(f"⚠️ {report['baseline_mismatches']}局按记录评分重算与记录结果不一致（游戏配置可能与推断不同）")
+    with open("rejudge_report.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n详细结果已保存到: rejudge_report.json")
+
+def run_ensemble(path, num_seeds=10000):
+    """在大量随机事件种子下重放历史游戏的决策轨迹，报告结果分布和运气归因（本地运行，不调用LLM）"""
+    from src.counterfactual import load_history_games, load_store_games
+    from src.seed_ensemble import SeedEnsemble
+    
+    if os.path.exists(os.path.join(path, "meta.json")):
+        from src.trajectory_store import TrajectoryStore
+        games = load_store_games(TrajectoryStore(path))
+    else:
+        games = load_history_games(path)
+    if not games:
+        print(f"❌ 没有找到游戏记录: {path}")
+        return
+    
+    report = SeedEnsemble(num_seeds=num_seeds).run(games)
+    print(f"\n=== 随机事件种子集成 ({report['games']}局 × {report['seeds']}个种子, {report['elapsed']:.2f}秒) ===")
+    print(f"记录胜利率: {report['recorded_victory_rate']:.2%}, 期望胜利率: {report['expected_victory_rate']:.2%}, "
+          f"运气: {report['luck']:+.2%}")
+    if report['undetermined_rate']:
+        print(f"决策轨迹用完仍未结束: {report['undetermined_rate']:.2%}")
+    for detail in report['details']:
+        outcomes = ", ".join(f"{name}={p:.1%}" for name, p in detail['outcomes'].items() if p)
+        print(f"  {detail['source']}: 记录{detail['recorded_outcome']}, {outcomes}, 运气{detail['victory_luck']:+.2f}")
+    with open("ensemble_report.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n详细结果已保存到: ensemble_report.json")
+
 def main():
     """主函数"""
     print("=== 海岸线生态对抗建模系统 ===")
@@ -376,10 +489,26 @@ def main():
         if sys.argv[1] == "--config":
             manage_config()
             return
+        elif sys.argv[1] == "--sweep":
+            if len(sys.argv) < 3:
+                print("❌ 请指定扫描描述文件: python run_game.py --sweep sweep.json")
+                return
+            run_sweep(sys.argv[2])
+            return
+        elif sys.argv[1] == "--rejudge":
+            run_rejudge(sys.argv[2] if len(sys.argv) > 2 else "history")
+            return
+        elif sys.argv[1] == "--ensemble":
+            run_ensemble(sys.argv[2] if len(sys.argv) > 2 else "history",
+                         int(sys.argv[3]) if len(sys.argv) > 3 else 10000)
+            return
         elif sys.argv[1] == "--help":
             print("🎮 使用说明:")
             print("   python run_game.py        - 正常运行游戏")
             print("   python run_game.py --config  - 配置管理")
+            print("   python run_game.py --sweep sweep.json  - 参数扫描")
+            print("   python run_game.py --rejudge [history]  - 用当前裁判提示词重新评分历史游戏")
+            print("   python run_game.py --ensemble [history] [种子数]  - 随机事件种子集成与运气归因")
             print("   python run_game.py --help    - 显示帮助")
             return
     
@@ -437,16 +566,69 @@ def main():
     # 获取游戏初始化参数
     game_params = get_game_parameters(config)
     
+    game = None
     try:
+        # 紧凑轨迹存储（可选）
+        record_writer = None
+        if game_params['trajectory_store_path']:
+            from src.trajectory_store import TrajectoryStoreWriter
+            record_writer = TrajectoryStoreWriter(game_params['trajectory_store_path'])
+        
+        # 裁判代理模型（可选）：{"history_dir": "history", "confidence_threshold": 0.8, "audit_rate": 0.05}
+        judge_surrogate = None
+        if game_params['judge_surrogate']:
+            from src.judge_surrogate import JudgeSurrogate
+            from src.reference_table import ReferenceTable
+            surrogate_config = dict(game_params['judge_surrogate'])
+            history_dir = surrogate_config.pop('history_dir', 'history')
+            judge_surrogate = JudgeSurrogate.from_history(history_dir, table=ReferenceTable.load(), **surrogate_config)
+            print(f"✅ 已启用裁判代理模型 ({len(judge_surrogate)}个已知行动)")
+        
+        # 提示词布局："prefix"时固定内容放在系统消息中，便于服务商前缀缓存；档位"compact"使用精简提示词；
+        # structured_output时各角色以JSON格式回复，缺失或无效的字段单独追问；
+        # judge_samples大于1时裁判一次取多个回复投票
+        llm_client = LLMClient(api_key=api_key, base_url=base_url, model=model,
+                               prompt_layout=game_params['prompt_layout'],
+                               prompt_profile=game_params['prompt_profile'],
+                               structured_output=game_params['structured_output'],
+                               judge_samples=game_params['judge_samples'],
+                               judge_aggregate=game_params['judge_aggregate'])
+        
+        # 决策记忆：最近几年逐年列出，更早的年份汇总为摘要，长度不随游戏年数增长
+        decision_memory = None
+        if game_params['decision_memory']:
+            from src.decision_memory import DecisionMemory
+            decision_memory = DecisionMemory(model=model, **game_params['decision_memory'])
+            print(f"✅ 已启用决策记忆 (最近{decision_memory.recent_years}年, 上限{decision_memory.max_tokens} tokens)")
+        
+        # 前瞻规划（可选）：{"num_candidates": 4, "horizon": 5, "rollouts": 200}，
+        # 候选先按参考评分表和裁判代理模型在本地评分，其余候选合并为一次打包的裁判请求
+        planner = None
+        if game_params['lookahead_planner']:
+            from src.lookahead_planner import LookaheadPlanner
+            from src.reference_table import ReferenceTable
+            planner = LookaheadPlanner(table=ReferenceTable.load(), judge_surrogate=judge_surrogate,
+                                       **game_params['lookahead_planner'])
+            print(f"✅ 已启用前瞻规划 (每年{planner.num_candidates}组候选, 推演{planner.horizon}年)")
+        
         # 创建游戏实例
         game = ShorlineEcologyGame(
             api_key=api_key, 
             base_url=base_url, 
             model=model,
+            llm_client=llm_client,
             pause_between_years=pause_between_years,
             pause_duration=pause_duration,
             annual_bonus=annual_bonus,
-            use_llm_for_random_events=use_llm_for_random_events
+            use_llm_for_random_events=use_llm_for_random_events,
+            record_stream_path=game_params['record_stream_path'],
+            record_stream_flush_every=game_params['record_stream_flush_every'],
+            retain_records=game_params['retain_records'],
+            record_writer=record_writer,
+            history_db_path=game_params['history_db_path'],
+            judge_surrogate=judge_surrogate,
+            decision_memory=decision_memory,
+            planner=planner
         )
         
         # 设置游戏状态参数
@@ -462,8 +644,7 @@ def main():
         game.enable_random_events = game_params['enable_random_events']
         
         # 设置随机事件系统参数
-        if hasattr(game.random_event_system, 'disaster_probability_modifier'):
-            game.random_event_system.disaster_probability_modifier = game_params['disaster_probability_modifier']
+        game.random_event_system.disaster_probability_modifier = game_params['disaster_probability_modifier']
         
         # 选择运行模式
         if "default_mode" in config:
@@ -485,7 +666,7 @@ def main():
             print(f"结束原因: {summary['game_over_reason']}")
             
             # 导出详细记录
-            filename = game.game_state.export_to_json()
+            filename = game.export_game()
             print(f"详细记录已保存到: {filename}")
             
         else:
@@ -508,13 +689,26 @@ def main():
                 else:
                     fast_mode = True
             
+            # 序贯提前停止（num_games作为上限）
+            early_stopping = SequentialStopper.from_config(game_params['early_stopping'])
+            if early_stopping is not None:
+                print(f"✅ 已启用提前停止，最多运行{num_games}次游戏")
+            
             print(f"开始运行{num_games}次游戏...")
             
-            statistics = game.run_multiple_games(num_games, fast_mode=fast_mode)
+            statistics = game.run_multiple_games(num_games, fast_mode=fast_mode,
+                                                 keep_detailed_results=game_params['keep_detailed_results'],
+                                                 early_stopping=early_stopping)
             game.print_statistics(statistics)
             
             print(f"\n统计结果已保存到: game_statistics.json")
-            print(f"各次游戏详细记录已保存到: game_001.json - game_{num_games:03d}.json")
+            if game_params['retain_records']:
+                print(f"各次游戏详细记录已保存到: game_001.json - game_{statistics['total_games']:03d}.json")
+        
+        if game_params['trajectory_store_path']:
+            print(f"紧凑轨迹已写入: {game_params['trajectory_store_path']}")
+        elif game_params['record_stream_path']:
+            print(f"流式年度记录已写入: {game_params['record_stream_path']}")
     
     except KeyboardInterrupt:
         print("\n用户中断游戏")
@@ -522,6 +716,9 @@ def main():
         print(f"游戏运行出错: {str(e)}")
         import traceback
         traceback.print_exc()
+    finally:
+        if game is not None:
+            game.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""
+行动文本模糊索引
+人类LLM经常改写评分表中的行动（"promote public transit" / "promote public transportation"），
+使按原文计算的缓存键无法命中。本模块对规范行动（参考评分表中的行动和已评分过的行动）
+建立字符n-gram MinHash + LSH分桶索引，把新的行动文本映射到最相似的规范行动，
+供响应缓存等快速路径按规范行动命中。
+只合并近似重复的改写：字符相似度之外还要求实词一致（最多相差max_extra_tokens处：多出一个词，
+或换成同词根的词，如transit / transportation），
+并拒绝方向相反的匹配（"stop urban expansion" / "urban expansion"，"reforestation" / "deforestation"），
+否则缓存会返回相反行动的评分
+"""
+
+import zlib
+import logging
+import threading
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from .judge_surrogate import action_tokens, normalize_action, polarity_conflict
+from .reference_table import ReferenceTable
+
+logger = logging.getLogger(__name__)
+
+_MASK_32 = np.uint64(0xFFFFFFFF)
+_SHIFT_32 = np.uint64(32)
+
+
+def action_shingles(text: str, ngram: int = 3) -> FrozenSet[str]:
+    """规范化文本的字符n-gram集合（首尾补空格）"""
+    padded = f" {text} "
+    return frozenset(padded[i:i + ngram] for i in range(max(len(padded) - ngram + 1, 1)))
+
+
+def _same_root(a: str, b: str) -> bool:
+    """两个词干是否同词根：公共前缀至少4个字符且不短于较短词的60%（transit / transportation）"""
+    common = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        common += 1
+    return common >= max(4, 0.6 * min(len(a), len(b)))
+
+
+def token_changes(a: FrozenSet[str], b: FrozenSet[str]) -> int:
+    """
+    两个实词集合之间的改动处数：同词根的替换算一处，其余只在一方出现的词各算一处
+
+    Args:
+        a: 实词词干集合
+        b: 实词词干集合
+
+    Returns:
+        改动处数
+    """
+    only_a, only_b = set(a - b), set(b - a)
+    substitutions = 0
+    for x in sorted(only_a):
+        y = next((y for y in sorted(only_b) if _same_root(x, y)), None)
+        if y is not None:
+            only_a.discard(x)
+            only_b.discard(y)
+            substitutions += 1
+    return substitutions + len(only_a) + len(only_b)
+
+
+class ActionIndex:
+    """规范行动的MinHash相似度索引（线程安全）"""
+
+    def __init__(self, threshold: float = 0.5, num_perm: int = 64, band_size: int = 2,
+                 ngram: int = 3, seed: int = 1, max_extra_tokens: int = 1):
+        """
+        初始化索引
+
+        Args:
+            threshold: 判定为同一行动的最低Jaccard相似度（字符n-gram集合；实词和方向另外校验）
+            num_perm: MinHash签名长度
+            band_size: LSH每个分桶的签名行数（越小召回越高、候选越多）
+            ngram: 字符n-gram长度
+            seed: 哈希函数的随机种子
+            max_extra_tokens: 两个行动的实词（去掉虚词后的词干）最多相差的处数（多出一个词、
+                换成同词根的词各算一处，换成无关的词算两处）；
+                相差的词中有否定/削减类词、反义词或否定前缀时不匹配
+        """
+        if num_perm % band_size:
+            raise ValueError("num_perm必须是band_size的整数倍")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.band_size = band_size
+        self.ngram = ngram
+        self.max_extra_tokens = max_extra_tokens
+        rng = np.random.default_rng(seed)
+        # 乘法-移位哈希族: h(x) = ((a * x + b) mod 2^64) >> 32，a为奇数
+        self._a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+
+        self._canonical_of: Dict[str, str] = {}       # 规范化文本 -> 规范行动
+        self._shingles: Dict[str, FrozenSet[str]] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[str]] = {}
+        self._memo: Dict[str, Tuple[Optional[str], float]] = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+
+    @classmethod
+    def from_reference_table(cls, table: ReferenceTable = None, **kwargs) -> "ActionIndex":
+        """
+        以参考评分表中的行动为规范行动建立索引
+
+        Args:
+            table: 参考评分表（默认从prompt/ref_scoring_table.txt加载）
+            **kwargs: 传给构造函数的参数
+
+        Returns:
+            索引
+        """
+        index = cls(**kwargs)
+        for name in (table or ReferenceTable.load()).names:
+            index.add(name)
+        return index
+
+    def _signature(self, shingles: FrozenSet[str]) -> np.ndarray:
+        """MinHash签名"""
+        values = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        hashed = (values[:, np.newaxis] * self._a + self._b) >> _SHIFT_32
+        return (hashed & _MASK_32).min(axis=0)
+
+    def _bands(self, signature: np.ndarray):
+        for band in range(0, self.num_perm, self.band_size):
+            yield band, signature[band:band + self.band_size].tobytes()
+
+    def add(self, text: str, canonical: str = None) -> Optional[str]:
+        """
+        加入一个行动
+
+        Args:
+            text: 行动文本
+            canonical: 对应的规范行动（默认为该文本规范化后的自身）
+
+        Returns:
+            规范行动（文本为空时返回None）
+        """
+        key = normalize_action(text)
+        if not key:
+            return None
+        canonical = canonical or key
+        with self._lock:
+            if key in self._canonical_of:
+                return self._canonical_of[key]
+            self._canonical_of[key] = canonical
+            shingles = action_shingles(key, self.ngram)
+            self._shingles[key] = shingles
+            for band in self._bands(self._signature(shingles)):
+                self._buckets.setdefault(band, []).append(key)
+            # 新行动可能成为之前查询的更优匹配
+            self._memo.clear()
+        return canonical
+
+    def lookup(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        查找最相似的规范行动
+
+        Args:
+            text: 行动文本
+
+        Returns:
+            (规范行动, Jaccard相似度)；相似度低于阈值时规范行动为None
+        """
+        key = normalize_action(text)
+        with self._lock:
+            self.lookups += 1
+            canonical = self._canonical_of.get(key)
+            if canonical is not None:
+                self.exact_hits += 1
+                return canonical, 1.0
+            if key in self._memo:
+                result = self._memo[key]
+            else:
+                result = self._fuzzy_lookup(key)
+                self._memo[key] = result
+            if result[0] is not None:
+                self.fuzzy_hits += 1
+            return result
+
+    def _fuzzy_lookup(self, key: str) -> Tuple[Optional[str], float]:
+        """用LSH分桶找候选，再按精确Jaccard相似度验证"""
+        if not key or not self._shingles:
+            return None, 0.0
+        shingles = action_shingles(key, self.ngram)
+        candidates = set()
+        for band in self._bands(self._signature(shingles)):
+            candidates.update(self._buckets.get(band, ()))
+        tokens = action_tokens(key)
+        best, best_similarity = None, 0.0
+        for candidate in candidates:
+            if not self._tokens_agree(tokens, candidate, key):
+                continue
+            other = self._shingles[candidate]
+            similarity = len(shingles & other) / len(shingles | other)
+            if similarity > best_similarity or (similarity == best_similarity and best is not None
+                                                and candidate < best):
+                best, best_similarity = candidate, similarity
+        if best is None or best_similarity < self.threshold:
+            return None, best_similarity
+        return self._canonical_of[best], best_similarity
+
+    def _tokens_agree(self, tokens: FrozenSet[str], candidate: str, key: str) -> bool:
+        """实词一致（相差不超过max_extra_tokens处）且方向不相反"""
+        if token_changes(tokens, action_tokens(candidate)) > self.max_extra_tokens:
+            return False
+        return not polarity_conflict(key, candidate)
+
+    def canonical(self, text: str, default: str = None) -> Optional[str]:
+        """返回文本对应的规范行动，找不到时返回default"""
+        canonical, _ = self.lookup(text)
+        return canonical if canonical is not None else default
+
+    def stats(self) -> Dict[str, int]:
+        """查询统计"""
+        with self._lock:
+            return {
+                "actions": len(self._canonical_of),
+                "lookups": self.lookups,
+                "exact_hits": self.exact_hits,
+                "fuzzy_hits": self.fuzzy_hits,
+                "misses": self.lookups - self.exact_hits - self.fuzzy_hits,
+            }
+
+    def __len__(self) -> int:
+        return len(self._canonical_of)
+
+    def __contains__(self, text: str) -> bool:
+        return normalize_action(text) in self._canonical_of
@@ -0,0 +1,415 @@
+"""
+离线批处理任务模式
+大规模过夜运行时延迟不重要，费用和速率限制才重要。本模块让多局同步推进的游戏
+把每一轮待发送的LLM请求写成一个JSONL批处理文件（OpenAI Batch API格式），
+交给服务商的批处理接口或本地工作进程处理，结果返回后各局再继续推进。
+
+每局的一个阶段作为一个任务在独立线程中运行，遇到LLM请求时挂起；
+所有任务都挂起或完成后，收集到的请求作为一批提交。任务按游戏顺序逐个运行和恢复，
+因此随机事件等全局随机数的使用顺序与同步推进时一致
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .llm_client import LLMClient
+from .lockstep import LockstepRunner
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+
+def build_batch_request(custom_id: str, model: str, prompt: str, system_prompt: str = None,
+                        temperature: float = 0.7, max_tokens: int = 10000,
+                        history: List[Dict[str, str]] = None, response_format: Dict[str, str] = None,
+                        n: int = 1) -> Dict[str, Any]:
+    """构造一行批处理请求（与LLMClient._request_llm的参数一致，history为此前的对话消息，n为回复数）"""
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.extend(history or [])
+    messages.append({"role": "user", "content": prompt})
+    body = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+    if response_format:
+        body["response_format"] = response_format
+    if n > 1:
+        body["n"] = n
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": body,
+    }
+
+
+def read_batch_results(path: str, all_choices: bool = False) -> Dict[str, Tuple[Any, Optional[str]]]:
+    """
+    读取批处理结果文件
+
+    Args:
+        path: 结果JSONL路径
+        all_choices: 是否返回所有非空回复的列表（带n参数的多采样请求），否则只返回第一个回复
+
+    Returns:
+        {custom_id: (回复文本或回复列表, 错误信息)}
+    """
+    results = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            content, error = None, item.get("error")
+            response = item.get("response") or {}
+            if response.get("status_code", 200) != 200:
+                error = error or f"HTTP {response.get('status_code')}"
+            else:
+                try:
+                    texts = [(choice["message"]["content"] or "").strip() for choice in response["body"]["choices"]]
+                    if all_choices:
+                        content = [text for text in texts if text] or None
+                    else:
+                        content = texts[0] or None
+                except (KeyError, IndexError, TypeError):
+                    error = error or "回复格式不正确"
+            if content is None and error is None:
+                error = "回复为空"
+            results[item["custom_id"]] = (content, str(error) if error else None)
+    return results
+
+
+class LocalBatchWorker:
+    """本地批处理工作进程：逐行读取请求文件，调用处理函数，写出结果文件"""
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], str]):
+        """
+        初始化工作进程
+
+        Args:
+            handler: 由请求body（model/messages/...）生成回复文本的函数（body带n参数时调用n次）
+        """
+        self.handler = handler
+
+    @classmethod
+    def from_llm_client(cls, llm_client: LLMClient) -> "LocalBatchWorker":
+        """用同步LLM客户端处理请求（如本地部署的OpenAI兼容服务）"""
+        def handler(body: Dict[str, Any]) -> str:
+            messages = body["messages"]
+            system_prompt = next((m["content"] for m in messages if m["role"] == "system"), None)
+            dialog = [m for m in messages if m["role"] != "system"]
+            return llm_client._request_llm(dialog[-1]["content"], system_prompt, history=dialog[:-1],
+                                           response_format=body.get("response_format"))
+        return cls(handler)
+
+    def run(self, input_path: str, output_path: str):
+        """处理一个批处理文件"""
+        with open(input_path, "r", encoding="utf-8") as src, open(output_path, "w", encoding="utf-8") as dst:
+            for line in src:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                try:
+                    choices = [{"message": {"role": "assistant", "content": self.handler(request["body"])}}
+                               for _ in range(request["body"].get("n", 1))]
+                    item = {"custom_id": request["custom_id"], "error": None,
+                            "response": {"status_code": 200, "body": {"choices": choices}}}
+                except Exception as e:
+                    item = {"custom_id": request["custom_id"], "response": None, "error": str(e)}
+                dst.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API：上传请求文件、创建批处理任务、轮询直到完成后下载结果"""
+
+    def __init__(self, client=None, api_key: str = None, base_url: str = None,
+                 completion_window: str = "24h", poll_interval: float = 60.0):
+        """
+        初始化批处理接口
+
+        Args:
+            client: openai.OpenAI实例（可选，默认由api_key/base_url创建）
+            api_key: API密钥
+            base_url: API基础URL
+            completion_window: 批处理完成时限
+            poll_interval: 轮询间隔（秒）
+        """
+        if client is None:
+            import openai
+            client = openai.OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"),
+                                   base_url=base_url or os.getenv("OPENAI_BASE_URL"))
+        self.client = client
+        self.completion_window = completion_window
+        self.poll_interval = poll_interval
+
+    def run(self, input_path: str, output_path: str):
+        """提交批处理并等待结果"""
+        with open(input_path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT,
+                                           completion_window=self.completion_window)
+        logger.info(f"已提交批处理任务: {batch.id}")
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(self.poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+            logger.info(f"批处理任务{batch.id}状态: {batch.status}")
+
+        # 失败的请求写在error_file中，合并后统一按custom_id处理
+        lines = []
+        for file_id in (getattr(batch, "output_file_id", None), getattr(batch, "error_file_id", None)):
+            if file_id:
+                lines.append(self.client.files.content(file_id).text.strip())
+        if batch.status != "completed" and not lines:
+            raise Exception(f"批处理任务{batch.id}未完成: {batch.status}")
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(line for line in lines if line) + "\n")
+
+
+class _TaskSlot:
+    """一个批处理任务（在独立线程中运行，遇到LLM请求时挂起）"""
+
+    def __init__(self, index: int, func: Callable[[], Any]):
+        self.index = index
+        self.func = func
+        self.thread: Optional[threading.Thread] = None
+        self.resume = threading.Event()
+        self.paused = threading.Event()
+        self.request: Optional[Dict[str, Any]] = None     # build_batch_request的参数
+        self.response: Optional[List[str]] = None
+        self.error: Optional[Exception] = None
+        self.attempts = 0
+        self.done = False
+        self.result: Any = None
+
+
+class BatchCollector:
+    """收集各任务的LLM请求，按轮提交批处理"""
+
+    def __init__(self, backend, work_dir: str = "batch_jobs", model: str = "gpt-3.5-turbo",
+                 max_retries: int = 3, keep_files: bool = True):
+        """
+        初始化收集器
+
+        Args:
+            backend: 批处理后端（LocalBatchWorker、OpenAIBatchBackend或实现run(input_path, output_path)的对象）
+            work_dir: 请求/结果文件目录
+            model: 请求使用的模型
+            max_retries: 单个请求失败（出错或空回复）后在后续轮次中重试的次数
+            keep_files: 是否保留每轮的请求/结果文件
+        """
+        self.backend = backend
+        self.work_dir = work_dir
+        self.model = model
+        self.max_retries = max_retries
+        self.keep_files = keep_files
+        self.rounds = 0
+        self.requests_sent = 0
+        self._local = threading.local()
+        os.makedirs(work_dir, exist_ok=True)
+
+    def request(self, prompt: str, system_prompt: str = None, history: List[Dict[str, str]] = None,
+                response_format: Dict[str, str] = None) -> str:
+        """
+        在任务线程中提交一个LLM请求并挂起，直到该轮批处理返回结果
+
+        Args:
+            prompt: 用户提示词
+            system_prompt: 系统提示词
+            history: 此前的对话消息（多轮追问）
+            response_format: 回复格式（如JSON）
+
+        Returns:
+            LLM回复
+        """
+        return self._wait({"prompt": prompt, "system_prompt": system_prompt, "history": history,
+                           "response_format": response_format})[0]
+
+    def request_samples(self, prompt: str, system_prompt: str = None, n: int = 1,
+                        response_format: Dict[str, str] = None) -> List[str]:
+        """
+        提交一个带n参数的多采样请求并挂起（后端不支持n参数时返回的回复可能少于n个）
+
+        Args:
+            prompt: 用户提示词
+            system_prompt: 系统提示词
+            n: 回复数
+            response_format: 回复格式（如JSON）
+
+        Returns:
+            非空回复列表（至少一个）
+        """
+        return self._wait({"prompt": prompt, "system_prompt": system_prompt, "response_format": response_format,
+                           "n": n})
+
+    def _wait(self, request: Dict[str, Any]) -> List[str]:
+        """挂起当前任务直到该请求的批处理返回，返回非空回复列表"""
+        slot: Optional[_TaskSlot] = getattr(self._local, "slot", None)
+        if slot is None:
+            # 不在任务中（如直接调用客户端）：作为单个任务提交
+            [(result, error)] = self.run([lambda: self._wait(request)])
+            if error is not None:
+                raise error
+            return result
+        slot.request = request
+        slot.attempts = 0
+        slot.paused.set()
+        slot.resume.wait()
+        slot.resume.clear()
+        if slot.error is not None:
+            error, slot.error = slot.error, None
+            raise error
+        return slot.response
+
+    def _thread_main(self, slot: _TaskSlot):
+        self._local.slot = slot
+        try:
+            slot.result = slot.func()
+        except Exception as e:
+            slot.result = e
+        finally:
+            slot.done = True
+            slot.paused.set()
+
+    def _advance(self, slot: _TaskSlot):
+        """让一个任务运行到下一次LLM请求或结束"""
+        slot.paused.clear()
+        if slot.thread is None:
+            slot.thread = threading.Thread(target=self._thread_main, args=(slot,), daemon=True)
+            slot.thread.start()
+        else:
+            slot.resume.set()
+        slot.paused.wait()
+
+    def _submit(self, slots: List[_TaskSlot]) -> Dict[int, Tuple[Optional[List[str]], Optional[str]]]:
+        """把挂起任务的请求写成一批提交，返回{任务下标: (回复列表, 错误)}"""
+        self.rounds += 1
+        input_path = os.path.join(self.work_dir, f"round_{self.rounds:05d}_requests.jsonl")
+        output_path = os.path.join(self.work_dir, f"round_{self.rounds:05d}_results.jsonl")
+        with open(input_path, "w", encoding="utf-8") as f:
+            for slot in slots:
+                request = build_batch_request(f"r{self.rounds}-t{slot.index}", self.model, **slot.request)
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        logger.info(f"第{self.rounds}轮批处理: {len(slots)}个请求")
+        self.requests_sent += len(slots)
+        try:
+            self.backend.run(input_path, output_path)
+            results = read_batch_results(output_path, all_choices=True)
+        except Exception as e:
+            logger.error(f"第{self.rounds}轮批处理失败: {e}")
+            results = {}
+        finally:
+            if not self.keep_files:
+                for path in (input_path, output_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+        return {slot.index: results.get(f"r{self.rounds}-t{slot.index}", (None, "结果中缺少该请求"))
+                for slot in slots}
+
+    def run(self, tasks: Sequence[Callable[[], Any]]) -> List[Tuple[Any, Optional[Exception]]]:
+        """
+        运行一组任务，按轮批量处理它们的LLM请求
+
+        Args:
+            tasks: 无参数的任务函数
+
+        Returns:
+            每个任务的(返回值, 异常)，顺序与tasks一致
+        """
+        slots = [_TaskSlot(index, task) for index, task in enumerate(tasks)]
+        for slot in slots:
+            self._advance(slot)
+        while True:
+            waiting = [slot for slot in slots if not slot.done]
+            if not waiting:
+                break
+            responses = self._submit(waiting)
+            for slot in waiting:
+                content, error = responses[slot.index]
+                if content is None:
+                    slot.attempts += 1
+                    if slot.attempts <= self.max_retries:
+                        logger.warning(f"任务{slot.index}的请求失败({error})，下一轮重试 "
+                                       f"({slot.attempts}/{self.max_retries})")
+                        continue
+                    slot.error = Exception(f"批处理请求失败，已重试{self.max_retries}次: {error}")
+                slot.response = content
+                self._advance(slot)
+        return [(None, slot.result) if isinstance(slot.result, Exception) else (slot.result, None)
+                for slot in slots]
+
+    def stats(self) -> Dict[str, int]:
+        return {"rounds": self.rounds, "requests": self.requests_sent}
+
+
+class BatchLLMClient(LLMClient):
+    """通过批处理收集器发送请求的LLM客户端（提示词构造、解析和缓存与LLMClient相同）"""
+
+    def __init__(self, collector: BatchCollector, model: str = None, **kwargs):
+        """
+        初始化客户端
+
+        Args:
+            collector: 批处理收集器
+            model: 模型名称（默认使用收集器的模型）
+            **kwargs: 传给LLMClient的其他参数（response_cache、action_index等）
+        """
+        kwargs.setdefault("api_key", "batch")
+        super().__init__(model=model or collector.model, **kwargs)
+        self.collector = collector
+
+    def _request_llm(self, prompt: str, system_prompt: str = None, max_retries: int = 5,
+                     history: List[Dict[str, str]] = None, response_format: Dict[str, str] = None) -> str:
+        return self.collector.request(prompt, system_prompt, history, response_format)
+
+    def _request_samples(self, prompt: str, system_prompt: str = None, n: int = 1,
+                         response_format: Dict[str, str] = None) -> List[str]:
+        """多采样请求也经过收集器：带n参数写入批处理，后端返回的回复不足时在后续轮次补足"""
+        responses = []
+        while len(responses) < n:
+            responses.extend(self.collector.request_samples(prompt, system_prompt, n - len(responses),
+                                                            response_format))
+        return responses[:n]
+
+
+class BatchJobRunner(LockstepRunner):
+    """按批处理轮次同步推进多局游戏（各局需使用绑定到同一收集器的BatchLLMClient）"""
+
+    def __init__(self, games, collector: BatchCollector, **kwargs):
+        """
+        初始化运行器
+
+        Args:
+            games: 游戏控制器
+            collector: 批处理收集器
+            **kwargs: 传给LockstepRunner的参数（packer、pack_roles）
+        """
+        super().__init__(games, **kwargs)
+        self.collector = collector
+
+    def _each(self, indices, step, failed):
+        outcomes = self.collector.run([lambda i=i: step(i, self.games[i]) for i in indices])
+        results = {}
+        for index, (result, error) in zip(indices, outcomes):
+            if error is not None:
+                logger.error(f"游戏{index + 1}第{self.games[index].game_state.year}年处理出错: {str(error)}")
+                failed[index] = error
+            else:
+                results[index] = result
+        return results
+
+    def _batch(self, role, indices, texts, single, packed, failed):
+        if role not in self.pack_roles or len(indices) < 2:
+            return self._each(indices, single, failed)
+        # 打包请求作为一个任务提交
+        [(result, error)] = self.collector.run([lambda: packed([texts[index] for index in indices])])
+        if error is not None:
+            logger.error(f"第{self.year}年打包{role}请求出错: {str(error)}")
+            for index in indices:
+                failed[index] = error
+            return {}
+        return dict(zip(indices, result))
@@ -0,0 +1,336 @@
+"""
+历史游戏的反事实重新评分
+修改裁判提示词或参考评分表后，不必重新运行整局游戏：读取历史记录（导出的JSON或轨迹存储）中的国家行动，
+只重新调用裁判（每组不同的行动只评分一次，带缓存和并发），再沿用记录中的随机事件影响，
+按GameState的规则（年度奖励、分数上下限、胜利/失败/超时的判定顺序）重算分数轨迹和结果，
+报告胜利率的变化
+"""
+
+import glob
+import json
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .game_state import GameState, YearlyRecord, classify_outcome, yearly_record_from_dict
+from .judge_surrogate import normalize_action
+
+logger = logging.getLogger(__name__)
+
+_SCORE_KEYS = ('first_country', 'first_shoreline', 'second_country', 'second_shoreline')
+
+# 重算时记录中的行动已用完、游戏仍未结束（之后的行动未知）
+UNDETERMINED = "undetermined"
+
+
+@dataclass
+class RecordedGame:
+    """一局历史游戏（重新评分所需的部分）"""
+    source: str
+    initial_country: int
+    initial_shoreline: int
+    records: List[YearlyRecord]
+    outcome: str                                        # 记录中的结果类别
+    config: Dict[str, Any] = field(default_factory=dict)  # 导出记录metadata中的游戏配置（旧记录为空）
+
+
+def load_history_games(history_dir: str = "history") -> List[RecordedGame]:
+    """
+    读取导出的历史游戏记录
+
+    Args:
+        history_dir: 历史记录目录（读取其中的game_record_*.json / game_*.json）
+
+    Returns:
+        历史游戏列表（没有年度记录的文件被跳过）
+    """
+    paths = sorted(set(glob.glob(os.path.join(history_dir, "game_record_*.json"))
+                       + glob.glob(os.path.join(history_dir, "game_*.json"))))
+    games = []
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取历史记录失败: {path} -> {e}")
+            continue
+        records = [yearly_record_from_dict(entry) for entry in data.get("yearly_records", [])]
+        if not records:
+            continue
+        summary = data.get("game_summary", {})
+        initial = summary.get("initial_scores", {})
+        games.append(RecordedGame(
+            source=os.path.basename(path),
+            initial_country=initial.get("country", 60),
+            initial_shoreline=initial.get("shoreline", 100),
+            records=records,
+            outcome=classify_outcome(summary),
+            config=data.get("metadata", {}).get("config", {}),
+        ))
+    logger.info(f"读取{len(games)}局历史游戏")
+    return games
+
+
+def load_store_games(store) -> List[RecordedGame]:
+    """
+    读取轨迹存储中的游戏
+
+    Args:
+        store: TrajectoryStore实例
+
+    Returns:
+        历史游戏列表（轨迹存储不保存海岸线响应和随机事件详情，只保留重算需要的字段）
+    """
+    years, summaries = store.years, store.games
+    games = []
+    for row in range(store.num_games):
+        game_id = int(summaries["game_id"][row])
+        rows = store.game_rows(game_id)
+        rows = rows[years["year"][rows].argsort(kind="stable")]
+        records = [YearlyRecord(
+            year=int(years["year"][i]),
+            country_score=int(years["country_score"][i]),
+            shoreline_score=int(years["shoreline_score"][i]),
+            country_actions={"action_1": store.string(years["action_1_id"][i]),
+                             "action_2": store.string(years["action_2_id"][i])},
+            shore_response={},
+            judge_scores={key: int(years[key][i]) for key in _SCORE_KEYS},
+            random_events=[],
+            country_change=int(years["country_change"][i]),
+            shoreline_change=int(years["shoreline_change"][i]),
+            random_country_impact=int(years["random_country_impact"][i]),
+            random_shoreline_impact=int(years["random_shoreline_impact"][i]),
+        ) for i in rows]
+        if not records:
+            continue
+        games.append(RecordedGame(
+            source=f"store:{game_id}",
+            initial_country=int(summaries["initial_country"][row]),
+            initial_shoreline=int(summaries["initial_shoreline"][row]),
+            records=records,
+            outcome=classify_outcome({"victory": bool(summaries["victory"][row]),
+                                      "game_over_reason": store.string(summaries["reason_id"][row])}),
+        ))
+    logger.info(f"从轨迹存储读取{len(games)}局游戏")
+    return games
+
+
+def infer_annual_bonus(game: RecordedGame, default: int = 1) -> int:
+    """
+    由记录的分数轨迹推断年度奖励（未被0/100截断的年份中，分数变化减去评分和随机事件影响后的最常见值）
+
+    Args:
+        game: 历史游戏
+        default: 无法推断时的默认值
+
+    Returns:
+        年度奖励
+    """
+    residuals = Counter()
+    previous = (game.initial_country, game.initial_shoreline)
+    for record in game.records:
+        current = (record.country_score, record.shoreline_score)
+        changes = ((record.country_change, record.random_country_impact),
+                   (record.shoreline_change, record.random_shoreline_impact))
+        for before, after, (judged, random_impact) in zip(previous, current, changes):
+            if 0 < after < 100:
+                residuals[after - before - judged - random_impact] += 1
+        previous = current
+    return residuals.most_common(1)[0][0] if residuals else default
+
+
+def action_pair_key(actions: Dict[str, str]) -> Tuple[str, str]:
+    """行动组合的去重键（规范化后的两个行动）"""
+    return normalize_action(actions.get("action_1", "")), normalize_action(actions.get("action_2", ""))
+
+
+def replay_game(game: RecordedGame, judge_scores: List[Dict[str, int]], annual_bonus: int = 1,
+                max_years: int = 25, victory_threshold: int = 100, failure_threshold: int = 75) -> Dict[str, Any]:
+    """
+    按GameState的规则用给定的逐年评分重算一局游戏（随机事件影响沿用记录）
+
+    Args:
+        game: 历史游戏
+        judge_scores: 逐年的裁判评分（与game.records一一对应）
+        annual_bonus: 年度奖励
+        max_years: 最大年数
+        victory_threshold: 胜利阈值
+        failure_threshold: 失败阈值
+
+    Returns:
+        {"outcome": 结果类别（记录中的行动用完时仍未结束为"undetermined"）, "years": 结束年份,
+         "final_country", "final_shoreline", "trajectory": [(国家分数, 海岸线分数)]}
+    """
+    state = GameState(initial_country_score=game.initial_country, initial_shoreline_score=game.initial_shoreline,
+                      max_years=max_years, victory_threshold=victory_threshold, failure_threshold=failure_threshold)
+    trajectory = []
+    outcome = UNDETERMINED
+    for record, scores in zip(game.records, judge_scores):
+        state.year += 1
+        state.update_scores(
+            country_change=scores.get('first_country', 0) + scores.get('second_country', 0),
+            shoreline_change=scores.get('first_shoreline', 0) + scores.get('second_shoreline', 0),
+            random_country_impact=record.random_country_impact,
+            random_shoreline_impact=record.random_shoreline_impact,
+            annual_bonus=annual_bonus,
+        )
+        trajectory.append((state.country_score, state.shoreline_score))
+        if state.is_game_over():
+            outcome = state.get_game_summary()["outcome"]
+            break
+    return {"outcome": outcome, "years": state.year, "final_country": state.country_score,
+            "final_shoreline": state.shoreline_score, "trajectory": trajectory}
+
+
+def resolve_game_settings(game: RecordedGame, overrides: Dict[str, Optional[int]] = None) -> Dict[str, int]:
+    """
+    一局历史游戏重算时使用的规则参数：显式参数优先，其次是记录的配置，最后推断年度奖励或取GameState默认值
+
+    Args:
+        game: 历史游戏
+        overrides: {"annual_bonus", "max_years", "victory_threshold", "failure_threshold": 显式值或None}
+
+    Returns:
+        replay_game的规则参数
+    """
+    defaults = GameState.__init__.__defaults__
+    fallback = {"max_years": defaults[2], "victory_threshold": defaults[3], "failure_threshold": defaults[4]}
+    overrides = overrides or {}
+    settings = {}
+    for name in ("annual_bonus", "max_years", "victory_threshold", "failure_threshold"):
+        value = overrides.get(name)
+        if value is None:
+            value = game.config.get(name)
+        if value is None:
+            value = infer_annual_bonus(game) if name == "annual_bonus" else fallback[name]
+        settings[name] = value
+    return settings
+
+
+def _summarize(outcomes: List[str]) -> Dict[str, Any]:
+    counts = Counter(outcomes)
+    return {"victory_rate": counts["victory"] / len(outcomes) if outcomes else 0.0, "outcomes": dict(counts)}
+
+
+class CounterfactualRejudger:
+    """用当前的裁判提示词和参考评分表重新评分历史游戏"""
+
+    def __init__(self, llm_client, ref_table: str, workers: int = 8, annual_bonus: Optional[int] = None,
+                 max_years: Optional[int] = None, victory_threshold: Optional[int] = None,
+                 failure_threshold: Optional[int] = None):
+        """
+        初始化重新评分器
+
+        Args:
+            llm_client: LLM客户端（配置response_cache后重复运行不再请求已评过的行动）
+            ref_table: 参考评分表文本（新的评分表）
+            workers: 并发的裁判请求数
+            annual_bonus: 年度奖励（None时依次取记录metadata中的配置、由分数轨迹推断）
+            max_years: 最大年数（None时取记录metadata中的配置，否则为GameState默认值）
+            victory_threshold: 胜利阈值（同上）
+            failure_threshold: 失败阈值（同上）
+        """
+        self.llm_client = llm_client
+        self.ref_table = ref_table
+        self.workers = max(1, workers)
+        self.overrides = {"annual_bonus": annual_bonus, "max_years": max_years,
+                          "victory_threshold": victory_threshold, "failure_threshold": failure_threshold}
+
+    def game_settings(self, game: RecordedGame) -> Dict[str, int]:
+        """一局游戏重算时使用的规则参数（见resolve_game_settings）"""
+        return resolve_game_settings(game, self.overrides)
+
+    def judge_pairs(self, games: List[RecordedGame]) -> Dict[Tuple[str, str], Optional[Dict[str, int]]]:
+        """
+        为所有不同的行动组合重新评分（每组只请求一次，并发执行）
+
+        Args:
+            games: 历史游戏列表
+
+        Returns:
+            {行动组合键: 新评分（请求失败时为None）}
+        """
+        texts = {}
+        for game in games:
+            for record in game.records:
+                key = action_pair_key(record.country_actions)
+                if key not in texts:
+                    actions = record.country_actions
+                    texts[key] = f"ACTION_1: {actions.get('action_1', '')}\nACTION_2: {actions.get('action_2', '')}"
+
+        def judge(key):
+            try:
+                return key, self.llm_client.call_judge_llm(texts[key], self.ref_table)
+            except Exception as e:
+                logger.warning(f"重新评分失败: {texts[key]!r} -> {e}")
+                return key, None
+
+        logger.info(f"重新评分{len(texts)}组不同的行动（并发{self.workers}）")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return dict(executor.map(judge, texts))
+
+    def run(self, games: List[RecordedGame]) -> Dict[str, Any]:
+        """
+        重新评分并重算全部游戏
+
+        Args:
+            games: 历史游戏列表
+
+        Returns:
+            {"games": 重算的局数, "skipped_games": 因评分失败跳过的局数, "unique_pairs": 不同行动组合数,
+             "changed_pairs": 评分改变的组合数, "baseline": 用记录评分重算的结果, "counterfactual": 用新评分重算的结果,
+             "victory_rate_shift": 胜利率变化, "baseline_mismatches": 用记录评分重算与记录结果不一致的局数,
+             "transitions": {"原结果->新结果": 局数}, "mean_score_change": {评分项: 新评分减记录评分的平均值},
+             "details": 逐局结果}
+        """
+        new_scores = self.judge_pairs(games)
+        changed = set()
+        score_changes = {key: [] for key in _SCORE_KEYS}
+        baseline, counterfactual, transitions, details = [], [], Counter(), []
+        mismatches = skipped = 0
+        for game in games:
+            keys = [action_pair_key(record.country_actions) for record in game.records]
+            if any(new_scores[key] is None for key in keys):
+                skipped += 1
+                continue
+            settings = self.game_settings(game)
+            recorded = replay_game(game, [record.judge_scores for record in game.records], **settings)
+            rejudged = replay_game(game, [new_scores[key] for key in keys], **settings)
+            for record, key in zip(game.records, keys):
+                for name in _SCORE_KEYS:
+                    delta = new_scores[key].get(name, 0) - record.judge_scores.get(name, 0)
+                    score_changes[name].append(delta)
+                    if delta:
+                        changed.add(key)
+            if recorded["outcome"] != game.outcome:
+                mismatches += 1
+            baseline.append(recorded["outcome"])
+            counterfactual.append(rejudged["outcome"])
+            if recorded["outcome"] != rejudged["outcome"]:
+                transitions[f"{recorded['outcome']}->{rejudged['outcome']}"] += 1
+            details.append({"source": game.source, "settings": settings,
+                            "baseline": {k: v for k, v in recorded.items() if k != "trajectory"},
+                            "counterfactual": {k: v for k, v in rejudged.items() if k != "trajectory"},
+                            "trajectory": rejudged["trajectory"]})
+
+        baseline_summary, counterfactual_summary = _summarize(baseline), _summarize(counterfactual)
+        report = {
+            "games": len(details),
+            "skipped_games": skipped,
+            "unique_pairs": len(new_scores),
+            "changed_pairs": len(changed),
+            "baseline": baseline_summary,
+            "counterfactual": counterfactual_summary,
+            "victory_rate_shift": counterfactual_summary["victory_rate"] - baseline_summary["victory_rate"],
+            "baseline_mismatches": mismatches,
+            "transitions": dict(transitions),
+            "mean_score_change": {name: sum(values) / len(values) if values else 0.0
+                                  for name, values in score_changes.items()},
+            "details": details,
+        }
+        logger.info(f"反事实重新评分完成: {report['games']}局, 胜利率{baseline_summary['victory_rate']:.2%} -> "
+                    f"{counterfactual_summary['victory_rate']:.2%}")
+        return report
@@ -0,0 +1,169 @@
+"""
+人类LLM的决策记忆
+最近k年的行动和结果逐年列出，更早的年份在本地增量汇总为一段摘要（不额外调用LLM），
+渲染结果不超过固定的token预算，游戏年数再长，每年人类LLM提示词的长度也保持不变
+"""
+
+import logging
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .judge_surrogate import normalize_action
+from .prompt_profiles import bound_text, count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def _signed(value: float) -> str:
+    return f"{value:+.0f}" if float(value).is_integer() else f"{value:+.1f}"
+
+
+class DecisionMemory:
+    """有界的滚动决策记忆（每局游戏开始时由游戏控制器重建）"""
+
+    def __init__(self, recent_years: int = 3, max_tokens: int = 160, max_actions: int = 4,
+                 action_chars: int = 60, max_tracked_actions: int = 32, model: str = "gpt-3.5-turbo"):
+        """
+        初始化决策记忆
+
+        Args:
+            recent_years: 逐年列出的最近年数
+            max_tokens: 渲染结果的token上限
+            max_actions: 摘要中列出的最常用行动数
+            action_chars: 行动文本的最大字符数
+            max_tracked_actions: 摘要中最多统计的不同行动数（超过后替换使用次数最少的行动，内存占用有界）
+            model: 计算token数使用的模型名称
+        """
+        self.recent_years = recent_years
+        self.max_tokens = max_tokens
+        self.max_actions = max_actions
+        self.action_chars = action_chars
+        self.max_tracked_actions = max_tracked_actions
+        self.model = model
+        self.reset()
+
+    def reset(self):
+        """清空记忆（新的一局）"""
+        self.recent: deque = deque()
+        self.summary_years: List[int] = []          # [第一年, 最后一年]
+        self.judge_totals = [0, 0]                  # 摘要年份中裁判评分的合计（国家, 海岸线）
+        self.event_totals = [0, 0]                  # 摘要年份中随机事件影响的合计
+        self.lowest_shoreline: Optional[int] = None
+        self.last_scores: Optional[Tuple[int, int]] = None
+        # 规范化行动 -> [次数, 国家变化合计, 海岸线变化合计, 显示文本]
+        self.actions: Dict[str, List[Any]] = {}
+
+    def rebuild(self, records: Iterable[Any]):
+        """
+        由已有的年度记录重建记忆（新的一局时为空，从快照继续时为快照之前的年份）
+
+        Args:
+            records: YearlyRecord列表
+        """
+        self.reset()
+        for record in records:
+            self.observe(record)
+
+    def observe(self, record: Any):
+        """
+        加入一年的记录（超出最近k年的年份并入摘要）
+
+        Args:
+            record: YearlyRecord（或具有相同属性的对象）
+        """
+        scores = record.judge_scores or {}
+        actions = record.country_actions or {}
+        entry = {
+            "year": record.year,
+            "actions": [(actions.get("action_1", ""), scores.get("first_country", 0), scores.get("first_shoreline", 0)),
+                        (actions.get("action_2", ""), scores.get("second_country", 0), scores.get("second_shoreline", 0))],
+            "events": (record.random_country_impact, record.random_shoreline_impact),
+            "scores": (record.country_score, record.shoreline_score),
+        }
+        self.recent.append(entry)
+        while len(self.recent) > self.recent_years:
+            self._fold(self.recent.popleft())
+
+    def _fold(self, entry: Dict[str, Any]):
+        """把一年并入摘要"""
+        if not self.summary_years:
+            self.summary_years = [entry["year"], entry["year"]]
+        self.summary_years[1] = entry["year"]
+        for text, country, shoreline in entry["actions"]:
+            self.judge_totals[0] += country
+            self.judge_totals[1] += shoreline
+            key = normalize_action(text)
+            if not key:
+                continue
+            if key not in self.actions and len(self.actions) >= self.max_tracked_actions:
+                # 替换使用次数最少的行动（新行动继承其次数，近似的高频项统计）
+                evicted = min(self.actions, key=lambda name: self.actions[name][0])
+                count = self.actions.pop(evicted)[0]
+                self.actions[key] = [count, country * count, shoreline * count, text]
+            stats = self.actions.setdefault(key, [0, 0, 0, text])
+            stats[0] += 1
+            stats[1] += country
+            stats[2] += shoreline
+        self.event_totals[0] += entry["events"][0]
+        self.event_totals[1] += entry["events"][1]
+        shoreline_score = entry["scores"][1]
+        if self.lowest_shoreline is None or shoreline_score < self.lowest_shoreline:
+            self.lowest_shoreline = shoreline_score
+        self.last_scores = entry["scores"]
+
+    def _summary_lines(self, top: int, chars: int) -> List[str]:
+        if not self.summary_years:
+            return []
+        first, last = self.summary_years
+        years = f"year {first}" if first == last else f"years {first}-{last}"
+        lines = [f"Earlier ({years}): judged changes country {_signed(self.judge_totals[0])}, "
+                 f"shoreline {_signed(self.judge_totals[1])}; random events country {_signed(self.event_totals[0])}, "
+                 f"shoreline {_signed(self.event_totals[1])}; ended at country {self.last_scores[0]}, "
+                 f"shoreline {self.last_scores[1]} (lowest shoreline {self.lowest_shoreline})."]
+        if top > 0 and self.actions:
+            ranked = sorted(self.actions.values(), key=lambda stats: -stats[0])[:top]
+            lines.append("Most used earlier: " + "; ".join(
+                f"{bound_text(text, chars)} x{count} (avg country {_signed(country / count)}, "
+                f"shoreline {_signed(shoreline / count)})" for count, country, shoreline, text in ranked))
+        return lines
+
+    def _recent_line(self, entry: Dict[str, Any], chars: int) -> str:
+        actions = "; ".join(f"{bound_text(text, chars)} (country {_signed(country)}, shoreline {_signed(shoreline)})"
+                            for text, country, shoreline in entry["actions"])
+        events = entry["events"]
+        event_text = f"; events country {_signed(events[0])}, shoreline {_signed(events[1])}" if any(events) else ""
+        return (f"Year {entry['year']}: {actions}{event_text}; "
+                f"scores country {entry['scores'][0]}, shoreline {entry['scores'][1]}")
+
+    def render(self) -> str:
+        """
+        渲染记忆文本：内容超出token上限时依次减少列出的行动、缩短行动文本、减少逐年列出的年数，
+        最后截断文本
+
+        Returns:
+            记忆文本（没有任何记录时为空字符串）
+        """
+        if not self.recent and not self.summary_years:
+            return ""
+        recent = list(self.recent)
+        levels = [(self.max_actions, self.action_chars, len(recent)),
+                  (self.max_actions // 2, self.action_chars // 2, len(recent))]
+        levels += [(0, self.action_chars // 2, keep) for keep in range(len(recent), -1, -1)]
+        text = ""
+        for top, chars, keep in levels:
+            lines = self._summary_lines(top, chars)
+            lines += [self._recent_line(entry, chars) for entry in recent[len(recent) - keep:]]
+            text = "\n".join(lines)
+            if count_tokens(text, self.model) <= self.max_tokens:
+                return text
+        limit = self.max_tokens
+        while limit > 1 and count_tokens(text, self.model) > self.max_tokens:
+            text = bound_text(text, limit)
+            limit = limit * 3 // 4
+        return text
+
+    def stats(self) -> Dict[str, int]:
+        """记忆的当前规模：逐年列出的年数、摘要年数、统计的行动数和渲染后的token数"""
+        summary = self.summary_years[1] - self.summary_years[0] + 1 if self.summary_years else 0
+        return {"recent_years": len(self.recent), "summary_years": summary,
+                "tracked_actions": len(self.actions), "tokens": count_tokens(self.render(), self.model)}
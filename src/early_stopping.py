@@ -0,0 +1,189 @@
+"""
+多局游戏的序贯提前停止
+根据胜利率的序贯概率比检验（SPRT）或置信区间宽度判断估计是否已足够精确，
+满足条件时提前结束批量游戏，减少API调用
+"""
+
+import math
+import logging
+from statistics import NormalDist
+from typing import Dict, Any, Optional, Tuple
+
+from .stats_aggregator import GameStatsAggregator
+
+logger = logging.getLogger(__name__)
+
+
+def wilson_interval(successes: int, trials: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """
+    胜利率的Wilson置信区间
+
+    Args:
+        successes: 胜利局数
+        trials: 总局数
+        confidence: 置信水平
+
+    Returns:
+        (下界, 上界)
+    """
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+def mean_interval(mean: float, std: float, count: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """
+    均值的正态近似置信区间
+
+    Args:
+        mean: 样本均值
+        std: 样本标准差
+        count: 样本数
+        confidence: 置信水平
+
+    Returns:
+        (下界, 上界)
+    """
+    if count < 2:
+        return -math.inf, math.inf
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    half_width = z * std / math.sqrt(count)
+    return mean - half_width, mean + half_width
+
+
+class SequentialStopper:
+    """胜利率估计的序贯停止规则
+
+    两类停止条件（满足任一即停止）：
+    1. 设置target_victory_rate时，对H0: p = target - margin 与 H1: p = target + margin
+       做Wald SPRT，检验结论为"高于"或"低于"目标时停止；
+    2. 设置ci_width（以及可选的shoreline_ci_width）时，胜利率Wilson区间宽度
+       和最终海岸线分数均值区间宽度都不超过阈值时停止。
+    """
+
+    def __init__(self, target_victory_rate: float = None, margin: float = 0.05,
+                 alpha: float = 0.05, beta: float = 0.05,
+                 ci_width: float = None, shoreline_ci_width: float = None,
+                 confidence: float = 0.95, min_games: int = 10):
+        """
+        初始化停止规则
+
+        Args:
+            target_victory_rate: 目标胜利率（只关心真实胜利率高于还是低于它）
+            margin: SPRT的无差异区间半宽
+            alpha: 第一类错误率（误判为高于目标）
+            beta: 第二类错误率（误判为低于目标）
+            ci_width: 胜利率置信区间的目标宽度
+            shoreline_ci_width: 最终海岸线分数均值置信区间的目标宽度（可选）
+            confidence: 置信区间的置信水平
+            min_games: 最少运行局数
+        """
+        if target_victory_rate is None and ci_width is None and shoreline_ci_width is None:
+            raise ValueError("至少需要设置target_victory_rate、ci_width或shoreline_ci_width之一")
+        self.target_victory_rate = target_victory_rate
+        self.margin = margin
+        self.alpha = alpha
+        self.beta = beta
+        self.ci_width = ci_width
+        self.shoreline_ci_width = shoreline_ci_width
+        self.confidence = confidence
+        self.min_games = min_games
+
+        if target_victory_rate is not None:
+            self.p0 = min(max(target_victory_rate - margin, 1e-6), 1 - 1e-6)
+            self.p1 = min(max(target_victory_rate + margin, 1e-6), 1 - 1e-6)
+            if self.p0 >= self.p1:
+                raise ValueError("无差异区间过窄，无法进行SPRT检验")
+            self.upper_bound = math.log((1 - beta) / alpha)
+            self.lower_bound = math.log(beta / (1 - alpha))
+
+    def log_likelihood_ratio(self, victories: int, games: int) -> float:
+        """SPRT的对数似然比 log(L(p1)/L(p0))"""
+        losses = games - victories
+        return (victories * math.log(self.p1 / self.p0)
+                + losses * math.log((1 - self.p1) / (1 - self.p0)))
+
+    def check(self, aggregator: GameStatsAggregator) -> Optional[str]:
+        """
+        判断是否可以停止
+
+        Args:
+            aggregator: 当前的在线统计聚合器
+
+        Returns:
+            停止原因（"above_target"/"below_target"/"precise"），不满足时返回None
+        """
+        games = aggregator.total_games
+        if games < self.min_games:
+            return None
+
+        if self.target_victory_rate is not None:
+            llr = self.log_likelihood_ratio(aggregator.victories, games)
+            if llr >= self.upper_bound:
+                return "above_target"
+            if llr <= self.lower_bound:
+                return "below_target"
+
+        if self.ci_width is None and self.shoreline_ci_width is None:
+            return None
+        if self.ci_width is not None:
+            low, high = wilson_interval(aggregator.victories, games, self.confidence)
+            if high - low > self.ci_width:
+                return None
+        if self.shoreline_ci_width is not None:
+            shoreline = aggregator.stats["final_shoreline"]
+            low, high = mean_interval(shoreline.mean, shoreline.std, shoreline.count, self.confidence)
+            if high - low > self.shoreline_ci_width:
+                return None
+        return "precise"
+
+    def report(self, aggregator: GameStatsAggregator, planned_games: int,
+               reason: Optional[str]) -> Dict[str, Any]:
+        """
+        生成提前停止报告
+
+        Args:
+            aggregator: 在线统计聚合器
+            planned_games: 计划运行的局数
+            reason: 停止原因（未提前停止时为None）
+
+        Returns:
+            报告字典
+        """
+        games = aggregator.total_games
+        shoreline = aggregator.stats["final_shoreline"]
+        report = {
+            "planned_games": planned_games,
+            "games_run": games,
+            "games_saved": max(0, planned_games - games),
+            "stopped_early": reason is not None,
+            "reason": reason,
+            "confidence": self.confidence,
+            "victory_rate_ci": list(wilson_interval(aggregator.victories, games, self.confidence)),
+            "final_shoreline_ci": list(mean_interval(shoreline.mean, shoreline.std, shoreline.count,
+                                                     self.confidence)) if shoreline.count > 1 else None,
+        }
+        if self.target_victory_rate is not None:
+            report["target_victory_rate"] = self.target_victory_rate
+            report["log_likelihood_ratio"] = self.log_likelihood_ratio(aggregator.victories, games)
+        return report
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> Optional["SequentialStopper"]:
+        """
+        由game_config.json中的early_stopping配置创建停止规则
+
+        Args:
+            config: 配置字典（None或空字典表示不启用）
+
+        Returns:
+            停止规则或None
+        """
+        if not config:
+            return None
+        return cls(**config)
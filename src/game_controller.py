@@ -7,10 +7,18 @@ import logging
 import os
 import json
 import time
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Optional
 from .llm_client import LLMClient
 from .random_events import RandomEventSystem
 from .game_state import GameState
+from .game_snapshot import GameSnapshot
+from .record_writer import JsonlRecordWriter
+from .history_db import HistoryDatabase
+from .stats_aggregator import GameStatsAggregator
+from .early_stopping import SequentialStopper
+from .judge_surrogate import JudgeSurrogate
+from .decision_memory import DecisionMemory
+from .lookahead_planner import LookaheadPlanner
 
 # 配置日志
 logging.basicConfig(
@@ -23,12 +31,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def format_actions_text(country_actions: Dict[str, str]) -> str:
+    """把国家行动格式化为裁判/海岸线LLM的输入文本"""
+    return f"ACTION_1: {country_actions.get('action_1', '')}\nACTION_2: {country_actions.get('action_2', '')}"
+
 class ShorlineEcologyGame:
     """海岸线生态对抗建模游戏主控制器"""
     
     def __init__(self, api_key: str = None, base_url: str = None, model: str = "gpt-3.5-turbo", 
                  pause_between_years: bool = True, pause_duration: float = 5.0, annual_bonus: int = 1,
-                 use_llm_for_random_events: bool = True):
+                 use_llm_for_random_events: bool = True, record_stream_path: str = None,
+                 record_stream_flush_every: int = 10, retain_records: bool = True,
+                 record_writer=None, history_db_path: str = None, llm_client=None,
+                 judge_surrogate: Optional[JudgeSurrogate] = None,
+                 decision_memory: Optional[DecisionMemory] = None,
+                 planner: Optional[LookaheadPlanner] = None):
         """
         初始化游戏
         
@@ -40,8 +57,18 @@ class ShorlineEcologyGame:
             pause_duration: 暂停时长（秒）
             annual_bonus: 每年自动增加的分数（默认1分）
             use_llm_for_random_events: 是否使用LLM评估随机事件
+            record_stream_path: 流式JSONL年度记录文件路径（可选，以.gz结尾时压缩）
+            record_stream_flush_every: 流式记录每多少行刷新一次磁盘
+            retain_records: 是否在内存中保留年度记录（关闭后仅依赖流式记录）
+            record_writer: 自定义记录写入器（如TrajectoryStoreWriter，需实现begin_game/write_year/end_game/close），
+                           优先于record_stream_path
+            history_db_path: SQLite历史数据库路径（可选，导出的游戏记录会自动增量导入）
+            llm_client: 自定义LLM客户端（可选，如多个游戏共享的带缓存客户端），优先于api_key/base_url/model
+            judge_surrogate: 裁判代理模型（可选），置信度足够时代替裁判LLM评分
+            decision_memory: 人类LLM的决策记忆（可选），每年把此前年份的行动和结果附加在人类LLM提示词中
+            planner: 前瞻规划器（可选），人类LLM每年提出多组候选行动，本地推演后选出最好的一组
         """
-        self.llm_client = LLMClient(api_key=api_key, base_url=base_url, model=model)
+        self.llm_client = llm_client or LLMClient(api_key=api_key, base_url=base_url, model=model)
         self.random_event_system = RandomEventSystem(use_llm_evaluation=use_llm_for_random_events)
         self.game_state = GameState()
         self.ref_scoring_table = self._load_reference_table()
@@ -49,6 +76,17 @@ class ShorlineEcologyGame:
         self.pause_duration = pause_duration
         self.annual_bonus = annual_bonus
         self.use_llm_for_random_events = use_llm_for_random_events
+        self.retain_records = retain_records
+        self.record_writer = record_writer
+        if self.record_writer is None and record_stream_path:
+            self.record_writer = JsonlRecordWriter(record_stream_path, flush_every=record_stream_flush_every)
+        self.history_db = HistoryDatabase(history_db_path) if history_db_path else None
+        self.judge_surrogate = judge_surrogate
+        self.decision_memory = decision_memory
+        self.planner = planner
+        self._planned_scores = None
+        self.stats_aggregator = None
+        self.snapshots = {}
         
         logger.info(f"海岸线生态对抗建模游戏初始化完成 (年度奖励: +{annual_bonus}, 随机事件LLM评估: {'启用' if use_llm_for_random_events else '关闭'})")
     
@@ -61,148 +99,380 @@ class ShorlineEcologyGame:
             logger.error("参考评分表文件未找到")
             return ""
     
-    def run_single_game(self) -> Dict[str, Any]:
+    def close(self):
+        """关闭流式记录写入器、历史数据库等资源"""
+        if self.record_writer is not None:
+            self.record_writer.close()
+        if self.history_db is not None:
+            self.history_db.close()
+    
+    def get_run_metadata(self) -> Dict[str, Any]:
+        """
+        获取当前运行的模型和游戏配置（写入导出记录的metadata字段）
+        
+        Returns:
+            元数据字典
+        """
+        return {
+            "model": self.llm_client.model,
+            "config": {
+                "initial_country_score": self.game_state.initial_country_score,
+                "initial_shoreline_score": self.game_state.initial_shoreline_score,
+                "max_years": self.game_state.max_years,
+                "victory_threshold": self.game_state.victory_threshold,
+                "failure_threshold": self.game_state.failure_threshold,
+                "annual_bonus": self.annual_bonus,
+                "disaster_probability_modifier": self.random_event_system.disaster_probability_modifier,
+                "use_llm_for_random_events": self.use_llm_for_random_events,
+                "enable_random_events": getattr(self, 'enable_random_events', True)
+            }
+        }
+    
+    def export_game(self, filename: str = None) -> str:
+        """
+        导出当前游戏记录（附带运行元数据），并导入历史数据库（如已配置）
+        
+        Args:
+            filename: 文件名（可选）
+            
+        Returns:
+            生成的文件路径
+        """
+        filename = self.game_state.export_to_json(filename, metadata=self.get_run_metadata())
+        if self.history_db is not None:
+            try:
+                self.history_db.ingest_file(filename)
+            except Exception as e:
+                logger.warning(f"导入历史数据库失败: {e}")
+        return filename
+    
+    def run_single_game(self, game_id: Any = None, action_overrides: Dict[int, Dict[str, str]] = None,
+                        capture_snapshots: bool = False) -> Dict[str, Any]:
         """
         运行单次游戏
         
+        Args:
+            game_id: 游戏编号（写入流式记录时使用，可选）
+            action_overrides: 指定年份的国家行动 {年份: {"action_1": ..., "action_2": ...}}，
+                              这些年份不调用人类LLM（可选）
+            capture_snapshots: 是否在每年结束时保存快照到self.snapshots（用于之后分支）
+        
         Returns:
             游戏结果摘要
         """
         logger.info("开始新的游戏回合")
         self.game_state.reset_game()
+        return self._run_game_loop(game_id, action_overrides, capture_snapshots)
+    
+    def run_from_snapshot(self, snapshot: GameSnapshot, action_overrides: Dict[int, Dict[str, str]] = None,
+                          game_id: Any = None, restore_rng: bool = True,
+                          capture_snapshots: bool = False) -> Dict[str, Any]:
+        """
+        从快照继续运行游戏（快照之前的年度记录直接复用，不重新调用LLM）
+        
+        Args:
+            snapshot: 游戏快照
+            action_overrides: 指定年份的国家行动（如快照后第一年的另一组行动）
+            game_id: 游戏编号（可选）
+            restore_rng: 是否恢复快照的随机数状态
+            capture_snapshots: 是否在每年结束时保存快照
+        
+        Returns:
+            游戏结果摘要
+        """
+        logger.info(f"从第{snapshot.year}年末的快照继续游戏")
+        snapshot.restore(self, restore_rng=restore_rng)
+        return self._run_game_loop(game_id, action_overrides, capture_snapshots)
+    
+    def run_branches(self, snapshot: GameSnapshot, branches: List[Dict[int, Dict[str, str]]],
+                     restore_rng: bool = True) -> List[Dict[str, Any]]:
+        """
+        从同一快照运行多个分支
+        
+        Args:
+            snapshot: 分支点快照
+            branches: 每个分支的行动覆盖（格式同action_overrides）
+            restore_rng: 每个分支是否从相同的随机数状态开始（分支间只有行动不同）
+        
+        Returns:
+            各分支的结果摘要（附带branch序号）
+        """
+        results = []
+        for index, overrides in enumerate(branches):
+            summary = self.run_from_snapshot(snapshot, overrides, game_id=f"branch_{index}",
+                                             restore_rng=restore_rng)
+            summary["branch"] = index
+            results.append(summary)
+        return results
+    
+    def _run_game_loop(self, game_id: Any = None, action_overrides: Dict[int, Dict[str, str]] = None,
+                       capture_snapshots: bool = False) -> Dict[str, Any]:
+        """从当前游戏状态开始逐年运行直到游戏结束"""
+        self.begin_game(game_id, capture_snapshots)
         
         while not self.game_state.is_game_over():
-            self.game_state.year += 1
-            logger.info(f"=== 第{self.game_state.year}年 ===")
+            self.begin_year()
             
             try:
-                # 1. 人类LLM决策
-                logger.info("人类LLM进行决策...")
-                country_actions = self.llm_client.call_human_llm(
-                    country_score=self.game_state.country_score,
-                    shoreline_score=self.game_state.shoreline_score,
-                    opportunities=self.game_state.current_opportunities,
-                    challenges=self.game_state.current_challenges,
-                    ref_table=self.ref_scoring_table
-                )
+                # 1. 人类LLM决策（指定了行动的年份直接使用）
+                country_actions = self.decide_actions(action_overrides)
                 
                 # 2. 裁判LLM评分
-                logger.info("裁判LLM进行评分...")
-                actions_text = f"ACTION_1: {country_actions.get('action_1', '')}\nACTION_2: {country_actions.get('action_2', '')}"
-                judge_scores = self.llm_client.call_judge_llm(
-                    country_actions=actions_text,
-                    ref_table=self.ref_scoring_table
-                )
-                
-                # 3. 计算分数变化
-                country_change = judge_scores.get('first_country', 0) + judge_scores.get('second_country', 0)
-                shoreline_change = judge_scores.get('first_shoreline', 0) + judge_scores.get('second_shoreline', 0)
-                
-                # 4. 触发随机事件 (如果启用)
-                random_country_impact = 0
-                random_shoreline_impact = 0
-                triggered_events = []
+                actions_text = format_actions_text(country_actions)
+                judge_scores = self.judge_actions(country_actions, actions_text)
                 
-                if getattr(self, 'enable_random_events', True):
-                    logger.info("检查随机事件...")
-                    self.random_event_system.apply_disaster_modifier(self.game_state.shoreline_score)
-                    triggered_events = self.random_event_system.trigger_random_events(self.game_state.year)
-                    
-                    if self.use_llm_for_random_events:
-                        random_country_impact, random_shoreline_impact = self.random_event_system.calculate_total_impact_with_llm(
-                            triggered_events, self.llm_client, self.game_state.country_score, self.game_state.shoreline_score
-                        )
-                    else:
-                        random_country_impact, random_shoreline_impact = self.random_event_system.calculate_total_impact(triggered_events)
-                else:
-                    logger.info("随机事件已禁用")
-                
-                # 5. 更新分数
-                self.game_state.update_scores(
-                    country_change=country_change,
-                    shoreline_change=shoreline_change,
-                    random_country_impact=random_country_impact,
-                    random_shoreline_impact=random_shoreline_impact,
-                    annual_bonus=self.annual_bonus
-                )
+                # 3-5. 计算分数变化、触发随机事件、更新分数
+                outcome = self.apply_year(judge_scores)
                 
                 # 6. 海岸线LLM响应
                 logger.info("海岸线LLM生成响应...")
                 shore_response = self.llm_client.call_shore_llm(actions_text)
                 
-                # 7. 更新当前机遇和挑战
-                self.game_state.current_opportunities = shore_response.get('opportunities', self.game_state.current_opportunities)
-                self.game_state.current_challenges = shore_response.get('challenges', self.game_state.current_challenges)
-                
-                # 8. 记录年度数据
-                random_events_data = [
-                    {
-                        "name": event.name,
-                        "description": event.description,
-                        "country_impact": event.country_impact,
-                        "shoreline_impact": event.shoreline_impact,
-                        "occurred": occurred
-                    }
-                    for event, occurred in triggered_events
-                ]
-                
-                self.game_state.record_year(
-                    country_actions=country_actions,
-                    shore_response=shore_response,
-                    judge_scores=judge_scores,
-                    random_events=random_events_data,
-                    country_change=country_change,
-                    shoreline_change=shoreline_change,
-                    random_country_impact=random_country_impact,
-                    random_shoreline_impact=random_shoreline_impact,
-                    annual_bonus=self.annual_bonus
-                )
-                
-                # 9. 显示当前状态
-                print(f"\n📊 第{self.game_state.year}年总结:")
-                print(f"   国家行动1: {country_actions.get('action_1', 'N/A')}")
-                print(f"   国家行动2: {country_actions.get('action_2', 'N/A')}")
-                print(f"   分数变化: 国家{country_change:+d}, 海岸线{shoreline_change:+d}")
-                if random_country_impact != 0 or random_shoreline_impact != 0:
-                    print(f"   随机事件影响: 国家{random_country_impact:+d}, 海岸线{random_shoreline_impact:+d}")
-                if self.annual_bonus > 0:
-                    print(f"   年度自然增长: 国家+{self.annual_bonus}, 海岸线+{self.annual_bonus}")
-                if triggered_events:
-                    event_names = [event.name for event, occurred in triggered_events if occurred]
-                    if event_names:
-                        print(f"   发生的随机事件: {', '.join(event_names)}")
-                print(f"   当前分数: 国家={self.game_state.country_score}, 海岸线={self.game_state.shoreline_score}")
-                print(f"   新的机遇: {shore_response.get('opportunities', 'N/A')}")
-                print(f"   新的挑战: {shore_response.get('challenges', 'N/A')}")
-                
-                logger.info(f"当前状态: 国家={self.game_state.country_score}, 海岸线={self.game_state.shoreline_score}")
-                
-                # 10. 暂停以便观察
-                if self.pause_between_years:
-                    print(f"\n⏳ 暂停{self.pause_duration}秒，观察年度变化...")
-                    time.sleep(self.pause_duration)
-                    print("-" * 80)
-                
-                # 11. 重置随机事件概率
-                self.random_event_system.reset_probabilities()
+                # 7-11. 更新机遇和挑战、记录、显示、暂停、重置随机事件概率
+                self.finish_year(country_actions, judge_scores, outcome, shore_response, capture_snapshots)
                 
             except Exception as e:
                 logger.error(f"第{self.game_state.year}年处理出错: {str(e)}")
                 break
         
-        # 游戏结束
+        return self.end_game()
+    
+    # ---------- 年度流程的各个阶段（逐局运行和多局同步运行共用） ----------
+    
+    def begin_game(self, game_id: Any = None, capture_snapshots: bool = False):
+        """开始记录一局游戏（游戏状态需已重置或从快照恢复）"""
+        self.game_state.attach_record_writer(self.record_writer, retain_records=self.retain_records)
+        if self.record_writer is not None:
+            self.record_writer.begin_game(game_id)
+        self.snapshots = {}
+        if self.decision_memory is not None:
+            # 新的一局为空；从快照继续时包含快照之前的年份
+            self.decision_memory.rebuild(self.game_state.yearly_records)
+        if capture_snapshots:
+            self.snapshots[self.game_state.year] = GameSnapshot.capture(self)
+    
+    def begin_year(self):
+        """进入新的一年"""
+        self.game_state.year += 1
+        self._planned_scores = None
+        logger.info(f"=== 第{self.game_state.year}年 ===")
+    
+    def decide_actions(self, action_overrides: Dict[int, Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        人类LLM决策
+        
+        Args:
+            action_overrides: 指定年份的国家行动（这些年份不调用人类LLM）
+            
+        Returns:
+            国家行动
+        """
+        if action_overrides and self.game_state.year in action_overrides:
+            country_actions = dict(action_overrides[self.game_state.year])
+            logger.info(f"使用指定的国家行动: {country_actions}")
+            return country_actions
+        if self.planner is not None:
+            logger.info("人类LLM提出候选行动，前瞻规划选择...")
+            country_actions, scores = self.planner.decide(self)
+            if scores is not None:
+                self._planned_scores = (dict(country_actions), scores)
+            return country_actions
+        logger.info("人类LLM进行决策...")
+        # 只在配置了决策记忆时传入memory，自定义客户端无需支持该参数
+        memory = {"memory": self.decision_memory.render()} if self.decision_memory is not None else {}
+        return self.llm_client.call_human_llm(
+            country_score=self.game_state.country_score,
+            shoreline_score=self.game_state.shoreline_score,
+            opportunities=self.game_state.current_opportunities,
+            challenges=self.game_state.current_challenges,
+            ref_table=self.ref_scoring_table,
+            **memory
+        )
+    
+    def take_planned_scores(self, country_actions: Dict[str, str]) -> Optional[Dict[str, int]]:
+        """
+        取出前瞻规划时裁判为本年选中行动给出的评分（只能取一次）
+        
+        Args:
+            country_actions: 本年的国家行动
+            
+        Returns:
+            评分；行动不是规划选中的行动或规划时未经裁判评分时为None
+        """
+        planned, self._planned_scores = self._planned_scores, None
+        if planned is None or planned[0] != country_actions:
+            return None
+        logger.info("沿用前瞻规划时的裁判评分")
+        if self.judge_surrogate is not None and self.judge_surrogate.learn_online:
+            self.judge_surrogate.add_judged_year(country_actions, planned[1])
+        return dict(planned[1])
+    
+    def judge_actions(self, country_actions: Dict[str, str], actions_text: str) -> Dict[str, int]:
+        """裁判LLM评分（配置了裁判代理模型时按置信度门控；前瞻规划已评分的行动沿用规划时的评分）"""
+        planned = self.take_planned_scores(country_actions)
+        if planned is not None:
+            return planned
+        logger.info("裁判LLM进行评分...")
+        call_judge = lambda: self.llm_client.call_judge_llm(
+            country_actions=actions_text,
+            ref_table=self.ref_scoring_table
+        )
+        if self.judge_surrogate is not None:
+            return self.judge_surrogate.score(
+                country_actions.get('action_1', ''), country_actions.get('action_2', ''), call_judge
+            )
+        return call_judge()
+    
+    def apply_year(self, judge_scores: Dict[str, int]) -> Dict[str, Any]:
+        """
+        按裁判评分和随机事件更新分数
+        
+        Args:
+            judge_scores: 裁判评分
+            
+        Returns:
+            本年的分数变化和触发的随机事件（供finish_year记录）
+        """
+        # 3. 计算分数变化
+        country_change = judge_scores.get('first_country', 0) + judge_scores.get('second_country', 0)
+        shoreline_change = judge_scores.get('first_shoreline', 0) + judge_scores.get('second_shoreline', 0)
+        
+        # 4. 触发随机事件 (如果启用)
+        random_country_impact = 0
+        random_shoreline_impact = 0
+        triggered_events = []
+        
+        if getattr(self, 'enable_random_events', True):
+            logger.info("检查随机事件...")
+            self.random_event_system.apply_disaster_modifier(self.game_state.shoreline_score)
+            triggered_events = self.random_event_system.trigger_random_events(self.game_state.year)
+            
+            if self.use_llm_for_random_events:
+                random_country_impact, random_shoreline_impact = self.random_event_system.calculate_total_impact_with_llm(
+                    triggered_events, self.llm_client, self.game_state.country_score, self.game_state.shoreline_score
+                )
+            else:
+                random_country_impact, random_shoreline_impact = self.random_event_system.calculate_total_impact(triggered_events)
+        else:
+            logger.info("随机事件已禁用")
+        
+        # 5. 更新分数
+        self.game_state.update_scores(
+            country_change=country_change,
+            shoreline_change=shoreline_change,
+            random_country_impact=random_country_impact,
+            random_shoreline_impact=random_shoreline_impact,
+            annual_bonus=self.annual_bonus
+        )
+        return {
+            "country_change": country_change,
+            "shoreline_change": shoreline_change,
+            "random_country_impact": random_country_impact,
+            "random_shoreline_impact": random_shoreline_impact,
+            "triggered_events": triggered_events
+        }
+    
+    def finish_year(self, country_actions: Dict[str, str], judge_scores: Dict[str, int],
+                    outcome: Dict[str, Any], shore_response: Dict[str, str], capture_snapshots: bool = False):
+        """
+        结束一年：更新机遇和挑战、记录年度数据、显示状态并重置随机事件概率
+        
+        Args:
+            country_actions: 国家行动
+            judge_scores: 裁判评分
+            outcome: apply_year的返回值
+            shore_response: 海岸线LLM响应
+            capture_snapshots: 是否保存本年末的快照
+        """
+        country_change = outcome["country_change"]
+        shoreline_change = outcome["shoreline_change"]
+        random_country_impact = outcome["random_country_impact"]
+        random_shoreline_impact = outcome["random_shoreline_impact"]
+        triggered_events = outcome["triggered_events"]
+        
+        # 7. 更新当前机遇和挑战
+        self.game_state.current_opportunities = shore_response.get('opportunities', self.game_state.current_opportunities)
+        self.game_state.current_challenges = shore_response.get('challenges', self.game_state.current_challenges)
+        
+        # 8. 记录年度数据
+        random_events_data = [
+            {
+                "name": event.name,
+                "description": event.description,
+                "country_impact": event.country_impact,
+                "shoreline_impact": event.shoreline_impact,
+                "occurred": occurred
+            }
+            for event, occurred in triggered_events
+        ]
+        
+        record = self.game_state.record_year(
+            country_actions=country_actions,
+            shore_response=shore_response,
+            judge_scores=judge_scores,
+            random_events=random_events_data,
+            country_change=country_change,
+            shoreline_change=shoreline_change,
+            random_country_impact=random_country_impact,
+            random_shoreline_impact=random_shoreline_impact,
+            annual_bonus=self.annual_bonus
+        )
+        if self.decision_memory is not None:
+            self.decision_memory.observe(record)
+        
+        # 9. 显示当前状态
+        print(f"\n📊 第{self.game_state.year}年总结:")
+        print(f"   国家行动1: {country_actions.get('action_1', 'N/A')}")
+        print(f"   国家行动2: {country_actions.get('action_2', 'N/A')}")
+        print(f"   分数变化: 国家{country_change:+d}, 海岸线{shoreline_change:+d}")
+        if random_country_impact != 0 or random_shoreline_impact != 0:
+            print(f"   随机事件影响: 国家{random_country_impact:+d}, 海岸线{random_shoreline_impact:+d}")
+        if self.annual_bonus > 0:
+            print(f"   年度自然增长: 国家+{self.annual_bonus}, 海岸线+{self.annual_bonus}")
+        if triggered_events:
+            event_names = [event.name for event, occurred in triggered_events if occurred]
+            if event_names:
+                print(f"   发生的随机事件: {', '.join(event_names)}")
+        print(f"   当前分数: 国家={self.game_state.country_score}, 海岸线={self.game_state.shoreline_score}")
+        print(f"   新的机遇: {shore_response.get('opportunities', 'N/A')}")
+        print(f"   新的挑战: {shore_response.get('challenges', 'N/A')}")
+        
+        logger.info(f"当前状态: 国家={self.game_state.country_score}, 海岸线={self.game_state.shoreline_score}")
+        
+        # 10. 暂停以便观察
+        if self.pause_between_years:
+            print(f"\n⏳ 暂停{self.pause_duration}秒，观察年度变化...")
+            time.sleep(self.pause_duration)
+            print("-" * 80)
+        
+        # 11. 重置随机事件概率
+        self.random_event_system.reset_probabilities()
+        
+        if capture_snapshots:
+            self.snapshots[self.game_state.year] = GameSnapshot.capture(self)
+    
+    def end_game(self) -> Dict[str, Any]:
+        """结束一局游戏，返回结果摘要"""
         summary = self.game_state.get_game_summary()
         logger.info(f"游戏结束: {summary['game_over_reason']}")
+        if self.record_writer is not None:
+            self.record_writer.end_game(summary)
         
         return summary
     
-    def run_multiple_games(self, num_games: int = 10, fast_mode: bool = True) -> Dict[str, Any]:
+    def run_multiple_games(self, num_games: int = 10, fast_mode: bool = True,
+                           keep_detailed_results: bool = True,
+                           progress_callback: Callable[[Dict[str, Any]], None] = None,
+                           early_stopping: Optional[SequentialStopper] = None) -> Dict[str, Any]:
         """
         运行多次游戏并统计结果
         
         Args:
             num_games: 游戏次数
             fast_mode: 快速模式，禁用年度暂停
+            keep_detailed_results: 是否保留每局总结到detailed_results（关闭后内存占用与局数无关）
+            progress_callback: 每局结束后以当前统计快照调用的回调函数（可选）
+            early_stopping: 序贯停止规则（可选），胜利率估计足够精确时提前结束，num_games为上限
             
         Returns:
             多次游戏的统计结果
@@ -218,40 +488,53 @@ class ShorlineEcologyGame:
             print(f"🚀 多次游戏模式：已启用快速模式，将连续运行{num_games}次游戏")
         
         results = []
-        victories = 0
-        failures = 0
+        # 在线聚合器，运行中可通过self.stats_aggregator随时查看统计
+        self.stats_aggregator = GameStatsAggregator()
+        stop_reason = None
         
         for i in range(num_games):
             logger.info(f"运行第{i+1}次游戏...")
             
+            summary = None
             try:
-                summary = self.run_single_game()
-                results.append(summary)
+                summary = self.run_single_game(game_id=i + 1)
+                self.stats_aggregator.update(summary)
+                if keep_detailed_results:
+                    results.append(summary)
                 
-                if summary['victory']:
-                    victories += 1
-                else:
-                    failures += 1
-                
-                # 保存单次游戏记录
-                filename = f"game_{i+1:03d}.json"
-                self.game_state.export_to_json(filename)
+                # 保存单次游戏记录（未保留内存记录时，年度数据已在流式记录中）
+                if self.retain_records:
+                    filename = f"game_{i+1:03d}.json"
+                    self.export_game(filename)
                 
             except Exception as e:
                 logger.error(f"第{i+1}次游戏运行失败: {str(e)}")
-                failures += 1
+                if summary is None:
+                    self.stats_aggregator.record_error()
+            
+            if progress_callback is not None:
+                progress_callback(self.stats_aggregator.snapshot())
+            
+            if early_stopping is not None:
+                stop_reason = early_stopping.check(self.stats_aggregator)
+                if stop_reason is not None:
+                    logger.info(f"满足提前停止条件({stop_reason})，已运行{i+1}/{num_games}局")
+                    print(f"⏹️ 胜利率估计已足够精确({stop_reason})，提前结束，节省{num_games - i - 1}局")
+                    break
         
         # 统计结果
-        statistics = {
-            "total_games": num_games,
-            "victories": victories,
-            "failures": failures,
-            "victory_rate": victories / num_games if num_games > 0 else 0,
-            "average_duration": sum(r['total_years'] for r in results) / len(results) if results else 0,
-            "average_final_country_score": sum(r['final_scores']['country'] for r in results) / len(results) if results else 0,
-            "average_final_shoreline_score": sum(r['final_scores']['shoreline'] for r in results) / len(results) if results else 0,
-            "detailed_results": results
-        }
+        statistics = self._build_statistics(self.stats_aggregator, results)
+        if early_stopping is not None:
+            statistics["early_stopping"] = early_stopping.report(self.stats_aggregator, num_games, stop_reason)
+        if self.judge_surrogate is not None:
+            statistics["judge_surrogate"] = self.judge_surrogate.stats()
+        if self.planner is not None:
+            statistics["lookahead_planner"] = self.planner.stats()
+        usage_stats = getattr(self.llm_client, "usage_stats", None)
+        if usage_stats is not None and usage_stats()["total"]["requests"]:
+            statistics["llm_usage"] = usage_stats()
+        # 保持detailed_results在最后
+        statistics["detailed_results"] = statistics.pop("detailed_results")
         
         # 保存统计结果
         with open("game_statistics.json", "w", encoding="utf-8") as f:
@@ -264,6 +547,31 @@ class ShorlineEcologyGame:
         
         return statistics
     
+    def _build_statistics(self, aggregator: GameStatsAggregator, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        由聚合器生成统计结果字典（保持原有字段，附加分布统计）
+        
+        Args:
+            aggregator: 在线统计聚合器
+            results: 每局游戏总结（可为空）
+            
+        Returns:
+            统计结果
+        """
+        snapshot = aggregator.snapshot()
+        metrics = snapshot["metrics"]
+        return {
+            "total_games": aggregator.total_games,
+            "victories": aggregator.victories,
+            "failures": aggregator.total_games - aggregator.victories,
+            "victory_rate": aggregator.victory_rate,
+            "average_duration": metrics["duration"]["mean"],
+            "average_final_country_score": metrics["final_country"]["mean"],
+            "average_final_shoreline_score": metrics["final_shoreline"]["mean"],
+            "aggregates": snapshot,
+            "detailed_results": results
+        }
+    
     def print_statistics(self, statistics: Dict[str, Any]):
         """
         打印游戏统计结果
@@ -280,6 +588,61 @@ class ShorlineEcologyGame:
         print(f"平均最终国家分数: {statistics['average_final_country_score']:.1f}")
         print(f"平均最终海岸线分数: {statistics['average_final_shoreline_score']:.1f}")
         
+        aggregates = statistics.get('aggregates')
+        if aggregates:
+            print(f"\n=== 分布统计 ===")
+            print(f"结果分布: {aggregates['outcomes']}")
+            labels = {"duration": "游戏时长", "final_country": "最终国家分数", "final_shoreline": "最终海岸线分数"}
+            for name, label in labels.items():
+                metric = aggregates['metrics'][name]
+                quantiles = ", ".join(f"P{float(q) * 100:g}={v}" for q, v in metric['quantiles'].items())
+                print(f"{label}: 均值{metric['mean']:.1f} ± {metric['std']:.1f} ({quantiles})")
+        
+        early_stopping = statistics.get('early_stopping')
+        if early_stopping:
+            print(f"\n=== 提前停止 ===")
+            low, high = early_stopping['victory_rate_ci']
+            print(f"实际运行: {early_stopping['games_run']}/{early_stopping['planned_games']}局，"
+                  f"节省{early_stopping['games_saved']}局")
+            print(f"停止原因: {early_stopping['reason'] or '达到计划局数'}")
+            print(f"胜利率{early_stopping['confidence']:.0%}置信区间: [{low:.2%}, {high:.2%}]")
+        
+        surrogate = statistics.get('judge_surrogate')
+        if surrogate:
+            print(f"\n=== 裁判代理模型 ===")
+            print(f"代理评分: {surrogate['surrogate_calls']}次 ({surrogate['surrogate_rate']:.1%}), "
+                  f"裁判LLM调用: {surrogate['llm_calls']}次")
+            if surrogate['audits']:
+                print(f"审计{surrogate['audits']}次: 完全一致{surrogate['audit_exact_rate']:.1%}, "
+                      f"平均绝对误差{surrogate['audit_mean_abs_error']:.2f}")
+        
+        planner = statistics.get('lookahead_planner')
+        if planner:
+            sources = ", ".join(f"{source}={count}" for source, count in planner['sources'].items())
+            print(f"\n=== 前瞻规划 ===")
+            print(f"决策: {planner['decisions']}次, 候选: {planner['candidates']}组 ({sources}), "
+                  f"未选第一组: {planner['reordered']}次, 裁判请求: {planner['judge_requests']}次 (沿用{planner['reused_scores']}次), "
+                  f"改为单次决策: {planner['fallbacks']}次")
+        
+        usage = statistics.get('llm_usage')
+        if usage:
+            total = usage['total']
+            print(f"\n=== LLM用量 ({usage['prompt_layout']}布局) ===")
+            print(f"请求: {total['requests']}次, 提示词token: {total['prompt_tokens']}, "
+                  f"其中前缀缓存命中: {total['cached_tokens']} ({total['cached_rate']:.1%}), "
+                  f"生成token: {total['completion_tokens']}, 平均耗时: {total['mean_latency']:.2f}秒")
+            for role, entry in usage['by_role'].items():
+                print(f"  {role}: {entry['requests']}次, 缓存命中{entry['cached_rate']:.1%}, "
+                      f"平均耗时{entry['mean_latency']:.2f}秒")
+            for role, entry in usage.get('structured_output', {}).items():
+                print(f"  {role}结构化回复: {entry['responses']}条, 首次有效{entry['valid']}条, "
+                      f"追问{entry['reasks']}次, 修复{entry['repaired']}条, 仍无效{entry['failed']}条")
+            voting = usage.get('judge_voting')
+            if voting:
+                variance = ", ".join(f"{key}={value:.2f}" for key, value in voting['mean_variance'].items())
+                print(f"  裁判投票: {voting['calls']}次 × {voting['samples_per_call']}个采样 "
+                      f"({voting['aggregate']}), 平均采样方差: {variance}")
+        
         print(f"\n=== 详细结果 ===")
         for i, result in enumerate(statistics['detailed_results']):
             status = "胜利" if result['victory'] else "失败"
@@ -0,0 +1,168 @@
+"""
+游戏快照与分支
+在任意年末保存游戏状态（分数、机遇/挑战、随机数状态、随机事件状态和已有年度记录），
+从同一快照可以启动多个"如果当年采取另一行动"的分支：
+分支只复制记录列表的引用（年度记录本身不可变、在分支间共享），
+前缀年份的LLM输出直接复用，不再重新调用
+"""
+
+import json
+import random
+import logging
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .game_state import GameState, YearlyRecord, yearly_record_from_dict
+from .random_events import RandomEvent
+
+logger = logging.getLogger(__name__)
+
+# 快照中保存的游戏配置字段
+CONFIG_FIELDS = ("initial_country_score", "initial_shoreline_score", "max_years",
+                 "victory_threshold", "failure_threshold")
+
+
+class GameSnapshot:
+    """某一年末的游戏状态（创建后不应修改）"""
+
+    def __init__(self, year: int, country_score: int, shoreline_score: int,
+                 opportunities: str, challenges: str, records: Tuple[YearlyRecord, ...],
+                 config: Dict[str, Any], rng_state: Any = None,
+                 event_state: Optional[List[Tuple[str, str, float, int, int]]] = None):
+        """
+        初始化快照
+
+        Args:
+            year: 已完成的年数
+            country_score: 国家分数
+            shoreline_score: 海岸线分数
+            opportunities: 当前机遇（下一年人类LLM的输入）
+            challenges: 当前挑战
+            records: 前缀年份的年度记录（共享，不复制）
+            config: 游戏配置（初始分数、最大年数、胜利/失败阈值）
+            rng_state: random模块的状态（可选，恢复后分支的随机事件序列可复现）
+            event_state: 随机事件系统的事件列表状态（可选）
+        """
+        self.year = year
+        self.country_score = country_score
+        self.shoreline_score = shoreline_score
+        self.opportunities = opportunities
+        self.challenges = challenges
+        self.records = tuple(records)
+        self.config = dict(config)
+        self.rng_state = rng_state
+        self.event_state = event_state
+
+    @classmethod
+    def capture(cls, game) -> "GameSnapshot":
+        """
+        保存正在运行的游戏控制器的当前状态
+
+        Args:
+            game: ShorlineEcologyGame实例
+
+        Returns:
+            快照
+        """
+        state = game.game_state
+        event_state = [(e.name, e.description, e.probability, e.country_impact, e.shoreline_impact)
+                       for e in game.random_event_system.events]
+        return cls(
+            year=state.year,
+            country_score=state.country_score,
+            shoreline_score=state.shoreline_score,
+            opportunities=state.current_opportunities,
+            challenges=state.current_challenges,
+            records=state.yearly_records,
+            config={name: getattr(state, name) for name in CONFIG_FIELDS},
+            rng_state=random.getstate(),
+            event_state=event_state,
+        )
+
+    @classmethod
+    def from_records(cls, records: List[Union[YearlyRecord, Dict[str, Any]]], year: int,
+                     config: Dict[str, Any] = None) -> "GameSnapshot":
+        """
+        由已完成游戏的年度记录还原第year年末的状态（不含随机数状态）
+
+        Args:
+            records: 年度记录（YearlyRecord或导出格式的字典）
+            year: 分支点年份（0表示游戏开始前）
+            config: 游戏配置（缺省字段使用GameState默认值）
+
+        Returns:
+            快照
+        """
+        defaults = GameState(**{k: v for k, v in (config or {}).items() if k in CONFIG_FIELDS})
+        records = [r if isinstance(r, YearlyRecord) else yearly_record_from_dict(r) for r in records]
+        prefix = [r for r in records if r.year <= year]
+        if len(prefix) != year:
+            raise ValueError(f"记录中没有完整的前{year}年数据（共{len(prefix)}年）")
+
+        # 与游戏控制器相同的更新方式：海岸线LLM响应中有对应字段时才覆盖
+        opportunities, challenges = defaults.current_opportunities, defaults.current_challenges
+        for record in prefix:
+            opportunities = record.shore_response.get("opportunities", opportunities)
+            challenges = record.shore_response.get("challenges", challenges)
+
+        last = prefix[-1] if prefix else None
+        return cls(
+            year=year,
+            country_score=last.country_score if last else defaults.initial_country_score,
+            shoreline_score=last.shoreline_score if last else defaults.initial_shoreline_score,
+            opportunities=opportunities,
+            challenges=challenges,
+            records=tuple(prefix),
+            config={name: getattr(defaults, name) for name in CONFIG_FIELDS},
+        )
+
+    @classmethod
+    def from_export(cls, source: Union[str, Dict[str, Any]], year: int) -> "GameSnapshot":
+        """
+        由导出的游戏记录（JSON文件路径或已加载的字典）还原第year年末的状态
+
+        Args:
+            source: 游戏记录文件路径或字典
+            year: 分支点年份
+
+        Returns:
+            快照
+        """
+        if isinstance(source, str):
+            with open(source, "r", encoding="utf-8") as f:
+                source = json.load(f)
+        config = dict(source.get("metadata", {}).get("config", {}))
+        initial_scores = source.get("game_summary", {}).get("initial_scores", {})
+        config.setdefault("initial_country_score", initial_scores.get("country", 60))
+        config.setdefault("initial_shoreline_score", initial_scores.get("shoreline", 100))
+        return cls.from_records(source["yearly_records"], year, config)
+
+    def to_game_state(self) -> GameState:
+        """
+        创建处于快照状态的新GameState（记录列表是新的列表，记录对象与快照共享）
+
+        Returns:
+            游戏状态
+        """
+        state = GameState(**self.config)
+        state.year = self.year
+        state.country_score = self.country_score
+        state.shoreline_score = self.shoreline_score
+        state.current_opportunities = self.opportunities
+        state.current_challenges = self.challenges
+        state.yearly_records = list(self.records)
+        state.recorded_years = self.year
+        return state
+
+    def restore(self, game, restore_rng: bool = True):
+        """
+        把快照状态恢复到游戏控制器中
+
+        Args:
+            game: ShorlineEcologyGame实例
+            restore_rng: 是否恢复随机数状态（恢复后同一快照的各分支使用相同的随机事件序列）
+        """
+        game.game_state = self.to_game_state()
+        if self.event_state is not None:
+            game.random_event_system.events = [RandomEvent(*event) for event in self.event_state]
+        if restore_rng and self.rng_state is not None:
+            random.setstate(self.rng_state)
@@ -26,6 +26,78 @@ class YearlyRecord:
     random_country_impact: int
     random_shoreline_impact: int
 
+def classify_outcome(summary: Dict[str, Any]) -> str:
+    """
+    根据游戏总结判断结果类别（兼容没有outcome字段的旧记录）
+    
+    Args:
+        summary: get_game_summary()格式的游戏总结
+        
+    Returns:
+        "victory" / "failure" / "timeout" / "in_progress"
+    """
+    if summary.get("outcome"):
+        return summary["outcome"]
+    if summary.get("victory"):
+        return "victory"
+    reason = summary.get("game_over_reason", "")
+    if "失败" in reason:
+        return "failure"
+    if "上限" in reason:
+        return "timeout"
+    return "in_progress"
+
+def yearly_record_to_dict(record: YearlyRecord) -> Dict[str, Any]:
+    """
+    将年度记录转换为导出用的字典格式（与export_to_json中的yearly_records条目一致）
+    
+    Args:
+        record: 年度记录
+        
+    Returns:
+        可JSON序列化的字典
+    """
+    return {
+        "year": record.year,
+        "country_score": record.country_score,
+        "shoreline_score": record.shoreline_score,
+        "country_actions": record.country_actions,
+        "shore_response": record.shore_response,
+        "judge_scores": record.judge_scores,
+        "random_events": record.random_events,
+        "score_changes": {
+            "country": record.country_change,
+            "shoreline": record.shoreline_change,
+            "random_country_impact": record.random_country_impact,
+            "random_shoreline_impact": record.random_shoreline_impact
+        }
+    }
+
+def yearly_record_from_dict(data: Dict[str, Any]) -> YearlyRecord:
+    """
+    由导出格式的字典还原年度记录（yearly_record_to_dict的逆操作）
+    
+    Args:
+        data: yearly_records中的一条记录
+        
+    Returns:
+        年度记录
+    """
+    changes = data.get("score_changes", {})
+    return YearlyRecord(
+        year=data["year"],
+        country_score=data["country_score"],
+        shoreline_score=data["shoreline_score"],
+        country_actions=data.get("country_actions", {}),
+        shore_response=data.get("shore_response", {}),
+        judge_scores=data.get("judge_scores", {}),
+        random_events=data.get("random_events", []),
+        country_change=changes.get("country", 0),
+        shoreline_change=changes.get("shoreline", 0),
+        random_country_impact=changes.get("random_country_impact", 0),
+        random_shoreline_impact=changes.get("random_shoreline_impact", 0)
+    )
+
 class GameState:
     """游戏状态类"""
     
@@ -36,6 +108,8 @@ class GameState:
         self.max_years = max_years
         self.victory_threshold = victory_threshold
         self.failure_threshold = failure_threshold
+        self.record_writer = None
+        self.retain_records = True
         self.reset_game()
         logger.info(f"游戏状态初始化: 国家分数={initial_country_score}, 海岸线分数={initial_shoreline_score}, "
                    f"最大年数={max_years}, 胜利阈值={victory_threshold}, 失败阈值={failure_threshold}")
@@ -48,9 +122,22 @@ class GameState:
         self.game_over = False
         self.victory = False
         self.yearly_records = []
+        self.recorded_years = 0
         self.current_opportunities = "海岸线提供丰富的渔业资源和旅游潜力"
         self.current_challenges = "海岸侵蚀和海洋污染威胁生态平衡"
     
+    def attach_record_writer(self, record_writer, retain_records: bool = True):
+        """
+        挂接流式记录写入器，每次record_year时立即写出年度记录
+        
+        Args:
+            record_writer: JsonlRecordWriter实例（None表示取消挂接）
+            retain_records: 是否仍在内存中保留yearly_records（关闭后内存占用不随年数增长，
+                            但export_to_json将不再包含年度记录）
+        """
+        self.record_writer = record_writer
+        self.retain_records = retain_records
+    
     def is_game_over(self) -> bool:
         """检查游戏是否结束"""
         if self.country_score >= self.victory_threshold:
@@ -108,6 +195,9 @@ class GameState:
             random_country_impact: 随机事件对国家的影响
             random_shoreline_impact: 随机事件对海岸线的影响
             annual_bonus: 年度自然增长奖励
+            
+        Returns:
+            本年的年度记录
         """
         record = YearlyRecord(
             year=self.year,
@@ -123,8 +213,13 @@ class GameState:
             random_shoreline_impact=random_shoreline_impact
         )
         
-        self.yearly_records.append(record)
+        if self.retain_records:
+            self.yearly_records.append(record)
+        self.recorded_years += 1
+        if self.record_writer is not None:
+            self.record_writer.write_year(record)
         logger.info(f"第{self.year}年记录已保存 (年度奖励: +{annual_bonus})")
+        return record
     
     def get_game_summary(self) -> Dict[str, Any]:
         """获取游戏总结"""
@@ -140,9 +235,21 @@ class GameState:
             "total_years": self.year,
             "victory": self.victory,
             "game_over_reason": self._get_game_over_reason(),
-            "yearly_records": len(self.yearly_records)
+            "outcome": self._get_game_outcome(),
+            "yearly_records": self.recorded_years
         }
     
+    def _get_game_outcome(self) -> str:
+        """获取游戏结果类别（与_get_game_over_reason判断顺序一致）"""
+        if self.victory:
+            return "victory"
+        elif self.shoreline_score < self.failure_threshold:
+            return "failure"
+        elif self.year >= self.max_years:
+            return "timeout"
+        else:
+            return "in_progress"
+    
     def _get_game_over_reason(self) -> str:
         """获取游戏结束原因"""
         if self.victory:
@@ -154,12 +261,13 @@ class GameState:
         else:
             return "游戏进行中"
     
-    def export_to_json(self, filename: str = None) -> str:
+    def export_to_json(self, filename: str = None, metadata: Dict[str, Any] = None) -> str:
         """
         导出游戏数据到JSON文件
         
         Args:
             filename: 文件名（可选）
+            metadata: 运行元数据，如模型和游戏配置（可选，写入"metadata"字段）
             
         Returns:
             生成的文件路径
@@ -173,24 +281,12 @@ class GameState:
             "game_summary": self.get_game_summary(),
             "yearly_records": []
         }
+        if metadata:
+            export_data["metadata"] = metadata
         
         # 转换年度记录
         for record in self.yearly_records:
-            export_data["yearly_records"].append({
-                "year": record.year,
-                "country_score": record.country_score,
-                "shoreline_score": record.shoreline_score,
-                "country_actions": record.country_actions,
-                "shore_response": record.shore_response,
-                "judge_scores": record.judge_scores,
-                "random_events": record.random_events,
-                "score_changes": {
-                    "country": record.country_change,
-                    "shoreline": record.shoreline_change,
-                    "random_country_impact": record.random_country_impact,
-                    "random_shoreline_impact": record.random_shoreline_impact
-                }
-            })
+            export_data["yearly_records"].append(yearly_record_to_dict(record))
         
         # 保存到文件
         with open(filename, 'w', encoding='utf-8') as f:
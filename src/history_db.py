@@ -0,0 +1,358 @@
+"""
+SQLite历史数据库
+将history/*.json和export_to_json导出的游戏记录增量导入本地SQLite，
+按模型、结果、配置和行动建立索引，支持快速统计查询
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Any, List, Optional
+
+from .game_state import classify_outcome
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingested_files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    sha1 TEXT NOT NULL,
+    game_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS actions (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    source TEXT,
+    model TEXT,
+    config_key TEXT,
+    config_json TEXT,
+    outcome TEXT NOT NULL,
+    victory INTEGER NOT NULL,
+    total_years INTEGER NOT NULL,
+    initial_country INTEGER,
+    initial_shoreline INTEGER,
+    final_country INTEGER,
+    final_shoreline INTEGER,
+    game_over_reason TEXT,
+    first_action_1_id INTEGER REFERENCES actions(id),
+    first_action_2_id INTEGER REFERENCES actions(id),
+    ingested_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS years (
+    game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    year INTEGER NOT NULL,
+    country_score INTEGER,
+    shoreline_score INTEGER,
+    action_1_id INTEGER REFERENCES actions(id),
+    action_2_id INTEGER REFERENCES actions(id),
+    first_country INTEGER,
+    first_shoreline INTEGER,
+    second_country INTEGER,
+    second_shoreline INTEGER,
+    country_change INTEGER,
+    shoreline_change INTEGER,
+    random_country_impact INTEGER,
+    random_shoreline_impact INTEGER,
+    opportunities TEXT,
+    challenges TEXT,
+    PRIMARY KEY (game_id, year)
+);
+
+CREATE TABLE IF NOT EXISTS events (
+    game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    year INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    country_impact INTEGER,
+    shoreline_impact INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_games_model ON games(model);
+CREATE INDEX IF NOT EXISTS idx_games_outcome ON games(outcome);
+CREATE INDEX IF NOT EXISTS idx_games_config ON games(config_key);
+CREATE INDEX IF NOT EXISTS idx_games_first_action_1 ON games(first_action_1_id, victory);
+CREATE INDEX IF NOT EXISTS idx_games_first_action_2 ON games(first_action_2_id, victory);
+CREATE INDEX IF NOT EXISTS idx_years_action_1 ON years(action_1_id);
+CREATE INDEX IF NOT EXISTS idx_years_action_2 ON years(action_2_id);
+CREATE INDEX IF NOT EXISTS idx_events_name ON events(name);
+CREATE INDEX IF NOT EXISTS idx_events_game ON events(game_id);
+"""
+
+# 可用于分组统计的游戏字段
+GROUPABLE_COLUMNS = {"model", "config_key", "outcome", "total_years"}
+
+
+def config_key(config: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    计算游戏配置的稳定哈希键
+
+    Args:
+        config: 游戏配置字典
+
+    Returns:
+        配置哈希（无配置时返回None）
+    """
+    if not config:
+        return None
+    canonical = json.dumps(config, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def _file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HistoryDatabase:
+    """基于SQLite的游戏历史数据库"""
+
+    def __init__(self, path: str = "history.db"):
+        """
+        打开或创建历史数据库
+
+        Args:
+            path: 数据库文件路径（":memory:"表示内存数据库）
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._action_ids: Dict[str, int] = {
+            row["text"]: row["id"] for row in self.conn.execute("SELECT id, text FROM actions")
+        }
+        logger.info(f"历史数据库已打开: {path}")
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _action_id(self, text: Optional[str]) -> int:
+        text = (text or "").strip()
+        action_id = self._action_ids.get(text)
+        if action_id is None:
+            cursor = self.conn.execute("INSERT INTO actions (text) VALUES (?)", (text,))
+            action_id = cursor.lastrowid
+            self._action_ids[text] = action_id
+        return action_id
+
+    def ingest_export(self, data: Dict[str, Any], source: str = None,
+                      model: str = None, config: Dict[str, Any] = None) -> int:
+        """
+        导入一局export_to_json格式的游戏数据（不提交事务）
+
+        Args:
+            data: 游戏数据字典
+            source: 数据来源（文件路径等）
+            model: 模型名称（缺省时读取metadata）
+            config: 游戏配置（缺省时读取metadata）
+
+        Returns:
+            数据库中的游戏编号
+        """
+        summary = data.get("game_summary", {})
+        records = data.get("yearly_records", [])
+        metadata = data.get("metadata", {})
+        model = model or metadata.get("model")
+        config = config or metadata.get("config")
+
+        first_actions = records[0].get("country_actions", {}) if records else {}
+        cursor = self.conn.execute(
+            """INSERT INTO games (source, model, config_key, config_json, outcome, victory, total_years,
+                                  initial_country, initial_shoreline, final_country, final_shoreline,
+                                  game_over_reason, first_action_1_id, first_action_2_id, ingested_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                source, model, config_key(config),
+                json.dumps(config, ensure_ascii=False, sort_keys=True) if config else None,
+                classify_outcome(summary), 1 if summary.get("victory") else 0,
+                summary.get("total_years", len(records)),
+                summary.get("initial_scores", {}).get("country"),
+                summary.get("initial_scores", {}).get("shoreline"),
+                summary.get("final_scores", {}).get("country"),
+                summary.get("final_scores", {}).get("shoreline"),
+                summary.get("game_over_reason"),
+                self._action_id(first_actions.get("action_1")) if records else None,
+                self._action_id(first_actions.get("action_2")) if records else None,
+                time.time(),
+            ),
+        )
+        game_id = cursor.lastrowid
+
+        year_rows = []
+        event_rows = []
+        for record in records:
+            actions = record.get("country_actions", {})
+            judge = record.get("judge_scores", {})
+            changes = record.get("score_changes", {})
+            shore = record.get("shore_response", {})
+            year = record.get("year", 0)
+            year_rows.append((
+                game_id, year, record.get("country_score"), record.get("shoreline_score"),
+                self._action_id(actions.get("action_1")), self._action_id(actions.get("action_2")),
+                judge.get("first_country"), judge.get("first_shoreline"),
+                judge.get("second_country"), judge.get("second_shoreline"),
+                changes.get("country"), changes.get("shoreline"),
+                changes.get("random_country_impact"), changes.get("random_shoreline_impact"),
+                shore.get("opportunities"), shore.get("challenges"),
+            ))
+            for event in record.get("random_events", []):
+                if event.get("occurred", True):
+                    event_rows.append((game_id, year, event.get("name", ""),
+                                       event.get("country_impact"), event.get("shoreline_impact")))
+
+        self.conn.executemany("INSERT OR REPLACE INTO years VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              year_rows)
+        if event_rows:
+            self.conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?)", event_rows)
+        return game_id
+
+    def ingest_file(self, path: str, model: str = None, config: Dict[str, Any] = None,
+                    commit: bool = True) -> Optional[int]:
+        """
+        增量导入一个游戏记录JSON文件，未变化的文件直接跳过，内容变化的文件作为新的一局导入
+
+        Args:
+            path: JSON文件路径
+            model: 模型名称（可选）
+            config: 游戏配置（可选）
+            commit: 是否立即提交事务
+
+        Returns:
+            新导入的游戏编号（文件未变化或无法解析时返回None）
+        """
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.conn.execute("SELECT mtime, size, sha1, game_id FROM ingested_files WHERE path = ?",
+                                (key,)).fetchone()
+        if row is not None and row["mtime"] == stat.st_mtime and row["size"] == stat.st_size:
+            return None
+
+        sha1 = _file_sha1(path)
+        if row is not None and row["sha1"] == sha1:
+            self.conn.execute("UPDATE ingested_files SET mtime = ?, size = ? WHERE path = ?",
+                              (stat.st_mtime, stat.st_size, key))
+            if commit:
+                self.conn.commit()
+            return None
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"跳过无法解析的记录文件 {path}: {e}")
+            return None
+        if not isinstance(data, dict) or "game_summary" not in data:
+            return None
+
+        # 文件内容已改变时（如game_001.json被新一批游戏覆盖）作为新的一局导入，保留旧数据
+        game_id = self.ingest_export(data, source=key, model=model, config=config)
+        self.conn.execute("INSERT OR REPLACE INTO ingested_files VALUES (?, ?, ?, ?, ?)",
+                          (key, stat.st_mtime, stat.st_size, sha1, game_id))
+        if commit:
+            self.conn.commit()
+        return game_id
+
+    def ingest_directory(self, directory: str = "history", pattern: str = "*.json",
+                         model: str = None, config: Dict[str, Any] = None) -> int:
+        """
+        增量导入目录下的所有游戏记录
+
+        Args:
+            directory: 目录路径
+            pattern: 文件匹配模式
+            model: 模型名称（可选）
+            config: 游戏配置（可选）
+
+        Returns:
+            新导入的游戏局数
+        """
+        imported = 0
+        with self.conn:
+            for path in sorted(glob.glob(os.path.join(directory, "**", pattern), recursive=True)):
+                if self.ingest_file(path, model=model, config=config, commit=False) is not None:
+                    imported += 1
+        logger.info(f"从{directory}新导入{imported}局游戏")
+        return imported
+
+    def victory_rate_by_first_action(self, which: str = "action_1", model: str = None,
+                                     min_games: int = 1) -> List[Dict[str, Any]]:
+        """
+        按第一年的行动统计胜利率
+
+        Args:
+            which: "action_1"或"action_2"
+            model: 只统计指定模型（可选）
+            min_games: 最少局数，低于该值的行动不返回
+
+        Returns:
+            [{"action", "games", "victories", "victory_rate"}, ...]，按局数降序
+        """
+        if which not in ("action_1", "action_2"):
+            raise ValueError(f"无效的行动字段: {which}")
+        column = f"first_{which}_id"
+        where = "WHERE g.model = ?" if model else ""
+        params = [model] if model else []
+        rows = self.conn.execute(
+            f"""SELECT a.text AS action, COUNT(*) AS games, SUM(g.victory) AS victories
+                FROM games g JOIN actions a ON a.id = g.{column}
+                {where}
+                GROUP BY g.{column}
+                HAVING COUNT(*) >= ?
+                ORDER BY games DESC, victories DESC""",
+            params + [min_games],
+        ).fetchall()
+        return [
+            {"action": r["action"], "games": r["games"], "victories": r["victories"],
+             "victory_rate": r["victories"] / r["games"]}
+            for r in rows
+        ]
+
+    def victory_rate_by(self, column: str) -> List[Dict[str, Any]]:
+        """
+        按游戏字段（model/config_key/outcome/total_years）分组统计胜利率
+
+        Args:
+            column: 分组字段
+
+        Returns:
+            [{column, "games", "victories", "victory_rate"}, ...]
+        """
+        if column not in GROUPABLE_COLUMNS:
+            raise ValueError(f"不支持按{column}分组，可选: {sorted(GROUPABLE_COLUMNS)}")
+        rows = self.conn.execute(
+            f"""SELECT {column} AS value, COUNT(*) AS games, SUM(victory) AS victories
+                FROM games GROUP BY {column} ORDER BY games DESC"""
+        ).fetchall()
+        return [
+            {column: r["value"], "games": r["games"], "victories": r["victories"],
+             "victory_rate": r["victories"] / r["games"]}
+            for r in rows
+        ]
+
+    def game_count(self) -> int:
+        """数据库中的游戏局数"""
+        return self.conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
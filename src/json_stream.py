@@ -0,0 +1,239 @@
+"""
+流式JSON解析
+逐个读取顶层对象的字段，对大数组（yearly_records、detailed_results）按元素惰性迭代，
+内存峰值只与单条记录大小有关，而不是整个文件
+"""
+
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789.eE+-"
+_decoder = json.JSONDecoder()
+
+
+class _StreamReader:
+    """带缓冲的增量读取器，负责按需从文件补充数据"""
+
+    def __init__(self, fp, chunk_size: int = 65536):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.consumed = 0  # 已丢弃的字符数，用于错误定位
+
+    def _fill(self, min_size: int = 0) -> bool:
+        """读取更多数据，返回是否读到了新内容"""
+        if self.eof:
+            return False
+        # 丢弃已解析部分，避免缓冲区无限增长
+        if self.pos:
+            self.consumed += self.pos
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        chunk = self.fp.read(max(self.chunk_size, min_size))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def _error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self.buf, self.pos)
+
+    def peek(self) -> str:
+        """跳过空白并返回下一个字符（文件结束时返回空字符串）"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        """读取一个指定的结构字符"""
+        if self.peek() != char:
+            raise self._error(f"期望字符 {char!r}，实际为 {self.peek()!r} (偏移{self.consumed + self.pos})")
+        self.pos += 1
+
+    def decode_value(self) -> Any:
+        """解析下一个完整的JSON值（数据不足时自动补充读取）"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # 按当前未解析长度成倍读取，避免大值反复重解析
+                if not self._fill(len(self.buf) - self.pos):
+                    raise
+                continue
+            # 数字可能在缓冲区末尾被截断（如"-1."只解析出-1），需确认其后出现了非数字字符
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and not self.eof:
+                tail = end
+                while tail < len(self.buf) and self.buf[tail] in _NUMBER_CHARS:
+                    tail += 1
+                if tail == len(self.buf) and self._fill():
+                    continue
+            self.pos = end
+            return value
+
+
+class ArrayStream:
+    """顶层数组字段的惰性迭代器，元素逐个解析"""
+
+    def __init__(self, reader: _StreamReader):
+        self._reader = reader
+        self._done = False
+        self._first = True
+
+    def __iter__(self) -> Iterator[Any]:
+        return self
+
+    def __next__(self) -> Any:
+        if self._done:
+            raise StopIteration
+        reader = self._reader
+        if self._first:
+            self._first = False
+            if reader.peek() == "]":
+                reader.pos += 1
+                self._done = True
+                raise StopIteration
+        else:
+            char = reader.peek()
+            if char == "]":
+                reader.pos += 1
+                self._done = True
+                raise StopIteration
+            reader.expect(",")
+        return reader.decode_value()
+
+    def drain(self) -> int:
+        """跳过剩余元素，返回跳过的数量"""
+        count = 0
+        for _ in self:
+            count += 1
+        return count
+
+
+def iter_top_level(fp, stream_keys: Iterable[str] = (), chunk_size: int = 65536) -> Iterator[Tuple[str, Any]]:
+    """
+    逐个产生顶层JSON对象的(字段名, 值)
+
+    stream_keys中的字段如果是数组，值以ArrayStream形式惰性提供；
+    调用方未迭代完时，继续迭代本生成器会自动跳过剩余元素。
+
+    Args:
+        fp: 以文本模式打开的文件对象
+        stream_keys: 需要惰性迭代的数组字段名
+        chunk_size: 每次读取的字符数
+
+    Yields:
+        (字段名, 值或ArrayStream)
+    """
+    stream_keys = set(stream_keys)
+    reader = _StreamReader(fp, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.decode_value()
+        if not isinstance(key, str):
+            raise reader._error("对象字段名必须是字符串")
+        reader.expect(":")
+        if key in stream_keys and reader.peek() == "[":
+            reader.pos += 1
+            stream = ArrayStream(reader)
+            yield key, stream
+            stream.drain()
+        else:
+            yield key, reader.decode_value()
+        char = reader.peek()
+        if char == "}":
+            return
+        reader.expect(",")
+
+
+def iter_array_items(path: str, key: str) -> Iterator[Any]:
+    """
+    惰性迭代JSON文件顶层对象中某个数组字段的元素
+
+    Args:
+        path: JSON文件路径
+        key: 数组字段名（如"yearly_records"或"detailed_results"）
+
+    Yields:
+        数组元素
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for name, value in iter_top_level(f, stream_keys=(key,)):
+            if name == key:
+                yield from value
+                return
+
+
+def load_top_level_fields(path: str, skip_keys: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    读取JSON文件顶层对象的字段，跳过指定的大数组（不在内存中保留）
+
+    Args:
+        path: JSON文件路径
+        skip_keys: 需要跳过的数组字段名
+
+    Returns:
+        其余字段组成的字典
+    """
+    skip_keys = tuple(skip_keys)
+    fields = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for name, value in iter_top_level(f, stream_keys=skip_keys):
+            if not isinstance(value, ArrayStream):
+                fields[name] = value
+    return fields
+
+
+class LazyDetailedResults:
+    """game_statistics.json中detailed_results的惰性视图，每次迭代重新流式读取文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter_array_items(self.path, "detailed_results")
+
+
+def load_statistics(path: str = "game_statistics.json", lazy: bool = True) -> Dict[str, Any]:
+    """
+    读取多次游戏的统计结果
+
+    Args:
+        path: 统计文件路径
+        lazy: 为True时detailed_results以惰性视图提供，内存占用与游戏局数无关
+
+    Returns:
+        统计字典（可直接传给print_statistics）
+    """
+    if not lazy:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    statistics = load_top_level_fields(path, skip_keys=("detailed_results",))
+    statistics["detailed_results"] = LazyDetailedResults(path)
+    return statistics
+
+
+def iter_detailed_results(path: str = "game_statistics.json") -> Iterator[Dict[str, Any]]:
+    """
+    惰性迭代统计文件中的每局游戏结果
+
+    Args:
+        path: 统计文件路径
+
+    Yields:
+        单局游戏总结
+    """
+    return iter_array_items(path, "detailed_results")
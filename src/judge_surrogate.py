@@ -0,0 +1,400 @@
+"""
+裁判LLM代理模型
+历史记录显示，相似的行动文本得到的裁判评分高度一致。
+本模块在规范化的行动文本上做字符n-gram TF-IDF最近邻，由历史游戏记录（和参考评分表）训练，
+预测每个行动的(国家, 海岸线)评分及置信度；只有置信度低于阈值时才调用裁判LLM，
+并按比例抽样审计，用裁判LLM的结果衡量代理模型误差
+"""
+
+import os
+import re
+import json
+import glob
+import math
+import random
+import logging
+from collections import Counter
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from .reference_table import ReferenceTable
+
+logger = logging.getLogger(__name__)
+
+JUDGE_SLOTS = (("action_1", "first"), ("action_2", "second"))
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_action(text: str) -> str:
+    """规范化行动文本：小写、去除标点、合并空白"""
+    return _NON_WORD.sub(" ", (text or "").lower()).strip()
+
+
+def _stem(word: str) -> str:
+    """简单的英文词干：去掉常见的复数/时态后缀和词尾e（reduce/reducing/reduced -> reduc）"""
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            word = word[:-len(suffix)]
+            # stopping -> stopp -> stop
+            if suffix in ("ing", "ed") and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+            break
+    return word[:-1] if word.endswith("e") and len(word) > 3 else word
+
+
+# 比较行动文本时忽略的虚词
+_STOPWORDS = frozenset(("a", "an", "the", "some", "of", "for", "on", "in", "at", "to", "and", "with", "our",
+                        "all", "new"))
+
+# 否定/削减/反向类词：只出现在一个行动中时，两个行动的方向相反（"stop urban expansion" / "urban expansion"）
+_POLARITY_WORDS = frozenset(_stem(word) for word in (
+    "stop", "halt", "ban", "limit", "reduce", "restrict", "curb", "cut", "cease", "end", "prevent", "prohibit",
+    "forbid", "block", "suspend", "pause", "freeze", "abolish", "eliminate", "remove", "decrease", "lower",
+    "minimize", "discourage", "oppose", "against", "avoid", "abandon", "withdraw", "cancel", "discontinue",
+    "phase", "close", "shut", "destroy", "demolish", "weaken", "shrink", "not", "no", "non", "never", "without",
+    "less", "fewer", "anti", "dont",
+))
+
+# 反义词对：两个行动分别包含其中一个时方向相反（open / close some factories）
+_ANTONYM_PAIRS = frozenset(frozenset((_stem(a), _stem(b))) for a, b in (
+    ("open", "close"), ("start", "stop"), ("increase", "decrease"), ("expand", "reduce"), ("expand", "shrink"),
+    ("more", "less"), ("raise", "lower"), ("build", "demolish"), ("add", "remove"), ("allow", "ban"),
+    ("support", "oppose"), ("protect", "destroy"), ("strengthen", "weaken"), ("encourage", "discourage"),
+))
+
+# 否定/反向前缀：两个词只差这些前缀时意思相反（reforestation / deforestation, regulate / deregulate）
+_NEGATING_PREFIXES = ("re", "de", "un", "dis", "non", "anti", "counter")
+
+
+def action_tokens(text: str) -> FrozenSet[str]:
+    """行动文本的实词词干集合（规范化后分词，去掉虚词）"""
+    return frozenset(_stem(word) for word in normalize_action(text).split() if word not in _STOPWORDS)
+
+
+def _prefix_variants(word: str) -> FrozenSet[str]:
+    """词本身及去掉一个否定前缀后的词根（词根至少4个字符）"""
+    return frozenset([word] + [word[len(p):] for p in _NEGATING_PREFIXES
+                               if word.startswith(p) and len(word) - len(p) >= 4])
+
+
+def polarity_conflict(a: str, b: str) -> bool:
+    """
+    判断两个行动文本是否方向相反：只有一方包含否定/削减类词、分别包含一对反义词，
+    或有两个词只差否定前缀
+
+    Args:
+        a: 行动文本
+        b: 行动文本
+
+    Returns:
+        方向相反时为True
+    """
+    tokens_a, tokens_b = action_tokens(a), action_tokens(b)
+    only_a, only_b = tokens_a - tokens_b, tokens_b - tokens_a
+    if (only_a | only_b) & _POLARITY_WORDS:
+        return True
+    for x in only_a:
+        variants = _prefix_variants(x)
+        for y in only_b:
+            if frozenset((x, y)) in _ANTONYM_PAIRS or variants & _prefix_variants(y):
+                return True
+    return False
+
+
+def action_features(text: str, ngram: int = 3) -> Counter:
+    """
+    行动文本的特征：字符n-gram（词首尾补空格）加整词
+
+    Args:
+        text: 规范化后的行动文本
+        ngram: 字符n-gram长度
+
+    Returns:
+        {特征: 次数}
+    """
+    features = Counter()
+    padded = f" {text} "
+    for i in range(max(len(padded) - ngram + 1, 1)):
+        features[padded[i:i + ngram]] += 1
+    for word in text.split():
+        features["w:" + word] += 1
+    return features
+
+
+class JudgeSurrogate:
+    """裁判评分的最近邻代理模型（带置信度门控和审计抽样）"""
+
+    def __init__(self, k: int = 5, ngram: int = 3, confidence_threshold: float = 0.8,
+                 audit_rate: float = 0.05, learn_online: bool = True, similarity_power: float = 4.0,
+                 seed: int = None, rebuild_fraction: float = 0.25):
+        """
+        初始化代理模型
+
+        Args:
+            k: 最近邻个数
+            ngram: 字符n-gram长度
+            confidence_threshold: 置信度不低于该值时使用代理评分，否则调用裁判LLM
+            audit_rate: 代理评分足够可信时仍调用裁判LLM进行审计的比例
+            learn_online: 是否把裁判LLM的新评分加入训练数据
+            similarity_power: 投票权重为相似度的该次幂（越大越偏向最相似的行动）
+            seed: 审计抽样的随机种子（使用独立的随机数生成器，不影响游戏的随机事件序列）
+            rebuild_fraction: 新增行动按上次重建时的IDF增量加入索引，
+                新增数超过上次重建时行动数的该比例时才重建整个索引（重建总代价与行动数成线性）
+        """
+        self.k = k
+        self.ngram = ngram
+        self.confidence_threshold = confidence_threshold
+        self.audit_rate = audit_rate
+        self.learn_online = learn_online
+        self.similarity_power = similarity_power
+        self.rebuild_fraction = rebuild_fraction
+        self._rng = random.Random(seed)
+
+        # 每个不同的规范化文本一条文档，记录各评分出现的次数
+        self._texts: List[str] = []
+        self._labels: List[Counter] = []
+        self._index_of: Dict[str, int] = {}
+        self._postings: Dict[str, List[Tuple[int, float]]] = {}
+        self._idf: Dict[str, float] = {}
+        self._unseen_idf = 1.0
+        self._indexed = 0       # 已加入倒排索引的行动数
+        self._built_size = 0    # 上次重建时的行动数
+        self.index_rebuilds = 0
+
+        # 审计误差只保留累计计数（audits / audit_exact / audit_error_total）
+        self.counters = Counter()
+
+    # ---------- 训练 ----------
+
+    def add_example(self, action: str, country: int, shoreline: int, weight: int = 1):
+        """
+        添加一条训练样本
+
+        Args:
+            action: 行动文本
+            country: 裁判给出的国家评分
+            shoreline: 裁判给出的海岸线评分
+            weight: 样本计数
+        """
+        text = normalize_action(action)
+        if not text:
+            return
+        index = self._index_of.get(text)
+        if index is None:
+            index = len(self._texts)
+            self._index_of[text] = index
+            self._texts.append(text)
+            self._labels.append(Counter())
+        self._labels[index][(int(country), int(shoreline))] += weight
+
+    def add_judged_year(self, country_actions: Dict[str, str], judge_scores: Dict[str, int]):
+        """把一年的国家行动和裁判评分加入训练数据"""
+        for action_key, prefix in JUDGE_SLOTS:
+            country = judge_scores.get(f"{prefix}_country")
+            shoreline = judge_scores.get(f"{prefix}_shoreline")
+            if country is None or shoreline is None:
+                continue
+            self.add_example(country_actions.get(action_key, ""), country, shoreline)
+
+    def fit_reference_table(self, table: ReferenceTable):
+        """把参考评分表中的行动作为训练样本"""
+        for action in table.actions:
+            self.add_example(action.name, action.country_change, action.shoreline_change)
+
+    def fit_records(self, records: Iterable[Dict[str, Any]]):
+        """由导出格式的年度记录训练"""
+        for record in records:
+            self.add_judged_year(record.get("country_actions", {}), record.get("judge_scores", {}))
+
+    @classmethod
+    def from_history(cls, history_dir: str = "history", table: Optional[ReferenceTable] = None,
+                     **kwargs) -> "JudgeSurrogate":
+        """
+        由历史游戏记录目录训练代理模型
+
+        Args:
+            history_dir: 历史记录目录（读取其中的game_record_*.json / game_*.json）
+            table: 参考评分表（可选，作为额外的训练样本）
+            **kwargs: 传给构造函数的参数
+
+        Returns:
+            训练好的代理模型
+        """
+        surrogate = cls(**kwargs)
+        if table is not None:
+            surrogate.fit_reference_table(table)
+        paths = sorted(set(glob.glob(os.path.join(history_dir, "game_record_*.json"))
+                           + glob.glob(os.path.join(history_dir, "game_*.json"))))
+        for path in paths:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    surrogate.fit_records(json.load(f).get("yearly_records", []))
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取历史记录失败: {path} -> {e}")
+        logger.info(f"裁判代理模型训练完成: {len(paths)}个历史文件, {len(surrogate)}个不同行动")
+        return surrogate
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    # ---------- 检索 ----------
+
+    def _build_index(self):
+        """重建TF-IDF倒排索引"""
+        features = [action_features(text, self.ngram) for text in self._texts]
+        document_frequency = Counter()
+        for feature in features:
+            document_frequency.update(feature.keys())
+        total = len(features)
+        self._idf = {f: math.log((1 + total) / (1 + df)) + 1 for f, df in document_frequency.items()}
+        # 未见过的特征按最大IDF计入范数，使含大量陌生文本的行动相似度更低
+        self._unseen_idf = math.log(1 + total) + 1
+        self._postings = {}
+        for index, feature in enumerate(features):
+            self._index_document(index, feature)
+        self._indexed = self._built_size = total
+        self.index_rebuilds += 1
+
+    def _index_document(self, index: int, features: Counter):
+        """按当前IDF把一个行动的归一化向量加入倒排索引"""
+        vector = self._vector(features)
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        for f, value in vector.items():
+            self._postings.setdefault(f, []).append((index, value / norm))
+
+    def _vector(self, features: Counter) -> Dict[str, float]:
+        return {f: count * self._idf.get(f, self._unseen_idf) for f, count in features.items()}
+
+    def _update_index(self):
+        """新增行动较少时按已有IDF增量加入索引，累计足够多时重建（在线学习时避免每次都重建）"""
+        if self._indexed == len(self._texts):
+            return
+        if len(self._texts) > self._built_size * (1 + self.rebuild_fraction):
+            self._build_index()
+            return
+        for index in range(self._indexed, len(self._texts)):
+            self._index_document(index, action_features(self._texts[index], self.ngram))
+        self._indexed = len(self._texts)
+
+    def neighbors(self, action: str, k: int = None) -> List[Tuple[str, float]]:
+        """
+        查找最相似的已知行动
+
+        Args:
+            action: 行动文本
+            k: 返回个数（默认self.k）
+
+        Returns:
+            [(规范化文本, 余弦相似度)]，按相似度降序
+        """
+        self._update_index()
+        vector = self._vector(action_features(normalize_action(action), self.ngram))
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        if norm == 0:
+            return []
+        scores: Dict[int, float] = {}
+        for f, value in vector.items():
+            for index, weight in self._postings.get(f, ()):
+                scores[index] = scores.get(index, 0.0) + value * weight
+        best = sorted(scores.items(), key=lambda item: -item[1])[:k or self.k]
+        return [(self._texts[index], score / norm) for index, score in best]
+
+    def predict_action(self, action: str) -> Tuple[int, int, float]:
+        """
+        预测单个行动的评分
+
+        Args:
+            action: 行动文本
+
+        Returns:
+            (国家评分, 海岸线评分, 置信度)；置信度 = 最高相似度 × 加权投票中预测评分所占比例。
+            与查询方向相反的近邻（"ban mining operations" / "mining operations"）不参与投票，
+            没有同向近邻时置信度为0，交给裁判LLM评分
+        """
+        neighbors = [(text, similarity) for text, similarity in self.neighbors(action)
+                     if not polarity_conflict(action, text)]
+        if not neighbors:
+            return 0, 0, 0.0
+        votes = Counter()
+        for text, similarity in neighbors:
+            labels = self._labels[self._index_of[text]]
+            total = sum(labels.values())
+            for label, count in labels.items():
+                votes[label] += similarity ** self.similarity_power * count / total
+        (country, shoreline), weight = votes.most_common(1)[0]
+        confidence = neighbors[0][1] * weight / sum(votes.values())
+        return country, shoreline, min(confidence, 1.0)
+
+    def predict(self, action_1: str, action_2: str) -> Tuple[Dict[str, int], float]:
+        """
+        预测一年两个行动的评分（格式同call_judge_llm）
+
+        Returns:
+            (评分字典, 置信度)；置信度取两个行动中较低者
+        """
+        scores = {}
+        confidences = []
+        for (_, prefix), action in zip(JUDGE_SLOTS, (action_1, action_2)):
+            country, shoreline, confidence = self.predict_action(action)
+            scores[f"{prefix}_country"] = country
+            scores[f"{prefix}_shoreline"] = shoreline
+            confidences.append(confidence)
+        return scores, min(confidences)
+
+    # ---------- 门控评分 ----------
+
+    def score(self, action_1: str, action_2: str, call_judge: Callable[[], Dict[str, int]]) -> Dict[str, int]:
+        """
+        按置信度门控给出评分：置信度足够时使用代理评分（按audit_rate抽样审计），否则调用裁判LLM
+
+        Args:
+            action_1: 第一个行动
+            action_2: 第二个行动
+            call_judge: 调用裁判LLM的函数（返回call_judge_llm格式的评分）
+
+        Returns:
+            评分字典
+        """
+        predicted, confidence = self.predict(action_1, action_2)
+        confident = confidence >= self.confidence_threshold
+        if confident and self._rng.random() >= self.audit_rate:
+            self.counters["surrogate"] += 1
+            logger.info(f"裁判代理评分 (置信度{confidence:.2f}): {predicted}")
+            return predicted
+
+        scores = call_judge()
+        self.counters["llm"] += 1
+        if confident:
+            self.counters["audits"] += 1
+            errors = [abs(predicted[key] - scores.get(key, 0)) for key in predicted]
+            self.counters["audit_exact"] += not any(errors)
+            self.counters["audit_error_total"] += sum(errors)
+            if any(errors):
+                logger.info(f"裁判代理审计不一致: 代理{predicted} / 裁判LLM{scores}")
+        if self.learn_online:
+            self.add_judged_year({"action_1": action_1, "action_2": action_2}, scores)
+        return scores
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        门控与审计统计
+
+        Returns:
+            {"surrogate_calls", "llm_calls", "surrogate_rate", "audits",
+             "audit_exact_rate": 审计中四项评分完全一致的比例,
+             "audit_mean_abs_error": 审计中每年四项评分的平均绝对误差之和}
+        """
+        surrogate_calls = self.counters["surrogate"]
+        llm_calls = self.counters["llm"]
+        total = surrogate_calls + llm_calls
+        audits = self.counters["audits"]
+        return {
+            "surrogate_calls": surrogate_calls,
+            "llm_calls": llm_calls,
+            "surrogate_rate": surrogate_calls / total if total else 0.0,
+            "audits": audits,
+            "audit_exact_rate": self.counters["audit_exact"] / audits if audits else None,
+            "audit_mean_abs_error": self.counters["audit_error_total"] / audits if audits else None,
+        }
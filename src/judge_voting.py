@@ -0,0 +1,133 @@
+"""
+裁判多采样投票
+一次请求取n个裁判回复（接口的n参数，不支持时改为n个并发请求），四个评分分别按中位数或多数票汇总，
+并按行动统计各次采样之间的评分方差，用较少的游戏局数得到同样置信度的结果
+"""
+
+import threading
+from collections import Counter
+from statistics import median_low, pvariance
+from typing import Dict, List, Optional
+
+from .judge_surrogate import normalize_action
+
+# 评分汇总方式
+JUDGE_AGGREGATES = ("median", "majority")
+
+_SCORE_KEYS = ('first_country', 'first_shoreline', 'second_country', 'second_shoreline')
+
+
+def aggregate_values(values: List[int], method: str = "median") -> int:
+    """
+    汇总同一评分项的多个采样
+
+    Args:
+        values: 各次采样的评分（非空）
+        method: "median"取中位数（偶数个时取较小的中间值），"majority"取出现次数最多的值
+                （并列时取最接近中位数的值，仍并列时取较小值）
+
+    Returns:
+        汇总后的评分
+    """
+    middle = median_low(values)
+    if method == "median":
+        return middle
+    if method != "majority":
+        raise ValueError(f"未知的评分汇总方式: {method}")
+    counts = Counter(values)
+    top = max(counts.values())
+    return min((value for value, count in counts.items() if count == top),
+               key=lambda value: (abs(value - middle), value))
+
+
+def aggregate_scores(samples: List[Dict[str, int]], method: str = "median") -> Dict[str, int]:
+    """
+    汇总多次裁判采样（每个评分项只使用包含该项的采样）
+
+    Args:
+        samples: 各次采样解析出的评分
+        method: 汇总方式（见JUDGE_AGGREGATES）
+
+    Returns:
+        汇总后的评分（所有采样都缺失的评分项不出现在结果中）
+    """
+    result = {}
+    for key in _SCORE_KEYS:
+        values = [sample[key] for sample in samples if key in sample]
+        if values:
+            result[key] = aggregate_values(values, method)
+    return result
+
+
+def score_variance(samples: List[Dict[str, int]]) -> Dict[str, float]:
+    """
+    各评分项在采样之间的方差（总体方差，少于两个采样时为0）
+
+    Args:
+        samples: 各次采样解析出的评分
+
+    Returns:
+        {评分项: 方差}
+    """
+    variance = {}
+    for key in _SCORE_KEYS:
+        values = [sample[key] for sample in samples if key in sample]
+        variance[key] = pvariance(values) if len(values) > 1 else 0.0
+    return variance
+
+
+class JudgeVoteStats:
+    """按行动累计的裁判采样方差（线程安全）"""
+
+    def __init__(self):
+        self.calls = 0
+        self.samples = 0
+        self.variance_sums = dict.fromkeys(_SCORE_KEYS, 0.0)
+        self.actions: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, actions: List[Optional[str]], samples: List[Dict[str, int]]):
+        """
+        记录一次投票
+
+        Args:
+            actions: [ACTION_1文本, ACTION_2文本]（缺失时为None）
+            samples: 各次采样解析出的评分
+        """
+        variance = score_variance(samples)
+        with self._lock:
+            self.calls += 1
+            self.samples += len(samples)
+            for key, value in variance.items():
+                self.variance_sums[key] += value
+            for prefix, action in zip(("first", "second"), actions):
+                if not action:
+                    continue
+                entry = self.actions.setdefault(normalize_action(action), {
+                    "votes": 0, "country_variance": 0.0, "shoreline_variance": 0.0})
+                entry["votes"] += 1
+                entry["country_variance"] += variance[f"{prefix}_country"]
+                entry["shoreline_variance"] += variance[f"{prefix}_shoreline"]
+
+    def report(self, top: int = 10) -> Dict[str, object]:
+        """
+        方差报告
+
+        Args:
+            top: 列出平均方差最大的前几个行动
+
+        Returns:
+            {"calls": 投票次数, "samples": 采样总数, "mean_variance": {评分项: 平均方差},
+             "noisiest_actions": [{"action", "votes", "country_variance", "shoreline_variance"}]}
+        """
+        with self._lock:
+            mean_variance = {key: total / self.calls if self.calls else 0.0
+                             for key, total in self.variance_sums.items()}
+            actions = [{"action": action, "votes": entry["votes"],
+                        "country_variance": entry["country_variance"] / entry["votes"],
+                        "shoreline_variance": entry["shoreline_variance"] / entry["votes"]}
+                       for action, entry in self.actions.items()]
+            calls, samples = self.calls, self.samples
+        actions.sort(key=lambda entry: entry["country_variance"] + entry["shoreline_variance"], reverse=True)
+        return {"calls": calls, "samples": samples, "mean_variance": mean_variance,
+                "noisiest_actions": actions[:top]}
@@ -5,18 +5,50 @@ LLM客户端模块
 
 import openai
 import os
+import json
+import re
 import time
 import logging
-from typing import Dict, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from .response_cache import LLMResponseCache, cache_key
+from .action_index import ActionIndex
+from .judge_surrogate import normalize_action
+from .prompt_templates import PromptRegistry, default_registry
+from . import response_parsers
+from .response_parsers import parse_human_response, parse_event_response, parse_candidate_response
+from .judge_voting import JUDGE_AGGREGATES, JudgeVoteStats, aggregate_scores
+from .structured_outputs import ROLE_SCHEMAS, JSON_RESPONSE_FORMAT, schema_instruction, reask_prompt, parse_structured
+from .prompt_profiles import PROMPT_PROFILES, COMPACT_TEMPLATE_DIR, DEFAULT_CONTEXT_CHARS, bound_text, compact_ref_table
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 裁判评分的四个键
+JUDGE_SCORE_KEYS = ('first_country', 'first_shoreline', 'second_country', 'second_shoreline')
+
+# 提示词布局："inline"为单条用户消息（原有模板）；"prefix"把说明和参考评分表等固定内容放在
+# 稳定的系统消息中、每年变化的分数/行动放在简短的用户消息中，便于服务商复用提示词前缀缓存
+PROMPT_LAYOUTS = ("inline", "prefix")
+
+# 各角色的模板名称（prefix布局使用"<名称>_system"和"<名称>_user"两个模板）
+ROLE_TEMPLATES = {"human": "HumanLLM", "shore": "ShoreLLM", "judge": "JudgeLLM"}
+
+# 国家行动文本中的行动行（"ACTION_1: ..."）
+_ACTION_LINE = re.compile(r"^(ACTION_\d+):[ \t]*(.*)$", re.MULTILINE)
+
 class LLMClient:
     """LLM客户端类，支持OpenAI API和其他兼容接口"""
     
-    def __init__(self, api_key: str = None, base_url: str = None, model: str = "gpt-3.5-turbo"):
+    def __init__(self, api_key: str = None, base_url: str = None, model: str = "gpt-3.5-turbo",
+                 response_cache: LLMResponseCache = None, action_index: ActionIndex = None,
+                 prompt_registry: PromptRegistry = None, prompt_layout: str = "inline",
+                 prompt_profile: str = "standard", context_chars: int = DEFAULT_CONTEXT_CHARS,
+                 structured_output: bool = False, max_reasks: int = 1,
+                 judge_samples: int = 1, judge_aggregate: str = "median"):
         """
         初始化LLM客户端
         
@@ -24,10 +56,46 @@ class LLMClient:
             api_key: API密钥
             base_url: API基础URL (可选，用于自定义端点)
             model: 模型名称
+            response_cache: LLM响应缓存（可选，可在多个客户端之间共享）
+            action_index: 行动文本模糊索引（可选），裁判/海岸线调用按规范行动计算缓存键，
+                          使改写过的行动也能命中缓存
+            prompt_registry: 提示词模板注册表（默认使用进程内共享的prompt/目录注册表）
+            prompt_layout: 提示词布局（"inline"或"prefix"，见PROMPT_LAYOUTS）
+            prompt_profile: 提示词档位（"standard"或"compact"，见prompt_profiles）
+            context_chars: compact档位中机遇/挑战文本的最大字符数
+            structured_output: 是否使用JSON结构化回复（按角色字段表校验，见structured_outputs）
+            max_reasks: 结构化回复中有缺失或无效字段时，最多追问几次（只追问这些字段）
+            judge_samples: 每次裁判评分的采样数（大于1时一次请求取多个回复投票，见judge_voting）
+            judge_aggregate: 采样的汇总方式（"median"或"majority"）
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.base_url = base_url or os.getenv("OPENAI_BASE_URL")
         self.model = model
+        self.response_cache = response_cache
+        self.action_index = action_index
+        self.prompts = prompt_registry or default_registry()
+        if prompt_layout not in PROMPT_LAYOUTS:
+            raise ValueError(f"未知的提示词布局: {prompt_layout}")
+        self.prompt_layout = prompt_layout
+        if prompt_profile not in PROMPT_PROFILES:
+            raise ValueError(f"未知的提示词档位: {prompt_profile}")
+        self.prompt_profile = prompt_profile
+        self.context_chars = context_chars
+        self.structured_output = structured_output
+        self.max_reasks = max_reasks
+        # 按角色统计的结构化回复校验结果
+        self.structured_stats: Dict[str, Dict[str, int]] = {}
+        if judge_aggregate not in JUDGE_AGGREGATES:
+            raise ValueError(f"未知的评分汇总方式: {judge_aggregate}")
+        self.judge_samples = max(1, judge_samples)
+        self.judge_aggregate = judge_aggregate
+        self.judge_votes = JudgeVoteStats()
+        # 接口是否支持n参数（None为尚未确定）
+        self._n_supported: Optional[bool] = None
+        # 按角色累计的token用量（含服务商前缀缓存命中的token）和请求耗时
+        self.usage: Dict[str, Dict[str, float]] = {}
+        self._usage_lock = threading.Lock()
+        self._local = threading.local()
         
         # 配置OpenAI客户端
         self.client = openai.OpenAI(
@@ -37,7 +105,8 @@ class LLMClient:
         
         logger.info(f"LLM客户端初始化完成，模型: {self.model}")
     
-    def call_llm(self, prompt: str, system_prompt: str = None, max_retries: int = 5) -> str:
+    def call_llm(self, prompt: str, system_prompt: str = None, max_retries: int = 5,
+                 cache_role: str = None, cache_prompt: str = None) -> str:
         """
         调用LLM生成回复
         
@@ -45,23 +114,63 @@ class LLMClient:
             prompt: 用户提示词
             system_prompt: 系统提示词
             max_retries: 最大重试次数（默认5次，包含空回复重试）
+            cache_role: 调用角色（"human"/"shore"/"judge"/"event"），响应缓存据此决定是否复用
+            cache_prompt: 计算缓存键使用的提示词（默认同prompt，如按规范行动改写后的提示词）
             
         Returns:
             LLM生成的回复
         """
+        key = None
+        if self.response_cache is not None and self.response_cache.accepts(cache_role):
+            key = cache_key(self.model, system_prompt, cache_prompt or prompt)
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                logger.info(f"LLM响应缓存命中 ({cache_role})")
+                return cached
+        
+        self._local.role = cache_role
+        result = self._request_llm(prompt, system_prompt, max_retries)
+        if key is not None:
+            self.response_cache.put(key, result, role=cache_role)
+        return result
+    
+    def call_llm_samples(self, prompt: str, n: int, system_prompt: str = None, role: str = None) -> List[str]:
+        """
+        取同一提示词的n个回复（不经过响应缓存，如打包的裁判投票请求）
+        
+        Args:
+            prompt: 用户提示词
+            n: 回复数
+            system_prompt: 系统提示词
+            role: 调用角色（用量按角色统计）
+            
+        Returns:
+            非空回复列表（n个）
+        """
+        self._local.role = role
+        return self._request_samples(prompt, system_prompt, n)
+    
+    def _request_llm(self, prompt: str, system_prompt: str = None, max_retries: int = 5,
+                     history: List[Dict[str, str]] = None, response_format: Dict[str, str] = None) -> str:
+        """实际发送请求（含重试）；history为此前的对话消息，response_format为回复格式（如JSON）"""
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
+        messages.extend(history or [])
         messages.append({"role": "user", "content": prompt})
+        options = {"response_format": response_format} if response_format else {}
 
         for attempt in range(max_retries):
             try:
+                started = time.perf_counter()
                 response = self.client.chat.completions.create(
                     model=self.model,
                     messages=messages,
                     temperature=0.7,
-                    max_tokens=10000  # 增加token限制，防止回复被截断
+                    max_tokens=10000,  # 增加token限制，防止回复被截断
+                    **options
                 )
+                self._record_usage(getattr(response, "usage", None), time.perf_counter() - started)
                 result = response.choices[0].message.content.strip() if response.choices and response.choices[0].message and response.choices[0].message.content else ""
                 if result:
                     logger.info(f"LLM调用成功，尝试次数: {attempt + 1}")
@@ -83,8 +192,289 @@ class LLMClient:
         logger.error(f"LLM连续{max_retries}次回复均为空，游戏无法继续！")
         raise Exception(f"LLM连续{max_retries}次回复均为空，游戏无法继续！")
     
+    def _record_usage(self, usage, elapsed: float):
+        """累计一次请求的token用量（服务商返回usage时）和耗时"""
+        role = getattr(self._local, "role", None) or "other"
+        prompt_tokens = _usage_field(usage, "prompt_tokens")
+        # OpenAI: prompt_tokens_details.cached_tokens；DeepSeek等: prompt_cache_hit_tokens
+        cached_tokens = _usage_field(_usage_field(usage, "prompt_tokens_details", None), "cached_tokens") \
+            or _usage_field(usage, "prompt_cache_hit_tokens")
+        with self._usage_lock:
+            entry = self.usage.setdefault(role, {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                                                 "completion_tokens": 0, "latency_seconds": 0.0})
+            entry["requests"] += 1
+            entry["prompt_tokens"] += prompt_tokens
+            entry["cached_tokens"] += cached_tokens
+            entry["completion_tokens"] += _usage_field(usage, "completion_tokens")
+            entry["latency_seconds"] += elapsed
+    
+    def _request_samples(self, prompt: str, system_prompt: str = None, n: int = 1,
+                         response_format: Dict[str, str] = None) -> List[str]:
+        """
+        取同一提示词的n个回复：优先用接口的n参数一次取回；接口报错或返回的回复不足时，
+        之后改为并发请求补足（只在第一次失败时尝试n参数）。
+        多采样请求都经过这里，不直接发送请求的子类（如BatchLLMClient）重写此方法
+        
+        Args:
+            prompt: 用户提示词
+            system_prompt: 系统提示词
+            n: 回复数
+            response_format: 回复格式（如JSON）
+            
+        Returns:
+            非空回复列表（n个）
+        """
+        responses = []
+        if self._n_supported is not False:
+            messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+            messages.append({"role": "user", "content": prompt})
+            options = {"n": n, "response_format": response_format} if response_format else {"n": n}
+            try:
+                started = time.perf_counter()
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=10000,
+                    **options
+                )
+                self._record_usage(getattr(response, "usage", None), time.perf_counter() - started)
+                choices = response.choices or []
+                responses = [c.message.content.strip() for c in choices
+                             if c.message and c.message.content and c.message.content.strip()]
+                self._n_supported = len(choices) >= n
+            except Exception as e:
+                logger.warning(f"n参数请求失败，改为{n}个并发请求: {str(e)}")
+                self._n_supported = False
+        
+        missing = n - len(responses)
+        if missing > 0:
+            role = getattr(self._local, "role", None)
+            
+            def request(_):
+                self._local.role = role
+                return self._request_llm(prompt, system_prompt, response_format=response_format)
+            
+            with ThreadPoolExecutor(max_workers=missing) as executor:
+                responses.extend(executor.map(request, range(missing)))
+        return responses
+    
+    def _vote_judge(self, country_actions: str, prompt: str, system_prompt: str = None,
+                    cache_prompt: str = None, ref_table: str = None) -> Dict[str, int]:
+        """
+        裁判多采样投票：取judge_samples个回复，四个评分分别汇总，并按行动记录采样方差
+        
+        Args:
+            country_actions: 国家采取的行动
+            prompt: 裁判用户提示词
+            system_prompt: 系统提示词
+            cache_prompt: 计算缓存键使用的提示词（默认同prompt）
+            ref_table: 参考评分表（结构化回复的分数范围覆盖表中的分数）
+            
+        Returns:
+            汇总后的评分（所有采样都缺失的评分项不出现在结果中）
+        """
+        key = None
+        if self.response_cache is not None and self.response_cache.accepts("judge"):
+            key = cache_key(self.model, system_prompt, (cache_prompt or prompt) + self.judge_vote_tag())
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                logger.info("LLM响应缓存命中 (judge)")
+                return self.parse_judge_response(cached)
+        
+        response_format = None
+        if self.structured_output:
+            prompt = f"{prompt}\n\n{schema_instruction('judge', ref_table)}"
+            response_format = JSON_RESPONSE_FORMAT
+        self._local.role = "judge"
+        responses = self._request_samples(prompt, system_prompt, self.judge_samples, response_format)
+        if self.structured_output:
+            samples = [parse_structured("judge", response, ref_table=ref_table)[0] for response in responses]
+        else:
+            samples = [self.parse_judge_response(response) for response in responses]
+        scores = self.combine_judge_votes(country_actions, samples)
+        if key is not None and all(name in scores for name in JUDGE_SCORE_KEYS):
+            self.response_cache.put(key, "\n".join(f"{name}_rank: {scores[name]}" for name in JUDGE_SCORE_KEYS),
+                                    role="judge")
+        return scores
+    
+    def judge_vote_tag(self) -> str:
+        """投票汇总结果的缓存键后缀（汇总结果与单次回复使用不同的缓存键）"""
+        return f"\n\n[judge votes: {self.judge_samples} {self.judge_aggregate}]"
+    
+    def combine_judge_votes(self, country_actions: str, samples: List[Dict[str, int]]) -> Dict[str, int]:
+        """
+        汇总一组行动的裁判采样，并按行动记录采样方差
+        
+        Args:
+            country_actions: 国家采取的行动
+            samples: 各次采样解析出的评分
+            
+        Returns:
+            汇总后的评分
+        """
+        scores = aggregate_scores(samples, self.judge_aggregate)
+        actions = dict(_ACTION_LINE.findall(country_actions))
+        self.judge_votes.record([actions.get("ACTION_1"), actions.get("ACTION_2")], samples)
+        logger.info(f"裁判投票: {len(samples)}个采样 -> {scores}")
+        return scores
+    
+    def _call_structured(self, role: str, prompt: str, system_prompt: str = None,
+                         cache_prompt: str = None, ref_table: str = None) -> Dict[str, Any]:
+        """
+        以JSON结构化回复调用LLM：校验回复，只追问缺失或无效的字段（最多max_reasks次）
+        
+        Args:
+            role: 角色（"human"/"shore"/"judge"/"event"）
+            prompt: 用户提示词（末尾附加字段说明）
+            system_prompt: 系统提示词
+            cache_prompt: 计算缓存键使用的提示词（默认同prompt）
+            ref_table: 参考评分表（裁判的分数范围扩展到覆盖表中的分数）
+            
+        Returns:
+            通过校验的字段（追问后仍无效的字段不出现在结果中）
+        """
+        instruction = schema_instruction(role, ref_table)
+        full_prompt = f"{prompt}\n\n{instruction}"
+        key = None
+        if self.response_cache is not None and self.response_cache.accepts(role):
+            # 缓存中只保存校验通过的回复，与文本格式的回复使用不同的键
+            key = cache_key(self.model, system_prompt, f"{cache_prompt or prompt}\n\n{instruction}")
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                values, problems = parse_structured(role, cached, ref_table=ref_table)
+                if not problems:
+                    logger.info(f"LLM响应缓存命中 ({role})")
+                    return values
+        
+        self._local.role = role
+        response = self._request_llm(full_prompt, system_prompt, response_format=JSON_RESPONSE_FORMAT)
+        values, problems = parse_structured(role, response, ref_table=ref_table)
+        stats = {"responses": 1, "valid": int(not problems), "reasks": 0, "repaired": 0, "failed": 0}
+        history = [{"role": "user", "content": full_prompt}, {"role": "assistant", "content": response}]
+        for _ in range(self.max_reasks):
+            if not problems:
+                break
+            logger.warning(f"{role}结构化回复字段缺失或无效: {problems}，只追问这些字段")
+            question = reask_prompt(role, problems, ref_table)
+            reply = self._request_llm(question, system_prompt, history=history, response_format=JSON_RESPONSE_FORMAT)
+            history += [{"role": "user", "content": question}, {"role": "assistant", "content": reply}]
+            fixed, problems = parse_structured(role, reply, fields=list(problems), ref_table=ref_table)
+            values.update(fixed)
+            stats["reasks"] += 1
+        if stats["reasks"]:
+            stats["repaired" if not problems else "failed"] = 1
+        with self._usage_lock:
+            entry = self.structured_stats.setdefault(role, dict.fromkeys(stats, 0))
+            for name, count in stats.items():
+                entry[name] += count
+        
+        if problems:
+            logger.warning(f"{role}结构化回复追问后仍有字段无效: {problems}")
+        elif key is not None:
+            self.response_cache.put(key, json.dumps(values, ensure_ascii=False), role=role)
+        return values
+    
+    def usage_stats(self) -> Dict[str, Any]:
+        """
+        token用量统计
+        
+        Returns:
+            {"total": 合计, "by_role": {角色: 用量}}，各项含请求数、提示词/缓存命中/生成token数、
+            缓存命中比例和平均请求耗时；启用结构化回复时另含"structured_output"：
+            {角色: {回复数, 首次即有效数, 追问次数, 追问后修复数, 追问后仍无效数}}；裁判多采样时另含
+            "judge_voting"（各评分项的平均采样方差和方差最大的行动，见JudgeVoteStats.report）
+        """
+        with self._usage_lock:
+            by_role = {role: dict(entry) for role, entry in self.usage.items()}
+        total = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "latency_seconds": 0.0}
+        for entry in by_role.values():
+            for name in total:
+                total[name] += entry[name]
+        for entry in list(by_role.values()) + [total]:
+            entry["cached_rate"] = entry["cached_tokens"] / entry["prompt_tokens"] if entry["prompt_tokens"] else 0.0
+            entry["mean_latency"] = entry["latency_seconds"] / entry["requests"] if entry["requests"] else 0.0
+        stats = {"prompt_layout": self.prompt_layout, "prompt_profile": self.prompt_profile,
+                 "total": total, "by_role": by_role}
+        if self.structured_output:
+            with self._usage_lock:
+                stats["structured_output"] = {role: dict(entry) for role, entry in self.structured_stats.items()}
+        if self.judge_samples > 1:
+            stats["judge_voting"] = dict(self.judge_votes.report(), samples_per_call=self.judge_samples,
+                                         aggregate=self.judge_aggregate)
+        return stats
+    
+    def system_prompt(self, role: str, ref_table: str = None) -> Optional[str]:
+        """
+        角色的系统消息（prefix布局下为固定的说明和参考评分表，inline布局下为None）
+        
+        Args:
+            role: "human"、"shore"或"judge"
+            ref_table: 参考评分表（human、judge）
+            
+        Returns:
+            系统提示词
+        """
+        if self.prompt_layout != "prefix":
+            return None
+        return self.prompts.bind(self._template_name(role, "_system"),
+                                 ref_scoring_table=self._prompt_ref_table(ref_table)).render()
+    
+    def _template_name(self, role: str, part: str = "") -> str:
+        """角色在当前档位下的模板名称（compact档位的模板在prompt/compact/下）"""
+        name = ROLE_TEMPLATES[role] + part
+        return f"{COMPACT_TEMPLATE_DIR}/{name}" if self.prompt_profile == "compact" else name
+    
+    def _prompt_ref_table(self, ref_table: Optional[str]) -> Optional[str]:
+        """compact档位把参考评分表改写为CSV行"""
+        if ref_table is None or self.prompt_profile != "compact":
+            return ref_table
+        return compact_ref_table(ref_table)
+    
+    def _user_template(self, role: str, ref_table: str = None):
+        """角色的用户消息模板（inline布局下包含全部内容，参考评分表预先渲染）"""
+        if self.prompt_layout == "prefix":
+            return self.prompts.get(self._template_name(role, "_user"))
+        name = self._template_name(role)
+        if ref_table is None:
+            return self.prompts.get(name)
+        return self.prompts.bind(name, ref_scoring_table=self._prompt_ref_table(ref_table))
+    
+    def packed_template(self, role: str, ref_table: str = None):
+        """跨游戏打包请求的模板（按当前档位选择，参考评分表预先渲染）"""
+        name = self._template_name(role, "_packed")
+        if ref_table is None:
+            return self.prompts.get(name)
+        return self.prompts.bind(name, ref_scoring_table=self._prompt_ref_table(ref_table))
+    
+    def canonicalize_actions(self, country_actions: str) -> str:
+        """
+        把国家行动文本中的各行动替换为模糊索引中的规范行动
+        （找不到时使用规范化后的原文，与该行动评分后加入索引的规范形式一致）
+        
+        Args:
+            country_actions: 国家行动文本（"ACTION_1: ...\nACTION_2: ..."）
+            
+        Returns:
+            改写后的文本（未配置索引时原样返回）
+        """
+        if self.action_index is None:
+            return country_actions
+        return _ACTION_LINE.sub(
+            lambda m: f"{m.group(1)}: {self.action_index.canonical(m.group(2), default=normalize_action(m.group(2)))}",
+            country_actions
+        )
+    
+    def _index_judged_actions(self, country_actions: str):
+        """把已评分的新行动加入模糊索引，之后它的改写也能命中缓存"""
+        if self.action_index is None:
+            return
+        for _, action in _ACTION_LINE.findall(country_actions):
+            if self.action_index.canonical(action) is None:
+                self.action_index.add(action)
+    
     def call_human_llm(self, country_score: int, shoreline_score: int, 
-                       opportunities: str, challenges: str, ref_table: str) -> Dict[str, str]:
+                       opportunities: str, challenges: str, ref_table: str, memory: str = None) -> Dict[str, str]:
         """
         调用人类LLM（国家决策者）
         
@@ -94,79 +484,93 @@ class LLMClient:
             opportunities: 海岸线机遇
             challenges: 海岸线挑战
             ref_table: 参考评分表
+            memory: 此前年份的决策记忆（可选，见decision_memory）
             
         Returns:
             包含两个行动的字典
         """
-        with open("prompt/HumanLLM.txt", "r", encoding="utf-8") as f:
-            prompt_template = f.read()
-
-        if (opportunities is None or opportunities.strip() == "") and (challenges is None or challenges.strip() == ""):
-            logger.warning("机遇和挑战信息为空，使用默认值")
-            opportunities = "Coastline offers rich fisheries resources and tourism potential"
-            challenges = "Coastal erosion and marine pollution threaten ecological balance"
-        
-        prompt = prompt_template.format(
-            country_score=country_score,
-            shoreline_score=shoreline_score,
-            shoreline_opportunities=opportunities,
-            shoreline_challenges=challenges,
-            ref_scoring_table=ref_table
-        )
+        prompt = self.build_human_prompt(country_score, shoreline_score, opportunities, challenges, ref_table, memory)
 
         # print(f"=== 完整HumanLLM提示词 ===\n{prompt}\n{'='*80}\n")
         
-        response = self.call_llm(prompt)
+        if self.structured_output:
+            actions = self._call_structured("human", prompt, self.system_prompt("human", ref_table))
+            actions = {key: actions.get(key, "") for key in ROLE_SCHEMAS["human"]}
+        else:
+            response = self.call_llm(prompt, system_prompt=self.system_prompt("human", ref_table), cache_role="human")
 
-        # print(f"=== LLM原始回复 ===\n{response}\n{'='*80}\n")
-        
-        # 清理回复内容 - 移除think标签和其他不需要的内容
-        cleaned_response = response
-        
-        # 移除<think>标签及其内容
-        import re
-        cleaned_response = re.sub(r'<think>.*?</think>', '', cleaned_response, flags=re.DOTALL)
-        
-        # 移除```代码块外的内容，只保留代码块内的ACTION
-        code_block_match = re.search(r'```(.*?)```', cleaned_response, re.DOTALL)
-        if code_block_match:
-            cleaned_response = code_block_match.group(1).strip()
+            # print(f"=== LLM原始回复 ===\n{response}\n{'='*80}\n")
+            
+            actions = parse_human_response(response)
         
-        print(f"=== 清理后的回复 ===\n{cleaned_response}\n{'='*80}\n")
+        logger.info(f"人类LLM生成行动: {actions}")
+        return actions
+    
+    def call_human_candidates(self, country_score: int, shoreline_score: int, opportunities: str,
+                              challenges: str, ref_table: str, num_candidates: int = 4,
+                              memory: str = None) -> List[Dict[str, str]]:
+        """
+        一次调用让人类LLM提出多组候选行动（供前瞻规划比较）
         
-        # 解析回复 - 改进版，过滤代码块标记
-        actions = {}
-        lines = cleaned_response.split('\n')
-        current_action = None
+        Args:
+            country_score: 当前国家发展分数
+            shoreline_score: 当前海岸线状态分数
+            opportunities: 海岸线机遇
+            challenges: 海岸线挑战
+            ref_table: 参考评分表
+            num_candidates: 候选数
+            memory: 此前年份的决策记忆（可选）
+            
+        Returns:
+            候选行动列表（每个为包含两个行动的字典，最多num_candidates个）
+        """
+        prompt = self.build_human_prompt(country_score, shoreline_score, opportunities, challenges, ref_table, memory)
+        candidates_template = self.prompts.get(self._template_name("human", "_candidates"))
+        prompt = f"{prompt}\n\n{candidates_template.render(num_candidates=num_candidates)}"
+        response = self.call_llm(prompt, system_prompt=self.system_prompt("human", ref_table), cache_role="human")
+        candidates = parse_candidate_response(response)[:num_candidates]
+        logger.info(f"人类LLM提出{len(candidates)}组候选行动")
+        return candidates
+    
+    def build_human_prompt(self, country_score: int, shoreline_score: int,
+                           opportunities: str, challenges: str, ref_table: str, memory: str = None) -> str:
+        """
+        构造人类LLM提示词
         
-        for line in lines:
-            line = line.strip()
+        Args:
+            country_score: 当前国家发展分数
+            shoreline_score: 当前海岸线状态分数
+            opportunities: 海岸线机遇
+            challenges: 海岸线挑战
+            ref_table: 参考评分表
+            memory: 此前年份的决策记忆（可选，附加在用户提示词末尾）
             
-            # 跳过代码块标记和空行
-            if line in ['```', ''] or not line:
-                continue
-                
-            if line.startswith('ACTION_1:'):
-                current_action = 'action_1'
-                actions[current_action] = line.replace('ACTION_1:', '').strip()
-            elif line.startswith('ACTION_2:'):
-                current_action = 'action_2'
-                actions[current_action] = line.replace('ACTION_2:', '').strip()
-            elif current_action and line and not line.startswith('```'):
-                # 只在不是代码块标记的情况下才添加内容
-                if current_action in actions:
-                    actions[current_action] += ' ' + line
-                else:
-                    actions[current_action] = line
+        Returns:
+            用户提示词（系统提示词见system_prompt）
+        """
+        # 参考评分表每局不变，预先渲染进模板（prefix布局下放在系统消息中）
+        prompt_template = self._user_template("human", ref_table)
+
+        if (opportunities is None or opportunities.strip() == "") and (challenges is None or challenges.strip() == ""):
+            logger.warning("机遇和挑战信息为空，使用默认值")
+            opportunities = "Coastline offers rich fisheries resources and tourism potential"
+            challenges = "Coastal erosion and marine pollution threaten ecological balance"
         
-        # 确保两个行动都存在
-        if 'action_1' not in actions:
-            actions['action_1'] = ''
-        if 'action_2' not in actions:
-            actions['action_2'] = ''
+        if self.prompt_profile == "compact":
+            opportunities = bound_text(opportunities, self.context_chars) or "none"
+            challenges = bound_text(challenges, self.context_chars) or "none"
         
-        logger.info(f"人类LLM生成行动: {actions}")
-        return actions
+        prompt = prompt_template.render(
+            country_score=country_score,
+            shoreline_score=shoreline_score,
+            shoreline_opportunities=opportunities,
+            shoreline_challenges=challenges
+        )
+        if memory:
+            # 记忆随年份变化，放在用户提示词末尾（prefix布局下系统消息保持不变）
+            memory_template = self.prompts.get(self._template_name("human", "_memory"))
+            prompt = f"{prompt}\n\n{memory_template.render(decision_memory=memory)}"
+        return prompt
     
     def call_shore_llm(self, country_actions: str) -> Dict[str, str]:
         """
@@ -178,53 +582,13 @@ class LLMClient:
         Returns:
             包含机遇和挑战的字典
         """
-        with open("prompt/ShoreLLM.txt", "r", encoding="utf-8") as f:
-            prompt_template = f.read()
-        
-        prompt = prompt_template.format(country_actions=country_actions)
-        
-        response = self.call_llm(prompt)
-        
-        # 解析回复 - 支持多种格式
-        result = {}
-        lines = response.split('\n')
-        
-        current_section = None
-        for line in lines:
-            line = line.strip()
-            
-            # 检测机遇部分
-            if line.startswith('CHANCES:') or line.startswith('机遇:') or line.startswith('Opportunities:'):
-                current_section = 'opportunities'
-                # 如果同一行有内容，提取它
-                for prefix in ['CHANCES:', '机遇:', 'Opportunities:']:
-                    if line.startswith(prefix):
-                        content = line.replace(prefix, '').strip()
-                        if content:
-                            result['opportunities'] = content
-                        break
-            
-            # 检测挑战部分  
-            elif line.startswith('CHALLENGES:') or line.startswith('挑战:') or line.startswith('Challenges:'):
-                current_section = 'challenges'
-                # 如果同一行有内容，提取它
-                for prefix in ['CHALLENGES:', '挑战:', 'Challenges:']:
-                    if line.startswith(prefix):
-                        content = line.replace(prefix, '').strip()
-                        if content:
-                            result['challenges'] = content
-                        break
-            
-            # 处理内容行
-            elif current_section and line and not line.startswith('```') and line != '```':
-                # 处理以 - 开头的项目列表
-                if line.startswith('-'):
-                    content = line.replace('-', '').strip()
-                    if content and current_section not in result:
-                        result[current_section] = content
-                # 处理普通文本行
-                elif not line.startswith('```') and current_section not in result:
-                    result[current_section] = line
+        prompt, cache_prompt = self.build_shore_prompt(country_actions)
+        if self.structured_output:
+            result = self._call_structured("shore", prompt, self.system_prompt("shore"), cache_prompt)
+        else:
+            response = self.call_llm(prompt, system_prompt=self.system_prompt("shore"), cache_role="shore",
+                                     cache_prompt=cache_prompt)
+            result = self.parse_shore_response(response)
         
         # 确保返回的字典包含这两个键
         if 'opportunities' not in result:
@@ -235,70 +599,61 @@ class LLMClient:
         logger.info(f"海岸线LLM生成响应: {result}")
         return result
     
-    def call_judge_llm(self, country_actions: str, ref_table: str) -> Dict[str, int]:
+    def build_shore_prompt(self, country_actions: str) -> Tuple[str, str]:
         """
-        调用裁判LLM（评分系统）
+        构造海岸线LLM提示词
         
         Args:
             country_actions: 国家采取的行动
-            ref_table: 参考评分表
             
         Returns:
-            包含分数变化的字典
+            (用户提示词, 计算缓存键使用的用户提示词)；系统提示词见system_prompt
         """
-        with open("prompt/JudgeLLM.txt", "r", encoding="utf-8") as f:
-            prompt_template = f.read()
-        
-        prompt = prompt_template.format(
-            country_actions=country_actions,
-            ref_scoring_table=ref_table
-        )
+        prompt_template = self._user_template("shore")
         
-        response = self.call_llm(prompt)
+        prompt = prompt_template.render(country_actions=country_actions)
+        cache_prompt = prompt_template.render(country_actions=self.canonicalize_actions(country_actions))
+        return prompt, cache_prompt
+    
+    @staticmethod
+    def parse_shore_response(response: str) -> Dict[str, str]:
+        """
+        解析海岸线LLM回复（支持多种格式）
         
-        # 解析回复 - 支持多种格式
-        scores = {}
-        lines = response.split('\n')
+        Args:
+            response: LLM回复
+            
+        Returns:
+            解析出的机遇和挑战（缺失的键不出现在结果中）
+        """
+        return response_parsers.parse_shore_response(response)
+    
+    def call_judge_llm(self, country_actions: str, ref_table: str) -> Dict[str, int]:
+        """
+        调用裁判LLM（评分系统）
         
-        current_action = None
-        for line in lines:
-            line = line.strip()
+        Args:
+            country_actions: 国家采取的行动
+            ref_table: 参考评分表
             
-            # 标准格式解析
-            try:
-                if line.startswith('first_country_rank:'):
-                    scores['first_country'] = int(line.split(':')[1].strip())
-                elif line.startswith('first_shoreline_rank:'):
-                    scores['first_shoreline'] = int(line.split(':')[1].strip())
-                elif line.startswith('second_country_rank:'):
-                    scores['second_country'] = int(line.split(':')[1].strip())
-                elif line.startswith('second_shoreline_rank:'):
-                    scores['second_shoreline'] = int(line.split(':')[1].strip())
-                
-                # 备用格式解析 - 处理LLM可能的其他输出格式
-                elif line.startswith('ACTION_1:'):
-                    current_action = 'first'
-                elif line.startswith('ACTION_2:'):
-                    current_action = 'second'
-                elif current_action and 'Country Score Change:' in line:
-                    # 提取数值，处理 +4, -1 等格式
-                    value_str = line.split('Country Score Change:')[1].strip()
-                    value_str = value_str.replace('+', '').replace(' ', '')
-                    scores[f'{current_action}_country'] = int(value_str)
-                elif current_action and 'Shoreline Score Change:' in line:
-                    # 提取数值，处理 +2, -4 等格式
-                    value_str = line.split('Shoreline Score Change:')[1].strip()
-                    value_str = value_str.replace('+', '').replace(' ', '')
-                    scores[f'{current_action}_shoreline'] = int(value_str)
-                    
-            except (ValueError, IndexError) as e:
-                # 解析失败时记录日志但继续处理
-                logger.warning(f"解析裁判LLM响应时出错: {line} -> {e}")
-                continue
+        Returns:
+            包含分数变化的字典
+        """
+        prompt, cache_prompt = self.build_judge_prompt(country_actions, ref_table)
+        if self.judge_samples > 1:
+            scores = self._vote_judge(country_actions, prompt, self.system_prompt("judge", ref_table), cache_prompt,
+                                      ref_table)
+        elif self.structured_output:
+            scores = self._call_structured("judge", prompt, self.system_prompt("judge", ref_table), cache_prompt,
+                                           ref_table)
+        else:
+            response = self.call_llm(prompt, system_prompt=self.system_prompt("judge", ref_table),
+                                     cache_role="judge", cache_prompt=cache_prompt)
+            scores = self.parse_judge_response(response)
+        self._index_judged_actions(country_actions)
         
         # 确保所有必需的键都存在，如果缺失则设为0
-        required_keys = ['first_country', 'first_shoreline', 'second_country', 'second_shoreline']
-        for key in required_keys:
+        for key in JUDGE_SCORE_KEYS:
             if key not in scores:
                 scores[key] = 0
                 logger.warning(f"裁判LLM响应中缺少 {key}，设为0")
@@ -306,6 +661,36 @@ class LLMClient:
         logger.info(f"裁判LLM评分结果: {scores}")
         return scores
     
+    def build_judge_prompt(self, country_actions: str, ref_table: str) -> Tuple[str, str]:
+        """
+        构造裁判LLM提示词
+        
+        Args:
+            country_actions: 国家采取的行动
+            ref_table: 参考评分表
+            
+        Returns:
+            (用户提示词, 计算缓存键使用的用户提示词)；系统提示词见system_prompt
+        """
+        prompt_template = self._user_template("judge", ref_table)
+        
+        prompt = prompt_template.render(country_actions=country_actions)
+        cache_prompt = prompt_template.render(country_actions=self.canonicalize_actions(country_actions))
+        return prompt, cache_prompt
+    
+    @staticmethod
+    def parse_judge_response(response: str) -> Dict[str, int]:
+        """
+        解析裁判LLM回复（支持多种格式）
+        
+        Args:
+            response: LLM回复
+            
+        Returns:
+            解析出的评分（缺失的键不出现在结果中）
+        """
+        return response_parsers.parse_judge_response(response)
+    
     def call_judge_llm_for_random_event(self, event_name: str, event_description: str, 
                                        current_country_score: int, current_shoreline_score: int) -> Dict[str, int]:
         """
@@ -348,30 +733,20 @@ shoreline_impact: [integer between -3 and +3]
 reasoning: [brief explanation of your scoring]
 ```"""
         
-        response = self.call_llm(prompt)
-        
-        # 解析回复
-        scores = {"country_impact": 0, "shoreline_impact": 0, "reasoning": ""}
-        lines = response.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('country_impact:'):
-                try:
-                    impact = int(line.split(':')[1].strip())
-                    # 限制在-3到+3范围内
-                    scores['country_impact'] = max(-3, min(3, impact))
-                except (ValueError, IndexError):
-                    scores['country_impact'] = 0
-            elif line.startswith('shoreline_impact:'):
-                try:
-                    impact = int(line.split(':')[1].strip())
-                    # 限制在-3到+3范围内
-                    scores['shoreline_impact'] = max(-3, min(3, impact))
-                except (ValueError, IndexError):
-                    scores['shoreline_impact'] = 0
-            elif line.startswith('reasoning:'):
-                scores['reasoning'] = line.replace('reasoning:', '').strip()
+        if self.structured_output:
+            scores = {"country_impact": 0, "shoreline_impact": 0, "reasoning": ""}
+            scores.update(self._call_structured("event", prompt))
+        else:
+            response = self.call_llm(prompt, cache_role="event")
+            scores = parse_event_response(response)
         
         logger.info(f"随机事件LLM评分结果: {event_name} -> 国家{scores['country_impact']:+d}, 海岸线{scores['shoreline_impact']:+d}")
         return scores
+
+
+def _usage_field(usage, name: str, default: Any = 0) -> Any:
+    """读取usage中的字段（兼容对象和字典，缺失或为None时返回默认值）"""
+    if usage is None:
+        return default
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return default if value is None else value
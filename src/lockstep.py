@@ -0,0 +1,160 @@
+"""
+多局游戏同步推进
+G局游戏按年同步：每年先让所有进行中的游戏完成人类LLM决策，再统一进行裁判评分、
+随机事件与分数更新、海岸线响应和记录。同一阶段的请求可以交给PromptPacker打包
+（共享的模板每批只发送一次），每局游戏的规则和记录与逐局运行时一致
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .game_controller import ShorlineEcologyGame, format_actions_text
+from .prompt_packing import PromptPacker
+
+logger = logging.getLogger(__name__)
+
+PACKABLE_ROLES = ("judge", "shore")
+
+
+class LockstepRunner:
+    """按年同步推进多局游戏"""
+
+    def __init__(self, games: Sequence[ShorlineEcologyGame], packer: Optional[PromptPacker] = None,
+                 pack_roles: Sequence[str] = PACKABLE_ROLES):
+        """
+        初始化同步运行器
+
+        Args:
+            games: 游戏控制器（每局一个实例，可共享LLM客户端）
+            packer: 提示词打包器（可选，未提供时各局逐个请求）
+            pack_roles: 使用打包请求的角色（"judge"、"shore"）；配置了裁判代理模型或启用裁判多采样投票的游戏
+                不参与裁判打包
+        """
+        unknown = set(pack_roles) - set(PACKABLE_ROLES)
+        if unknown:
+            raise ValueError(f"不支持打包的角色: {sorted(unknown)}")
+        self.games = list(games)
+        self.packer = packer
+        self.pack_roles = set(pack_roles) if packer is not None else set()
+        self.year = 0
+
+    def _each(self, indices: List[int], step: Callable[[int, ShorlineEcologyGame], Any],
+              failed: Dict[int, Exception]) -> Dict[int, Any]:
+        """对每局执行一个阶段，出错的游戏记入failed（与逐局运行时一样在当年结束该局）"""
+        results = {}
+        for index in indices:
+            game = self.games[index]
+            try:
+                results[index] = step(index, game)
+            except Exception as e:
+                logger.error(f"游戏{index + 1}第{game.game_state.year}年处理出错: {str(e)}")
+                failed[index] = e
+        return results
+
+    def _batch(self, role: str, indices: List[int], texts: Dict[int, str],
+               single: Callable[[int, ShorlineEcologyGame], Any],
+               packed: Callable[[List[str]], List[Any]], failed: Dict[int, Exception]) -> Dict[int, Any]:
+        """可打包的阶段：未启用打包时逐局请求；打包请求本身出错时整批记为出错"""
+        if role not in self.pack_roles or len(indices) < 2:
+            return self._each(indices, single, failed)
+        try:
+            return dict(zip(indices, packed([texts[index] for index in indices])))
+        except Exception as e:
+            logger.error(f"第{self.year}年打包{role}请求出错: {str(e)}")
+            for index in indices:
+                failed[index] = e
+            return {}
+
+    def step(self, active: List[int], action_overrides: Dict[int, Dict[int, Dict[str, str]]] = None) -> List[int]:
+        """
+        推进一年
+
+        Args:
+            active: 进行中的游戏下标
+            action_overrides: {游戏下标: {年份: 国家行动}}（可选）
+
+        Returns:
+            本年出错的游戏下标（这些游戏在本年结束）
+        """
+        action_overrides = action_overrides or {}
+        failed: Dict[int, Exception] = {}
+        for index in active:
+            self.games[index].begin_year()
+        self.year = max(self.games[index].game_state.year for index in active)
+
+        # 1. 人类LLM决策
+        actions = self._each(active, lambda i, game: game.decide_actions(action_overrides.get(i)), failed)
+        texts = {i: format_actions_text(country_actions) for i, country_actions in actions.items()}
+
+        # 2. 裁判评分（配置了裁判代理模型的游戏单独评分；前瞻规划已评分的行动沿用规划时的评分）
+        judge_single = lambda i, game: game.judge_actions(actions[i], texts[i])
+        judge_scores = {}
+        for i in texts:
+            planned = self.games[i].take_planned_scores(actions[i])
+            if planned is not None:
+                judge_scores[i] = planned
+        packable = [i for i in texts if i not in judge_scores and self.games[i].judge_surrogate is None]
+        judge_scores.update(self._batch(
+            "judge", packable, texts, judge_single,
+            packed=lambda items: self.packer.judge_many(items, self.games[packable[0]].ref_scoring_table),
+            failed=failed))
+        judge_scores.update(self._each([i for i in texts if i not in packable and i not in judge_scores],
+                                       judge_single, failed))
+
+        # 3-5. 随机事件与分数更新（按游戏顺序，随机数序列可复现）
+        outcomes = self._each([i for i in active if i in judge_scores],
+                              lambda i, game: game.apply_year(judge_scores[i]), failed)
+
+        # 6. 海岸线响应
+        shore_responses = self._batch(
+            "shore", [i for i in active if i in outcomes], texts,
+            lambda i, game: game.llm_client.call_shore_llm(texts[i]),
+            packed=lambda items: self.packer.shore_many(items),
+            failed=failed)
+
+        # 7-11. 记录与重置
+        self._each([i for i in active if i in shore_responses],
+                   lambda i, game: game.finish_year(actions[i], judge_scores[i], outcomes[i], shore_responses[i]),
+                   failed)
+        return list(failed)
+
+    def run(self, game_ids: Sequence[Any] = None,
+            action_overrides: Dict[int, Dict[int, Dict[str, str]]] = None) -> List[Dict[str, Any]]:
+        """
+        同步运行所有游戏直到全部结束
+
+        Args:
+            game_ids: 各局的游戏编号（写入流式记录时使用，默认1..G）
+            action_overrides: {游戏下标: {年份: 国家行动}}（可选）
+
+        Returns:
+            各局的结果摘要（顺序与games一致）
+        """
+        game_ids = list(game_ids) if game_ids is not None else list(range(1, len(self.games) + 1))
+        original_pauses = [game.pause_between_years for game in self.games]
+        summaries: List[Optional[Dict[str, Any]]] = [None] * len(self.games)
+        try:
+            for game, game_id in zip(self.games, game_ids):
+                game.pause_between_years = False
+                game.game_state.reset_game()
+                game.begin_game(game_id)
+
+            active = list(range(len(self.games)))
+            while active:
+                still_active = []
+                for index in active:
+                    if self.games[index].game_state.is_game_over():
+                        summaries[index] = self.games[index].end_game()
+                    else:
+                        still_active.append(index)
+                active = still_active
+                if not active:
+                    break
+                logger.info(f"=== 同步推进第{self.games[active[0]].game_state.year + 1}年: {len(active)}局进行中 ===")
+                for index in self.step(active, action_overrides):
+                    summaries[index] = self.games[index].end_game()
+                    active.remove(index)
+        finally:
+            for game, pause in zip(self.games, original_pauses):
+                game.pause_between_years = pause
+        return summaries
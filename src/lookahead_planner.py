@@ -0,0 +1,253 @@
+"""
+人类LLM的前瞻规划
+人类LLM在一次调用中提出k组候选行动，每组候选先在本地评分（参考评分表精确匹配或置信度足够的裁判代理模型），
+其余候选合并为一次打包的裁判请求（裁判多采样投票时该请求一次取全部采样）；再用向量化的本地推演
+（年度奖励、胜负阈值、按海岸线分档的随机事件分布，假设今后几年保持同一组行动）估计每组候选的价值，选出最好的一组。
+选中的候选经过裁判评分时，游戏控制器沿用该评分，不再为选中的行动单独请求裁判
+"""
+
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .judge_surrogate import JudgeSurrogate
+from .prompt_packing import PromptPacker
+from .reference_table import ReferenceTable
+from .vector_sim import OUTCOME_IN_PROGRESS, OUTCOME_VICTORY, VectorizedEventSampler, advance_scores, check_game_over
+
+logger = logging.getLogger(__name__)
+
+# 候选评分的来源
+SCORE_SOURCES = ("table", "surrogate", "judge", "estimate")
+
+
+class LookaheadPlanner:
+    """候选行动的前瞻规划器"""
+
+    def __init__(self, num_candidates: int = 4, horizon: int = 5, rollouts: int = 200,
+                 table: Optional[ReferenceTable] = None, judge_surrogate: Optional[JudgeSurrogate] = None,
+                 confidence_threshold: float = 0.8, judge_unknown: bool = True, seed: int = None):
+        """
+        初始化规划器
+
+        Args:
+            num_candidates: 人类LLM每年提出的候选数
+            horizon: 推演年数
+            rollouts: 每组候选的推演次数（各候选使用相同的随机事件序列，比较更公平）
+            table: 参考评分表（候选的两个行动都在表中时直接按表评分）
+            judge_surrogate: 裁判代理模型（可选，置信度不低于confidence_threshold时使用其评分）
+            confidence_threshold: 使用代理评分的最低置信度
+            judge_unknown: 其余候选是否合并为一次打包的裁判请求（否则使用代理模型的预测或记0分）
+            seed: 推演的随机种子（可选）
+        """
+        self.num_candidates = num_candidates
+        self.horizon = horizon
+        self.rollouts = rollouts
+        self.table = table
+        self.judge_surrogate = judge_surrogate
+        self.confidence_threshold = confidence_threshold
+        self.judge_unknown = judge_unknown
+        self.rng = np.random.default_rng(seed)
+        self._samplers: Dict[float, VectorizedEventSampler] = {}
+        self.counters = Counter()
+        self.last_plan: List[Dict[str, Any]] = []
+
+    # ---------- 候选评分 ----------
+
+    def judge_candidates(self, candidates: List[Dict[str, str]], llm_client=None,
+                         ref_table: str = "") -> List[Tuple[Dict[str, int], str]]:
+        """
+        为候选行动评分：按表、代理模型，其余候选合并为一次打包的裁判请求
+
+        Args:
+            candidates: 候选行动列表
+            llm_client: LLM客户端（打包裁判请求用，可选）
+            ref_table: 参考评分表文本
+
+        Returns:
+            [(评分字典, 来源)]，来源见SCORE_SOURCES
+        """
+        results: List[Optional[Tuple[Dict[str, int], str]]] = [None] * len(candidates)
+        pending = []
+        for index, candidate in enumerate(candidates):
+            action_1, action_2 = candidate["action_1"], candidate["action_2"]
+            if self.table is not None and self.table.get(action_1) and self.table.get(action_2):
+                results[index] = (self.table.judge_scores(action_1, action_2), "table")
+                continue
+            if self.judge_surrogate is not None:
+                predicted, confidence = self.judge_surrogate.predict(action_1, action_2)
+                if confidence >= self.confidence_threshold:
+                    results[index] = (predicted, "surrogate")
+                    continue
+            pending.append(index)
+
+        if pending and self.judge_unknown and llm_client is not None:
+            texts = [f"ACTION_1: {candidates[i]['action_1']}\nACTION_2: {candidates[i]['action_2']}" for i in pending]
+            packed = PromptPacker(llm_client, max_items=len(texts)).judge_many(texts, ref_table)
+            self.counters["judge_requests"] += 1
+            for index, scores in zip(pending, packed):
+                results[index] = (scores, "judge")
+        else:
+            for index in pending:
+                candidate = candidates[index]
+                if self.judge_surrogate is not None:
+                    scores = self.judge_surrogate.predict(candidate["action_1"], candidate["action_2"])[0]
+                elif self.table is not None:
+                    scores = self.table.judge_scores(candidate["action_1"], candidate["action_2"])
+                else:
+                    scores = {"first_country": 0, "first_shoreline": 0, "second_country": 0, "second_shoreline": 0}
+                results[index] = (scores, "estimate")
+        for _, source in results:
+            self.counters[source] += 1
+        return results
+
+    # ---------- 本地推演 ----------
+
+    def _sampler(self, disaster_probability_modifier: float) -> VectorizedEventSampler:
+        if disaster_probability_modifier not in self._samplers:
+            self._samplers[disaster_probability_modifier] = VectorizedEventSampler(disaster_probability_modifier)
+        return self._samplers[disaster_probability_modifier]
+
+    def evaluate(self, deltas: List[Tuple[int, int]], country_score: int, shoreline_score: int,
+                 years_left: int, annual_bonus: int = 1, victory_threshold: int = 100,
+                 failure_threshold: int = 75, enable_random_events: bool = True,
+                 disaster_probability_modifier: float = 1.0) -> List[Dict[str, float]]:
+        """
+        向量化推演各组候选：假设今后horizon年（不超过剩余年数）每年都采取同一组行动，
+        按GameState的规则更新分数并判定胜负
+
+        Args:
+            deltas: 各候选每年的(国家变化, 海岸线变化)（两个行动的评分之和）
+            country_score: 当前国家分数
+            shoreline_score: 当前海岸线分数
+            years_left: 剩余年数（含本年）
+            annual_bonus: 每年自动增加的分数
+            victory_threshold: 胜利阈值
+            failure_threshold: 失败阈值
+            enable_random_events: 是否推演随机事件（使用预设影响值的分布）
+            disaster_probability_modifier: 全局灾害概率系数
+
+        Returns:
+            各候选的{"value": 期望价值, "victory_rate", "failure_rate", "mean_country", "mean_shoreline"}；
+            胜利记1，失败或超时记-1，推演结束时仍未分出胜负的按国家分数进展和海岸线余量记-0.75到0.75之间
+        """
+        steps = max(1, min(self.horizon, years_left))
+        size = len(deltas)
+        country = np.full((size, self.rollouts), country_score, dtype=np.int64)
+        shoreline = np.full((size, self.rollouts), shoreline_score, dtype=np.int64)
+        country_delta = np.array([d[0] for d in deltas], dtype=np.int64)[:, None]
+        shoreline_delta = np.array([d[1] for d in deltas], dtype=np.int64)[:, None]
+        value = np.zeros((size, self.rollouts))
+        victory = np.zeros((size, self.rollouts), dtype=bool)
+        failure = np.zeros((size, self.rollouts), dtype=bool)
+        done = np.zeros((size, self.rollouts), dtype=bool)
+        sampler = self._sampler(disaster_probability_modifier)
+
+        for step in range(steps):
+            random_country = random_shoreline = 0
+            if enable_random_events:
+                # 各候选共用同一组均匀随机数（公共随机数），差异只来自行动
+                uniforms = np.tile(self.rng.random(self.rollouts), size)
+                random_country, random_shoreline = sampler.sample(shoreline.ravel(), self.rng, uniforms)
+                random_country = random_country.reshape(size, self.rollouts)
+                random_shoreline = random_shoreline.reshape(size, self.rollouts)
+            new_country, new_shoreline = advance_scores(country, shoreline, country_delta + random_country,
+                                                        shoreline_delta + random_shoreline, annual_bonus)
+            country = np.where(done, country, new_country)
+            shoreline = np.where(done, shoreline, new_shoreline)
+            # 剩余年数用完时未分出胜负的记为超时
+            ended = check_game_over(country, shoreline, step + 1, years_left, victory_threshold, failure_threshold)
+            won = ~done & (ended == OUTCOME_VICTORY)
+            lost = ~done & ~won & (ended != OUTCOME_IN_PROGRESS)
+            victory |= won
+            failure |= lost
+            value[won] = 1.0
+            value[lost] = -1.0
+            done |= won | lost
+
+        open_games = ~done
+        if open_games.any():
+            progress = np.clip((country - country_score) / max(1, victory_threshold - country_score), -1, 1)
+            margin = np.clip((shoreline - failure_threshold) / max(1, 100 - failure_threshold), -1, 1)
+            value[open_games] = (0.5 * progress + 0.25 * margin)[open_games]
+
+        return [{"value": float(value[i].mean()), "victory_rate": float(victory[i].mean()),
+                 "failure_rate": float(failure[i].mean()), "mean_country": float(country[i].mean()),
+                 "mean_shoreline": float(shoreline[i].mean())} for i in range(size)]
+
+    # ---------- 决策 ----------
+
+    def decide(self, game) -> Tuple[Dict[str, str], Optional[Dict[str, int]]]:
+        """
+        为游戏控制器的当前年份选择行动
+
+        Args:
+            game: ShorlineEcologyGame实例
+
+        Returns:
+            (选中的国家行动, 裁判给出的评分)；选中的候选不是由裁判评分（按表、代理模型或估计）
+            或改为单次决策时评分为None
+        """
+        state = game.game_state
+        client = game.llm_client
+        memory = getattr(game, "decision_memory", None)
+        context = dict(country_score=state.country_score, shoreline_score=state.shoreline_score,
+                       opportunities=state.current_opportunities, challenges=state.current_challenges,
+                       ref_table=game.ref_scoring_table)
+        if memory is not None:
+            context["memory"] = memory.render()
+        candidates = client.call_human_candidates(num_candidates=self.num_candidates, **context)
+        self.counters["decisions"] += 1
+        if not candidates:
+            logger.warning("人类LLM没有给出有效的候选行动，改为单次决策")
+            self.counters["fallbacks"] += 1
+            self.last_plan = []
+            return client.call_human_llm(**context), None
+
+        judged = self.judge_candidates(candidates, client, game.ref_scoring_table)
+        deltas = [(scores.get("first_country", 0) + scores.get("second_country", 0),
+                   scores.get("first_shoreline", 0) + scores.get("second_shoreline", 0)) for scores, _ in judged]
+        evaluations = self.evaluate(
+            deltas, state.country_score, state.shoreline_score,
+            years_left=state.max_years - state.year + 1,
+            annual_bonus=game.annual_bonus,
+            victory_threshold=state.victory_threshold,
+            failure_threshold=state.failure_threshold,
+            enable_random_events=getattr(game, "enable_random_events", True),
+            disaster_probability_modifier=game.random_event_system.disaster_probability_modifier,
+        )
+        # 价值相同时保留人类LLM给出的顺序
+        best = max(range(len(candidates)), key=lambda i: (evaluations[i]["value"], -i))
+        self.last_plan = [dict(candidate, scores=scores, source=source, **evaluation)
+                          for candidate, (scores, source), evaluation in zip(candidates, judged, evaluations)]
+        self.counters["candidates"] += len(candidates)
+        if best != 0:
+            self.counters["reordered"] += 1
+        logger.info(f"前瞻规划: {len(candidates)}组候选中选择第{best + 1}组 "
+                    f"(期望价值{evaluations[best]['value']:.2f}, 胜率{evaluations[best]['victory_rate']:.0%})")
+        scores, source = judged[best]
+        if source != "judge":
+            return dict(candidates[best]), None
+        self.counters["reused_scores"] += 1
+        return dict(candidates[best]), dict(scores)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        规划统计
+
+        Returns:
+            {"decisions": 决策次数, "candidates": 候选总数, "reordered": 未选第一组候选的次数,
+             "fallbacks": 改为单次决策的次数, "judge_requests": 裁判请求数（只有一组候选未知时为单次请求，否则为打包请求）,
+             "reused_scores": 选中候选的裁判评分交给游戏控制器沿用的次数, "sources": {来源: 候选数}}
+        """
+        return {
+            "decisions": self.counters["decisions"],
+            "candidates": self.counters["candidates"],
+            "reordered": self.counters["reordered"],
+            "fallbacks": self.counters["fallbacks"],
+            "judge_requests": self.counters["judge_requests"],
+            "reused_scores": self.counters["reused_scores"],
+            "sources": {source: self.counters[source] for source in SCORE_SOURCES},
+        }
@@ -0,0 +1,217 @@
+"""
+按表博弈的精确结果分布
+裁判按参考评分表评分时，分数是0-100的有界整数，每年的变化只取决于行动策略、
+年度奖励和相互独立的随机事件（海岸线分档决定灾害概率修正），
+因此可以在101×101的分数网格上逐年推进概率分布，精确得到胜利/失败/超时概率和期望时长，
+替代成千上万局抽样模拟
+"""
+
+import time
+import logging
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from .random_events import RandomEventSystem, DISASTER_MODIFIER_BANDS
+from .reference_table import ActionPolicy, ReferenceTable
+
+logger = logging.getLogger(__name__)
+
+SCORE_MIN = 0
+SCORE_MAX = 100
+NUM_SCORES = SCORE_MAX - SCORE_MIN + 1
+
+
+def _fast_fft_size(n: int) -> int:
+    """不小于n的最小5-smooth数（2、3、5的幂之积），FFT在这些长度上最快"""
+    while True:
+        m = n
+        for factor in (2, 3, 5):
+            while m % factor == 0:
+                m //= factor
+        if m == 1:
+            return n
+        n += 1
+
+
+def _fold_matrix(size: int, offset: int) -> np.ndarray:
+    """
+    将线性卷积结果的下标折叠回0-100分数（超出范围的部分截断到边界，对应update_scores的clamp）
+
+    Args:
+        size: 卷积结果在该维上的长度
+        offset: 卷积结果下标0对应的分数
+
+    Returns:
+        (101, size)的0/1矩阵
+    """
+    matrix = np.zeros((NUM_SCORES, size))
+    scores = np.clip(np.arange(size) + offset, SCORE_MIN, SCORE_MAX)
+    matrix[scores, np.arange(size)] = 1.0
+    return matrix
+
+
+class OutcomeSolver:
+    """按表博弈的马尔可夫链求解器"""
+
+    def __init__(self, policy: ActionPolicy = None, annual_bonus: int = 1, max_years: int = 25,
+                 victory_threshold: int = 100, failure_threshold: int = 75,
+                 enable_random_events: bool = True, disaster_probability_modifier: float = 1.0,
+                 table: ReferenceTable = None):
+        """
+        初始化求解器
+
+        Args:
+            policy: 行动策略（默认在参考评分表中均匀随机选择）
+            annual_bonus: 每年自动增加的分数
+            max_years: 最大年数
+            victory_threshold: 胜利阈值（国家分数）
+            failure_threshold: 失败阈值（海岸线分数）
+            enable_random_events: 是否启用随机事件（使用预设影响值）
+            disaster_probability_modifier: 全局灾害概率系数
+            table: 参考评分表（未提供policy时使用，默认从prompt/ref_scoring_table.txt加载）
+        """
+        if policy is None:
+            policy = ActionPolicy(table or ReferenceTable.load())
+        self.policy = policy
+        self.annual_bonus = annual_bonus
+        self.max_years = max_years
+        self.victory_threshold = victory_threshold
+        self.failure_threshold = failure_threshold
+        self.enable_random_events = enable_random_events
+        self.event_system = RandomEventSystem(use_llm_evaluation=False,
+                                              disaster_probability_modifier=disaster_probability_modifier)
+        self._build_kernels()
+
+    def _build_kernels(self):
+        """按海岸线分档构建每年总变化的卷积核（行动 + 随机事件 + 年度奖励）"""
+        action_distribution = self.policy.delta_distribution()
+        # 每个分档: (该档海岸线分数的布尔掩码, 随机事件总影响分布)
+        scores = np.arange(NUM_SCORES)
+        bands = []
+        upper = SCORE_MAX + 1
+        for lower_bound, _ in DISASTER_MODIFIER_BANDS:
+            mask = (scores >= lower_bound) & (scores < upper)
+            upper = lower_bound
+            if not mask.any():
+                continue
+            if self.enable_random_events:
+                event_distribution = self.event_system.impact_distribution(lower_bound)
+            else:
+                event_distribution = {(0, 0): 1.0}
+            bands.append((mask, event_distribution))
+
+        event_deltas = [key for _, distribution in bands for key in distribution]
+        action_offset = (min(c for c, _ in action_distribution), min(s for _, s in action_distribution))
+        event_offset = (min(c for c, _ in event_deltas), min(s for _, s in event_deltas))
+        span = (
+            max(c for c, _ in action_distribution) - action_offset[0] + max(c for c, _ in event_deltas) - event_offset[0],
+            max(s for _, s in action_distribution) - action_offset[1] + max(s for _, s in event_deltas) - event_offset[1],
+        )
+        country_min = action_offset[0] + event_offset[0] + self.annual_bonus
+        shore_min = action_offset[1] + event_offset[1] + self.annual_bonus
+
+        # 线性卷积的完整尺寸（补零到FFT快速长度，多出的部分恒为0）
+        self._shape = (_fast_fft_size(NUM_SCORES + span[0]), _fast_fft_size(NUM_SCORES + span[1]))
+        self._fold_country = _fold_matrix(self._shape[0], country_min)
+        self._fold_shore = _fold_matrix(self._shape[1], shore_min).T
+
+        # 行动与随机事件相互独立，总变化的卷积核在频域中是两者之积
+        action_hat = np.fft.rfft2(self._kernel(action_distribution, action_offset))
+        self._bands = []
+        for mask, event_distribution in bands:
+            event_hat = np.fft.rfft2(self._kernel(event_distribution, event_offset))
+            self._bands.append((mask, action_hat * event_hat))
+
+    def _kernel(self, distribution: Dict[Tuple[int, int], float], offset: Tuple[int, int]) -> np.ndarray:
+        """把{(国家变化, 海岸线变化): 概率}放到FFT网格上"""
+        kernel = np.zeros(self._shape)
+        for (dc, ds), p in distribution.items():
+            kernel[dc - offset[0], ds - offset[1]] += p
+        return kernel
+
+    def _step(self, mass: np.ndarray) -> np.ndarray:
+        """推进一年（mass[国家分数, 海岸线分数]为未结束游戏的概率质量）"""
+        spectrum = None
+        for mask, kernel_hat in self._bands:
+            band_mass = np.where(mask[np.newaxis, :], mass, 0.0)
+            if not band_mass.any():
+                continue
+            term = np.fft.rfft2(band_mass, s=self._shape) * kernel_hat
+            spectrum = term if spectrum is None else spectrum + term
+        if spectrum is None:
+            return np.zeros_like(mass)
+        full = np.fft.irfft2(spectrum, s=self._shape)
+        # FFT舍入误差可能产生极小的负值
+        np.maximum(full, 0.0, out=full)
+        return self._fold_country @ full @ self._fold_shore
+
+    def _absorb(self, mass: np.ndarray, year: int) -> Tuple[float, float, float]:
+        """按is_game_over的判定顺序移除结束的游戏，返回(胜利, 失败, 超时)概率质量"""
+        victory_rows = slice(max(self.victory_threshold, 0), None)
+        victory = mass[victory_rows, :].sum()
+        mass[victory_rows, :] = 0.0
+        failure_cols = slice(0, max(self.failure_threshold, 0))
+        failure = mass[:, failure_cols].sum()
+        mass[:, failure_cols] = 0.0
+        timeout = 0.0
+        if year >= self.max_years:
+            timeout = mass.sum()
+            mass[:, :] = 0.0
+        return float(victory), float(failure), float(timeout)
+
+    def solve(self, initial_country_score: int = 60, initial_shoreline_score: int = 100) -> Dict[str, Any]:
+        """
+        计算结果分布
+
+        Args:
+            initial_country_score: 初始国家分数
+            initial_shoreline_score: 初始海岸线分数
+
+        Returns:
+            {"victory", "failure", "timeout": 概率, "expected_years": 期望时长,
+             "end_year_distribution": 各年结束的概率（下标为年份）,
+             "outcomes_by_year": 每年结束时的[胜利, 失败, 超时]概率, "elapsed_ms": 计算耗时}
+        """
+        start = time.perf_counter()
+        mass = np.zeros((NUM_SCORES, NUM_SCORES))
+        mass[initial_country_score, initial_shoreline_score] = 1.0
+
+        outcomes_by_year: List[List[float]] = [list(self._absorb(mass, 0))]
+        for year in range(1, self.max_years + 1):
+            if mass.sum() <= 0:
+                break
+            mass = self._step(mass)
+            outcomes_by_year.append(list(self._absorb(mass, year)))
+
+        totals = np.array(outcomes_by_year).sum(axis=0)
+        end_years = [sum(row) for row in outcomes_by_year]
+        total = sum(end_years)
+        return {
+            "victory": float(totals[0]),
+            "failure": float(totals[1]),
+            "timeout": float(totals[2]),
+            "expected_years": sum(year * p for year, p in enumerate(end_years)) / total if total else 0.0,
+            "end_year_distribution": end_years,
+            "outcomes_by_year": outcomes_by_year,
+            "elapsed_ms": (time.perf_counter() - start) * 1000,
+        }
+
+
+def solve_outcome_distribution(policy: ActionPolicy = None, initial_country_score: int = 60,
+                               initial_shoreline_score: int = 100, **kwargs) -> Dict[str, Any]:
+    """
+    计算按表博弈的精确结果分布（参数同OutcomeSolver）
+
+    Args:
+        policy: 行动策略（默认在参考评分表中均匀随机选择）
+        initial_country_score: 初始国家分数
+        initial_shoreline_score: 初始海岸线分数
+        **kwargs: annual_bonus、max_years、victory_threshold、failure_threshold、
+                  enable_random_events、disaster_probability_modifier、table
+
+    Returns:
+        结果分布字典
+    """
+    solver = OutcomeSolver(policy=policy, **kwargs)
+    return solver.solve(initial_country_score, initial_shoreline_score)
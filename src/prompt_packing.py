@@ -0,0 +1,221 @@
+"""
+跨游戏提示词打包
+多局游戏同步推进时，同一年的G个裁判（或海岸线）请求共用同一模板和参考评分表。
+打包模式把多局的条目编号后合并成一个请求，共享的模板每批只发送一次，
+回复按编号拆回各局；某个条目解析失败时单独重试该条目。
+裁判启用多采样投票时，打包请求一次取judge_samples个回复，每个条目分别汇总各采样的评分
+"""
+
+import re
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .llm_client import JUDGE_SCORE_KEYS
+from .response_cache import cache_key
+
+logger = logging.getLogger(__name__)
+
+# 打包回复中的条目标题行（"ITEM 3"、"**ITEM 3:**"、"### Item 3" 等）
+_ITEM_HEADER = re.compile(r"^[\s#*>`]*ITEM[\s_#]*(\d+)\b[^\n]*$", re.IGNORECASE | re.MULTILINE)
+
+
+def format_packed_items(items: List[str]) -> str:
+    """把各局的国家行动文本编号为"ITEM n"条目"""
+    return "\n\n".join(f"ITEM {number}\n{text}" for number, text in enumerate(items, 1))
+
+
+def split_packed_response(response: str) -> Dict[int, str]:
+    """
+    按条目标题拆分打包回复
+
+    Args:
+        response: 打包请求的LLM回复
+
+    Returns:
+        {条目编号(从1开始): 该条目的回复文本}
+    """
+    blocks = {}
+    headers = list(_ITEM_HEADER.finditer(response))
+    for header, following in zip(headers, headers[1:] + [None]):
+        end = following.start() if following else len(response)
+        blocks.setdefault(int(header.group(1)), response[header.end():end])
+    return blocks
+
+
+def _judge_complete(scores: Dict[str, int]) -> bool:
+    return all(key in scores for key in JUDGE_SCORE_KEYS)
+
+
+def _shore_complete(result: Dict[str, str]) -> bool:
+    return bool(result.get("opportunities")) and bool(result.get("challenges"))
+
+
+def _render_judge(scores: Dict[str, int]) -> str:
+    """评分写回单条目回复格式（存入按单局提示词计算的缓存键）"""
+    return "\n".join(f"{key}_rank: {scores[key]}" for key in JUDGE_SCORE_KEYS)
+
+
+def _render_shore(result: Dict[str, str]) -> str:
+    return f"CHANCES: {result['opportunities']}\nCHALLENGES: {result['challenges']}"
+
+
+class PromptPacker:
+    """把多局的同一角色请求打包成编号的多条目请求"""
+
+    def __init__(self, llm_client, max_items: int = 10):
+        """
+        初始化打包器
+
+        Args:
+            llm_client: LLM客户端（LLMClient，需支持build_*_prompt/parse_*_response）
+            max_items: 每个打包请求最多包含的条目数
+        """
+        self.llm_client = llm_client
+        self.max_items = max(1, max_items)
+        self.packed_requests = 0
+        self.packed_items = 0
+        self.cache_hits = 0
+        self.retried_items = 0
+
+    def judge_many(self, actions_texts: List[str], ref_table: str) -> List[Dict[str, int]]:
+        """
+        为多局游戏的国家行动评分
+
+        Args:
+            actions_texts: 各局的国家行动文本（"ACTION_1: ...\\nACTION_2: ..."）
+            ref_table: 参考评分表
+
+        Returns:
+            各局的评分（格式同call_judge_llm，顺序与输入一致）；客户端启用多采样投票（judge_samples > 1）时
+            每个条目汇总打包请求各采样中该条目的评分，缓存在投票结果的缓存键下
+        """
+        client = self.llm_client
+        samples = getattr(client, "judge_samples", 1)
+        voting = {}
+        if samples > 1:
+            voting = dict(samples=samples, combine=client.combine_judge_votes, key_tag=client.judge_vote_tag())
+        results = self._run(
+            role="judge",
+            items=actions_texts,
+            ref_table=ref_table,
+            build_single=lambda text: client.build_judge_prompt(text, ref_table),
+            system_prompt=client.system_prompt("judge", ref_table),
+            parse=client.parse_judge_response,
+            complete=_judge_complete,
+            render=_render_judge,
+            retry=lambda text: client.call_judge_llm(text, ref_table),
+            **voting
+        )
+        for text in actions_texts:
+            client._index_judged_actions(text)
+        return results
+
+    def shore_many(self, actions_texts: List[str]) -> List[Dict[str, str]]:
+        """
+        生成多局游戏的海岸线响应
+
+        Args:
+            actions_texts: 各局的国家行动文本
+
+        Returns:
+            各局的机遇和挑战（格式同call_shore_llm，顺序与输入一致）
+        """
+        client = self.llm_client
+        return self._run(
+            role="shore",
+            items=actions_texts,
+            build_single=client.build_shore_prompt,
+            system_prompt=client.system_prompt("shore"),
+            parse=client.parse_shore_response,
+            complete=_shore_complete,
+            render=_render_shore,
+            retry=client.call_shore_llm,
+        )
+
+    def _run(self, role: str, items: List[str], build_single: Callable[[str], Tuple[str, str]], system_prompt: Optional[str],
+             parse: Callable[[str], Dict[str, Any]],
+             complete: Callable[[Dict[str, Any]], bool], render: Callable[[Dict[str, Any]], str],
+             retry: Callable[[str], Dict[str, Any]], samples: int = 1,
+             combine: Callable[[str, List[Dict[str, Any]]], Dict[str, Any]] = None,
+             key_tag: str = "", ref_table: str = None) -> List[Dict[str, Any]]:
+        """
+        先查单局缓存，其余条目分批打包请求，解析失败的条目单独重试
+        （打包请求使用客户端当前档位的单条消息打包模板，用量记在该角色下；缓存键与单局请求一致，
+        包含单局请求的系统提示词。prefix布局的系统提示词只适用于单局回复格式，该布局下不打包）。
+        samples > 1时每个打包请求取samples个回复，条目的结果由combine(条目文本, 各采样中完整的结果)汇总，
+        缓存键加上key_tag后缀
+        """
+        client = self.llm_client
+        cache = getattr(client, "response_cache", None)
+        use_cache = cache is not None and cache.accepts(role)
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        keys: List[Optional[str]] = [None] * len(items)
+        pending = []
+        for index, text in enumerate(items):
+            if use_cache:
+                _, cache_prompt = build_single(text)
+                keys[index] = cache_key(client.model, system_prompt, cache_prompt + key_tag)
+                cached = cache.get(keys[index])
+                if cached is not None:
+                    parsed = parse(cached)
+                    if complete(parsed):
+                        results[index] = parsed
+                        self.cache_hits += 1
+                        continue
+            pending.append(index)
+
+        failed = 0
+        if getattr(client, "prompt_layout", "inline") == "prefix" and len(pending) > 1:
+            logger.info(f"prefix布局的系统提示词只适用于单局请求，{len(pending)}个{role}条目不打包")
+            pending_batches = []
+        else:
+            template = client.packed_template(role, ref_table)
+            pending_batches = range(0, len(pending), self.max_items)
+        for start in pending_batches:
+            batch = pending[start:start + self.max_items]
+            if len(batch) == 1:
+                # 只剩一个条目时直接使用单局请求
+                continue
+            prompt = template.render(num_items=len(batch),
+                                     items=format_packed_items([items[i] for i in batch]))
+            try:
+                if samples > 1:
+                    responses = client.call_llm_samples(prompt, samples, role=role)
+                else:
+                    responses = [client.call_llm(prompt, cache_role=role)]
+            except Exception as e:
+                logger.warning(f"打包{role}请求失败，{len(batch)}个条目将单独重试: {e}")
+                failed += len(batch)
+                continue
+            self.packed_requests += 1
+            self.packed_items += len(batch)
+            sample_blocks = [split_packed_response(response) for response in responses]
+            for number, index in enumerate(batch, 1):
+                parsed_samples = [parsed for parsed in (parse(blocks.get(number, "")) for blocks in sample_blocks)
+                                  if complete(parsed)]
+                if parsed_samples:
+                    parsed = combine(items[index], parsed_samples) if samples > 1 else parsed_samples[0]
+                    results[index] = parsed
+                    if keys[index] is not None:
+                        cache.put(keys[index], render(parsed), role=role)
+                else:
+                    failed += 1
+                    logger.warning(f"打包{role}回复中第{number}个条目解析失败，单独重试")
+
+        # 解析失败、请求失败的条目和单条目批次按单局方式请求
+        for index in pending:
+            if results[index] is None:
+                results[index] = retry(items[index])
+        self.retried_items += failed
+        logger.info(f"打包{role}请求完成: {len(items)}个条目, 缓存命中{len(items) - len(pending)}, 单独重试{failed}")
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        """打包统计"""
+        return {
+            "packed_requests": self.packed_requests,
+            "packed_items": self.packed_items,
+            "cache_hits": self.cache_hits,
+            "retried_items": self.retried_items,
+        }
@@ -0,0 +1,229 @@
+"""
+提示词档位
+"standard"档位使用原有的提示词；"compact"档位（prompt/compact/）使用精简的说明、CSV形式的参考评分表，
+并限制随上一年海岸线响应带入的机遇/挑战文本长度，以减少每次调用的输入token。
+本模块还提供按角色统计两个档位的token数，以及用历史记录验证精简提示词不改变裁判评分分布的工具
+"""
+
+import os
+import re
+import json
+import glob
+import logging
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+from .reference_table import ReferenceTable
+
+try:
+    import tiktoken
+except ImportError:  # 未安装时使用近似计数
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+PROMPT_PROFILES = ("standard", "compact")
+
+# compact档位的模板子目录
+COMPACT_TEMPLATE_DIR = "compact"
+
+# compact档位中机遇/挑战文本的默认最大字符数
+DEFAULT_CONTEXT_CHARS = 240
+
+_SCORE_KEYS = ('first_country', 'first_shoreline', 'second_country', 'second_shoreline')
+
+# 近似分词：英文每4个字母、数字每3位、其他非空白字符（含中文）各计1个token
+_APPROX_TOKEN = re.compile(r"[A-Za-z]{1,4}|\d{1,3}|[^\sA-Za-z\d]")
+
+
+@lru_cache(maxsize=8)
+def compact_ref_table(text: str) -> str:
+    """
+    把markdown参考评分表改写为紧凑的CSV行（行动,海岸线变化,国家变化）
+
+    Args:
+        text: markdown格式的评分表
+
+    Returns:
+        CSV文本（无法解析出任何行时原样返回）
+    """
+    table = ReferenceTable.parse(text)
+    if not len(table):
+        return text
+    return "\n".join(f"{a.name},{a.shoreline_change:+d},{a.country_change:+d}" for a in table.actions)
+
+
+def bound_text(text: Optional[str], limit: int = DEFAULT_CONTEXT_CHARS) -> str:
+    """
+    合并空白并把文本截断到limit个字符以内（尽量在词边界截断）
+
+    Args:
+        text: 原文本
+        limit: 最大字符数（0或负数表示不限制）
+
+    Returns:
+        截断后的文本
+    """
+    text = " ".join((text or "").split())
+    if limit <= 0 or len(text) <= limit:
+        return text
+    cut = text[:limit - 1]
+    space = cut.rfind(" ")
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut.rstrip(" ,;:") + "…"
+
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """
+    统计文本的token数（安装了tiktoken时精确计数，否则近似）
+
+    Args:
+        text: 文本
+        model: 模型名称（tiktoken选择编码用）
+
+    Returns:
+        token数
+    """
+    if not text:
+        return 0
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return len(encoding.encode(text))
+    return len(_APPROX_TOKEN.findall(text))
+
+
+def load_recorded_years(history_dir: str = "history") -> List[Dict[str, Any]]:
+    """
+    读取历史游戏记录中的全部年度记录
+
+    Args:
+        history_dir: 历史记录目录（读取其中的game_record_*.json / game_*.json）
+
+    Returns:
+        年度记录列表（导出格式）
+    """
+    paths = sorted(set(glob.glob(os.path.join(history_dir, "game_record_*.json"))
+                       + glob.glob(os.path.join(history_dir, "game_*.json"))))
+    records = []
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                records.extend(json.load(f).get("yearly_records", []))
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取历史记录失败: {path} -> {e}")
+    return records
+
+
+def _role_prompts(client, record: Dict[str, Any], previous: Dict[str, Any], ref_table: str) -> Dict[str, int]:
+    """构造一年中三个角色的提示词（系统+用户消息），返回各角色的token数"""
+    actions = record.get("country_actions", {})
+    actions_text = f"ACTION_1: {actions.get('action_1', '')}\nACTION_2: {actions.get('action_2', '')}"
+    shore = previous.get("shore_response", {})
+    human = client.build_human_prompt(previous.get("country_score", 60), previous.get("shoreline_score", 100),
+                                      shore.get("opportunities", ""), shore.get("challenges", ""), ref_table)
+    prompts = {
+        "human": (client.system_prompt("human", ref_table), human),
+        "judge": (client.system_prompt("judge", ref_table), client.build_judge_prompt(actions_text, ref_table)[0]),
+        "shore": (client.system_prompt("shore"), client.build_shore_prompt(actions_text)[0]),
+    }
+    return {role: count_tokens(system or "", client.model) + count_tokens(user, client.model)
+            for role, (system, user) in prompts.items()}
+
+
+def measure_token_savings(records: Iterable[Dict[str, Any]], ref_table: str,
+                          standard_client, compact_client) -> Dict[str, Dict[str, float]]:
+    """
+    按角色比较两个客户端（通常为standard和compact档位）每年的输入token数
+
+    Args:
+        records: 年度记录（导出格式，按年份顺序，上一年的分数和海岸线响应作为当年人类LLM的输入）
+        ref_table: 参考评分表
+        standard_client: 基准客户端
+        compact_client: 精简档位客户端
+
+    Returns:
+        {角色: {"standard": 平均token数, "compact": 平均token数, "saving": 节省比例}}，另含"total"
+    """
+    totals = {"standard": Counter(), "compact": Counter()}
+    years = 0
+    previous: Dict[str, Any] = {}
+    for record in records:
+        if record.get("year") == 1:
+            previous = {}
+        for name, client in (("standard", standard_client), ("compact", compact_client)):
+            totals[name].update(_role_prompts(client, record, previous, ref_table))
+        previous = record
+        years += 1
+    report = {}
+    for role in ("human", "judge", "shore", "total"):
+        if role == "total":
+            standard, compact = sum(totals["standard"].values()), sum(totals["compact"].values())
+        else:
+            standard, compact = totals["standard"][role], totals["compact"][role]
+        report[role] = {
+            "standard": standard / years if years else 0.0,
+            "compact": compact / years if years else 0.0,
+            "saving": 1 - compact / standard if standard else 0.0,
+        }
+    return report
+
+
+def _distribution_distance(a: List[int], b: List[int]) -> float:
+    """两组整数评分的经验分布总变差距离"""
+    if not a or not b:
+        return 0.0
+    count_a, count_b = Counter(a), Counter(b)
+    return 0.5 * sum(abs(count_a[v] / len(a) - count_b[v] / len(b)) for v in set(count_a) | set(count_b))
+
+
+def validate_against_history(client, records: Iterable[Dict[str, Any]], ref_table: str,
+                             mean_tolerance: float = 0.5, distance_tolerance: float = 0.25) -> Dict[str, Any]:
+    """
+    用客户端（如compact档位）重新评分历史记录中的行动，与记录中的裁判评分分布比较
+
+    Args:
+        client: 待验证的LLM客户端
+        records: 年度记录（需含country_actions和judge_scores）
+        ref_table: 参考评分表
+        mean_tolerance: 各评分项均值允许的最大偏移
+        distance_tolerance: 各评分项分布允许的最大总变差距离
+
+    Returns:
+        {"years": 样本数, "scores": {评分项: 统计}, "within_tolerance": 是否全部在容差内}
+    """
+    recorded = {key: [] for key in _SCORE_KEYS}
+    rejudged = {key: [] for key in _SCORE_KEYS}
+    for record in records:
+        actions = record.get("country_actions")
+        scores = record.get("judge_scores")
+        if not actions or not scores or any(key not in scores for key in _SCORE_KEYS):
+            continue
+        actions_text = f"ACTION_1: {actions.get('action_1', '')}\nACTION_2: {actions.get('action_2', '')}"
+        new_scores = client.call_judge_llm(actions_text, ref_table)
+        for key in _SCORE_KEYS:
+            recorded[key].append(int(scores[key]))
+            rejudged[key].append(int(new_scores[key]))
+
+    years = len(recorded[_SCORE_KEYS[0]])
+    report = {"years": years, "scores": {}, "within_tolerance": years > 0}
+    for key in _SCORE_KEYS:
+        old, new = recorded[key], rejudged[key]
+        mean_shift = (sum(new) - sum(old)) / years if years else 0.0
+        distance = _distribution_distance(old, new)
+        report["scores"][key] = {
+            "recorded_mean": sum(old) / years if years else 0.0,
+            "rejudged_mean": sum(new) / years if years else 0.0,
+            "mean_shift": mean_shift,
+            "mean_abs_error": sum(abs(x - y) for x, y in zip(old, new)) / years if years else 0.0,
+            "exact_rate": sum(x == y for x, y in zip(old, new)) / years if years else 0.0,
+            "distribution_distance": distance,
+        }
+        if abs(mean_shift) > mean_tolerance or distance > distance_tolerance:
+            report["within_tolerance"] = False
+    logger.info(f"提示词档位验证: {years}年样本, {'在容差内' if report['within_tolerance'] else '超出容差'}")
+    return report
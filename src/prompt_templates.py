@@ -0,0 +1,230 @@
+"""
+提示词模板注册表
+所有prompt/*.txt模板只读取一次并预编译为"常量片段 + 变量槽位"，每次调用只填充变量槽位。
+参考评分表等每局不变的内容可以预先渲染进模板（bind），之后每年只拼接行动、分数等少量文本。
+模板文件修改后（修改时间或大小变化）自动重新加载
+"""
+
+import os
+import time
+import logging
+import threading
+from string import Formatter
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPT_DIR = "prompt"
+
+
+class PromptTemplate:
+    """预编译的提示词模板，渲染结果与str.format一致"""
+
+    def __init__(self, text: str, name: str = ""):
+        """
+        初始化模板
+
+        Args:
+            text: 模板文本（str.format语法）
+            name: 模板名称（用于日志）
+        """
+        self.text = text
+        self.name = name
+        self._parts = self._compile(text)
+        self.fields = frozenset(part[1] for part in self._parts if part[1] is not None)
+
+    @staticmethod
+    def _compile(text: str) -> List[Tuple[str, Optional[str], Optional[str], str]]:
+        """拆分为(常量文本, 字段名, 转换符, 格式说明)片段，相邻常量合并"""
+        parts = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if field is not None and (not field or not field.isidentifier()):
+                raise ValueError(f"模板只支持具名字段: {{{field}}}")
+            if spec and "{" in spec:
+                raise ValueError(f"模板不支持嵌套字段: {{{field}:{spec}}}")
+            if parts and parts[-1][1] is None:
+                literal = parts.pop()[0] + literal
+            parts.append((literal, field, conversion, spec or ""))
+        return parts
+
+    @staticmethod
+    def _format_value(value: Any, conversion: Optional[str], spec: str) -> str:
+        if conversion == "r":
+            value = repr(value)
+        elif conversion == "a":
+            value = ascii(value)
+        elif conversion == "s":
+            value = str(value)
+        if not spec and type(value) is str:
+            return value
+        return format(value, spec)
+
+    def render(self, **values: Any) -> str:
+        """
+        填充变量槽位
+
+        Args:
+            **values: 字段值（多余的字段忽略，缺少字段时抛出KeyError，同str.format）
+
+        Returns:
+            渲染后的提示词
+        """
+        pieces = []
+        for literal, field, conversion, spec in self._parts:
+            pieces.append(literal)
+            if field is not None:
+                pieces.append(self._format_value(values[field], conversion, spec))
+        return "".join(pieces)
+
+    def partial(self, **constants: Any) -> "PromptTemplate":
+        """
+        预先渲染部分字段，返回只剩其余槽位的模板
+
+        Args:
+            **constants: 固定不变的字段值（如参考评分表）
+
+        Returns:
+            新模板（常量值直接并入常量片段，不会再被当作模板语法解析）
+        """
+        bound = PromptTemplate.__new__(PromptTemplate)
+        bound.name = self.name
+        parts = []
+        for literal, field, conversion, spec in self._parts:
+            if field in constants:
+                literal += self._format_value(constants[field], conversion, spec)
+                field, conversion, spec = None, None, ""
+            if parts and parts[-1][1] is None:
+                literal = parts.pop()[0] + literal
+            parts.append((literal, field, conversion, spec))
+        bound._parts = parts
+        bound.fields = frozenset(part[1] for part in parts if part[1] is not None)
+        bound.text = None
+        return bound
+
+
+class PromptRegistry:
+    """按名称加载、缓存并热重载提示词模板"""
+
+    def __init__(self, directory: str = DEFAULT_PROMPT_DIR, check_interval: float = 1.0):
+        """
+        初始化注册表
+
+        Args:
+            directory: 模板目录
+            check_interval: 检查模板文件是否修改的最短间隔（秒，0表示每次使用都检查）
+        """
+        self.directory = directory
+        self.check_interval = check_interval
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.reloads = 0
+
+    def _path(self, name: str) -> str:
+        filename = name if name.endswith(".txt") else f"{name}.txt"
+        return os.path.join(self.directory, filename)
+
+    def _entry(self, name: str) -> Dict[str, Any]:
+        """取模板条目，首次使用时加载，超过检查间隔时比较文件修改时间"""
+        now = time.monotonic()
+        entry = self._entries.get(name)
+        if entry is not None and now - entry["checked_at"] < self.check_interval:
+            return entry
+        with self._lock:
+            entry = self._entries.get(name)
+            path = self._path(name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                if entry is None:
+                    raise
+                # 文件暂时不可访问（如正在被替换或工作目录改变）时继续使用已加载的版本
+                entry["checked_at"] = now
+                return entry
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if entry is None or entry["signature"] != signature:
+                with open(path, "r", encoding="utf-8") as f:
+                    text = f.read()
+                if entry is None:
+                    self.loads += 1
+                else:
+                    self.reloads += 1
+                    logger.info(f"提示词模板已修改，重新加载: {path}")
+                entry = {"signature": signature, "text": text, "template": PromptTemplate(text, name),
+                         "bound": {}, "checked_at": now}
+                self._entries[name] = entry
+            else:
+                entry["checked_at"] = now
+            return entry
+
+    def text(self, name: str) -> str:
+        """模板文件的原始文本（如参考评分表）"""
+        return self._entry(name)["text"]
+
+    def get(self, name: str) -> PromptTemplate:
+        """
+        获取预编译模板
+
+        Args:
+            name: 模板名称（文件名，可省略.txt，如"JudgeLLM"）
+
+        Returns:
+            预编译模板
+        """
+        return self._entry(name)["template"]
+
+    def bind(self, name: str, /, **constants: Any) -> PromptTemplate:
+        """
+        获取预先渲染了常量字段的模板（按常量值缓存，模板重新加载后失效）
+
+        Args:
+            name: 模板名称
+            **constants: 常量字段值（需可哈希，如参考评分表文本）
+
+        Returns:
+            只剩其余槽位的模板
+        """
+        entry = self._entry(name)
+        key = tuple(sorted(constants.items()))
+        bound = entry["bound"].get(key)
+        if bound is None:
+            bound = entry["template"].partial(**constants)
+            # 不同的常量值（如多张参考评分表）很少，超出时整体清空
+            if len(entry["bound"]) >= 16:
+                entry["bound"].clear()
+            entry["bound"][key] = bound
+        return bound
+
+    def render(self, name: str, /, constants: Dict[str, Any] = None, **values: Any) -> str:
+        """
+        渲染模板
+
+        Args:
+            name: 模板名称
+            constants: 常量字段值（预先渲染并缓存）
+            **values: 每次调用变化的字段值
+
+        Returns:
+            渲染后的提示词
+        """
+        template = self.bind(name, **constants) if constants else self.get(name)
+        return template.render(**values)
+
+    def stats(self) -> Dict[str, int]:
+        """加载统计"""
+        return {
+            "templates": len(self._entries),
+            "loads": self.loads,
+            "reloads": self.reloads,
+        }
+
+
+_default_registry: Optional[PromptRegistry] = None
+
+
+def default_registry() -> PromptRegistry:
+    """进程内共享的默认注册表（模板目录为prompt/）"""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = PromptRegistry()
+    return _default_registry
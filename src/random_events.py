@@ -21,40 +21,61 @@ class RandomEvent:
         self.country_impact = country_impact  # 对国家发展的影响
         self.shoreline_impact = shoreline_impact  # 对海岸线的影响
 
+# 事件定义: (名称, 描述, 基础概率, 国家影响范围, 海岸线影响范围)
+# 影响范围上下界相同表示固定影响，否则每年重置时在范围内均匀抽取整数
+EVENT_SPECS: List[Tuple[str, str, float, Tuple[int, int], Tuple[int, int]]] = [
+    # 自然灾害 - 概率≤0.1，影响≤3
+    ("海啸", "强烈海啸袭击海岸线，造成严重破坏", 0.001, (-3, -3), (-3, -3)),
+    ("台风", "强台风登陆，对基础设施造成损害", 0.02, (-1, -1), (-1, -1)),
+    ("海平面上升", "全球变暖导致海平面显著上升", 0.02, (-1, -1), (-1, -1)),
+    ("风暴潮", "强风暴潮侵蚀海岸线", 0.04, (-1, -1), (-1, -1)),
+    ("海洋酸化", "海洋酸化影响海洋生态系统", 0.002, (-1, -1), (-2, -2)),
+    ("海岸侵蚀", "长期海岸侵蚀加剧", 0.008, (-1, -1), (-2, -2)),
+    ("极端高温", "海洋极端高温事件", 0.003, (-2, -2), (-3, -3)),
+    
+    # 积极事件 - 概率≤0.1，影响≤3
+    ("珊瑚礁复苏", "珊瑚礁生态系统自然恢复", 0.03, (1, 1), (3, 3)),
+    ("海洋保护区成效", "海洋保护区政策显现成效", 0.06, (1, 1), (2, 2)),
+    ("清洁技术突破", "新的清洁技术突破降低污染", 0.02, (2, 2), (2, 2)),
+    ("国际援助", "获得国际环保资金援助", 0.08, (3, 3), (1, 1)),
+    ("生态旅游兴起", "生态旅游带来经济效益", 0.1, (2, 2), (1, 1)),
+    ("海洋生物多样性增加", "海洋生物多样性自然增加", 0.05, (1, 1), (2, 2)),
+    
+    # 中性事件 - 概率≤0.1，影响≤3
+    ("渔业资源波动", "渔业资源因自然因素波动", 0.08, (0, 0), (-2, 2)),
+    ("海洋生物迁移", "海洋生物迁移模式改变", 0.06, (0, 0), (-1, 1)),
+    ("气候变化影响", "气候变化对海岸线造成缓慢影响", 0.09, (-1, 1), (-2, 1)),
+    ("洋流变化", "海洋洋流模式发生变化", 0.07, (-1, 1), (-1, 2)),
+]
+
+# get_disaster_probability_modifier的海岸线分档: (分数下界, 修正因子)，从高到低
+DISASTER_MODIFIER_BANDS: List[Tuple[int, float]] = [(90, 0.5), (75, 0.8), (60, 1.0), (45, 1.2), (0, 1.5)]
+
+
+def _draw_impact(impact_range: Tuple[int, int]) -> int:
+    """按范围取得事件影响（固定值不消耗随机数）"""
+    low, high = impact_range
+    return low if low == high else random.randint(low, high)
+
+
 class RandomEventSystem:
     """随机事件系统"""
     
-    def __init__(self, use_llm_evaluation: bool = True):
+    def __init__(self, use_llm_evaluation: bool = True, disaster_probability_modifier: float = 1.0):
         self.events = self._initialize_events()
         self.use_llm_evaluation = use_llm_evaluation
+        # 全局灾害概率系数，与海岸线状态修正因子相乘（对应配置项disaster_probability_modifier）
+        self.disaster_probability_modifier = disaster_probability_modifier
         logger.info(f"随机事件系统初始化完成 (LLM评估: {'启用' if use_llm_evaluation else '关闭'})")
     
     def _initialize_events(self) -> List[RandomEvent]:
         """初始化随机事件列表 - 所有概率都≤0.1，分数影响绝对值≤3"""
-        events = [
-            # 自然灾害 - 概率≤0.1，影响≤3
-            RandomEvent("海啸", "强烈海啸袭击海岸线，造成严重破坏", 0.001, -3, -3),
-            RandomEvent("台风", "强台风登陆，对基础设施造成损害", 0.02, -1, -1),
-            RandomEvent("海平面上升", "全球变暖导致海平面显著上升", 0.02, -1, -1),
-            RandomEvent("风暴潮", "强风暴潮侵蚀海岸线", 0.04, -1, -1),
-            RandomEvent("海洋酸化", "海洋酸化影响海洋生态系统", 0.002, -1, -2),
-            RandomEvent("海岸侵蚀", "长期海岸侵蚀加剧", 0.008, -1, -2),
-            RandomEvent("极端高温", "海洋极端高温事件", 0.003, -2, -3),
-            
-            # 积极事件 - 概率≤0.1，影响≤3
-            RandomEvent("珊瑚礁复苏", "珊瑚礁生态系统自然恢复", 0.03, 1, 3),
-            RandomEvent("海洋保护区成效", "海洋保护区政策显现成效", 0.06, 1, 2),
-            RandomEvent("清洁技术突破", "新的清洁技术突破降低污染", 0.02, 2, 2),
-            RandomEvent("国际援助", "获得国际环保资金援助", 0.08, 3, 1),
-            RandomEvent("生态旅游兴起", "生态旅游带来经济效益", 0.1, 2, 1),
-            RandomEvent("海洋生物多样性增加", "海洋生物多样性自然增加", 0.05, 1, 2),
-            
-            # 中性事件 - 概率≤0.1，影响≤3
-            RandomEvent("渔业资源波动", "渔业资源因自然因素波动", 0.08, 0, random.randint(-2, 2)),
-            RandomEvent("海洋生物迁移", "海洋生物迁移模式改变", 0.06, 0, random.randint(-1, 1)),
-            RandomEvent("气候变化影响", "气候变化对海岸线造成缓慢影响", 0.09, random.randint(-1, 1), random.randint(-2, 1)),
-            RandomEvent("洋流变化", "海洋洋流模式发生变化", 0.07, random.randint(-1, 1), random.randint(-1, 2)),
-        ]
+        events = []
+        for name, description, probability, country_range, shoreline_range in EVENT_SPECS:
+            # 中性事件的影响在每次初始化时随机抽取（先国家后海岸线）
+            country_impact = _draw_impact(country_range)
+            shoreline_impact = _draw_impact(shoreline_range)
+            events.append(RandomEvent(name, description, probability, country_impact, shoreline_impact))
         
         # 确保所有随机影响都在±3范围内
         for event in events:
@@ -159,16 +180,11 @@ class RandomEventSystem:
         Returns:
             概率修正因子
         """
-        if shoreline_score >= 90:
-            return 0.5  # 状态良好，灾害概率降低
-        elif shoreline_score >= 75:
-            return 0.8  # 状态一般，灾害概率略降低
-        elif shoreline_score >= 60:
-            return 1.0  # 状态中等，概率不变
-        elif shoreline_score >= 45:
-            return 1.2  # 状态较差，灾害概率增加
-        else:
-            return 1.5  # 状态很差，灾害概率大幅增加
+        # 状态良好(≥90)灾害概率降低，状态很差(<45)灾害概率大幅增加
+        for lower_bound, modifier in DISASTER_MODIFIER_BANDS:
+            if shoreline_score >= lower_bound:
+                return modifier
+        return DISASTER_MODIFIER_BANDS[-1][1]
     
     def apply_disaster_modifier(self, shoreline_score: int):
         """
@@ -177,13 +193,62 @@ class RandomEventSystem:
         Args:
             shoreline_score: 海岸线状态分数
         """
-        modifier = self.get_disaster_probability_modifier(shoreline_score)
-        
-        # 只对负面事件应用修正
+        # 只对负面事件应用修正（确保不超过0.1）
         for event in self.events:
-            if event.shoreline_impact < 0 or event.country_impact < 0:
-                original_prob = event.probability
-                event.probability = min(0.1, original_prob * modifier)  # 确保不超过0.1
+            event.probability = self.event_probability(event.probability, event.country_impact,
+                                                       event.shoreline_impact, shoreline_score)
+    
+    def event_probability(self, probability: float, country_impact: int, shoreline_impact: int,
+                          shoreline_score: int) -> float:
+        """
+        某个事件在给定海岸线状态下的实际发生概率（与apply_disaster_modifier一致）
+        
+        Args:
+            probability: 基础概率
+            country_impact: 事件对国家的影响
+            shoreline_impact: 事件对海岸线的影响
+            shoreline_score: 海岸线状态分数
+            
+        Returns:
+            发生概率
+        """
+        if shoreline_impact < 0 or country_impact < 0:
+            modifier = self.get_disaster_probability_modifier(shoreline_score) * self.disaster_probability_modifier
+            return min(0.1, probability * modifier)
+        return probability
+    
+    def impact_distribution(self, shoreline_score: int) -> Dict[Tuple[int, int], float]:
+        """
+        一年内随机事件总影响（使用预设值）的精确分布
+        中性事件的影响按范围均匀分布，负面影响的取值会受灾害概率修正
+        
+        Args:
+            shoreline_score: 年初的海岸线状态分数
+            
+        Returns:
+            {(国家影响, 海岸线影响): 概率}
+        """
+        distribution = {(0, 0): 1.0}
+        for _, _, probability, (country_low, country_high), (shore_low, shore_high) in EVENT_SPECS:
+            weight = 1.0 / ((country_high - country_low + 1) * (shore_high - shore_low + 1))
+            outcomes: Dict[Tuple[int, int], float] = {}
+            for country_impact in range(country_low, country_high + 1):
+                for shoreline_impact in range(shore_low, shore_high + 1):
+                    country_impact_clamped = max(-3, min(3, country_impact))
+                    shoreline_impact_clamped = max(-3, min(3, shoreline_impact))
+                    p = self.event_probability(probability, country_impact_clamped,
+                                               shoreline_impact_clamped, shoreline_score)
+                    key = (country_impact_clamped, shoreline_impact_clamped)
+                    outcomes[key] = outcomes.get(key, 0.0) + weight * p
+                    outcomes[(0, 0)] = outcomes.get((0, 0), 0.0) + weight * (1 - p)
+            
+            combined: Dict[Tuple[int, int], float] = {}
+            for (c1, s1), p1 in distribution.items():
+                for (c2, s2), p2 in outcomes.items():
+                    key = (c1 + c2, s1 + s2)
+                    combined[key] = combined.get(key, 0.0) + p1 * p2
+            distribution = combined
+        return distribution
     
     def evaluate_event_impact_with_llm(self, event: RandomEvent, llm_client, 
                                       current_country_score: int, current_shoreline_score: int) -> Tuple[int, int]:
@@ -0,0 +1,147 @@
+"""
+流式年度记录写入器
+每年记录生成后立即追加写入JSONL文件，支持批量刷新和gzip压缩
+"""
+
+import gzip
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, Iterator, List, Optional
+
+from .game_state import YearlyRecord, yearly_record_to_dict
+
+logger = logging.getLogger(__name__)
+
+class JsonlRecordWriter:
+    """追加式JSONL年度记录写入器
+
+    每行一个JSON对象：
+    - {"type": "year", "game_id": ..., <年度记录字段>}
+    - {"type": "summary", "game_id": ..., "game_summary": {...}}
+    """
+
+    def __init__(self, path: str, flush_every: int = 10, flush_interval: float = 5.0,
+                 compress: Optional[bool] = None):
+        """
+        初始化写入器
+
+        Args:
+            path: 输出文件路径（以.gz结尾时默认启用压缩）
+            flush_every: 缓冲多少行后写入磁盘
+            flush_interval: 距上次刷新超过多少秒时强制写入
+            compress: 是否使用gzip压缩（None表示根据扩展名判断）
+        """
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.compress = path.endswith(".gz") if compress is None else compress
+        self.current_game_id = None
+        self.lines_written = 0
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if self.compress:
+            self._file = gzip.open(path, "at", encoding="utf-8")
+        else:
+            self._file = open(path, "a", encoding="utf-8")
+
+        logger.info(f"流式记录写入器已打开: {path} (压缩: {'是' if self.compress else '否'}, 批量: {self.flush_every}行)")
+
+    def begin_game(self, game_id: Any = None):
+        """
+        开始一局新游戏，之后写入的年度记录都带有该游戏编号
+
+        Args:
+            game_id: 游戏编号
+        """
+        self.current_game_id = game_id
+
+    def write_year(self, record: YearlyRecord):
+        """
+        写入一条年度记录
+
+        Args:
+            record: 年度记录
+        """
+        entry = {"type": "year", "game_id": self.current_game_id}
+        entry.update(yearly_record_to_dict(record))
+        self.write(entry)
+
+    def end_game(self, summary: Dict[str, Any]):
+        """
+        写入游戏总结并立即刷新，保证整局数据落盘
+
+        Args:
+            summary: get_game_summary()返回的游戏总结
+        """
+        self.write({"type": "summary", "game_id": self.current_game_id, "game_summary": summary})
+        self.flush()
+
+    def write(self, entry: Dict[str, Any]):
+        """
+        写入任意一行JSON数据（进入缓冲区，按批量刷新）
+
+        Args:
+            entry: 可JSON序列化的字典
+        """
+        self._buffer.append(json.dumps(entry, ensure_ascii=False))
+        if (len(self._buffer) >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """将缓冲区内容写入文件"""
+        if self._buffer:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self.lines_written += len(self._buffer)
+            self._buffer = []
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        """刷新并关闭文件"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        logger.info(f"流式记录写入器已关闭: {self.path} (共{self.lines_written}行)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def iter_jsonl_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    逐行读取JSONL记录文件（支持gzip），可用于观察正在进行中的游戏
+
+    写入中的文件最后一行可能不完整，此时跳过该行。
+
+    Args:
+        path: JSONL文件路径
+
+    Yields:
+        每行解析得到的字典
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"跳过不完整的记录行: {line[:50]}")
+        except EOFError:
+            # gzip文件仍在写入，尾部数据块不完整
+            logger.warning(f"记录文件尾部不完整（可能仍在写入）: {path}")
@@ -0,0 +1,155 @@
+"""
+参考评分表
+解析prompt/ref_scoring_table.txt，提供按表评分（离线裁判）和随机行动策略，
+供精确求解、向量化模拟等不调用LLM的分析使用
+"""
+
+import re
+import random
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TABLE_PATH = "prompt/ref_scoring_table.txt"
+
+_ROW_PATTERN = re.compile(r"^\|\s*([^|]+?)\s*\|\s*([+-]?\d+)\s*\|\s*([+-]?\d+)\s*\|\s*$")
+
+
+class ReferenceAction:
+    """参考评分表中的一个行动"""
+
+    def __init__(self, name: str, shoreline_change: int, country_change: int):
+        self.name = name
+        self.shoreline_change = shoreline_change
+        self.country_change = country_change
+
+    def __repr__(self) -> str:
+        return f"ReferenceAction({self.name!r}, shoreline={self.shoreline_change:+d}, country={self.country_change:+d})"
+
+
+class ReferenceTable:
+    """参考评分表（行动名 -> 分数变化）"""
+
+    def __init__(self, actions: List[ReferenceAction]):
+        self.actions = list(actions)
+        self._by_name = {action.name.lower(): action for action in self.actions}
+
+    @classmethod
+    def parse(cls, text: str) -> "ReferenceTable":
+        """
+        解析markdown格式的评分表（| Action | Shoreline Score Change | Country Score Change |）
+
+        Args:
+            text: 评分表文本
+
+        Returns:
+            评分表
+        """
+        actions = []
+        for line in text.splitlines():
+            match = _ROW_PATTERN.match(line.strip())
+            if match:
+                name, shoreline, country = match.groups()
+                actions.append(ReferenceAction(name, int(shoreline), int(country)))
+        return cls(actions)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_TABLE_PATH) -> "ReferenceTable":
+        """从文件加载评分表"""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.parse(f.read())
+
+    @property
+    def names(self) -> List[str]:
+        return [action.name for action in self.actions]
+
+    def get(self, name: str) -> Optional[ReferenceAction]:
+        """按名称查找行动（忽略大小写和首尾空白）"""
+        return self._by_name.get(name.strip().lower())
+
+    def judge_scores(self, action_1: str, action_2: str) -> Dict[str, int]:
+        """
+        按表给出裁判评分（格式同call_judge_llm，表中没有的行动记0分）
+
+        Args:
+            action_1: 第一个行动
+            action_2: 第二个行动
+
+        Returns:
+            包含分数变化的字典
+        """
+        scores = {}
+        for prefix, name in (("first", action_1), ("second", action_2)):
+            action = self.get(name)
+            scores[f"{prefix}_country"] = action.country_change if action else 0
+            scores[f"{prefix}_shoreline"] = action.shoreline_change if action else 0
+        return scores
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+
+class ActionPolicy:
+    """随机行动策略：每年独立地为两个行动位各选一个表中行动"""
+
+    def __init__(self, table: ReferenceTable, weights: Dict[str, float] = None,
+                 weights_2: Dict[str, float] = None):
+        """
+        初始化策略
+
+        Args:
+            table: 参考评分表
+            weights: 第一个行动位的权重 {行动名: 权重}（默认表中行动均匀分布）
+            weights_2: 第二个行动位的权重（默认与第一个相同）
+        """
+        self.table = table
+        self.slot_probabilities = [self._normalize(weights), self._normalize(weights_2 or weights)]
+
+    def _normalize(self, weights: Optional[Dict[str, float]]) -> List[Tuple[ReferenceAction, float]]:
+        if weights is None:
+            return [(action, 1.0 / len(self.table)) for action in self.table.actions]
+        total = sum(weights.values())
+        if total <= 0:
+            raise ValueError("策略权重之和必须为正")
+        result = []
+        for name, weight in weights.items():
+            action = self.table.get(name)
+            if action is None:
+                raise ValueError(f"评分表中没有行动: {name}")
+            if weight > 0:
+                result.append((action, weight / total))
+        return result
+
+    def delta_distribution(self) -> Dict[Tuple[int, int], float]:
+        """
+        每年两个行动按表评分的总变化分布
+
+        Returns:
+            {(国家变化, 海岸线变化): 概率}
+        """
+        distribution: Dict[Tuple[int, int], float] = {}
+        for first, p1 in self.slot_probabilities[0]:
+            for second, p2 in self.slot_probabilities[1]:
+                key = (first.country_change + second.country_change,
+                       first.shoreline_change + second.shoreline_change)
+                distribution[key] = distribution.get(key, 0.0) + p1 * p2
+        return distribution
+
+    def sample(self, rng: random.Random = None) -> Dict[str, str]:
+        """
+        抽取一年的两个行动（格式同call_human_llm）
+
+        Args:
+            rng: 随机数生成器（默认使用全局random）
+
+        Returns:
+            {"action_1": 行动名, "action_2": 行动名}
+        """
+        rng = rng or random
+        actions = {}
+        for key, slot in zip(("action_1", "action_2"), self.slot_probabilities):
+            names = [action.name for action, _ in slot]
+            probabilities = [p for _, p in slot]
+            actions[key] = rng.choices(names, probabilities)[0]
+        return actions
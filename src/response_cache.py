@@ -0,0 +1,114 @@
+"""
+LLM响应缓存
+以(模型, 系统提示词, 提示词)为键缓存LLM回复，可在多个游戏/线程之间共享，
+并可选追加写入JSONL文件，供后续运行（如中断后继续的参数扫描）复用
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 默认只缓存评分类调用：相同行动文本的评分可以复用；
+# 人类/海岸线LLM的回复是博弈过程本身的随机性，缓存后重复实验会完全相同
+DEFAULT_CACHED_ROLES = ("judge", "event")
+
+
+def cache_key(model: str, system_prompt: Optional[str], prompt: str) -> str:
+    """计算缓存键（内容的sha1）"""
+    digest = hashlib.sha1()
+    for part in (model or "", system_prompt or "", prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LLMResponseCache:
+    """线程安全的LLM响应缓存"""
+
+    def __init__(self, path: str = None, roles: Iterable[str] = DEFAULT_CACHED_ROLES,
+                 max_entries: int = None):
+        """
+        初始化缓存
+
+        Args:
+            path: 持久化JSONL文件路径（可选，存在时先加载已有条目）
+            roles: 允许缓存的调用角色（"human"、"shore"、"judge"、"event"）
+            max_entries: 内存中最多保留的条目数（可选，超过后不再加入新条目）
+        """
+        self.path = path
+        self.roles = frozenset(roles)
+        self.max_entries = max_entries
+        self.entries: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._file = None
+        if path:
+            self._load(path)
+            self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self, path: str):
+        """加载已有的缓存文件（忽略写入中断造成的不完整行）"""
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.entries[entry["key"]] = entry["response"]
+        logger.info(f"已加载LLM响应缓存: {len(self.entries)}条 ({path})")
+
+    def accepts(self, role: Optional[str]) -> bool:
+        """该角色的调用是否使用缓存"""
+        return role is not None and role in self.roles
+
+    def get(self, key: str) -> Optional[str]:
+        """查询缓存，未命中返回None"""
+        with self._lock:
+            response = self.entries.get(key)
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return response
+
+    def put(self, key: str, response: str, role: str = None):
+        """加入缓存（并追加写入持久化文件）"""
+        with self._lock:
+            if key in self.entries:
+                return
+            if self.max_entries is not None and len(self.entries) >= self.max_entries:
+                return
+            self.entries[key] = response
+            if self._file is not None:
+                self._file.write(json.dumps({"key": key, "role": role, "response": response},
+                                            ensure_ascii=False) + "\n")
+                self._file.flush()
+
+    def stats(self) -> Dict[str, float]:
+        """命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def close(self):
+        """关闭持久化文件"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
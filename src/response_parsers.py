@@ -0,0 +1,332 @@
+"""
+LLM回复解析
+人类、海岸线、裁判和随机事件四类回复共用的单遍解析器：正则表达式预先编译，
+格式规范的回复（最常见的情况）由一个整体匹配的快速路径直接解析，其余回复逐行扫描一遍。
+解析结果与原先逐行startswith/replace的实现一致。
+另提供由历史记录生成的解析基准语料和计时工具
+"""
+
+import re
+import time
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_THINK = re.compile(r"<think>.*?</think>", re.DOTALL)
+_CODE_BLOCK = re.compile(r"```(.*?)```", re.DOTALL)
+
+# 快速路径：可选的代码块围栏中恰好两行/四行规范格式，内容中没有反引号
+_OPEN_FENCE = r"\s*(?:```[^\n`]*\n)?\s*"
+_CLOSE_FENCE = r"(?:\n\s*```)?\s*"
+_HUMAN_FAST = re.compile(_OPEN_FENCE + r"ACTION_1:([^\n`]*)\n\s*ACTION_2:([^\n`]*)" + _CLOSE_FENCE)
+_SHORE_FAST = re.compile(_OPEN_FENCE + r"CHANCES:([^\n`]*)\n\s*CHALLENGES:([^\n`]*)" + _CLOSE_FENCE)
+_JUDGE_FAST = re.compile(
+    _OPEN_FENCE
+    + r"first_country_rank:[ \t]*([+-]?\d+)[ \t]*\n\s*first_shoreline_rank:[ \t]*([+-]?\d+)[ \t]*\n"
+    + r"\s*second_country_rank:[ \t]*([+-]?\d+)[ \t]*\n\s*second_shoreline_rank:[ \t]*([+-]?\d+)[ \t]*"
+    + _CLOSE_FENCE)
+
+_HUMAN_LABELS = {"ACTION_1": "action_1", "ACTION_2": "action_2"}
+_SHORE_LABELS = {
+    "CHANCES": "opportunities", "机遇": "opportunities", "Opportunities": "opportunities",
+    "CHALLENGES": "challenges", "挑战": "challenges", "Challenges": "challenges",
+}
+_JUDGE_LABELS = {
+    "first_country_rank": "first_country", "first_shoreline_rank": "first_shoreline",
+    "second_country_rank": "second_country", "second_shoreline_rank": "second_shoreline",
+}
+_JUDGE_ACTIONS = {"ACTION_1": "first", "ACTION_2": "second"}
+_EVENT_IMPACTS = ("country_impact", "shoreline_impact")
+_CANDIDATE_HEADER = re.compile(r"^[ \t*#]*CANDIDATE[ \t]*\d+[ \t*]*:?[ \t*]*$", re.MULTILINE | re.IGNORECASE)
+
+
+def clean_human_response(response: str) -> str:
+    """移除<think>推理内容；有代码块时只保留第一个代码块的内容"""
+    if "<think>" in response:
+        response = _THINK.sub("", response)
+    if "```" in response:
+        match = _CODE_BLOCK.search(response)
+        if match:
+            response = match.group(1).strip()
+    return response
+
+
+def iter_human_tokens(response: str) -> Iterator[Tuple[str, Optional[str], str]]:
+    """
+    逐行切分人类LLM回复（调试时可逐条查看解析过程）
+
+    Args:
+        response: LLM回复
+
+    Yields:
+        (类型, 行动键, 内容)；类型为"skip"（空行/围栏）、"action"（行动行）、
+        "continuation"（接续上一行动的内容）或"ignored"（行动之前的其他内容）
+    """
+    current = None
+    for raw in clean_human_response(response).split("\n"):
+        line = raw.strip()
+        if not line or line == "```":
+            yield "skip", None, line
+            continue
+        label, colon, rest = line.partition(":")
+        if colon and label in _HUMAN_LABELS:
+            current = _HUMAN_LABELS[label]
+            yield "action", current, rest.replace(label + ":", "").strip()
+        elif current and not line.startswith("```"):
+            yield "continuation", current, line
+        else:
+            yield "ignored", None, line
+
+
+def parse_human_response(response: str) -> Dict[str, str]:
+    """
+    解析人类LLM回复
+
+    Args:
+        response: LLM回复
+
+    Returns:
+        {"action_1": ..., "action_2": ...}（缺失的行动为空字符串）
+    """
+    if "<think>" not in response:
+        match = _HUMAN_FAST.fullmatch(response)
+        if match:
+            return {"action_1": match.group(1).replace("ACTION_1:", "").strip(),
+                    "action_2": match.group(2).replace("ACTION_2:", "").strip()}
+    actions = {}
+    for kind, key, content in iter_human_tokens(response):
+        if kind == "action":
+            actions[key] = content
+        elif kind == "continuation":
+            actions[key] += " " + content
+    actions.setdefault("action_1", "")
+    actions.setdefault("action_2", "")
+    return actions
+
+
+def parse_shore_response(response: str) -> Dict[str, str]:
+    """
+    解析海岸线LLM回复（CHANCES/CHALLENGES、机遇/挑战、Opportunities/Challenges，内容可在下一行或列表项中）
+
+    Args:
+        response: LLM回复
+
+    Returns:
+        解析出的机遇和挑战（缺失的键不出现在结果中）
+    """
+    match = _SHORE_FAST.fullmatch(response)
+    if match:
+        result = {}
+        opportunities = match.group(1).replace("CHANCES:", "").strip()
+        challenges = match.group(2).replace("CHALLENGES:", "").strip()
+        if opportunities:
+            result["opportunities"] = opportunities
+        if challenges:
+            result["challenges"] = challenges
+        return result
+
+    result = {}
+    section = None
+    for raw in response.split("\n"):
+        line = raw.strip()
+        label, colon, rest = line.partition(":")
+        if colon and label in _SHORE_LABELS:
+            section = _SHORE_LABELS[label]
+            content = rest.replace(label + ":", "").strip()
+            if content:
+                result[section] = content
+        elif section and line and not line.startswith("```") and section not in result:
+            if line.startswith("-"):
+                content = line.replace("-", "").strip()
+                if content:
+                    result[section] = content
+            else:
+                result[section] = line
+    return result
+
+
+def parse_judge_response(response: str) -> Dict[str, int]:
+    """
+    解析裁判LLM回复（"first_country_rank: n"格式，或按行动分组的"Country Score Change: +n"格式）
+
+    Args:
+        response: LLM回复
+
+    Returns:
+        解析出的评分（缺失的键不出现在结果中）
+    """
+    match = _JUDGE_FAST.fullmatch(response)
+    if match:
+        return {key: int(value) for key, value in zip(_JUDGE_LABELS.values(), match.groups())}
+
+    scores = {}
+    current = None
+    for raw in response.split("\n"):
+        line = raw.strip()
+        label, colon, rest = line.partition(":")
+        try:
+            if colon and label in _JUDGE_LABELS:
+                scores[_JUDGE_LABELS[label]] = int(rest.partition(":")[0].strip())
+            elif colon and label in _JUDGE_ACTIONS:
+                current = _JUDGE_ACTIONS[label]
+            elif current and "Country Score Change:" in line:
+                value = line.split("Country Score Change:")[1].strip()
+                scores[f"{current}_country"] = int(value.replace("+", "").replace(" ", ""))
+            elif current and "Shoreline Score Change:" in line:
+                value = line.split("Shoreline Score Change:")[1].strip()
+                scores[f"{current}_shoreline"] = int(value.replace("+", "").replace(" ", ""))
+        except ValueError as e:
+            # 解析失败时记录日志但继续处理
+            logger.warning(f"解析裁判LLM响应时出错: {line} -> {e}")
+    return scores
+
+
+def parse_event_response(response: str) -> Dict[str, Any]:
+    """
+    解析随机事件评估回复
+
+    Args:
+        response: LLM回复
+
+    Returns:
+        {"country_impact": -3..3, "shoreline_impact": -3..3, "reasoning": 说明}（无法解析的影响记0）
+    """
+    scores = {"country_impact": 0, "shoreline_impact": 0, "reasoning": ""}
+    for raw in response.split("\n"):
+        line = raw.strip()
+        label, colon, rest = line.partition(":")
+        if not colon:
+            continue
+        if label in _EVENT_IMPACTS:
+            try:
+                # 限制在-3到+3范围内
+                scores[label] = max(-3, min(3, int(rest.partition(":")[0].strip())))
+            except ValueError:
+                scores[label] = 0
+        elif label == "reasoning":
+            scores["reasoning"] = rest.replace("reasoning:", "").strip()
+    return scores
+
+
+def parse_candidate_response(response: str) -> List[Dict[str, str]]:
+    """
+    解析人类LLM的多候选回复（"CANDIDATE n:"分隔，每段为ACTION_1/ACTION_2格式）
+
+    Args:
+        response: LLM回复
+
+    Returns:
+        候选行动列表（缺少任一行动的候选和重复的候选被丢弃；没有候选标题时按单个回复解析）
+    """
+    if "<think>" in response:
+        response = _THINK.sub("", response)
+    sections = _CANDIDATE_HEADER.split(response)
+    if len(sections) > 1:
+        sections = sections[1:]
+    candidates, seen = [], set()
+    for section in sections:
+        actions = parse_human_response(section)
+        key = (actions["action_1"].lower(), actions["action_2"].lower())
+        if actions["action_1"] and actions["action_2"] and key not in seen:
+            seen.add(key)
+            candidates.append(actions)
+    return candidates
+
+
+PARSERS: Dict[str, Callable[[str], Dict[str, Any]]] = {
+    "human": parse_human_response,
+    "shore": parse_shore_response,
+    "judge": parse_judge_response,
+    "event": parse_event_response,
+}
+
+
+# ---------- 解析基准 ----------
+
+def _human_variants(action_1: str, action_2: str) -> List[str]:
+    return [
+        f"```\nACTION_1: {action_1}\n\nACTION_2: {action_2}\n```",
+        f"ACTION_1: {action_1}\nACTION_2: {action_2}",
+        f"<think>\nThe shoreline is healthy, so I can focus on growth.\n</think>\n\n```\nACTION_1: {action_1}\n\n"
+        f"ACTION_2: {action_2}\n```",
+        f"Here are my actions:\n```text\nACTION_1: {action_1}\nwith local community support\nACTION_2: {action_2}\n```",
+    ]
+
+
+def _shore_variants(opportunities: str, challenges: str) -> List[str]:
+    return [
+        f"```\nCHANCES: {opportunities}\n\nCHALLENGES: {challenges}\n```",
+        f"CHANCES:\n- {opportunities}\n\nCHALLENGES:\n- {challenges}",
+        f"机遇: {opportunities}\n挑战: {challenges}",
+    ]
+
+
+def _judge_variants(scores: Dict[str, int]) -> List[str]:
+    plain = "\n".join(f"{key}_rank: {scores[key]}" for key in _JUDGE_LABELS.values())
+    grouped = "\n".join(
+        f"ACTION_{n}:\nCountry Score Change: {scores[f'{p}_country']:+d}\n"
+        f"Shoreline Score Change: {scores[f'{p}_shoreline']:+d}"
+        for n, p in ((1, "first"), (2, "second")))
+    return [f"```\n{plain}\n```", plain, f"Based on the reference table:\n\n```\n{plain}\n```\n", grouped]
+
+
+def build_parser_corpus(records: Iterable[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """
+    由历史年度记录生成解析基准语料：用记录中的行动、海岸线响应、裁判评分和随机事件影响
+    渲染出各角色常见的回复格式（规范格式、代码块、<think>推理、列表项、按行动分组等）
+
+    Args:
+        records: 年度记录（导出格式）
+
+    Returns:
+        [(角色, 回复文本)]
+    """
+    corpus = []
+    for index, record in enumerate(records):
+        actions = record.get("country_actions") or {}
+        if actions:
+            variants = _human_variants(actions.get("action_1", ""), actions.get("action_2", ""))
+            corpus.append(("human", variants[index % len(variants)]))
+        shore = record.get("shore_response") or {}
+        if shore:
+            variants = _shore_variants(shore.get("opportunities", ""), shore.get("challenges", ""))
+            corpus.append(("shore", variants[index % len(variants)]))
+        scores = record.get("judge_scores") or {}
+        if all(key in scores for key in _JUDGE_LABELS.values()):
+            variants = _judge_variants(scores)
+            corpus.append(("judge", variants[index % len(variants)]))
+        for event in record.get("random_events") or []:
+            corpus.append(("event", f"```\ncountry_impact: {event.get('country_impact', 0)}\n"
+                                    f"shoreline_impact: {event.get('shoreline_impact', 0)}\n"
+                                    f"reasoning: {event.get('description', '')}\n```"))
+    return corpus
+
+
+def benchmark_parsers(corpus: List[Tuple[str, str]], repeat: int = 20,
+                      parsers: Dict[str, Callable[[str], Dict[str, Any]]] = None) -> Dict[str, Dict[str, float]]:
+    """
+    按角色计时解析器
+
+    Args:
+        corpus: 解析基准语料（build_parser_corpus的结果）
+        repeat: 重复次数
+        parsers: {角色: 解析函数}（默认为本模块的解析器，可传入其他实现对比）
+
+    Returns:
+        {角色: {"responses": 回复数, "microseconds": 每条回复的平均解析耗时(微秒)}}
+    """
+    parsers = parsers or PARSERS
+    by_role: Dict[str, List[str]] = {}
+    for role, response in corpus:
+        by_role.setdefault(role, []).append(response)
+    report = {}
+    for role, responses in by_role.items():
+        parse = parsers[role]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for response in responses:
+                parse(response)
+        elapsed = time.perf_counter() - start
+        report[role] = {"responses": len(responses), "microseconds": elapsed * 1e6 / (repeat * len(responses))}
+    return report
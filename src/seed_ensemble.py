@@ -0,0 +1,189 @@
+"""
+固定决策轨迹的随机事件种子集成
+把一局历史游戏的逐年行动和裁判评分固定下来，在数千个随机事件种子下向量化重放
+（随机事件由VectorizedEventSampler按年初海岸线所在的灾害修正分档抽样，即apply_disaster_modifier的反馈），
+得到这一决策序列的结果分布，并把记录的结果分解为策略（期望胜率）和运气（记录结果与期望的差）。
+全部在本地运行，不调用LLM
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .counterfactual import RecordedGame, resolve_game_settings
+from .vector_sim import OUTCOME_IN_PROGRESS, OUTCOME_NAMES, VectorizedEventSampler, advance_scores, check_game_over
+
+logger = logging.getLogger(__name__)
+
+# 决策轨迹用完时游戏仍未结束（之后的行动未知）
+UNDETERMINED = "undetermined"
+
+
+def _percentile_rank(values: np.ndarray, value: float) -> float:
+    """value在values中的百分位（相等的值记一半）"""
+    return float(((values < value).sum() + 0.5 * (values == value).sum()) / len(values))
+
+
+class SeedEnsemble:
+    """固定决策轨迹、变化随机事件种子的集成重放"""
+
+    def __init__(self, num_seeds: int = 10000, seed: int = None, extend_trace: bool = False,
+                 annual_bonus: Optional[int] = None, max_years: Optional[int] = None,
+                 victory_threshold: Optional[int] = None, failure_threshold: Optional[int] = None,
+                 disaster_probability_modifier: Optional[float] = None):
+        """
+        初始化种子集成
+
+        Args:
+            num_seeds: 每局游戏重放的随机事件种子数
+            seed: 随机种子（可选；每局游戏使用同一组随机数，便于比较不同游戏）
+            extend_trace: 记录的行动用完后是否继续重复最后一年的行动（否则记为undetermined）
+            annual_bonus: 年度奖励（None时依次取记录的配置、由分数轨迹推断）
+            max_years: 最大年数（None时取记录的配置，否则为GameState默认值）
+            victory_threshold: 胜利阈值（同上）
+            failure_threshold: 失败阈值（同上）
+            disaster_probability_modifier: 全局灾害概率系数（None时取记录的配置，否则为1.0）
+        """
+        self.num_seeds = num_seeds
+        self.seed = seed
+        self.extend_trace = extend_trace
+        self.overrides = {"annual_bonus": annual_bonus, "max_years": max_years,
+                          "victory_threshold": victory_threshold, "failure_threshold": failure_threshold}
+        self.disaster_probability_modifier = disaster_probability_modifier
+        self._samplers: Dict[float, VectorizedEventSampler] = {}
+
+    def _sampler(self, modifier: float) -> VectorizedEventSampler:
+        if modifier not in self._samplers:
+            self._samplers[modifier] = VectorizedEventSampler(modifier)
+        return self._samplers[modifier]
+
+    def simulate(self, game: RecordedGame) -> Dict[str, np.ndarray]:
+        """
+        在num_seeds个随机事件种子下重放一局游戏的决策轨迹
+
+        Args:
+            game: 历史游戏
+
+        Returns:
+            {"outcome": 结果编码（轨迹用完仍未结束为OUTCOME_IN_PROGRESS）, "years": 结束年份,
+             "final_country", "final_shoreline": 最终分数, "event_country", "event_shoreline": 随机事件影响合计}
+        """
+        settings = resolve_game_settings(game, self.overrides)
+        modifier = self.disaster_probability_modifier
+        if modifier is None:
+            modifier = game.config.get("disaster_probability_modifier", 1.0)
+        sampler = self._sampler(modifier)
+        deltas = [(scores.get('first_country', 0) + scores.get('second_country', 0),
+                   scores.get('first_shoreline', 0) + scores.get('second_shoreline', 0))
+                  for scores in (record.judge_scores for record in game.records)]
+
+        size = self.num_seeds
+        rng = np.random.default_rng(self.seed)
+        country = np.full(size, game.initial_country, dtype=np.int64)
+        shoreline = np.full(size, game.initial_shoreline, dtype=np.int64)
+        event_country = np.zeros(size, dtype=np.int64)
+        event_shoreline = np.zeros(size, dtype=np.int64)
+        outcome = np.full(size, OUTCOME_IN_PROGRESS, dtype=np.int8)
+        years = np.zeros(size, dtype=np.int16)
+        year = 0
+        while True:
+            active = outcome == OUTCOME_IN_PROGRESS
+            if not active.any() or (year >= len(deltas) and not self.extend_trace):
+                years[active] = year
+                break
+            country_change, shoreline_change = deltas[min(year, len(deltas) - 1)]
+            year += 1
+            # 每年为所有种子抽取随机数（已结束的种子也抽），同一种子在不同游戏中的事件序列一致
+            random_country, random_shoreline = sampler.sample(shoreline, rng, rng.random(size))
+            new_country, new_shoreline = advance_scores(country, shoreline, country_change + random_country,
+                                                        shoreline_change + random_shoreline, settings["annual_bonus"])
+            country = np.where(active, new_country, country)
+            shoreline = np.where(active, new_shoreline, shoreline)
+            event_country += np.where(active, random_country, 0)
+            event_shoreline += np.where(active, random_shoreline, 0)
+            ended = check_game_over(country, shoreline, year, settings["max_years"],
+                                    settings["victory_threshold"], settings["failure_threshold"])
+            finished = active & (ended != OUTCOME_IN_PROGRESS)
+            outcome[finished] = ended[finished]
+            years[finished] = year
+        return {"outcome": outcome, "years": years, "final_country": country, "final_shoreline": shoreline,
+                "event_country": event_country, "event_shoreline": event_shoreline}
+
+    def replay(self, game: RecordedGame) -> Dict[str, Any]:
+        """
+        一局游戏的结果分布和运气归因
+
+        Args:
+            game: 历史游戏
+
+        Returns:
+            {"source", "seeds", "outcomes": {结果: 概率}, "expected_years", "recorded_outcome",
+             "recorded_outcome_probability": 记录结果在集成中的概率,
+             "victory_luck": 记录是否胜利(1/0)减去期望胜率（正数表示运气好）,
+             "event_percentile": {"country", "shoreline": 记录的随机事件影响合计在集成中的百分位},
+             "final_country", "final_shoreline": {"mean", "p10", "p50", "p90"}}
+        """
+        arrays = self.simulate(game)
+        counts = np.bincount(arrays["outcome"] - OUTCOME_IN_PROGRESS, minlength=len(OUTCOME_NAMES) + 1)
+        outcomes = {name: float(counts[code - OUTCOME_IN_PROGRESS] / self.num_seeds)
+                    for code, name in OUTCOME_NAMES.items()}
+        outcomes[UNDETERMINED] = float(counts[0] / self.num_seeds)
+        recorded_events = (sum(record.random_country_impact for record in game.records),
+                           sum(record.random_shoreline_impact for record in game.records))
+        return {
+            "source": game.source,
+            "seeds": self.num_seeds,
+            "outcomes": outcomes,
+            "expected_years": float(arrays["years"].mean()),
+            "recorded_outcome": game.outcome,
+            "recorded_outcome_probability": outcomes.get(game.outcome, 0.0),
+            "victory_luck": float(game.outcome == "victory") - outcomes["victory"],
+            "event_percentile": {"country": _percentile_rank(arrays["event_country"], recorded_events[0]),
+                                 "shoreline": _percentile_rank(arrays["event_shoreline"], recorded_events[1])},
+            "final_country": self._quantiles(arrays["final_country"]),
+            "final_shoreline": self._quantiles(arrays["final_shoreline"]),
+        }
+
+    @staticmethod
+    def _quantiles(values: np.ndarray) -> Dict[str, float]:
+        p10, p50, p90 = np.percentile(values, [10, 50, 90])
+        return {"mean": float(values.mean()), "p10": float(p10), "p50": float(p50), "p90": float(p90)}
+
+    def run(self, games: List[RecordedGame]) -> Dict[str, Any]:
+        """
+        对多局游戏做种子集成，汇总策略与运气
+
+        Args:
+            games: 历史游戏列表
+
+        Returns:
+            {"games": 局数, "seeds": 每局种子数, "recorded_victory_rate": 记录的胜利率,
+             "expected_victory_rate": 各局期望胜率的平均（随机事件的影响被平均掉，只反映决策）,
+             "luck": 两者之差, "undetermined_rate": 轨迹用完仍未结束的平均比例,
+             "luckiest", "unluckiest": victory_luck最大/最小的几局, "details": 逐局结果, "elapsed": 耗时（秒）}
+        """
+        start = time.perf_counter()
+        details = [self.replay(game) for game in games]
+        recorded = sum(detail["recorded_outcome"] == "victory" for detail in details) / len(details) if details else 0.0
+        expected = float(np.mean([detail["outcomes"]["victory"] for detail in details])) if details else 0.0
+        ranked = sorted(details, key=lambda detail: detail["victory_luck"])
+        summary = lambda detail: {"source": detail["source"], "recorded_outcome": detail["recorded_outcome"],
+                                  "victory_probability": detail["outcomes"]["victory"],
+                                  "victory_luck": detail["victory_luck"]}
+        report = {
+            "games": len(details),
+            "seeds": self.num_seeds,
+            "recorded_victory_rate": recorded,
+            "expected_victory_rate": expected,
+            "luck": recorded - expected,
+            "undetermined_rate": float(np.mean([d["outcomes"][UNDETERMINED] for d in details])) if details else 0.0,
+            "luckiest": [summary(detail) for detail in reversed(ranked[-3:])],
+            "unluckiest": [summary(detail) for detail in ranked[:3]],
+            "details": details,
+            "elapsed": time.perf_counter() - start,
+        }
+        logger.info(f"种子集成完成: {len(details)}局 × {self.num_seeds}个种子, 记录胜利率{recorded:.2%}, "
+                    f"期望胜利率{expected:.2%}, 耗时{report['elapsed']:.2f}秒")
+        return report
@@ -0,0 +1,233 @@
+"""
+在线统计聚合器
+每局游戏结束时增量更新统计量（Welford均值/方差、直方图分位数、结果计数），
+内存占用与游戏局数无关，并可在多个进程/分片之间合并
+"""
+
+import math
+from collections import Counter
+from typing import Dict, Any, Iterable, Optional
+
+from .game_state import classify_outcome
+
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+class RunningStats:
+    """Welford在线均值/方差（支持Chan并行合并）"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def update(self, value: float):
+        """加入一个样本"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "RunningStats"):
+        """合并另一组统计量"""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float:
+        """样本方差（n-1）"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RunningStats":
+        stats = cls()
+        stats.count = data["count"]
+        stats.mean = data["mean"]
+        stats.m2 = data["m2"]
+        stats.min = data["min"]
+        stats.max = data["max"]
+        return stats
+
+
+class IntegerHistogram:
+    """整数直方图
+
+    游戏分数和年数都是有界整数（0-100），直方图本身就是O(1)大小，
+    分位数由直方图精确计算且可直接合并，无需近似的分位数草图。
+    """
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.total = 0
+
+    def update(self, value: int):
+        self.counts[int(value)] += 1
+        self.total += 1
+
+    def merge(self, other: "IntegerHistogram"):
+        self.counts.update(other.counts)
+        self.total += other.total
+
+    def quantile(self, q: float) -> Optional[int]:
+        """
+        计算分位数（取累计频数首次达到q的值）
+
+        Args:
+            q: 分位数 (0-1)
+
+        Returns:
+            分位数值（无样本时返回None）
+        """
+        if self.total == 0:
+            return None
+        target = max(1, math.ceil(q * self.total))
+        cumulative = 0
+        for value in sorted(self.counts):
+            cumulative += self.counts[value]
+            if cumulative >= target:
+                return value
+        return max(self.counts)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {str(value): count for value, count in sorted(self.counts.items())}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, int]) -> "IntegerHistogram":
+        histogram = cls()
+        for value, count in data.items():
+            histogram.counts[int(value)] = count
+            histogram.total += count
+        return histogram
+
+
+class GameStatsAggregator:
+    """多局游戏的在线统计聚合器"""
+
+    METRICS = ("duration", "final_country", "final_shoreline")
+
+    def __init__(self, quantiles: Iterable[float] = DEFAULT_QUANTILES):
+        self.quantiles = tuple(quantiles)
+        self.games = 0
+        self.victories = 0
+        self.errors = 0
+        self.outcomes: Counter = Counter()
+        self.stats = {name: RunningStats() for name in self.METRICS}
+        self.histograms = {name: IntegerHistogram() for name in self.METRICS}
+
+    def update(self, summary: Dict[str, Any]):
+        """
+        加入一局游戏的总结
+
+        Args:
+            summary: get_game_summary()格式的游戏总结
+        """
+        self.games += 1
+        if summary.get("victory"):
+            self.victories += 1
+        self.outcomes[classify_outcome(summary)] += 1
+        values = {
+            "duration": summary.get("total_years", 0),
+            "final_country": summary.get("final_scores", {}).get("country", 0),
+            "final_shoreline": summary.get("final_scores", {}).get("shoreline", 0),
+        }
+        for name, value in values.items():
+            self.stats[name].update(value)
+            self.histograms[name].update(value)
+
+    def record_error(self):
+        """记录一局运行失败的游戏（计入失败，不计入分数统计）"""
+        self.errors += 1
+        self.outcomes["error"] += 1
+
+    def merge(self, other: "GameStatsAggregator"):
+        """合并另一个聚合器（如其他进程或分片的结果）"""
+        self.games += other.games
+        self.victories += other.victories
+        self.errors += other.errors
+        self.outcomes.update(other.outcomes)
+        for name in self.METRICS:
+            self.stats[name].merge(other.stats[name])
+            self.histograms[name].merge(other.histograms[name])
+
+    @property
+    def total_games(self) -> int:
+        """总局数（包括运行失败的局）"""
+        return self.games + self.errors
+
+    @property
+    def victory_rate(self) -> float:
+        return self.victories / self.total_games if self.total_games else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        当前统计结果（运行中随时可调用）
+
+        Returns:
+            统计字典
+        """
+        metrics = {}
+        for name in self.METRICS:
+            stats = self.stats[name]
+            histogram = self.histograms[name]
+            metrics[name] = {
+                "mean": stats.mean if stats.count else 0.0,
+                "std": stats.std,
+                "min": stats.min,
+                "max": stats.max,
+                "quantiles": {str(q): histogram.quantile(q) for q in self.quantiles},
+                "histogram": histogram.to_dict(),
+            }
+        return {
+            "total_games": self.total_games,
+            "completed_games": self.games,
+            "victories": self.victories,
+            "errors": self.errors,
+            "victory_rate": self.victory_rate,
+            "outcomes": dict(self.outcomes),
+            "metrics": metrics,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为可JSON保存/跨进程传递的字典"""
+        return {
+            "quantiles": list(self.quantiles),
+            "games": self.games,
+            "victories": self.victories,
+            "errors": self.errors,
+            "outcomes": dict(self.outcomes),
+            "stats": {name: self.stats[name].to_dict() for name in self.METRICS},
+            "histograms": {name: self.histograms[name].to_dict() for name in self.METRICS},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "GameStatsAggregator":
+        aggregator = cls(quantiles=data.get("quantiles", DEFAULT_QUANTILES))
+        aggregator.games = data["games"]
+        aggregator.victories = data["victories"]
+        aggregator.errors = data["errors"]
+        aggregator.outcomes = Counter(data["outcomes"])
+        aggregator.stats = {name: RunningStats.from_dict(data["stats"][name]) for name in cls.METRICS}
+        aggregator.histograms = {name: IntegerHistogram.from_dict(data["histograms"][name]) for name in cls.METRICS}
+        return aggregator
@@ -0,0 +1,232 @@
+"""
+结构化输出
+可选的JSON回复模式：每个角色有固定的字段表（类型和取值范围），提示词末尾附上字段说明并请求
+JSON格式的回复，回复经快速校验后，只针对缺失或无效的字段重新询问，不再把解析失败的字段静默记为0
+"""
+
+import re
+import json
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from .reference_table import ReferenceTable
+from .response_parsers import PARSERS
+
+logger = logging.getLogger(__name__)
+
+# 请求JSON格式回复（OpenAI兼容接口的response_format参数）
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """结构化回复中的一个字段"""
+    kind: type                      # int或str
+    description: str
+    minimum: Optional[int] = None
+    maximum: Optional[int] = None
+
+
+# 各角色的字段表（键与原有解析结果的键一致，整数范围与提示词中的说明一致；
+# 裁判的范围在调用时扩展到覆盖参考评分表，见role_schema）
+ROLE_SCHEMAS: Dict[str, Dict[str, FieldSpec]] = {
+    "human": {
+        "action_1": FieldSpec(str, "the first action the country takes this year"),
+        "action_2": FieldSpec(str, "the second action the country takes this year"),
+    },
+    "shore": {
+        "opportunities": FieldSpec(str, "the main opportunity the shoreline offers the country"),
+        "challenges": FieldSpec(str, "the main challenge the shoreline poses to the country"),
+    },
+    "judge": {
+        "first_country": FieldSpec(int, "Country Score Change of ACTION_1", -3, 4),
+        "first_shoreline": FieldSpec(int, "Shoreline Score Change of ACTION_1", -5, 5),
+        "second_country": FieldSpec(int, "Country Score Change of ACTION_2", -3, 4),
+        "second_shoreline": FieldSpec(int, "Shoreline Score Change of ACTION_2", -5, 5),
+    },
+    "event": {
+        "country_impact": FieldSpec(int, "impact of the event on the Country Development Score", -3, 3),
+        "shoreline_impact": FieldSpec(int, "impact of the event on the Shoreline Status Score", -3, 3),
+        "reasoning": FieldSpec(str, "brief explanation of your scoring"),
+    },
+}
+
+_INTEGER = re.compile(r"[+-]?\d+")
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def _field_line(name: str, spec: FieldSpec) -> str:
+    if spec.kind is int:
+        return f'- "{name}": integer in [{spec.minimum}, {spec.maximum}], {spec.description}'
+    return f'- "{name}": non-empty string, {spec.description}'
+
+
+@lru_cache(maxsize=32)
+def _judge_schema(ref_table: str) -> Dict[str, FieldSpec]:
+    """裁判字段表：整数范围扩展到覆盖参考评分表中出现的分数变化（如urban expansion的+10/-10）"""
+    actions = ReferenceTable.parse(ref_table).actions
+    schema = {}
+    for name, spec in ROLE_SCHEMAS["judge"].items():
+        column = "country_change" if name.endswith("_country") else "shoreline_change"
+        values = [getattr(action, column) for action in actions] + [spec.minimum, spec.maximum]
+        schema[name] = FieldSpec(int, spec.description, min(values), max(values))
+    return schema
+
+
+def role_schema(role: str, ref_table: str = None) -> Dict[str, FieldSpec]:
+    """
+    角色的字段表
+
+    Args:
+        role: "human"、"shore"、"judge"或"event"
+        ref_table: 参考评分表文本（裁判的分数范围由此扩展，不提供时使用提示词中的范围）
+
+    Returns:
+        {字段: FieldSpec}
+    """
+    if role == "judge" and ref_table:
+        return _judge_schema(ref_table)
+    return ROLE_SCHEMAS[role]
+
+
+@lru_cache(maxsize=None)
+def schema_instruction(role: str, ref_table: str = None) -> str:
+    """
+    附加在提示词末尾的JSON格式说明
+
+    Args:
+        role: "human"、"shore"、"judge"或"event"
+        ref_table: 参考评分表文本（见role_schema）
+
+    Returns:
+        说明文本
+    """
+    fields = "\n".join(_field_line(name, spec) for name, spec in role_schema(role, ref_table).items())
+    return ("Respond ONLY with a single JSON object instead of the format above, with exactly these keys:\n"
+            + fields)
+
+
+def reask_prompt(role: str, problems: Dict[str, str], ref_table: str = None) -> str:
+    """
+    只针对缺失或无效字段的追问
+
+    Args:
+        role: 角色
+        problems: {字段: 问题说明}
+        ref_table: 参考评分表文本（见role_schema）
+
+    Returns:
+        追问文本
+    """
+    schema = role_schema(role, ref_table)
+    issues = "\n".join(f'- "{name}": {problem}' for name, problem in problems.items())
+    fields = "\n".join(_field_line(name, schema[name]) for name in problems)
+    return (f"Some fields in your reply were missing or invalid:\n{issues}\n\n"
+            f"Respond ONLY with a JSON object containing just these keys:\n{fields}")
+
+
+def extract_json(response: str) -> Optional[Dict[str, Any]]:
+    """
+    从回复中取出JSON对象（允许代码块围栏或前后的说明文字）
+
+    Args:
+        response: LLM回复
+
+    Returns:
+        JSON对象（无法解析时为None）
+    """
+    text = response.strip()
+    candidates = [text]
+    match = _JSON_OBJECT.search(text)
+    if match and match.group(0) != text:
+        candidates.append(match.group(0))
+    for candidate in candidates:
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def _check(spec: FieldSpec, value: Any) -> Tuple[Any, Optional[str]]:
+    """校验并转换一个字段的值，返回(值, 问题说明)"""
+    if spec.kind is int:
+        if isinstance(value, bool):
+            return None, "not an integer"
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        elif isinstance(value, str) and _INTEGER.fullmatch(value.strip()):
+            value = int(value.strip())
+        if not isinstance(value, int):
+            return None, "not an integer"
+        if not spec.minimum <= value <= spec.maximum:
+            return None, f"{value} is out of range [{spec.minimum}, {spec.maximum}]"
+        return value, None
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        value = "; ".join(item.strip() for item in value if item.strip())
+    if not isinstance(value, str):
+        return None, "not a string"
+    if not value.strip():
+        return None, "empty"
+    return value.strip(), None
+
+
+def validate(role: str, data: Dict[str, Any], fields: Iterable[str] = None,
+             ref_table: str = None) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    按角色的字段表校验回复
+
+    Args:
+        role: 角色
+        data: 回复中的JSON对象
+        fields: 只校验这些字段（默认全部字段，追问时只校验被追问的字段）
+        ref_table: 参考评分表文本（见role_schema）
+
+    Returns:
+        (有效字段的值, {缺失或无效的字段: 问题说明})
+    """
+    schema = role_schema(role, ref_table)
+    values, problems = {}, {}
+    for name in (fields if fields is not None else schema):
+        if name not in data or data[name] is None:
+            problems[name] = "missing"
+            continue
+        value, problem = _check(schema[name], data[name])
+        if problem:
+            problems[name] = problem
+        else:
+            values[name] = value
+    return values, problems
+
+
+def _text_fallback(role: str, response: str) -> Dict[str, Any]:
+    """回复不是JSON时退回原有的文本解析（随机事件的解析结果带默认值，只保留回复中出现的字段）"""
+    data = PARSERS[role](response)
+    if role == "event":
+        data = {name: value for name, value in data.items() if f"{name}:" in response}
+    return data
+
+
+def parse_structured(role: str, response: str, fields: Iterable[str] = None,
+                     ref_table: str = None) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    解析并校验结构化回复（不是JSON时退回文本解析，再按字段表校验）
+
+    Args:
+        role: 角色
+        response: LLM回复
+        fields: 只校验这些字段（默认全部字段）
+        ref_table: 参考评分表文本（见role_schema）
+
+    Returns:
+        (有效字段的值, {缺失或无效的字段: 问题说明})
+    """
+    data = extract_json(response)
+    if data is None:
+        logger.info(f"{role}回复不是JSON，使用文本解析")
+        data = _text_fallback(role, response)
+    return validate(role, data, fields, ref_table)
@@ -0,0 +1,411 @@
+"""
+参数扫描
+对游戏配置（annual_bonus、victory_threshold、failure_threshold、max_years、
+disaster_probability_modifier、model）做网格或随机设计，
+将所有(配置, 重复)任务调度到共享线程池中运行，所有任务共享同一个LLM响应缓存，
+结果写入一张带索引的SQLite结果表；已完成的任务在重新运行时自动跳过
+"""
+
+import json
+import time
+import random
+import sqlite3
+import logging
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .game_controller import ShorlineEcologyGame
+from .game_state import GameState, classify_outcome
+from .history_db import config_key
+from .llm_client import LLMClient
+from .response_cache import LLMResponseCache
+from .action_index import ActionIndex
+
+logger = logging.getLogger(__name__)
+
+SWEEP_PARAMETERS = ("annual_bonus", "victory_threshold", "failure_threshold", "max_years",
+                    "disaster_probability_modifier", "model")
+
+# 未在设计和基础配置中出现时使用的默认值（与run_game.py一致）
+DEFAULT_CONFIG = {
+    "model": "gpt-3.5-turbo",
+    "initial_country_score": 60,
+    "initial_shoreline_score": 100,
+    "max_years": 25,
+    "victory_threshold": 100,
+    "failure_threshold": 75,
+    "annual_bonus": 1,
+    "disaster_probability_modifier": 1.0,
+    "use_llm_for_random_events": True,
+    "enable_random_events": True,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweep_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    config_key TEXT NOT NULL,
+    replicate INTEGER NOT NULL,
+    model TEXT,
+    annual_bonus INTEGER,
+    victory_threshold INTEGER,
+    failure_threshold INTEGER,
+    max_years INTEGER,
+    disaster_probability_modifier REAL,
+    config_json TEXT,
+    outcome TEXT,
+    victory INTEGER,
+    total_years INTEGER,
+    final_country INTEGER,
+    final_shoreline INTEGER,
+    error TEXT,
+    elapsed REAL,
+    finished_at REAL,
+    UNIQUE (config_key, replicate)
+);
+CREATE INDEX IF NOT EXISTS idx_sweep_config ON sweep_results(config_key);
+CREATE INDEX IF NOT EXISTS idx_sweep_params ON sweep_results(model, annual_bonus, victory_threshold,
+                                                             failure_threshold, max_years,
+                                                             disaster_probability_modifier);
+CREATE INDEX IF NOT EXISTS idx_sweep_outcome ON sweep_results(outcome);
+"""
+
+
+def grid_design(space: Dict[str, Iterable[Any]]) -> List[Dict[str, Any]]:
+    """
+    网格设计：所有参数取值的笛卡尔积
+
+    Args:
+        space: {参数名: 取值列表}
+
+    Returns:
+        配置列表
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(list(space[n]) for n in names))]
+
+
+def random_design(space: Dict[str, Any], num_configs: int, seed: int = None) -> List[Dict[str, Any]]:
+    """
+    随机设计：每个参数独立抽样
+
+    取值为列表时从中均匀选取；为[下界, 上界]形式的字典{"min", "max"}时均匀抽样
+    （上下界都是整数时抽取整数）。
+
+    Args:
+        space: {参数名: 取值列表或{"min": 下界, "max": 上界}}
+        num_configs: 配置数量
+        seed: 随机种子（可选）
+
+    Returns:
+        配置列表
+    """
+    rng = random.Random(seed)
+    design = []
+    for _ in range(num_configs):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, dict):
+                low, high = values["min"], values["max"]
+                if isinstance(low, int) and isinstance(high, int):
+                    config[name] = rng.randint(low, high)
+                else:
+                    config[name] = rng.uniform(low, high)
+            else:
+                config[name] = rng.choice(list(values))
+        design.append(config)
+    return design
+
+
+class SweepResultsTable:
+    """参数扫描结果表（SQLite，每个(配置, 重复)一行）"""
+
+    def __init__(self, path: str = "sweep_results.db"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def completed_jobs(self) -> set:
+        """已有结果（不含出错）的(config_key, replicate)集合"""
+        rows = self.conn.execute("SELECT config_key, replicate FROM sweep_results WHERE error IS NULL")
+        return {(key, replicate) for key, replicate in rows}
+
+    def add_result(self, config: Dict[str, Any], replicate: int, summary: Dict[str, Any] = None,
+                   error: str = None, elapsed: float = 0.0):
+        """
+        写入一个任务的结果（同一任务重跑时覆盖）
+
+        Args:
+            config: 完整配置
+            replicate: 重复编号
+            summary: 游戏总结（出错时为None）
+            error: 错误信息（可选）
+            elapsed: 运行耗时（秒）
+        """
+        final_scores = (summary or {}).get("final_scores", {})
+        self.conn.execute(
+            """INSERT OR REPLACE INTO sweep_results (config_key, replicate, model, annual_bonus,
+                   victory_threshold, failure_threshold, max_years, disaster_probability_modifier,
+                   config_json, outcome, victory, total_years, final_country, final_shoreline,
+                   error, elapsed, finished_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                config_key(config), replicate, config.get("model"), config.get("annual_bonus"),
+                config.get("victory_threshold"), config.get("failure_threshold"), config.get("max_years"),
+                config.get("disaster_probability_modifier"),
+                json.dumps(config, ensure_ascii=False, sort_keys=True),
+                classify_outcome(summary) if summary else "error",
+                int(bool(summary and summary.get("victory"))),
+                summary.get("total_years") if summary else None,
+                final_scores.get("country"), final_scores.get("shoreline"),
+                error, elapsed, time.time(),
+            ),
+        )
+        self.conn.commit()
+
+    def summary_by_config(self) -> List[Dict[str, Any]]:
+        """
+        按配置汇总：局数、胜利率、平均时长和最终分数
+
+        Returns:
+            每个配置一行的字典列表
+        """
+        rows = self.conn.execute(
+            """SELECT config_key, config_json, COUNT(*), SUM(victory), AVG(total_years),
+                      AVG(final_country), AVG(final_shoreline), SUM(error IS NOT NULL)
+               FROM sweep_results GROUP BY config_key ORDER BY config_key"""
+        ).fetchall()
+        return [
+            {
+                "config_key": key,
+                "config": json.loads(config_json),
+                "games": games,
+                "victories": victories,
+                "victory_rate": victories / games if games else 0.0,
+                "average_duration": avg_years,
+                "average_final_country_score": avg_country,
+                "average_final_shoreline_score": avg_shoreline,
+                "errors": errors,
+            }
+            for key, config_json, games, victories, avg_years, avg_country, avg_shoreline, errors in rows
+        ]
+
+    def close(self):
+        self.conn.close()
+
+
+class ParameterSweep:
+    """参数扫描调度器"""
+
+    def __init__(self, design: List[Dict[str, Any]], replicates: int = 1,
+                 base_config: Dict[str, Any] = None, workers: int = 4,
+                 results_path: str = "sweep_results.db", response_cache: LLMResponseCache = None,
+                 client_factory: Callable[[str], Any] = None, action_index: ActionIndex = None):
+        """
+        初始化参数扫描
+
+        Args:
+            design: 配置列表（grid_design/random_design的结果，只需包含扫描的参数）
+            replicates: 每个配置重复运行的局数
+            base_config: 基础配置（如game_config.json内容），提供API信息和未扫描参数的取值
+            workers: 并发运行的游戏数
+            results_path: 结果表SQLite路径
+            response_cache: 所有任务共享的LLM响应缓存（默认新建只缓存评分调用的内存缓存）
+            client_factory: 由模型名创建LLM客户端的函数（可选，默认创建共享缓存的LLMClient）
+            action_index: 所有客户端共享的行动文本模糊索引（可选，使改写过的行动也能命中缓存）
+        """
+        self.base_config = dict(base_config or {})
+        self.replicates = replicates
+        self.workers = workers
+        self.response_cache = response_cache if response_cache is not None else LLMResponseCache()
+        self.action_index = action_index
+        self.client_factory = client_factory or self._default_client_factory
+        self.results = SweepResultsTable(results_path)
+        self.configs = [self._full_config(config) for config in design]
+        self._clients: Dict[str, Any] = {}
+        self._clients_lock = threading.Lock()
+
+    def _full_config(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """合并默认值、基础配置和设计中的参数（不含API密钥等运行信息）"""
+        full = dict(DEFAULT_CONFIG)
+        for name in DEFAULT_CONFIG:
+            if name in self.base_config:
+                full[name] = self.base_config[name]
+        full.update(config)
+        return full
+
+    def _default_client_factory(self, model: str) -> LLMClient:
+        return LLMClient(api_key=self.base_config.get("api_key"), base_url=self.base_config.get("base_url"),
+                         model=model, response_cache=self.response_cache, action_index=self.action_index,
+                         prompt_layout=self.base_config.get("prompt_layout", "inline"),
+                         prompt_profile=self.base_config.get("prompt_profile", "standard"),
+                         structured_output=self.base_config.get("structured_output", False),
+                         judge_samples=self.base_config.get("judge_samples", 1),
+                         judge_aggregate=self.base_config.get("judge_aggregate", "median"))
+
+    def _get_client(self, model: str):
+        """同一模型的任务共享一个客户端（连接池复用）"""
+        with self._clients_lock:
+            if model not in self._clients:
+                self._clients[model] = self.client_factory(model)
+            return self._clients[model]
+
+    def jobs(self) -> List[Tuple[Dict[str, Any], int]]:
+        """尚未完成的(配置, 重复编号)任务列表"""
+        done = self.results.completed_jobs()
+        return [
+            (config, replicate)
+            for config in self.configs
+            for replicate in range(self.replicates)
+            if (config_key(config), replicate) not in done
+        ]
+
+    def build_game(self, config: Dict[str, Any]) -> ShorlineEcologyGame:
+        """
+        按配置创建游戏实例
+
+        Args:
+            config: 完整配置
+
+        Returns:
+            游戏实例
+        """
+        game = ShorlineEcologyGame(
+            pause_between_years=False,
+            annual_bonus=config["annual_bonus"],
+            use_llm_for_random_events=config["use_llm_for_random_events"],
+            llm_client=self._get_client(config["model"]),
+        )
+        game.game_state = GameState(
+            initial_country_score=config["initial_country_score"],
+            initial_shoreline_score=config["initial_shoreline_score"],
+            max_years=config["max_years"],
+            victory_threshold=config["victory_threshold"],
+            failure_threshold=config["failure_threshold"],
+        )
+        game.enable_random_events = config["enable_random_events"]
+        game.random_event_system.disaster_probability_modifier = config["disaster_probability_modifier"]
+        return game
+
+    def _run_job(self, config: Dict[str, Any], replicate: int) -> Tuple[Optional[Dict[str, Any]], Optional[str], float]:
+        """运行单个任务，返回(总结, 错误信息, 耗时)"""
+        start = time.time()
+        try:
+            game = self.build_game(config)
+            summary = game.run_single_game(game_id=replicate)
+            game.close()
+            return summary, None, time.time() - start
+        except Exception as e:
+            logger.error(f"扫描任务失败 ({config_key(config)}, 重复{replicate}): {e}")
+            return None, str(e), time.time() - start
+
+    def run(self, progress_callback: Callable[[int, int], None] = None) -> Dict[str, Any]:
+        """
+        运行所有未完成的任务
+
+        Args:
+            progress_callback: 每完成一个任务以(已完成数, 总任务数)调用的回调（可选）
+
+        Returns:
+            运行统计（任务数、跳过数、出错数、缓存命中情况、按配置汇总）
+        """
+        jobs = self.jobs()
+        total_jobs = len(self.configs) * self.replicates
+        skipped = total_jobs - len(jobs)
+        logger.info(f"参数扫描: {len(self.configs)}个配置 × {self.replicates}次重复，"
+                    f"待运行{len(jobs)}个任务（跳过已完成{skipped}个），并发{self.workers}")
+
+        start = time.time()
+        errors = 0
+        finished = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._run_job, config, replicate): (config, replicate)
+                       for config, replicate in jobs}
+            # 结果只在主线程写入，SQLite连接无需跨线程共享
+            for future in as_completed(futures):
+                config, replicate = futures[future]
+                summary, error, elapsed = future.result()
+                self.results.add_result(config, replicate, summary, error, elapsed)
+                errors += error is not None
+                finished += 1
+                if progress_callback is not None:
+                    progress_callback(finished, len(jobs))
+
+        result = {
+            "configs": len(self.configs),
+            "replicates": self.replicates,
+            "jobs_run": len(jobs),
+            "jobs_skipped": skipped,
+            "errors": errors,
+            "elapsed": time.time() - start,
+            "cache": self.response_cache.stats(),
+            "by_config": self.results.summary_by_config(),
+        }
+        if self.action_index is not None:
+            result["action_index"] = self.action_index.stats()
+        return result
+
+    def close(self):
+        """关闭结果表和缓存文件"""
+        self.results.close()
+        self.response_cache.close()
+
+
+def sweep_from_spec(spec: Dict[str, Any], base_config: Dict[str, Any] = None) -> ParameterSweep:
+    """
+    由扫描描述文件创建参数扫描
+
+    描述示例::
+
+        {
+          "design": "grid",
+          "parameters": {"annual_bonus": [0, 1, 2], "max_years": [20, 25]},
+          "replicates": 5,
+          "workers": 8,
+          "results_path": "sweep_results.db",
+          "cache_path": "llm_cache.jsonl",
+          "fuzzy_actions": true
+        }
+
+    随机设计使用 "design": "random"，并设置 "num_configs" 和可选的 "seed"。
+    "fuzzy_actions"为true（或一个0-1之间的相似度阈值）时，按参考评分表建立行动文本模糊索引，
+    改写过的行动也能命中评分缓存。
+
+    Args:
+        spec: 扫描描述
+        base_config: 基础配置（如game_config.json内容）
+
+    Returns:
+        参数扫描实例
+    """
+    space = spec["parameters"]
+    unknown = set(space) - set(SWEEP_PARAMETERS)
+    if unknown:
+        raise ValueError(f"不支持扫描的参数: {sorted(unknown)}")
+    if spec.get("design", "grid") == "random":
+        design = random_design(space, spec["num_configs"], spec.get("seed"))
+    else:
+        design = grid_design(space)
+    cache = LLMResponseCache(path=spec.get("cache_path"),
+                             roles=spec.get("cache_roles", ("judge", "event")))
+    return ParameterSweep(
+        design,
+        replicates=spec.get("replicates", 1),
+        base_config=base_config,
+        workers=spec.get("workers", 4),
+        results_path=spec.get("results_path", "sweep_results.db"),
+        response_cache=cache,
+        action_index=_action_index_from_spec(spec.get("fuzzy_actions")),
+    )
+
+
+def _action_index_from_spec(value: Any) -> Optional[ActionIndex]:
+    """由扫描描述中的fuzzy_actions创建模糊索引（false/缺省时不启用）"""
+    if not value:
+        return None
+    if value is True:
+        return ActionIndex.from_reference_table()
+    return ActionIndex.from_reference_table(threshold=float(value))
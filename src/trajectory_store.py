@@ -0,0 +1,397 @@
+"""
+紧凑轨迹存储
+以定长列式二进制格式保存大量游戏的年度轨迹，可通过内存映射直接用NumPy分析
+行动和响应文本只在字符串表中保存一次，轨迹中仅记录其编号
+"""
+
+import json
+import logging
+import os
+from typing import Dict, Any, Iterable, List, Optional
+
+import numpy as np
+
+from .game_state import YearlyRecord, yearly_record_to_dict
+from .record_writer import iter_jsonl_records
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+
+# 年度轨迹列（每年一行）
+YEAR_COLUMNS = [
+    ("game_id", "<i4"),
+    ("year", "<i2"),
+    ("country_score", "<i2"),
+    ("shoreline_score", "<i2"),
+    ("first_country", "<i2"),
+    ("first_shoreline", "<i2"),
+    ("second_country", "<i2"),
+    ("second_shoreline", "<i2"),
+    ("country_change", "<i2"),
+    ("shoreline_change", "<i2"),
+    ("random_country_impact", "<i2"),
+    ("random_shoreline_impact", "<i2"),
+    ("event_count", "<i2"),
+    ("action_1_id", "<i4"),
+    ("action_2_id", "<i4"),
+    ("opportunities_id", "<i4"),
+    ("challenges_id", "<i4"),
+]
+
+# 游戏汇总列（每局一行）
+GAME_COLUMNS = [
+    ("game_id", "<i4"),
+    ("total_years", "<i2"),
+    ("victory", "<i1"),
+    ("initial_country", "<i2"),
+    ("initial_shoreline", "<i2"),
+    ("final_country", "<i2"),
+    ("final_shoreline", "<i2"),
+    ("reason_id", "<i4"),
+]
+
+STRING_TABLE_FILE = "strings.jsonl"
+META_FILE = "meta.json"
+
+
+def _column_path(directory: str, table: str, column: str) -> str:
+    return os.path.join(directory, f"{table}.{column}.bin")
+
+
+def _read_meta(directory: str) -> Dict[str, Any]:
+    with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class TrajectoryStoreWriter:
+    """轨迹存储写入器（追加模式）
+
+    同时实现了记录写入器接口（begin_game/write_year/end_game/close），
+    可直接挂接到GameState上边玩边写。
+    """
+
+    def __init__(self, directory: str, buffer_rows: int = 65536):
+        """
+        打开或创建轨迹存储
+
+        Args:
+            directory: 存储目录
+            buffer_rows: 缓冲多少行后写入磁盘
+        """
+        self.directory = directory
+        self.buffer_rows = max(1, buffer_rows)
+        os.makedirs(directory, exist_ok=True)
+
+        self._strings: Dict[str, int] = {}
+        self._pending_strings: List[str] = []
+        self._year_buffer: Dict[str, List[int]] = {name: [] for name, _ in YEAR_COLUMNS}
+        self._game_buffer: Dict[str, List[int]] = {name: [] for name, _ in GAME_COLUMNS}
+        self.current_game_id = None
+
+        meta_path = os.path.join(directory, META_FILE)
+        if os.path.exists(meta_path):
+            meta = _read_meta(directory)
+            if meta.get("version") != STORE_VERSION:
+                raise ValueError(f"不支持的轨迹存储版本: {meta.get('version')}")
+            self.next_game_id = meta.get("next_game_id", 0)
+            strings_path = os.path.join(directory, STRING_TABLE_FILE)
+            if os.path.exists(strings_path):
+                with open(strings_path, "r", encoding="utf-8") as f:
+                    for index, line in enumerate(f):
+                        self._strings[json.loads(line)] = index
+        else:
+            self.next_game_id = 0
+            self._write_meta()
+
+        logger.info(f"轨迹存储已打开: {directory} (已有字符串{len(self._strings)}条, 下一局编号{self.next_game_id})")
+
+    def intern(self, text: Optional[str]) -> int:
+        """
+        将文本加入字符串表并返回编号（相同文本只保存一次）
+
+        Args:
+            text: 文本
+
+        Returns:
+            字符串编号
+        """
+        text = text or ""
+        string_id = self._strings.get(text)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings[text] = string_id
+            self._pending_strings.append(text)
+        return string_id
+
+    def new_game_id(self) -> int:
+        """分配一个新的游戏编号"""
+        game_id = self.next_game_id
+        self.next_game_id += 1
+        return game_id
+
+    def add_year(self, game_id: int, record: Dict[str, Any]):
+        """
+        添加一行年度轨迹
+
+        Args:
+            game_id: 存储内的游戏编号
+            record: export_to_json格式的年度记录字典
+        """
+        judge_scores = record.get("judge_scores", {})
+        score_changes = record.get("score_changes", {})
+        actions = record.get("country_actions", {})
+        shore = record.get("shore_response", {})
+        events = record.get("random_events", [])
+
+        row = {
+            "game_id": game_id,
+            "year": record.get("year", 0),
+            "country_score": record.get("country_score", 0),
+            "shoreline_score": record.get("shoreline_score", 0),
+            "first_country": judge_scores.get("first_country", 0),
+            "first_shoreline": judge_scores.get("first_shoreline", 0),
+            "second_country": judge_scores.get("second_country", 0),
+            "second_shoreline": judge_scores.get("second_shoreline", 0),
+            "country_change": score_changes.get("country", 0),
+            "shoreline_change": score_changes.get("shoreline", 0),
+            "random_country_impact": score_changes.get("random_country_impact", 0),
+            "random_shoreline_impact": score_changes.get("random_shoreline_impact", 0),
+            "event_count": sum(1 for e in events if e.get("occurred", True)),
+            "action_1_id": self.intern(actions.get("action_1")),
+            "action_2_id": self.intern(actions.get("action_2")),
+            "opportunities_id": self.intern(shore.get("opportunities")),
+            "challenges_id": self.intern(shore.get("challenges")),
+        }
+        for name, value in row.items():
+            self._year_buffer[name].append(value)
+
+        if len(self._year_buffer["game_id"]) >= self.buffer_rows:
+            self.flush()
+
+    def add_game(self, game_id: int, summary: Dict[str, Any]):
+        """
+        添加一行游戏汇总
+
+        Args:
+            game_id: 存储内的游戏编号
+            summary: get_game_summary()格式的游戏总结
+        """
+        row = {
+            "game_id": game_id,
+            "total_years": summary.get("total_years", 0),
+            "victory": 1 if summary.get("victory") else 0,
+            "initial_country": summary.get("initial_scores", {}).get("country", 0),
+            "initial_shoreline": summary.get("initial_scores", {}).get("shoreline", 0),
+            "final_country": summary.get("final_scores", {}).get("country", 0),
+            "final_shoreline": summary.get("final_scores", {}).get("shoreline", 0),
+            "reason_id": self.intern(summary.get("game_over_reason")),
+        }
+        for name, value in row.items():
+            self._game_buffer[name].append(value)
+
+    def add_export(self, data: Dict[str, Any]) -> int:
+        """
+        导入一局export_to_json格式的游戏数据
+
+        Args:
+            data: 游戏数据字典（包含game_summary和yearly_records）
+
+        Returns:
+            分配的游戏编号
+        """
+        game_id = self.new_game_id()
+        for record in data.get("yearly_records", []):
+            self.add_year(game_id, record)
+        self.add_game(game_id, data.get("game_summary", {}))
+        return game_id
+
+    # ---- 记录写入器接口 ----
+
+    def begin_game(self, game_id: Any = None):
+        """开始一局新游戏（外部编号不使用，统一分配存储内编号）"""
+        self.current_game_id = self.new_game_id()
+
+    def write_year(self, record: YearlyRecord):
+        """写入一条年度记录"""
+        if self.current_game_id is None:
+            self.begin_game()
+        self.add_year(self.current_game_id, yearly_record_to_dict(record))
+
+    def end_game(self, summary: Dict[str, Any]):
+        """写入游戏汇总"""
+        if self.current_game_id is None:
+            self.begin_game()
+        self.add_game(self.current_game_id, summary)
+        self.current_game_id = None
+
+    # ---- 持久化 ----
+
+    def _write_meta(self):
+        meta = {
+            "version": STORE_VERSION,
+            "next_game_id": self.next_game_id,
+            "year_columns": YEAR_COLUMNS,
+            "game_columns": GAME_COLUMNS,
+        }
+        tmp_path = os.path.join(self.directory, META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, os.path.join(self.directory, META_FILE))
+
+    def _flush_table(self, table: str, columns, buffer: Dict[str, List[int]]):
+        if not buffer[columns[0][0]]:
+            return
+        for name, dtype in columns:
+            values = np.asarray(buffer[name], dtype=np.int64)
+            info = np.iinfo(np.dtype(dtype))
+            values = np.clip(values, info.min, info.max).astype(dtype)
+            with open(_column_path(self.directory, table, name), "ab") as f:
+                values.tofile(f)
+            buffer[name] = []
+
+    def flush(self):
+        """将缓冲的字符串和轨迹行写入磁盘"""
+        if self._pending_strings:
+            with open(os.path.join(self.directory, STRING_TABLE_FILE), "a", encoding="utf-8") as f:
+                for text in self._pending_strings:
+                    f.write(json.dumps(text, ensure_ascii=False) + "\n")
+            self._pending_strings = []
+        self._flush_table("years", YEAR_COLUMNS, self._year_buffer)
+        self._flush_table("games", GAME_COLUMNS, self._game_buffer)
+        self._write_meta()
+
+    def close(self):
+        """刷新缓冲区"""
+        self.flush()
+        logger.info(f"轨迹存储已写入: {self.directory} (共{self.next_game_id}局)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class TrajectoryStore:
+    """只读轨迹存储，各列以内存映射的NumPy数组提供"""
+
+    def __init__(self, directory: str):
+        """
+        打开轨迹存储
+
+        Args:
+            directory: 存储目录
+        """
+        self.directory = directory
+        meta = _read_meta(directory)
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(f"不支持的轨迹存储版本: {meta.get('version')}")
+        self.years = self._map_table("years", meta["year_columns"])
+        self.games = self._map_table("games", meta["game_columns"])
+        self._strings: Optional[List[str]] = None
+        self._string_ids: Optional[Dict[str, int]] = None
+
+    def _map_table(self, table: str, columns) -> Dict[str, np.ndarray]:
+        arrays = {}
+        for name, dtype in columns:
+            path = _column_path(self.directory, table, name)
+            itemsize = np.dtype(dtype).itemsize
+            rows = os.path.getsize(path) // itemsize if os.path.exists(path) else 0
+            if rows == 0:
+                arrays[name] = np.empty(0, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+        # 写入中途被读取时各列长度可能不一致，按最短列对齐
+        length = min((len(a) for a in arrays.values()), default=0)
+        return {name: array[:length] for name, array in arrays.items()}
+
+    def __len__(self) -> int:
+        return len(self.years["game_id"])
+
+    @property
+    def num_games(self) -> int:
+        return len(self.games["game_id"])
+
+    @property
+    def strings(self) -> List[str]:
+        """字符串表（首次访问时加载）"""
+        if self._strings is None:
+            self._strings = []
+            path = os.path.join(self.directory, STRING_TABLE_FILE)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    self._strings = [json.loads(line) for line in f]
+        return self._strings
+
+    def string(self, string_id: int) -> str:
+        """根据编号获取文本"""
+        return self.strings[int(string_id)]
+
+    def string_id(self, text: str) -> Optional[int]:
+        """根据文本获取编号（不存在时返回None）"""
+        if self._string_ids is None:
+            self._string_ids = {text: index for index, text in enumerate(self.strings)}
+        return self._string_ids.get(text)
+
+    def game_rows(self, game_id: int) -> np.ndarray:
+        """获取某局游戏在年度轨迹中的行号"""
+        return np.flatnonzero(self.years["game_id"] == game_id)
+
+
+def import_export_files(writer: TrajectoryStoreWriter, paths: Iterable[str]) -> int:
+    """
+    将export_to_json导出的JSON文件（如history/*.json, game_001.json）导入轨迹存储
+
+    Args:
+        writer: 轨迹存储写入器
+        paths: JSON文件路径列表
+
+    Returns:
+        导入的游戏局数
+    """
+    imported = 0
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"跳过无法读取的记录文件 {path}: {e}")
+            continue
+        if "yearly_records" not in data:
+            continue
+        writer.add_export(data)
+        imported += 1
+    writer.flush()
+    logger.info(f"已导入{imported}局游戏到轨迹存储")
+    return imported
+
+
+def import_jsonl_stream(writer: TrajectoryStoreWriter, path: str) -> int:
+    """
+    将JsonlRecordWriter生成的流式记录导入轨迹存储
+
+    Args:
+        writer: 轨迹存储写入器
+        path: JSONL文件路径（支持.gz）
+
+    Returns:
+        导入的游戏局数
+    """
+    id_map: Dict[Any, int] = {}
+    imported = 0
+    for entry in iter_jsonl_records(path):
+        source_id = entry.get("game_id")
+        if source_id not in id_map:
+            id_map[source_id] = writer.new_game_id()
+        game_id = id_map[source_id]
+        if entry.get("type") == "year":
+            writer.add_year(game_id, entry)
+        elif entry.get("type") == "summary":
+            writer.add_game(game_id, entry.get("game_summary", {}))
+            # 同一编号再次出现时视为新的一局
+            del id_map[source_id]
+            imported += 1
+    writer.flush()
+    logger.info(f"已从流式记录导入{imported}局游戏到轨迹存储")
+    return imported
@@ -0,0 +1,262 @@
+"""
+向量化蒙特卡洛模拟
+用NumPy数组同步推进G局按表博弈：每年按策略抽取参考评分表中的行动，
+向量化地抽取随机事件（含按海岸线状态的灾害概率修正），加上年度奖励并截断到0-100，
+再按is_game_over的顺序用掩码判定结束，语义与GameState一致，用于校准和敏感性分析
+"""
+
+import time
+import logging
+from typing import Dict, Any, Tuple
+
+import numpy as np
+
+from .random_events import RandomEventSystem
+from .reference_table import ActionPolicy, ReferenceTable
+
+logger = logging.getLogger(__name__)
+
+# 结果编码
+OUTCOME_IN_PROGRESS = -1
+OUTCOME_VICTORY = 0
+OUTCOME_FAILURE = 1
+OUTCOME_TIMEOUT = 2
+OUTCOME_NAMES = {OUTCOME_VICTORY: "victory", OUTCOME_FAILURE: "failure", OUTCOME_TIMEOUT: "timeout"}
+
+
+def advance_scores(country: np.ndarray, shoreline: np.ndarray, country_change, shoreline_change,
+                   annual_bonus: int) -> Tuple[np.ndarray, np.ndarray]:
+    """一年的分数更新：加上变化和年度奖励后截断到0-100（同GameState.update_scores）"""
+    return (np.clip(country + country_change + annual_bonus, 0, 100),
+            np.clip(shoreline + shoreline_change + annual_bonus, 0, 100))
+
+
+def check_game_over(country: np.ndarray, shoreline: np.ndarray, year: int, max_years: int,
+                    victory_threshold: int, failure_threshold: int) -> np.ndarray:
+    """
+    按is_game_over的判定顺序（胜利、失败、超时）返回结果编码
+
+    Args:
+        country: 国家分数（任意形状）
+        shoreline: 海岸线分数（形状同country）
+        year: 已进行的年数
+        max_years: 最大年数
+        victory_threshold: 胜利阈值
+        failure_threshold: 失败阈值
+
+    Returns:
+        与country形状相同的结果编码（未结束为OUTCOME_IN_PROGRESS）
+    """
+    outcome = np.full(np.shape(country), OUTCOME_IN_PROGRESS, dtype=np.int8)
+    victory = country >= victory_threshold
+    failure = ~victory & (shoreline < failure_threshold)
+    outcome[victory] = OUTCOME_VICTORY
+    outcome[failure] = OUTCOME_FAILURE
+    if year >= max_years:
+        outcome[~victory & ~failure] = OUTCOME_TIMEOUT
+    return outcome
+
+
+def _categorical(distribution: Dict[Tuple[int, int], float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """把{(国家变化, 海岸线变化): 概率}转为逆变换抽样用的(累积概率, 国家变化, 海岸线变化)"""
+    keys = sorted(distribution)
+    cumulative = np.cumsum([distribution[key] for key in keys])
+    return (cumulative / cumulative[-1],
+            np.array([key[0] for key in keys], dtype=np.int64),
+            np.array([key[1] for key in keys], dtype=np.int64))
+
+
+def _draw(table: Tuple[np.ndarray, np.ndarray, np.ndarray], uniforms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """按均匀随机数做逆变换抽样"""
+    cumulative, country, shoreline = table
+    index = np.minimum(np.searchsorted(cumulative, uniforms, side="right"), len(cumulative) - 1)
+    return country[index], shoreline[index]
+
+
+class VectorizedEventSampler:
+    """随机事件总影响的向量化抽样
+
+    一年内各事件相互独立，总影响的精确分布只取决于海岸线所在的灾害修正分档
+    （RandomEventSystem.impact_distribution，使用预设影响值），
+    因此每局每年只需一个均匀随机数即可按该分布抽样，与逐事件抽样同分布。
+    """
+
+    def __init__(self, disaster_probability_modifier: float = 1.0):
+        """
+        初始化抽样器
+
+        Args:
+            disaster_probability_modifier: 全局灾害概率系数
+        """
+        event_system = RandomEventSystem(use_llm_evaluation=False,
+                                         disaster_probability_modifier=disaster_probability_modifier)
+        # 修正因子相同的分数共享同一分布
+        modifiers = [event_system.get_disaster_probability_modifier(score) for score in range(101)]
+        distinct = sorted(set(modifiers))
+        self.band_of_score = np.array([distinct.index(modifier) for modifier in modifiers])
+        self.bands = [_categorical(event_system.impact_distribution(modifiers.index(modifier)))
+                      for modifier in distinct]
+
+    def sample(self, shoreline_scores: np.ndarray, rng: np.random.Generator,
+               uniforms: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        抽取一年的随机事件总影响
+
+        Args:
+            shoreline_scores: 各局年初的海岸线分数
+            rng: NumPy随机数生成器
+            uniforms: 预先抽好的[0, 1)均匀随机数（可选，用于固定事件种子的重放）
+
+        Returns:
+            (各局国家影响, 各局海岸线影响)
+        """
+        size = len(shoreline_scores)
+        if uniforms is None:
+            uniforms = rng.random(size)
+        country = np.zeros(size, dtype=np.int64)
+        shoreline = np.zeros(size, dtype=np.int64)
+        band = self.band_of_score[np.clip(shoreline_scores, 0, 100)]
+        for index, table in enumerate(self.bands):
+            mask = band == index
+            if mask.any():
+                country[mask], shoreline[mask] = _draw(table, uniforms[mask])
+        return country, shoreline
+
+
+class VectorizedSimulator:
+    """按表博弈的批量模拟器"""
+
+    def __init__(self, policy: ActionPolicy = None, annual_bonus: int = 1, max_years: int = 25,
+                 victory_threshold: int = 100, failure_threshold: int = 75,
+                 initial_country_score: int = 60, initial_shoreline_score: int = 100,
+                 enable_random_events: bool = True, disaster_probability_modifier: float = 1.0,
+                 table: ReferenceTable = None):
+        """
+        初始化模拟器
+
+        Args:
+            policy: 行动策略（默认在参考评分表中均匀随机选择）
+            annual_bonus: 每年自动增加的分数
+            max_years: 最大年数
+            victory_threshold: 胜利阈值（国家分数）
+            failure_threshold: 失败阈值（海岸线分数）
+            initial_country_score: 初始国家分数
+            initial_shoreline_score: 初始海岸线分数
+            enable_random_events: 是否启用随机事件（使用预设影响值）
+            disaster_probability_modifier: 全局灾害概率系数
+            table: 参考评分表（未提供policy时使用）
+        """
+        if policy is None:
+            policy = ActionPolicy(table or ReferenceTable.load())
+        self.policy = policy
+        self.annual_bonus = annual_bonus
+        self.max_years = max_years
+        self.victory_threshold = victory_threshold
+        self.failure_threshold = failure_threshold
+        self.initial_country_score = initial_country_score
+        self.initial_shoreline_score = initial_shoreline_score
+        self.enable_random_events = enable_random_events
+        self.event_sampler = VectorizedEventSampler(disaster_probability_modifier)
+
+        # 两个行动按表评分的总变化分布
+        self._action_table = _categorical(policy.delta_distribution())
+
+    def _action_deltas(self, size: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """按策略抽取两个行动，返回各局的(国家变化, 海岸线变化)"""
+        return _draw(self._action_table, rng.random(size))
+
+    def _check_game_over(self, country: np.ndarray, shoreline: np.ndarray, year: int) -> np.ndarray:
+        """按is_game_over的判定顺序返回结果编码（未结束为-1）"""
+        return check_game_over(country, shoreline, year, self.max_years,
+                               self.victory_threshold, self.failure_threshold)
+
+    def simulate_batch(self, num_games: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """
+        同步模拟一批游戏
+
+        Args:
+            num_games: 游戏局数
+            rng: NumPy随机数生成器
+
+        Returns:
+            {"outcome": 结果编码, "years": 游戏时长, "final_country", "final_shoreline": 最终分数}
+        """
+        outcome = np.full(num_games, OUTCOME_IN_PROGRESS, dtype=np.int8)
+        years = np.zeros(num_games, dtype=np.int16)
+        final_country = np.full(num_games, self.initial_country_score, dtype=np.int16)
+        final_shoreline = np.full(num_games, self.initial_shoreline_score, dtype=np.int16)
+
+        # 只对未结束的局推进，active为这些局在结果数组中的下标
+        active = np.arange(num_games)
+        country = final_country.astype(np.int64)
+        shoreline = final_shoreline.astype(np.int64)
+        year = 0
+        while True:
+            ended = self._check_game_over(country, shoreline, year)
+            done = ended != OUTCOME_IN_PROGRESS
+            if done.any():
+                index = active[done]
+                outcome[index] = ended[done]
+                years[index] = year
+                final_country[index] = country[done]
+                final_shoreline[index] = shoreline[done]
+                keep = ~done
+                active, country, shoreline = active[keep], country[keep], shoreline[keep]
+            if len(active) == 0:
+                break
+
+            year += 1
+            country_change, shoreline_change = self._action_deltas(len(active), rng)
+            if self.enable_random_events:
+                random_country, random_shoreline = self.event_sampler.sample(shoreline, rng)
+                country_change += random_country
+                shoreline_change += random_shoreline
+            country, shoreline = advance_scores(country, shoreline, country_change, shoreline_change,
+                                                self.annual_bonus)
+
+        return {"outcome": outcome, "years": years,
+                "final_country": final_country, "final_shoreline": final_shoreline}
+
+    def run(self, num_games: int, seed: int = None, batch_size: int = 250000,
+            return_arrays: bool = False) -> Dict[str, Any]:
+        """
+        模拟多局游戏并汇总
+
+        Args:
+            num_games: 游戏局数
+            seed: 随机种子（可选）
+            batch_size: 每批同步模拟的局数（控制内存占用）
+            return_arrays: 是否在结果中附带每局的结果数组
+
+        Returns:
+            {"games", "victory", "failure", "timeout": 概率, "counts": 各结果局数,
+             "expected_years", "end_year_distribution", "average_final_country_score",
+             "average_final_shoreline_score", "elapsed": 耗时（秒）}
+        """
+        start = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        batches = []
+        remaining = num_games
+        while remaining > 0:
+            size = min(batch_size, remaining)
+            batches.append(self.simulate_batch(size, rng))
+            remaining -= size
+        arrays = {key: np.concatenate([batch[key] for batch in batches]) for key in batches[0]}
+
+        counts = np.bincount(arrays["outcome"], minlength=3)
+        result = {
+            "games": num_games,
+            "counts": {name: int(counts[code]) for code, name in OUTCOME_NAMES.items()},
+            "expected_years": float(arrays["years"].mean()),
+            "end_year_distribution": (np.bincount(arrays["years"], minlength=self.max_years + 1)
+                                      / num_games).tolist(),
+            "average_final_country_score": float(arrays["final_country"].mean()),
+            "average_final_shoreline_score": float(arrays["final_shoreline"].mean()),
+        }
+        for code, name in OUTCOME_NAMES.items():
+            result[name] = float(counts[code] / num_games)
+        result["elapsed"] = time.perf_counter() - start
+        if return_arrays:
+            result["arrays"] = arrays
+        logger.info(f"向量化模拟{num_games}局完成: 胜利率={result['victory']:.2%}, 耗时{result['elapsed']:.2f}秒")
+        return result
@@ -0,0 +1,72 @@
+"""
+测试共用的LLM接口替身
+FakeCompletions模拟chat.completions接口（子类按消息给出回复），fake_client把替身绑定到LLMClient
+"""
+
+import os
+import sys
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, List
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.llm_client import LLMClient
+from src.prompt_templates import PromptRegistry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REGISTRY = PromptRegistry(os.path.join(ROOT, "prompt"))
+REF_TABLE = REGISTRY.text("ref_scoring_table")
+
+
+def completion(*contents: str, usage: Any = None) -> SimpleNamespace:
+    """构造chat.completions的回复对象（每个内容一个choice）"""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))
+                                    for content in contents], usage=usage)
+
+
+class FakeCompletions:
+    """
+    chat.completions接口替身：线程安全地记录每次请求（{"messages": 消息, **其余参数}），
+    按n参数返回多个choice；子类实现reply，需要时实现usage
+    """
+    def __init__(self):
+        self.calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def reply(self, messages: List[Dict[str, str]]) -> str:
+        raise NotImplementedError
+
+    def usage(self, messages: List[Dict[str, str]]) -> Any:
+        return None
+
+    def create(self, model, messages, temperature, max_tokens, **options):
+        with self._lock:
+            self.calls.append({"messages": messages, **options})
+        return completion(*(self.reply(messages) for _ in range(options.get("n", 1))), usage=self.usage(messages))
+
+
+class ScriptedCompletions(FakeCompletions):
+    """按顺序返回预设回复"""
+    def __init__(self, replies: List[str]):
+        super().__init__()
+        self.replies = list(replies)
+
+    def reply(self, messages):
+        return self.replies.pop(0)
+
+
+def fake_client(completions: FakeCompletions, **options) -> LLMClient:
+    """
+    绑定到接口替身的LLM客户端
+
+    Args:
+        completions: chat.completions接口替身
+        **options: LLMClient的其他参数（默认使用prompt/下的模板）
+
+    Returns:
+        LLM客户端
+    """
+    options.setdefault("prompt_registry", REGISTRY)
+    client = LLMClient(api_key="test_key", model="m", **options)
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return client
@@ -0,0 +1,144 @@
+"""
+行动文本模糊索引测试脚本
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.action_index import ActionIndex
+from src.reference_table import ReferenceTable
+from src.response_cache import LLMResponseCache
+from src.llm_client import LLMClient
+from src.sweep import sweep_from_spec
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TABLE_PATH = os.path.join(ROOT, "prompt", "ref_scoring_table.txt")
+
+def test_paraphrase_lookup():
+    """测试改写的行动映射到规范行动，不同行动不误配"""
+    print("🔍 测试模糊查找...")
+
+    index = ActionIndex.from_reference_table(ReferenceTable.load(TABLE_PATH))
+    assert len(index) == 11
+    paraphrases = {
+        "Promote public transit": "promote public transportation",
+        "promote public transport": "promote public transportation",
+        "Promote the use of public transportation": "promote public transportation",
+        "Close factories.": "close some factories",
+        "Close the factories": "close some factories",
+        "develop the fisheries industry": "develop fisheries",
+        "Use organic fertilizers": "use organic fertilizer",
+        "Expand mining operations": "mining operations",
+        "support fossil fuel": "support fossil fuels",
+        "DEVELOP INDUSTRY": "develop industry",
+    }
+    for text, expected in paraphrases.items():
+        canonical, similarity = index.lookup(text)
+        print(f"   {text!r} -> {canonical!r} ({similarity:.2f})")
+        assert canonical == expected
+    assert index.canonical("Launch a space program") is None
+    assert index.canonical("Launch a space program", default="x") == "x"
+    # 只合并近似重复：实词相差太多、换成无关词的改写不匹配
+    assert index.canonical("support fossil fuel industry and exports") is None
+    assert index.canonical("build green parks") is None and index.canonical("close some schools") is None
+
+    # 新加入的行动成为规范行动，其改写也能命中
+    index.add("Implement coastal erosion control measures")
+    assert index.canonical("implement coastal erosion control") == "implement coastal erosion control measures"
+
+    stats = index.stats()
+    assert stats["exact_hits"] == 1 and stats["fuzzy_hits"] == 10
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        index.lookup("Promote public transit")
+    per_lookup_us = (time.perf_counter() - start) * 1000
+    print(f"   重复查找: {per_lookup_us:.1f}微秒/次")
+    assert per_lookup_us < 1000
+
+    print("✅ 模糊查找正常")
+
+def test_negated_actions_do_not_match():
+    """测试否定/反义的改写不映射到相反的规范行动"""
+    print("🔍 测试否定改写不误配...")
+
+    index = ActionIndex.from_reference_table(ReferenceTable.load(TABLE_PATH), threshold=0.5)
+    negated = ["reforestation", "Halt deforestation", "stop urban expansion", "Ban mining operations",
+               "open some factories", "reduce support for fossil fuels", "stop developing industry",
+               "close industry", "limit urban expansion", "no more mining operations"]
+    for text in negated:
+        canonical, _ = index.lookup(text)
+        print(f"   {text!r} -> {canonical!r}")
+        assert canonical is None
+    # 加入的否定行动成为独立的规范行动
+    index.add("Stop urban expansion")
+    assert index.canonical("stop the urban expansion") == "stop urban expansion"
+    assert index.canonical("urban expansion") == "urban expansion"
+
+    # 裁判缓存：否定改写不命中相反行动的评分
+    cache = LLMResponseCache()
+    client = LLMClient(api_key="test_key", model="m", response_cache=cache,
+                       action_index=ActionIndex.from_reference_table(ReferenceTable.load(TABLE_PATH)))
+    requests = []
+    reply = "first_country_rank: 10\nfirst_shoreline_rank: -10\nsecond_country_rank: 3\nsecond_shoreline_rank: -3"
+    client._request_llm = lambda prompt, system_prompt=None, max_retries=5: requests.append(prompt) or reply
+    client.call_judge_llm("ACTION_1: urban expansion\nACTION_2: mining operations", "")
+    for actions in ("ACTION_1: stop urban expansion\nACTION_2: mining operations",
+                    "ACTION_1: urban expansion\nACTION_2: ban mining operations",
+                    "ACTION_1: halt urban expansion\nACTION_2: Ban mining operations."):
+        client.call_judge_llm(actions, "")
+    assert len(requests) == 4 and cache.stats()["hits"] == 0
+    # 评分过的否定行动之后可以命中自己的缓存
+    client.call_judge_llm("ACTION_1: Stop urban expansion.\nACTION_2: mining operations", "")
+    assert len(requests) == 4 and cache.stats()["hits"] == 1
+
+    print("✅ 否定改写不误配")
+
+def test_judge_cache_hits_on_paraphrase():
+    """测试裁判调用按规范行动计算缓存键"""
+    print("🔍 测试改写行动命中评分缓存...")
+
+    cache = LLMResponseCache()
+    index = ActionIndex.from_reference_table(ReferenceTable.load(TABLE_PATH))
+    client = LLMClient(api_key="test_key", model="m", response_cache=cache, action_index=index)
+    requests = []
+    reply = "first_country_rank: -1\nfirst_shoreline_rank: 2\nsecond_country_rank: -3\nsecond_shoreline_rank: 4"
+    client._request_llm = lambda prompt, system_prompt=None, max_retries=5: requests.append(prompt) or reply
+
+    first = client.call_judge_llm("ACTION_1: Promote public transportation\nACTION_2: Close fisheries", "")
+    second = client.call_judge_llm("ACTION_1: promote public transit\nACTION_2: close the fisheries", "")
+    assert first == second
+    assert len(requests) == 1 and cache.stats()["hits"] == 1
+    # 实际发送的提示词保持原文
+    assert "Promote public transportation" in requests[0]
+
+    # 表中没有的行动评分后加入索引，之后它的改写也命中缓存
+    client.call_judge_llm("ACTION_1: Restore coastal wetlands\nACTION_2: Close fisheries", "")
+    client.call_judge_llm("ACTION_1: Restore coastal wetland.\nACTION_2: Close fisheries", "")
+    assert len(requests) == 2
+    assert client.canonicalize_actions("ACTION_1: unrelated words\nACTION_2: close fisheries") == \
+        "ACTION_1: unrelated words\nACTION_2: close fisheries"
+
+    spec = {"parameters": {"annual_bonus": [1]}, "fuzzy_actions": 0.6}
+    with tempfile.TemporaryDirectory() as tmp:
+        spec["results_path"] = os.path.join(tmp, "sweep.db")
+        sweep = sweep_from_spec(spec)
+        assert sweep.action_index is not None and sweep.action_index.threshold == 0.6
+        sweep.close()
+
+    print("✅ 改写行动命中评分缓存")
+
+def main():
+    """主测试函数"""
+    print("🌊 行动文本模糊索引测试")
+    print("=" * 50)
+    test_paraphrase_lookup()
+    test_negated_actions_do_not_match()
+    test_judge_cache_hits_on_paraphrase()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
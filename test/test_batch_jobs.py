@@ -0,0 +1,171 @@
+"""
+离线批处理任务模式测试脚本
+"""
+
+import sys
+import os
+import re
+import json
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.batch_jobs import (BatchCollector, BatchJobRunner, BatchLLMClient, LocalBatchWorker,
+                            read_batch_results)
+from src.llm_client import LLMClient
+from src.reference_table import ReferenceTable
+from src.game_controller import ShorlineEcologyGame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TABLE = ReferenceTable.load(os.path.join(ROOT, "prompt", "ref_scoring_table.txt"))
+ACTION_PATTERN = re.compile(r"ACTION_1: (.*)\nACTION_2: (.*)")
+
+def fake_reply(prompt):
+    """按提示词类型生成确定的回复"""
+    pairs = ACTION_PATTERN.findall(prompt)
+    if "You are the judge" in prompt:
+        scores = TABLE.judge_scores(*pairs[0])
+        return "\n".join(f"{key}_rank: {value}" for key, value in scores.items())
+    if "expert in shoreline ecology" in prompt:
+        return f"CHANCES: 机遇{pairs[0][0]}\nCHALLENGES: 挑战{pairs[0][1]}"
+    return "ACTION_1: develop industry\nACTION_2: close fisheries"
+
+def _make_games(client, count):
+    games = []
+    for _ in range(count):
+        game = ShorlineEcologyGame(llm_client=client, pause_between_years=False, use_llm_for_random_events=False)
+        game.enable_random_events = False
+        games.append(game)
+    return games
+
+def test_batch_rounds_match_sequential():
+    """测试批处理轮次推进与逐局运行结果一致，每年每个角色一轮"""
+    print("🔍 测试批处理推进...")
+
+    direct = LLMClient(api_key="test_key", model="m")
+    direct._request_llm = lambda prompt, system_prompt=None, max_retries=5: fake_reply(prompt)
+    sequential = [game.run_single_game() for game in _make_games(direct, 3)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        worker = LocalBatchWorker(lambda body: fake_reply(body["messages"][-1]["content"]))
+        collector = BatchCollector(worker, work_dir=tmp, model="m")
+        games = _make_games(BatchLLMClient(collector), 3)
+        summaries = BatchJobRunner(games, collector).run()
+
+        for a, b in zip(sequential, summaries):
+            assert (a["total_years"], a["final_scores"]) == (b["total_years"], b["final_scores"])
+        years = max(s["total_years"] for s in summaries)
+        stats = collector.stats()
+        print(f"   {years}年, 批处理统计: {stats}")
+        # 人类、裁判、海岸线各一轮
+        assert stats["rounds"] == 3 * years
+        assert stats["requests"] == 3 * sum(s["total_years"] for s in summaries)
+
+        with open(os.path.join(tmp, "round_00001_requests.jsonl"), "r", encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f]
+        assert len(requests) == 3
+        assert requests[0]["url"] == "/v1/chat/completions" and requests[0]["body"]["model"] == "m"
+        assert {r["custom_id"] for r in requests} == {"r1-t0", "r1-t1", "r1-t2"}
+
+    print("✅ 批处理推进正常")
+
+def test_failed_items_retried_next_round():
+    """测试失败或缺失的请求在下一轮重试，超过次数后报错"""
+    print("🔍 测试批处理重试...")
+
+    attempts = {}
+    def flaky(body):
+        prompt = body["messages"][-1]["content"]
+        attempts[prompt] = attempts.get(prompt, 0) + 1
+        if prompt == "flaky" and attempts[prompt] < 3:
+            raise RuntimeError("rate limited")
+        if prompt == "broken":
+            raise RuntimeError("always fails")
+        return f"reply:{prompt}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        collector = BatchCollector(LocalBatchWorker(flaky), work_dir=tmp, max_retries=2, keep_files=False)
+        client = BatchLLMClient(collector)
+        outcomes = collector.run([lambda: client.call_llm("ok"), lambda: client.call_llm("flaky"),
+                                  lambda: client.call_llm("broken")])
+        assert outcomes[0] == ("reply:ok", None)
+        assert outcomes[1] == ("reply:flaky", None)
+        assert outcomes[2][0] is None and "always fails" in str(outcomes[2][1])
+        assert collector.stats()["rounds"] == 3
+        assert os.listdir(tmp) == []
+
+        # 不在任务中的调用作为单个任务提交
+        assert client.call_llm("direct") == "reply:direct"
+
+        path = os.path.join(tmp, "results.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"custom_id": "a", "response": {"status_code": 500, "body": {}}, "error": None}) + "\n")
+            f.write(json.dumps({"custom_id": "b", "response": {"status_code": 200, "body": {
+                "choices": [{"message": {"content": " hi "}}]}}, "error": None}) + "\n")
+        results = read_batch_results(path)
+        assert results["a"] == (None, "HTTP 500") and results["b"] == ("hi", None)
+
+    print("✅ 批处理重试正常")
+
+def structured_reply(body):
+    """JSON结构化回复：与fake_reply的内容相同，请求必须带response_format"""
+    assert body["response_format"] == {"type": "json_object"}
+    prompt = body["messages"][-1]["content"]
+    pairs = ACTION_PATTERN.findall(prompt)
+    if "You are the judge" in prompt:
+        return json.dumps(TABLE.judge_scores(*pairs[0]))
+    if "expert in shoreline ecology" in prompt:
+        return json.dumps({"opportunities": f"机遇{pairs[0][0]}", "challenges": f"挑战{pairs[0][1]}"})
+    return json.dumps({"action_1": "urban expansion", "action_2": "close fisheries"})
+
+def test_structured_output_in_batches():
+    """测试结构化回复的response_format和追问对话写入批处理请求"""
+    print("🔍 测试批处理结构化回复...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        collector = BatchCollector(LocalBatchWorker(structured_reply), work_dir=tmp, model="m")
+        games = _make_games(BatchLLMClient(collector, structured_output=True), 2)
+        summaries = BatchJobRunner(games, collector).run()
+        for game in games:
+            # urban expansion的+10/-10通过校验，没有追问
+            assert game.game_state.yearly_records[0].judge_scores == TABLE.judge_scores("urban expansion",
+                                                                                        "close fisheries")
+            assert game.llm_client.structured_stats["judge"]["reasks"] == 0
+        assert summaries[0]["total_years"] == summaries[1]["total_years"]
+
+        # 无效字段的追问带上此前的对话，一起写入下一轮请求
+        replies = iter([json.dumps({"first_country": 4, "first_shoreline": -5}),
+                        json.dumps({"second_country": -3, "second_shoreline": 4})])
+        collector = BatchCollector(LocalBatchWorker(lambda body: structured_reply(body) and next(replies)),
+                                   work_dir=tmp, model="m")
+        client = BatchLLMClient(collector, structured_output=True)
+        [(scores, error)] = collector.run([lambda: client.call_judge_llm(
+            "ACTION_1: develop industry\nACTION_2: close fisheries", client.prompts.text("ref_scoring_table"))])
+        assert error is None and scores == TABLE.judge_scores("develop industry", "close fisheries")
+        with open(os.path.join(tmp, "round_00002_requests.jsonl"), "r", encoding="utf-8") as f:
+            [request] = [json.loads(line) for line in f]
+        assert [m["role"] for m in request["body"]["messages"]] == ["user", "assistant", "user"]
+        assert '"second_country": missing' in request["body"]["messages"][-1]["content"]
+
+        # 本地工作进程用同步客户端处理时同样转发对话和回复格式
+        calls = []
+        direct = LLMClient(api_key="test_key", model="m")
+        direct._request_llm = lambda prompt, system_prompt=None, max_retries=5, history=None, \
+            response_format=None: calls.append((prompt, system_prompt, history, response_format)) or "{}"
+        LocalBatchWorker.from_llm_client(direct).handler(request["body"])
+        prompt, system_prompt, history, response_format = calls[0]
+        assert prompt == request["body"]["messages"][-1]["content"] and len(history) == 2
+        assert response_format == {"type": "json_object"}
+
+    print("✅ 批处理结构化回复正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 离线批处理任务模式测试")
+    print("=" * 50)
+    test_batch_rounds_match_sequential()
+    test_failed_items_retried_next_round()
+    test_structured_output_in_batches()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
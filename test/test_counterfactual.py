@@ -0,0 +1,123 @@
+"""
+历史游戏反事实重新评分测试脚本
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_fakes import FakeCompletions, REF_TABLE, fake_client
+from src.response_cache import LLMResponseCache
+from src.trajectory_store import TrajectoryStore, TrajectoryStoreWriter, import_export_files
+from src.counterfactual import (CounterfactualRejudger, RecordedGame, action_pair_key, infer_annual_bonus,
+                                load_history_games, load_store_games, replay_game)
+from src.game_state import YearlyRecord
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_DIR = os.path.join(ROOT, "history")
+
+class GenerousJudge(FakeCompletions):
+    """新的评分标准下每个行动都+3国家、0海岸线"""
+    def reply(self, messages):
+        return "first_country_rank: 3\nfirst_shoreline_rank: 0\nsecond_country_rank: 3\nsecond_shoreline_rank: 0"
+
+def _record(year, country, shoreline, scores, events=(0, 0)):
+    return YearlyRecord(year=year, country_score=country, shoreline_score=shoreline,
+                        country_actions={"action_1": "develop industry", "action_2": "close fisheries"},
+                        shore_response={}, judge_scores=scores, random_events=[],
+                        country_change=scores["first_country"] + scores["second_country"],
+                        shoreline_change=scores["first_shoreline"] + scores["second_shoreline"],
+                        random_country_impact=events[0], random_shoreline_impact=events[1])
+
+def test_replay_matches_history():
+    """测试用记录的评分重算时与历史记录完全一致（含推断的年度奖励）"""
+    print("🔍 测试按记录评分重算...")
+
+    games = load_history_games(HISTORY_DIR)
+    assert len(games) == 8
+    bonuses = [infer_annual_bonus(game) for game in games]
+    assert bonuses.count(0) == 1 and bonuses.count(1) == 7
+    for game, bonus in zip(games, bonuses):
+        result = replay_game(game, [record.judge_scores for record in game.records], annual_bonus=bonus)
+        assert result["outcome"] == game.outcome, game.source
+        assert result["trajectory"] == [(r.country_score, r.shoreline_score) for r in game.records]
+
+    # 随机事件影响沿用记录，分数截断在0-100；记录的行动用完时仍未结束记为undetermined
+    scores = {"first_country": 4, "first_shoreline": -2, "second_country": -1, "second_shoreline": 3}
+    game = RecordedGame(source="manual", initial_country=95, initial_shoreline=99, outcome="victory",
+                        records=[_record(1, 100, 100, scores, events=(2, 1))])
+    result = replay_game(game, [scores])
+    assert result["outcome"] == "victory" and result["trajectory"] == [(100, 100)]
+    weaker = dict(scores, first_country=-2)
+    assert replay_game(game, [weaker])["outcome"] == "undetermined"
+
+    print("✅ 按记录评分重算正常")
+
+def test_rejudge_history():
+    """测试每组不同的行动只评分一次、重复运行命中缓存，并报告胜利率变化"""
+    print("🔍 测试反事实重新评分...")
+
+    games = load_history_games(HISTORY_DIR)
+    unique_pairs = {action_pair_key(record.country_actions) for game in games for record in game.records}
+    judge = GenerousJudge()
+    cache = LLMResponseCache()
+    rejudger = CounterfactualRejudger(fake_client(judge, response_cache=cache), REF_TABLE, workers=4)
+    report = rejudger.run(games)
+    print(f"   {report['games']}局, {report['unique_pairs']}组不同的行动, 胜利率 "
+          f"{report['baseline']['victory_rate']:.2%} -> {report['counterfactual']['victory_rate']:.2%}")
+    assert len(judge.calls) == report["unique_pairs"] == len(unique_pairs)
+    assert report["games"] == 8 and report["skipped_games"] == 0 and report["baseline_mismatches"] == 0
+    assert report["baseline"]["outcomes"] == {"victory": 2, "timeout": 6}
+    # 国家每年+6：超时的游戏都在25年内胜利；原来第3年胜利的游戏只记录了3年行动，无法判定
+    assert report["counterfactual"]["outcomes"] == {"victory": 7, "undetermined": 1}
+    assert abs(report["victory_rate_shift"] - 0.625) < 1e-9
+    assert report["transitions"] == {"timeout->victory": 6, "victory->undetermined": 1}
+    print(f"   平均评分变化: {report['mean_score_change']}")
+    assert report["mean_score_change"]["first_country"] > 0 and report["changed_pairs"] == len(unique_pairs)
+    detail = report["details"][0]
+    assert detail["counterfactual"]["years"] < detail["baseline"]["years"] == 18
+
+    # 同一份缓存：重复运行不再请求
+    CounterfactualRejudger(fake_client(judge, response_cache=cache), REF_TABLE).run(games)
+    assert len(judge.calls) == len(unique_pairs)
+
+    # 显式参数优先于推断的年度奖励
+    strict = CounterfactualRejudger(fake_client(judge, response_cache=cache), REF_TABLE, annual_bonus=0, max_years=5)
+    assert strict.game_settings(games[0]) == {"annual_bonus": 0, "max_years": 5,
+                                               "victory_threshold": 100, "failure_threshold": 75}
+    assert strict.run(games)["counterfactual"]["outcomes"] == {"timeout": 7, "undetermined": 1}
+
+    print("✅ 反事实重新评分正常")
+
+def test_trajectory_store_games():
+    """测试从轨迹存储读取的游戏与导出的JSON一致"""
+    print("🔍 测试轨迹存储...")
+
+    paths = sorted(os.path.join(HISTORY_DIR, name) for name in os.listdir(HISTORY_DIR) if name.endswith(".json"))
+    with tempfile.TemporaryDirectory() as tmp:
+        with TrajectoryStoreWriter(tmp) as writer:
+            import_export_files(writer, paths)
+        stored = load_store_games(TrajectoryStore(tmp))
+    exported = load_history_games(HISTORY_DIR)
+    assert len(stored) == len(exported)
+    for from_store, from_json in zip(stored, exported):
+        assert from_store.outcome == from_json.outcome
+        assert [r.judge_scores for r in from_store.records] == [r.judge_scores for r in from_json.records]
+        assert [action_pair_key(r.country_actions) for r in from_store.records] == \
+               [action_pair_key(r.country_actions) for r in from_json.records]
+        assert infer_annual_bonus(from_store) == infer_annual_bonus(from_json)
+
+    print("✅ 轨迹存储读取正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 反事实重新评分测试")
+    print("=" * 50)
+    test_replay_matches_history()
+    test_rejudge_history()
+    test_trajectory_store_games()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
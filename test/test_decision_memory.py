@@ -0,0 +1,108 @@
+"""
+人类LLM决策记忆测试脚本
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_fakes import FakeCompletions, fake_client
+from src.game_state import YearlyRecord
+from src.game_controller import ShorlineEcologyGame
+from src.decision_memory import DecisionMemory
+from src.prompt_profiles import count_tokens
+
+def _record(year, action_1="build a port", action_2="restore wetlands", events=(0, 0)):
+    return YearlyRecord(year=year, country_score=60 + year, shoreline_score=100 - year,
+                        country_actions={"action_1": action_1, "action_2": action_2}, shore_response={},
+                        judge_scores={"first_country": 4, "first_shoreline": -4,
+                                      "second_country": -1, "second_shoreline": 3},
+                        random_events=[], country_change=3, shoreline_change=-1,
+                        random_country_impact=events[0], random_shoreline_impact=events[1])
+
+class ScriptedGameLLM(FakeCompletions):
+    """记录人类LLM提示词，每年给出不同的长行动"""
+    def __init__(self):
+        super().__init__()
+        self.human_prompts = []
+    def reply(self, messages):
+        content = messages[-1]["content"]
+        if "You are the judge" in content:
+            return "first_country_rank: 1\nfirst_shoreline_rank: -1\nsecond_country_rank: -1\nsecond_shoreline_rank: 1"
+        if "shoreline ecology" in content:
+            return "CHANCES: tourism\nCHALLENGES: erosion"
+        self.human_prompts.append(content)
+        n = len(self.human_prompts)
+        return (f"ACTION_1: develop a {n}th coastal tourism district with new hotels and marinas\n"
+                f"ACTION_2: restore mangrove belt segment {n} along the northern coast")
+
+def test_rolling_memory():
+    """测试最近k年逐年列出、更早年份汇总，以及token上限"""
+    print("🔍 测试滚动记忆...")
+
+    memory = DecisionMemory(recent_years=2, max_tokens=400)
+    assert memory.render() == ""
+    for year in range(1, 6):
+        memory.observe(_record(year, events=(-2, -1) if year == 1 else (0, 0)))
+    text = memory.render()
+    print("   " + text.replace("\n", "\n   "))
+    lines = text.splitlines()
+    assert lines[0].startswith("Earlier (years 1-3): judged changes country +9, shoreline -3")
+    assert "random events country -2, shoreline -1" in lines[0] and "lowest shoreline 97" in lines[0]
+    assert lines[1].startswith("Most used earlier: build a port x3 (avg country +4, shoreline -4)")
+    assert lines[2].startswith("Year 4: build a port (country +4, shoreline -4)") and lines[3].startswith("Year 5")
+    assert memory.stats()["recent_years"] == 2 and memory.stats()["summary_years"] == 3
+
+    # 超出上限时逐步压缩，最终不超过上限
+    for budget in (80, 40, 10):
+        small = DecisionMemory(recent_years=3, max_tokens=budget)
+        for year in range(1, 30):
+            small.observe(_record(year, action_1=f"very long action description number {year} " * 3))
+        assert count_tokens(small.render()) <= budget
+        assert len(small.actions) <= small.max_tracked_actions
+
+    memory.rebuild([_record(1)])
+    assert memory.stats()["summary_years"] == 0 and memory.render().startswith("Year 1:")
+
+    print("✅ 滚动记忆正常")
+
+def test_prompt_length_constant():
+    """测试100年游戏中人类LLM提示词长度不随年数增长"""
+    print("🔍 测试提示词长度...")
+
+    completions = ScriptedGameLLM()
+    client = fake_client(completions)
+    memory = DecisionMemory(recent_years=3, max_tokens=160)
+    game = ShorlineEcologyGame(llm_client=client, pause_between_years=False, use_llm_for_random_events=False,
+                               annual_bonus=0, decision_memory=memory)
+    game.enable_random_events = False
+    game.game_state.max_years = 100
+    game.run_single_game(capture_snapshots=True)
+
+    prompts = completions.human_prompts
+    assert len(prompts) == 100
+    assert "decision_memory" not in prompts[0] and "Your earlier decisions" not in prompts[0]
+    assert "Year 1: develop a 1th coastal" in prompts[1]
+    tokens = [count_tokens(prompt) for prompt in prompts]
+    print(f"   第1年{tokens[0]}, 第5年{tokens[4]}, 第50年{tokens[49]}, 第100年{tokens[99]} tokens")
+    assert max(tokens[5:]) - min(tokens[5:]) <= 40
+    assert max(tokens) - tokens[0] <= memory.max_tokens + 40
+    assert "Earlier (years 1-96)" in prompts[99]
+
+    # 从快照继续时，记忆包含快照之前的年份
+    game.snapshots[10].restore(game)
+    game.begin_game()
+    assert memory.stats()["recent_years"] == 3 and memory.stats()["summary_years"] == 7
+
+    print("✅ 提示词长度不随年数增长")
+
+def main():
+    """主测试函数"""
+    print("🌊 决策记忆测试")
+    print("=" * 50)
+    test_rolling_memory()
+    test_prompt_length_constant()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
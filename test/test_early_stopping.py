@@ -0,0 +1,131 @@
+"""
+序贯提前停止测试脚本
+"""
+
+import sys
+import os
+import random
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.early_stopping import SequentialStopper, wilson_interval
+from src.stats_aggregator import GameStatsAggregator
+from src.game_controller import ShorlineEcologyGame
+
+def _run_until_stop(stopper, victory_prob, max_games, seed):
+    """用伯努利结果模拟多局游戏，返回(停止原因, 局数)"""
+    rng = random.Random(seed)
+    aggregator = GameStatsAggregator()
+    for _ in range(max_games):
+        victory = rng.random() < victory_prob
+        aggregator.update({"victory": victory, "total_years": 10,
+                           "final_scores": {"country": 80, "shoreline": rng.randint(60, 100)}})
+        reason = stopper.check(aggregator)
+        if reason is not None:
+            return reason, aggregator.total_games
+    return None, aggregator.total_games
+
+def test_wilson_interval():
+    """测试Wilson置信区间"""
+    print("🔍 测试Wilson置信区间...")
+
+    low, high = wilson_interval(50, 100)
+    print(f"   50/100: [{low:.4f}, {high:.4f}]")
+    assert abs(low - 0.4038) < 1e-3 and abs(high - 0.5962) < 1e-3
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(0, 20)
+    assert low < 1e-12 and 0 < high < 0.2
+
+    print("✅ Wilson置信区间正常")
+
+def test_sprt_decisions():
+    """测试SPRT对明显高于/低于目标的胜利率能提前做出正确判断"""
+    print("🔍 测试SPRT提前停止...")
+
+    stopper = SequentialStopper(target_victory_rate=0.5, margin=0.1, min_games=5)
+    wrong = 0
+    spent = []
+    for seed in range(200):
+        reason, games = _run_until_stop(stopper, 0.8, 500, seed)
+        wrong += reason != "above_target"
+        spent.append(games)
+        reason, games = _run_until_stop(stopper, 0.2, 500, seed + 1000)
+        wrong += reason != "below_target"
+        spent.append(games)
+
+    average = sum(spent) / len(spent)
+    print(f"   平均运行局数: {average:.1f}/500, 错误判断: {wrong}/400")
+    assert wrong <= 20
+    assert average < 50
+
+    print("✅ SPRT提前停止正常")
+
+def test_ci_width_criterion():
+    """测试置信区间宽度准则（含海岸线分数均值）"""
+    print("🔍 测试置信区间宽度准则...")
+
+    stopper = SequentialStopper(ci_width=0.2, shoreline_ci_width=5, min_games=10)
+    reason, games = _run_until_stop(stopper, 0.5, 1000, 7)
+    print(f"   停止原因: {reason}, 局数: {games}")
+    assert reason == "precise"
+    # 胜利率约0.5时宽度0.2约需92局；海岸线分数标准差约12，宽度5约需85局
+    assert 80 <= games <= 120
+
+    try:
+        SequentialStopper()
+        assert False, "未设置任何准则时应报错"
+    except ValueError:
+        pass
+    assert SequentialStopper.from_config(None) is None
+
+    print("✅ 置信区间宽度准则正常")
+
+def test_run_multiple_games_early_stop():
+    """测试多次游戏提前停止并报告节省的局数（使用模拟LLM，不调用API）"""
+    print("🔍 测试多次游戏提前停止...")
+
+    class MockLLMClient:
+        model = "mock"
+        def call_human_llm(self, **kwargs):
+            return {"action_1": "develop industry", "action_2": "close fisheries"}
+        def call_judge_llm(self, **kwargs):
+            return {"first_country": 4, "first_shoreline": -5, "second_country": -3, "second_shoreline": 4}
+        def call_shore_llm(self, country_actions):
+            return {"opportunities": "机遇", "challenges": "挑战"}
+
+    game = ShorlineEcologyGame(api_key="test_key", pause_between_years=False,
+                               use_llm_for_random_events=False, retain_records=False)
+    game.llm_client = MockLLMClient()
+    game.enable_random_events = False
+
+    stopper = SequentialStopper(target_victory_rate=0.5, margin=0.2, min_games=3)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            statistics = game.run_multiple_games(50, keep_detailed_results=False, early_stopping=stopper)
+        finally:
+            os.chdir(cwd)
+
+    report = statistics["early_stopping"]
+    print(f"   实际运行: {report['games_run']}局, 节省: {report['games_saved']}局, 原因: {report['reason']}")
+    # 模拟游戏每局都胜利，ln(0.7/0.3)*n >= ln(19) 时停止，即第4局
+    assert report["reason"] == "above_target"
+    assert statistics["total_games"] == 4
+    assert report["games_saved"] == 46
+    assert list(statistics.keys())[-1] == "detailed_results"
+
+    print("✅ 多次游戏提前停止正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 序贯提前停止测试")
+    print("=" * 50)
+    test_wilson_interval()
+    test_sprt_decisions()
+    test_ci_width_criterion()
+    test_run_multiple_games_early_stop()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+游戏快照与分支测试脚本
+"""
+
+import sys
+import os
+import glob
+import random
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.game_controller import ShorlineEcologyGame
+from src.game_snapshot import GameSnapshot
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class MockLLMClient:
+    """模拟LLM客户端：行动固定，记录调用次数"""
+    def __init__(self):
+        self.model = "mock"
+        self.calls = {"human": 0, "judge": 0, "shore": 0}
+    def call_human_llm(self, **kwargs):
+        self.calls["human"] += 1
+        return {"action_1": "develop industry", "action_2": "close fisheries"}
+    def call_judge_llm(self, country_actions, **kwargs):
+        self.calls["judge"] += 1
+        if "urban expansion" in country_actions:
+            return {"first_country": 10, "first_shoreline": -9, "second_country": 4, "second_shoreline": -5}
+        return {"first_country": 4, "first_shoreline": -5, "second_country": -3, "second_shoreline": 4}
+    def call_shore_llm(self, country_actions):
+        self.calls["shore"] += 1
+        return {"opportunities": f"机遇: {country_actions[:20]}", "challenges": "挑战"}
+
+def _create_game(client):
+    game = ShorlineEcologyGame(llm_client=client, pause_between_years=False,
+                               use_llm_for_random_events=False)
+    game.enable_random_events = True
+    return game
+
+def test_branches_share_prefix():
+    """测试从中途快照分支：前缀记录共享、不重新调用LLM，行动覆盖生效"""
+    print("🔍 测试快照分支...")
+
+    random.seed(7)
+    client = MockLLMClient()
+    game = _create_game(client)
+    game.run_single_game(capture_snapshots=True)
+    snapshot = game.snapshots[5]
+    prefix = snapshot.records
+    assert snapshot.year == 5 and len(prefix) == 5
+    assert game.game_state.yearly_records[:5] == list(prefix)
+
+    calls_before = dict(client.calls)
+    alternative = {"action_1": "urban expansion", "action_2": "develop industry"}
+    results = game.run_branches(snapshot, [{}, {6: alternative}])
+    records = game.game_state.yearly_records
+    # 最后一个分支的前缀记录与快照是同一批对象
+    assert all(a is b for a, b in zip(records[:5], prefix))
+    assert records[5].country_actions == alternative
+    assert records[4].year == 5 and records[5].year == 6
+    # 前5年不重新调用LLM，分支1第6年使用指定行动
+    human_calls = client.calls["human"] - calls_before["human"]
+    judge_calls = client.calls["judge"] - calls_before["judge"]
+    assert judge_calls == sum(r["total_years"] - 5 for r in results)
+    assert human_calls == judge_calls - 1
+    print(f"   分支结果: {[(r['outcome'], r['total_years']) for r in results]}")
+
+    print("✅ 快照分支正常")
+
+def test_same_rng_state_reproducible():
+    """测试恢复随机数状态后相同行动的分支完全一致"""
+    print("🔍 测试分支可复现...")
+
+    random.seed(8)
+    game = _create_game(MockLLMClient())
+    game.run_single_game(capture_snapshots=True)
+    snapshot = game.snapshots[3]
+
+    trajectories = []
+    for _ in range(2):
+        game.run_from_snapshot(snapshot)
+        trajectories.append([(r.country_score, r.shoreline_score, r.random_country_impact,
+                              r.random_shoreline_impact) for r in game.game_state.yearly_records])
+    assert trajectories[0] == trajectories[1]
+    # 与原始游戏从第3年开始的轨迹一致
+    assert snapshot.records[2].country_score == trajectories[0][2][0]
+
+    print("✅ 分支可复现")
+
+def test_snapshot_from_export():
+    """测试由历史游戏记录还原中途状态并继续"""
+    print("🔍 测试由导出记录还原快照...")
+
+    paths = sorted(glob.glob(os.path.join(ROOT, "history", "game_record_*.json")))
+    if not paths:
+        print("   没有历史记录，跳过")
+        return
+    snapshot = GameSnapshot.from_export(paths[0], year=3)
+    third = snapshot.records[2]
+    assert snapshot.year == 3
+    assert (snapshot.country_score, snapshot.shoreline_score) == (third.country_score, third.shoreline_score)
+    assert snapshot.opportunities == third.shore_response.get("opportunities", snapshot.opportunities)
+
+    start = GameSnapshot.from_export(paths[0], year=0)
+    assert (start.country_score, start.shoreline_score) == (60, 100) and start.records == ()
+
+    game = _create_game(MockLLMClient())
+    summary = game.run_from_snapshot(snapshot)
+    assert game.game_state.yearly_records[2] is third
+    assert summary["total_years"] > 3
+    print(f"   {os.path.basename(paths[0])}: 第3年末 国家={snapshot.country_score}, "
+          f"海岸线={snapshot.shoreline_score} -> {summary['outcome']}")
+
+    print("✅ 由导出记录还原快照正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 游戏快照与分支测试")
+    print("=" * 50)
+    test_branches_share_prefix()
+    test_same_rng_state_reproducible()
+    test_snapshot_from_export()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
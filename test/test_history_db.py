@@ -0,0 +1,97 @@
+"""
+SQLite历史数据库测试脚本
+"""
+
+import sys
+import os
+import json
+import random
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.history_db import HistoryDatabase
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_ingest_history_incrementally():
+    """测试增量导入history目录"""
+    print("🔍 测试增量导入history目录...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with HistoryDatabase(os.path.join(tmp, "history.db")) as db:
+            first = db.ingest_directory(os.path.join(ROOT, "history"))
+            second = db.ingest_directory(os.path.join(ROOT, "history"))
+            print(f"   首次导入: {first}局, 再次导入: {second}局")
+            assert first == db.game_count() > 0
+            assert second == 0
+
+            outcomes = db.victory_rate_by("outcome")
+            print(f"   结果分布: {[(o['outcome'], o['games']) for o in outcomes]}")
+            assert sum(o["games"] for o in outcomes) == first
+
+            rates = db.victory_rate_by_first_action()
+            print(f"   第一年行动种类: {len(rates)}")
+            assert sum(r["games"] for r in rates) == first
+
+    print("✅ 增量导入正常")
+
+def test_query_speed_on_many_games():
+    """测试大量游戏时的查询速度"""
+    print("🔍 测试万局规模查询速度...")
+
+    actions = ["develop fisheries", "develop industry", "urban expansion", "mining operations"]
+    rng = random.Random(0)
+    with HistoryDatabase(":memory:") as db:
+        with db.conn:
+            for i in range(10000):
+                first_action = rng.choice(actions)
+                victory = rng.random() < 0.3
+                db.ingest_export({
+                    "game_summary": {"victory": victory, "total_years": 1,
+                                     "game_over_reason": "国家发展达到100分，获得胜利" if victory else "海岸线状态低于75分，游戏失败"},
+                    "yearly_records": [{"year": 1, "country_actions": {"action_1": first_action, "action_2": "close fisheries"}}],
+                    "metadata": {"model": "m1" if i % 2 else "m2", "config": {"annual_bonus": i % 3}},
+                })
+
+        start = time.perf_counter()
+        rates = db.victory_rate_by_first_action()
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"   查询耗时: {elapsed:.1f}ms")
+        assert len(rates) == len(actions)
+        assert sum(r["games"] for r in rates) == 10000
+        assert len(db.victory_rate_by("config_key")) == 3
+        assert len(db.victory_rate_by_first_action(model="m1")) == len(actions)
+
+    print("✅ 查询速度正常")
+
+def test_changed_file_is_ingested_again():
+    """测试内容变化的文件会作为新的一局导入"""
+    print("🔍 测试覆盖写入的记录文件...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "game_001.json")
+        data = {"game_summary": {"victory": False, "total_years": 0}, "yearly_records": []}
+        with HistoryDatabase(os.path.join(tmp, "history.db")) as db:
+            for victory in (False, True):
+                data["game_summary"]["victory"] = victory
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.utime(path, (time.time() + victory, time.time() + victory))
+                assert db.ingest_file(path) is not None
+            assert db.ingest_file(path) is None
+            assert db.game_count() == 2
+
+    print("✅ 覆盖写入的记录文件处理正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 SQLite历史数据库测试")
+    print("=" * 50)
+    test_ingest_history_incrementally()
+    test_query_speed_on_many_games()
+    test_changed_file_is_ingested_again()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
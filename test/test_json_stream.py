@@ -0,0 +1,83 @@
+"""
+流式JSON解析测试脚本
+"""
+
+import sys
+import os
+import io
+import glob
+import json
+import tempfile
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.json_stream import iter_top_level, iter_array_items, load_statistics, ArrayStream
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _stream_to_dict(text, chunk_size):
+    """用指定大小的缓冲区流式解析，结果应与json.loads一致"""
+    result = {}
+    for key, value in iter_top_level(io.StringIO(text), stream_keys=("yearly_records",), chunk_size=chunk_size):
+        result[key] = list(value) if isinstance(value, ArrayStream) else value
+    return result
+
+def test_matches_json_load():
+    """测试流式解析结果与json.load一致（包括极小缓冲区）"""
+    print("🔍 测试流式解析与json.load一致...")
+
+    paths = sorted(glob.glob(os.path.join(ROOT, "history", "*.json")))
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        expected = json.loads(text)
+        for chunk_size in (1, 7, 65536):
+            assert _stream_to_dict(text, chunk_size) == expected, (path, chunk_size)
+
+    edge_cases = ['{}', '{"a": []}', '{"yearly_records": [], "n": 12345}', '{"n": -1.5e3, "yearly_records": [1, 2]}']
+    for text in edge_cases:
+        assert _stream_to_dict(text, 1) == json.loads(text), text
+
+    print(f"   {len(paths)}个历史文件及{len(edge_cases)}个边界用例一致")
+    print("✅ 流式解析正常")
+
+def test_statistics_reader_bounded_memory():
+    """测试统计文件的惰性读取，内存峰值与游戏局数无关"""
+    print("🔍 测试统计文件惰性读取...")
+
+    result = {"total_years": 25, "victory": False, "game_over_reason": "达到25年上限，游戏结束" * 20,
+              "final_scores": {"country": 90, "shoreline": 80}, "initial_scores": {"country": 60, "shoreline": 100},
+              "yearly_records": 25}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "game_statistics.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"total_games": 20000, "victories": 0, "failures": 20000, "victory_rate": 0.0,
+                       "detailed_results": [result] * 20000}, f, ensure_ascii=False, indent=2)
+        file_size = os.path.getsize(path)
+
+        tracemalloc.start()
+        statistics = load_statistics(path)
+        count = sum(1 for r in statistics["detailed_results"] if r["total_years"] == 25)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"   文件大小: {file_size / 1e6:.1f}MB, 解析峰值内存: {peak / 1e6:.2f}MB")
+        assert statistics["total_games"] == 20000
+        assert count == 20000
+        assert peak < file_size / 10
+        # 惰性视图可重复迭代
+        assert next(iter(statistics["detailed_results"]))["victory"] is False
+        assert sum(1 for _ in iter_array_items(path, "detailed_results")) == 20000
+
+    print("✅ 统计文件惰性读取正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 流式JSON解析测试")
+    print("=" * 50)
+    test_matches_json_load()
+    test_statistics_reader_bounded_memory()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+JSON转TXT批量/增量转换测试脚本
+"""
+
+import sys
+import os
+import glob
+import shutil
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_to_txt_converter import convert_batch, find_record_files
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _copy_history(target):
+    """复制history目录中的JSON记录到临时目录（分散到子目录中）"""
+    paths = sorted(glob.glob(os.path.join(ROOT, "history", "game_record_*.json")))
+    for i, path in enumerate(paths):
+        subdir = os.path.join(target, f"batch_{i % 2}")
+        os.makedirs(subdir, exist_ok=True)
+        shutil.copy(path, subdir)
+    # 非游戏记录文件不应被转换
+    shutil.copy(os.path.join(ROOT, "game_config.example.json"), target)
+    return len(paths)
+
+def test_batch_conversion_with_manifest():
+    """测试批量转换和清单跳过"""
+    print("🔍 测试批量转换...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        total = _copy_history(tmp)
+        assert len(find_record_files(tmp)) == total
+
+        stats = convert_batch(tmp, workers=2)
+        print(f"   首次: {stats}")
+        assert stats == {"converted": total, "failed": 0, "skipped": 0}
+        assert len(glob.glob(os.path.join(tmp, "**", "*_table.txt"), recursive=True)) == total
+
+        stats = convert_batch(tmp, workers=2)
+        print(f"   再次: {stats}")
+        assert stats == {"converted": 0, "failed": 0, "skipped": total}
+
+        # 仅修改时间变化、内容不变的文件通过哈希跳过
+        touched = find_record_files(tmp)[0]
+        os.utime(touched, None)
+        assert convert_batch(tmp, workers=1)["converted"] == 0
+
+        # 新出现的记录只转换新增部分
+        shutil.copy(touched, os.path.join(tmp, "game_001.json"))
+        stats = convert_batch(tmp, workers=1)
+        print(f"   新增文件后: {stats}")
+        assert stats["converted"] == 1
+
+        # 写入中的不完整文件不记入清单，下次重试
+        with open(os.path.join(tmp, "game_002.json"), "w", encoding="utf-8") as f:
+            f.write('{"game_summary": {')
+        assert convert_batch(tmp, workers=1)["failed"] == 1
+        assert convert_batch(tmp, workers=1)["failed"] == 1
+
+    print("✅ 批量转换正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 JSON转TXT批量转换测试")
+    print("=" * 50)
+    test_batch_conversion_with_manifest()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+裁判代理模型测试脚本
+"""
+
+import sys
+import os
+import json
+import glob
+import random
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.judge_surrogate import JudgeSurrogate, normalize_action
+from src.reference_table import ReferenceTable
+from src.game_controller import ShorlineEcologyGame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TABLE_PATH = os.path.join(ROOT, "prompt", "ref_scoring_table.txt")
+
+class MockLLMClient:
+    """模拟LLM客户端：按参考评分表评分，记录裁判调用次数"""
+    def __init__(self):
+        self.model = "mock"
+        self.table = ReferenceTable.load(TABLE_PATH)
+        self.judge_calls = 0
+        self.actions = [("Develop industry", "Close fisheries"),
+                        ("develop industry.", "close fisheries"),
+                        ("Promote public transportation", "Use organic fertilizer")]
+    def call_human_llm(self, **kwargs):
+        action_1, action_2 = random.choice(self.actions)
+        return {"action_1": action_1, "action_2": action_2}
+    def call_judge_llm(self, country_actions, **kwargs):
+        self.judge_calls += 1
+        lines = country_actions.split("\n")
+        return self.table.judge_scores(lines[0].split(":", 1)[1].strip(" ."), lines[1].split(":", 1)[1].strip(" ."))
+    def call_shore_llm(self, country_actions):
+        return {"opportunities": "机遇", "challenges": "挑战"}
+
+def test_prediction():
+    """测试规范化与最近邻预测"""
+    print("🔍 测试代理模型预测...")
+
+    assert normalize_action("  Promote Public-Transportation! ") == "promote public transportation"
+    surrogate = JudgeSurrogate.from_history(os.path.join(ROOT, "history"), table=ReferenceTable.load(TABLE_PATH))
+    country, shoreline, confidence = surrogate.predict_action("Close some factories.")
+    assert (country, shoreline) == (-3, 5) and confidence > 0.8
+    # 改写的行动仍找到最相似的表中行动
+    country, shoreline, confidence = surrogate.predict_action("promote public transit")
+    assert (country, shoreline) == (-1, 2)
+    print(f"   'promote public transit' -> ({country}, {shoreline}), 置信度{confidence:.2f}")
+    # 陌生行动置信度低
+    _, _, confidence = surrogate.predict_action("launch a space program")
+    assert confidence < surrogate.confidence_threshold
+    _, _, confidence = surrogate.predict_action("???")
+    assert confidence == 0.0
+
+    scores, confidence = surrogate.predict("develop industry", "close fisheries")
+    assert scores == {"first_country": 4, "first_shoreline": -5, "second_country": -3, "second_shoreline": 4}
+
+    print("✅ 代理模型预测正常")
+
+def test_negated_actions_go_to_judge():
+    """测试方向相反的行动不采用近邻的评分，交给裁判LLM"""
+    print("🔍 测试否定行动门控...")
+
+    surrogate = JudgeSurrogate.from_history(os.path.join(ROOT, "history"), table=ReferenceTable.load(TABLE_PATH))
+    for action in ("ban mining operations", "Stop urban expansion", "halt deforestation", "reforestation",
+                   "reduce support for fossil fuels"):
+        country, shoreline, confidence = surrogate.predict_action(action)
+        print(f"   {action!r} -> ({country}, {shoreline}), 置信度{confidence:.2f}")
+        assert confidence < surrogate.confidence_threshold
+    calls = []
+    judge = {"first_country": -5, "first_shoreline": 6, "second_country": -2, "second_shoreline": 3}
+    scores = surrogate.score("stop urban expansion", "ban mining operations", lambda: calls.append(1) or judge)
+    assert scores == judge and calls == [1]
+    # 裁判评分后在线学到否定行动本身，同向的改写可以使用代理评分
+    country, shoreline, confidence = surrogate.predict_action("Stop urban expansion.")
+    assert (country, shoreline) == (-5, 6) and confidence >= surrogate.confidence_threshold
+    assert surrogate.predict_action("urban expansion")[:2] == (10, -10)
+
+    print("✅ 否定行动交给裁判LLM")
+
+def test_incremental_index():
+    """测试在线学习时索引增量更新、按批重建，结果与完整重建一致"""
+    print("🔍 测试增量索引...")
+
+    surrogate = JudgeSurrogate()
+    surrogate.fit_reference_table(ReferenceTable.load(TABLE_PATH))
+    for i in range(400):
+        surrogate.neighbors(f"restore wetland zone {i}")
+        surrogate.add_example(f"restore wetland zone {i}", 1, 2)
+    print(f"   411个行动, 重建{surrogate.index_rebuilds}次")
+    assert surrogate.index_rebuilds < 25
+
+    fresh = JudgeSurrogate()
+    fresh.fit_reference_table(ReferenceTable.load(TABLE_PATH))
+    for i in range(400):
+        fresh.add_example(f"restore wetland zone {i}", 1, 2)
+    for action in ("restore wetland zone 399", "develop industry", "close some factories"):
+        assert surrogate.neighbors(action, k=1)[0][0] == fresh.neighbors(action, k=1)[0][0]
+    assert fresh.index_rebuilds == 1
+
+    print("✅ 增量索引正常")
+
+def test_leave_one_out_accuracy():
+    """测试在历史记录上的留一法准确率（只统计代理模型会采用的高置信度预测）"""
+    print("🔍 测试历史记录上的准确率...")
+
+    paths = sorted(glob.glob(os.path.join(ROOT, "history", "game_record_*.json")))
+    if len(paths) < 2:
+        print("   历史记录不足，跳过")
+        return
+    confident = correct = 0
+    for held_out in paths:
+        surrogate = JudgeSurrogate(confidence_threshold=0.8)
+        surrogate.fit_reference_table(ReferenceTable.load(TABLE_PATH))
+        for path in paths:
+            if path != held_out:
+                with open(path, "r", encoding="utf-8") as f:
+                    surrogate.fit_records(json.load(f)["yearly_records"])
+        with open(held_out, "r", encoding="utf-8") as f:
+            records = json.load(f)["yearly_records"]
+        for record in records:
+            actions = record["country_actions"]
+            scores, confidence = surrogate.predict(actions.get("action_1", ""), actions.get("action_2", ""))
+            if confidence >= surrogate.confidence_threshold:
+                confident += 1
+                correct += scores == record["judge_scores"]
+    print(f"   高置信度预测: {confident}年, 完全正确: {correct}年")
+    assert confident > 0 and correct / confident > 0.9
+
+    print("✅ 准确率正常")
+
+def test_gated_judge_in_game():
+    """测试游戏中按置信度门控裁判调用，并抽样审计"""
+    print("🔍 测试门控评分...")
+
+    random.seed(3)
+    client = MockLLMClient()
+    surrogate = JudgeSurrogate(confidence_threshold=0.8, audit_rate=0.2, seed=1)
+    game = ShorlineEcologyGame(llm_client=client, pause_between_years=False,
+                               use_llm_for_random_events=False, judge_surrogate=surrogate)
+    game.enable_random_events = False
+    summary = game.run_single_game()
+    stats = surrogate.stats()
+    print(f"   {summary['total_years']}年, 统计: {stats}")
+    # 开始时没有训练数据，需要调用裁判LLM；之后主要使用在线学到的代理评分
+    assert stats["llm_calls"] == client.judge_calls
+    assert stats["surrogate_calls"] + stats["llm_calls"] == summary["total_years"]
+    assert stats["surrogate_calls"] > stats["llm_calls"]
+    assert stats["audits"] > 0 and stats["audit_exact_rate"] == 1.0 and stats["audit_mean_abs_error"] == 0
+    for record in game.game_state.yearly_records:
+        assert set(record.judge_scores) == {"first_country", "first_shoreline", "second_country", "second_shoreline"}
+
+    print("✅ 门控评分正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 裁判代理模型测试")
+    print("=" * 50)
+    test_prediction()
+    test_negated_actions_go_to_judge()
+    test_incremental_index()
+    test_leave_one_out_accuracy()
+    test_gated_judge_in_game()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
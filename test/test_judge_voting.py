@@ -0,0 +1,202 @@
+"""
+裁判多采样投票测试脚本
+"""
+
+import sys
+import os
+import re
+import json
+import random
+import tempfile
+from statistics import pvariance
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_fakes import FakeCompletions, REGISTRY, REF_TABLE, completion, fake_client
+from src.llm_client import LLMClient
+from src.response_cache import LLMResponseCache
+from src.judge_voting import aggregate_values, aggregate_scores, score_variance
+from src.batch_jobs import BatchCollector, BatchLLMClient, LocalBatchWorker
+from src.prompt_packing import PromptPacker
+
+ACTIONS = "ACTION_1: Build a port\nACTION_2: Restore wetlands"
+
+def _reply(first_country):
+    return (f"first_country_rank: {first_country}\nfirst_shoreline_rank: -3\n"
+            f"second_country_rank: -1\nsecond_shoreline_rank: 4")
+
+class NoisyJudge(FakeCompletions):
+    """有噪声的裁判：first_country为3加随机噪声；supports_n控制是否支持n参数，max_choices限制返回的回复数"""
+    def __init__(self, supports_n=True, max_choices=None, seed=0):
+        super().__init__()
+        self.supports_n = supports_n
+        self.max_choices = max_choices
+        self.rng = random.Random(seed)
+    def _sample(self, items=0):
+        with self._lock:
+            if items:
+                # 打包请求：每个条目一个评分块
+                return "\n\n".join(f"ITEM {n}\n" + _reply(3 + self.rng.choice((-2, -1, 0, 0, 0, 1, 2)))
+                                     for n in range(1, items + 1))
+            return _reply(3 + self.rng.choice((-2, -1, 0, 0, 0, 1, 2)))
+    def reply(self, messages):
+        return self._sample(len(re.findall(r"^ITEM \d+$", messages[-1]["content"], re.MULTILINE)))
+    def create(self, model, messages, temperature, max_tokens, **options):
+        if "n" not in options:
+            return super().create(model, messages, temperature, max_tokens, **options)
+        with self._lock:
+            self.calls.append({"messages": messages, **options})
+        if not self.supports_n:
+            raise TypeError("unexpected keyword argument 'n'")
+        count = min(options["n"], self.max_choices or options["n"])
+        return completion(*(self.reply(messages) for _ in range(count)))
+
+def _client(judge, samples=5, aggregate="median", cache=None):
+    return fake_client(judge, response_cache=cache, judge_samples=samples, judge_aggregate=aggregate)
+
+def test_aggregation():
+    """测试中位数、多数票和方差"""
+    print("🔍 测试评分汇总...")
+
+    assert aggregate_values([4, -1, 3, 3, 10]) == 3
+    assert aggregate_values([1, 2, 3, 4]) == 2
+    assert aggregate_values([4, 4, -1, -1, 0], "majority") == -1     # 并列时取最接近中位数的值
+    assert aggregate_values([5, 5, 1], "majority") == 5
+    try:
+        aggregate_values([1], "mean")
+        assert False, "未知汇总方式应报错"
+    except ValueError:
+        pass
+
+    samples = [{"first_country": 3, "second_country": -1}, {"first_country": 5}, {"first_country": 4}]
+    assert aggregate_scores(samples) == {"first_country": 4, "second_country": -1}
+    variance = score_variance(samples)
+    assert abs(variance["first_country"] - 2 / 3) < 1e-9 and variance["second_country"] == 0.0
+
+    try:
+        LLMClient(api_key="test_key", judge_aggregate="mean")
+        assert False, "未知汇总方式应报错"
+    except ValueError:
+        pass
+
+    print("✅ 评分汇总正常")
+
+def test_single_request_and_fallback():
+    """测试n参数一次取回、不支持时改为并发请求、回复不足时补足"""
+    print("🔍 测试采样请求...")
+
+    judge = NoisyJudge()
+    client = _client(judge)
+    scores = client.call_judge_llm(ACTIONS, REF_TABLE)
+    assert len(judge.calls) == 1 and judge.calls[0]["n"] == 5
+    assert set(scores) == {"first_country", "first_shoreline", "second_country", "second_shoreline"}
+    assert scores["second_shoreline"] == 4 and 1 <= scores["first_country"] <= 5
+
+    # 不支持n参数：第一次报错后改为并发请求，之后不再尝试n参数
+    judge = NoisyJudge(supports_n=False)
+    client = _client(judge, samples=4)
+    client.call_judge_llm(ACTIONS, REF_TABLE)
+    client.call_judge_llm(ACTIONS, REF_TABLE)
+    assert client._n_supported is False
+    assert [("n" in options) for options in judge.calls] == [True] + [False] * 8
+    assert client.usage_stats()["by_role"]["judge"]["requests"] == 8
+
+    # 只返回一个回复的接口：其余采样并发补足
+    judge = NoisyJudge(max_choices=1)
+    client = _client(judge, samples=3)
+    client.call_judge_llm(ACTIONS, REF_TABLE)
+    assert len(judge.calls) == 3 and client.judge_votes.samples == 3
+
+    # 缓存汇总结果
+    cache = LLMResponseCache()
+    judge = NoisyJudge()
+    client = _client(judge, cache=cache)
+    first = client.call_judge_llm(ACTIONS, REF_TABLE)
+    assert client.call_judge_llm(ACTIONS, REF_TABLE) == first and len(judge.calls) == 1
+
+    print("✅ 采样请求正常")
+
+def test_variance_reporting():
+    """测试按行动的方差报告，以及投票降低评分方差"""
+    print("🔍 测试方差报告...")
+
+    single = _client(NoisyJudge(seed=1), samples=1)
+    voted = _client(NoisyJudge(seed=1), samples=7)
+    single_scores = [single.call_judge_llm(ACTIONS, REF_TABLE)["first_country"] for _ in range(60)]
+    voted_scores = [voted.call_judge_llm(ACTIONS, REF_TABLE)["first_country"] for _ in range(60)]
+    print(f"   first_country方差: 单次{pvariance(single_scores):.2f} -> 7个采样投票{pvariance(voted_scores):.2f}")
+    assert pvariance(voted_scores) < pvariance(single_scores) / 2
+
+    report = voted.usage_stats()["judge_voting"]
+    assert report["calls"] == 60 and report["samples"] == 420 and report["samples_per_call"] == 7
+    assert report["mean_variance"]["first_country"] > 1 and report["mean_variance"]["second_country"] == 0
+    noisiest = report["noisiest_actions"][0]
+    assert noisiest["action"] == "build a port" and noisiest["votes"] == 60
+    assert report["noisiest_actions"][1]["country_variance"] == 0
+    assert "judge_voting" not in single.usage_stats()
+
+    print("✅ 方差报告正常")
+
+class SingleChoiceBackend:
+    """忽略n参数的批处理后端：每个请求只返回一个回复"""
+    def __init__(self, judge):
+        self.judge = judge
+    def run(self, input_path, output_path):
+        with open(input_path, "r", encoding="utf-8") as src, open(output_path, "w", encoding="utf-8") as dst:
+            for line in src:
+                request = json.loads(line)
+                self.judge.calls.append({"n": request["body"].get("n", 1)})
+                body = {"choices": [{"message": {"content": self.judge._sample()}}]}
+                dst.write(json.dumps({"custom_id": request["custom_id"], "error": None,
+                                      "response": {"status_code": 200, "body": body}}) + "\n")
+
+def test_batch_and_packed_voting():
+    """测试多采样请求经过批处理收集器，打包评分时每个条目仍投票"""
+    print("🔍 测试批处理与打包中的投票...")
+
+    judge = NoisyJudge()
+    with tempfile.TemporaryDirectory() as tmp:
+        collector = BatchCollector(LocalBatchWorker(lambda body: judge._sample()), work_dir=tmp, model="m")
+        client = BatchLLMClient(collector, prompt_registry=REGISTRY, judge_samples=5)
+        client.client = None     # 不应直接调用接口
+        [(scores, error)] = collector.run([lambda: client.call_judge_llm(ACTIONS, REF_TABLE)])
+        assert error is None and scores["second_shoreline"] == 4
+        with open(os.path.join(tmp, "round_00001_requests.jsonl"), "r", encoding="utf-8") as f:
+            [request] = [json.loads(line) for line in f]
+        assert request["body"]["n"] == 5
+        assert collector.stats() == {"rounds": 1, "requests": 1} and client.judge_votes.samples == 5
+
+        # 后端忽略n参数：在后续轮次补足采样
+        judge = NoisyJudge()
+        collector = BatchCollector(SingleChoiceBackend(judge), work_dir=tmp, model="m")
+        client = BatchLLMClient(collector, prompt_registry=REGISTRY, judge_samples=3)
+        [(scores, error)] = collector.run([lambda: client.call_judge_llm(ACTIONS, REF_TABLE)])
+        assert error is None and [r["n"] for r in judge.calls] == [3, 2, 1]
+        assert client.judge_votes.samples == 3
+
+    # 打包评分：一次打包请求取5个回复，每个条目分别投票，结果缓存在投票的缓存键下
+    cache = LLMResponseCache()
+    judge = NoisyJudge()
+    client = _client(judge, samples=5, cache=cache)
+    other = "ACTION_1: develop industry\nACTION_2: close fisheries"
+    packer = PromptPacker(client)
+    results = packer.judge_many([ACTIONS, other], REF_TABLE)
+    assert packer.packed_requests == 1 and [r["n"] for r in judge.calls] == [5]
+    assert client.judge_votes.calls == 2 and client.judge_votes.samples == 10
+    assert all(scores["second_shoreline"] == 4 for scores in results)
+    assert client.usage["judge"]["requests"] == 1
+    assert client.call_judge_llm(ACTIONS, REF_TABLE) == results[0] and len(judge.calls) == 1
+
+    print("✅ 批处理与打包中的投票正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 裁判多采样投票测试")
+    print("=" * 50)
+    test_aggregation()
+    test_single_request_and_fallback()
+    test_variance_reporting()
+    test_batch_and_packed_voting()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+人类LLM前瞻规划测试脚本
+"""
+
+import sys
+import os
+import re
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_fakes import FakeCompletions, ROOT, REF_TABLE, fake_client
+from src.game_controller import ShorlineEcologyGame
+from src.lookahead_planner import LookaheadPlanner
+from src.reference_table import ReferenceTable
+from src.response_parsers import parse_candidate_response
+
+TABLE = ReferenceTable.load(os.path.join(ROOT, "prompt", "ref_scoring_table.txt"))
+
+CANDIDATES_REPLY = """```
+CANDIDATE 1:
+ACTION_1: develop industry
+ACTION_2: develop fisheries
+
+CANDIDATE 2:
+ACTION_1: build offshore wind farms
+ACTION_2: restore coral reefs
+
+CANDIDATE 3:
+ACTION_1: use organic fertilizer
+ACTION_2: promote public transportation
+
+CANDIDATE 4:
+ACTION_1: build sea walls
+ACTION_2: close fisheries
+```"""
+
+class ScriptedPlannerLLM(FakeCompletions):
+    """按提示词内容返回候选、打包评分、单次评分或海岸线响应，按类型计数（多采样请求计一次）"""
+    def __init__(self):
+        super().__init__()
+        self.requests = {"candidates": 0, "packed_judge": 0, "judge": 0, "shore": 0, "human": 0}
+    @staticmethod
+    def _kind(content):
+        if "ITEM 1" in content:
+            return "packed_judge"
+        if "You are the judge" in content:
+            return "judge"
+        if "shoreline ecology" in content:
+            return "shore"
+        if "candidate plans" in content:
+            return "candidates"
+        return "human"
+    def create(self, model, messages, temperature, max_tokens, **options):
+        self.requests[self._kind(messages[-1]["content"])] += 1
+        return super().create(model, messages, temperature, max_tokens, **options)
+    def reply(self, messages):
+        content = messages[-1]["content"]
+        kind = self._kind(content)
+        if kind == "packed_judge":
+            items = sorted(set(int(n) for n in re.findall(r"^ITEM (\d+)$", content, re.MULTILINE)))
+            return "\n\n".join(f"ITEM {n}\nfirst_country_rank: 4\nfirst_shoreline_rank: 1\n"
+                                 f"second_country_rank: 3\nsecond_shoreline_rank: 2" for n in items)
+        if kind == "judge":
+            return "first_country_rank: 1\nfirst_shoreline_rank: -1\nsecond_country_rank: -1\nsecond_shoreline_rank: 1"
+        if kind == "shore":
+            return "CHANCES: tourism\nCHALLENGES: erosion"
+        if kind == "candidates":
+            return CANDIDATES_REPLY
+        return "ACTION_1: develop industry\nACTION_2: close fisheries"
+
+def test_parse_candidates():
+    """测试共用代码块、各自代码块、重复和不完整候选"""
+    print("🔍 测试候选解析...")
+
+    shared = parse_candidate_response(CANDIDATES_REPLY)
+    assert [c["action_1"] for c in shared] == ["develop industry", "build offshore wind farms",
+                                             "use organic fertilizer", "build sea walls"]
+    assert shared[2]["action_2"] == "promote public transportation"
+
+    separate = ("<think>compare options</think>\n**Candidate 1:**\n```\nACTION_1: develop industry\n"
+                "ACTION_2: develop fisheries\n```\n\n**Candidate 2:**\n```\nACTION_1: Develop Industry\n"
+                "ACTION_2: develop fisheries\n```\n\nCANDIDATE 3\n```\nACTION_1: close fisheries\n```\n\n"
+                "### CANDIDATE 4:\n```\nACTION_1: close fisheries\nACTION_2: restore wetlands\n```")
+    parsed = parse_candidate_response(separate)
+    assert parsed == [{"action_1": "develop industry", "action_2": "develop fisheries"},
+                      {"action_1": "close fisheries", "action_2": "restore wetlands"}]
+
+    # 没有候选标题时按单个回复解析
+    assert parse_candidate_response("ACTION_1: a\nACTION_2: b") == [{"action_1": "a", "action_2": "b"}]
+    assert parse_candidate_response("no actions here") == []
+
+    print("✅ 候选解析正常")
+
+def test_candidate_scoring_sources():
+    """测试候选按表评分，其余候选合并为一次打包的裁判请求"""
+    print("🔍 测试候选评分来源...")
+
+    completions = ScriptedPlannerLLM()
+    client = fake_client(completions)
+    planner = LookaheadPlanner(table=TABLE, seed=0)
+    candidates = client.call_human_candidates(60, 100, "", "", REF_TABLE, num_candidates=4)
+    assert completions.requests["candidates"] == 1 and len(candidates) == 4
+
+    judged = planner.judge_candidates(candidates, client, REF_TABLE)
+    assert [source for _, source in judged] == ["table", "judge", "table", "judge"]
+    assert judged[0][0] == TABLE.judge_scores("develop industry", "develop fisheries")
+    assert judged[1][0] == judged[3][0] == {"first_country": 4, "first_shoreline": 1,
+                                            "second_country": 3, "second_shoreline": 2}
+    assert completions.requests["packed_judge"] == 1 and completions.requests["judge"] == 0
+
+    # 只有一组未知候选时直接单次请求
+    planner.judge_candidates(candidates[1:3], client, REF_TABLE)
+    assert completions.requests["packed_judge"] == 1 and completions.requests["judge"] == 1
+    assert planner.stats()["judge_requests"] == 2
+
+    # 不请求裁判时，未知候选记为估计值
+    offline = LookaheadPlanner(table=TABLE, judge_unknown=False)
+    judged = offline.judge_candidates(candidates, client, REF_TABLE)
+    assert [source for _, source in judged] == ["table", "estimate", "table", "estimate"]
+    assert completions.requests["packed_judge"] == 1
+    assert offline.stats()["sources"] == {"table": 2, "surrogate": 0, "judge": 0, "estimate": 2}
+
+    # 裁判多采样投票：未知候选的全部采样在一次打包请求中取回
+    voting = ScriptedPlannerLLM()
+    client = fake_client(voting, judge_samples=3)
+    judged = planner.judge_candidates(candidates, client, REF_TABLE)
+    assert [source for _, source in judged] == ["table", "judge", "table", "judge"]
+    assert voting.requests["packed_judge"] == 1 and voting.requests["judge"] == 0 and [call["n"] for call in voting.calls] == [3]
+    assert client.judge_votes.calls == 2 and client.judge_votes.samples == 6
+
+    print("✅ 候选评分来源正常")
+
+def test_rollout_preferences():
+    """测试海岸线接近失败时选择保守候选，海岸线充足时选择发展候选"""
+    print("🔍 测试本地推演...")
+
+    planner = LookaheadPlanner(horizon=5, rollouts=300, seed=1)
+    growth, safe = (8, -9), (-1, 7)
+    near_failure = planner.evaluate([growth, safe], country_score=80, shoreline_score=78, years_left=20)
+    print(f"   海岸线78: 发展{near_failure[0]['value']:.2f}, 保守{near_failure[1]['value']:.2f}")
+    assert near_failure[0]["failure_rate"] > 0.9 and near_failure[1]["value"] > near_failure[0]["value"]
+
+    healthy = planner.evaluate([growth, safe], country_score=80, shoreline_score=100, years_left=20)
+    print(f"   海岸线100: 发展{healthy[0]['value']:.2f}, 保守{healthy[1]['value']:.2f}")
+    assert healthy[0]["victory_rate"] > 0.9 and healthy[0]["value"] > healthy[1]["value"]
+
+    # 最后一年仍未胜利记为超时失败；无随机事件时结果确定
+    last_year = planner.evaluate([(2, 0)], country_score=90, shoreline_score=100, years_left=1,
+                                 enable_random_events=False)
+    assert last_year[0] == {"value": -1.0, "victory_rate": 0.0, "failure_rate": 1.0,
+                            "mean_country": 93.0, "mean_shoreline": 100.0}
+
+    print("✅ 本地推演正常")
+
+def test_game_with_planner():
+    """测试游戏控制器使用前瞻规划"""
+    print("🔍 测试带规划的游戏...")
+
+    completions = ScriptedPlannerLLM()
+    planner = LookaheadPlanner(table=TABLE, rollouts=50, seed=2)
+    game = ShorlineEcologyGame(llm_client=fake_client(completions), pause_between_years=False,
+                               use_llm_for_random_events=False, planner=planner)
+    game.enable_random_events = False
+    game.game_state.max_years = 6
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            statistics = game.run_multiple_games(1)
+        finally:
+            os.chdir(cwd)
+
+    assert completions.requests["candidates"] == statistics["aggregates"]["metrics"]["duration"]["mean"]
+    assert completions.requests["human"] == 0
+    stats = statistics["lookahead_planner"]
+    assert stats["decisions"] == completions.requests["candidates"] and stats["fallbacks"] == 0
+    assert stats["judge_requests"] == completions.requests["packed_judge"] == stats["decisions"]
+    # 选中的候选经过裁判评分时沿用规划时的评分，只有按表评分的选中行动再请求裁判
+    print(f"   沿用裁判评分: {stats['reused_scores']}/{stats['decisions']}")
+    assert stats["reused_scores"] > 0
+    assert completions.requests["judge"] == stats["decisions"] - stats["reused_scores"]
+    assert len(planner.last_plan) == 4 and {"value", "source", "victory_rate"} <= set(planner.last_plan[0])
+
+    print("✅ 带规划的游戏正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 前瞻规划测试")
+    print("=" * 50)
+    test_parse_candidates()
+    test_candidate_scoring_sources()
+    test_rollout_preferences()
+    test_game_with_planner()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+按表博弈精确结果分布测试脚本
+"""
+
+import sys
+import os
+import random
+import logging
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.reference_table import ReferenceTable, ActionPolicy
+from src.random_events import RandomEventSystem
+from src.game_state import GameState
+from src.outcome_solver import OutcomeSolver, solve_outcome_distribution
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TABLE_PATH = os.path.join(ROOT, "prompt", "ref_scoring_table.txt")
+
+def _simulate(table, policy, num_games, seed):
+    """按GameState规则逐局模拟（与游戏控制器的年度流程一致，裁判按表评分）"""
+    random.seed(seed)
+    events = RandomEventSystem(use_llm_evaluation=False)
+    counts = {"victory": 0, "failure": 0, "timeout": 0}
+    total_years = 0
+    for _ in range(num_games):
+        state = GameState()
+        while not state.is_game_over():
+            state.year += 1
+            actions = policy.sample()
+            scores = table.judge_scores(actions["action_1"], actions["action_2"])
+            events.apply_disaster_modifier(state.shoreline_score)
+            triggered = events.trigger_random_events(state.year)
+            random_country, random_shoreline = events.calculate_total_impact(triggered)
+            state.update_scores(scores["first_country"] + scores["second_country"],
+                                scores["first_shoreline"] + scores["second_shoreline"],
+                                random_country, random_shoreline, annual_bonus=1)
+            events.reset_probabilities()
+        counts[state.get_game_summary()["outcome"]] += 1
+        total_years += state.year
+    return {k: v / num_games for k, v in counts.items()}, total_years / num_games
+
+def test_reference_table():
+    """测试评分表解析与按表评分"""
+    print("🔍 测试参考评分表...")
+
+    table = ReferenceTable.load(TABLE_PATH)
+    print(f"   行动数: {len(table)}")
+    assert len(table) == 11
+    assert table.get("Urban Expansion ").country_change == 10
+    assert table.judge_scores("close fisheries", "unknown action") == {
+        "first_country": -3, "first_shoreline": 4, "second_country": 0, "second_shoreline": 0}
+
+    policy = ActionPolicy(table, weights={"develop industry": 3, "close fisheries": 1})
+    distribution = policy.delta_distribution()
+    assert abs(sum(distribution.values()) - 1) < 1e-12
+    assert abs(distribution[(8, -10)] - 9 / 16) < 1e-12
+    assert abs(distribution[(1, -1)] - 6 / 16) < 1e-12
+
+    print("✅ 参考评分表正常")
+
+def test_event_impact_distribution():
+    """测试随机事件总影响分布与逐次抽样一致"""
+    print("🔍 测试随机事件影响分布...")
+
+    system = RandomEventSystem(use_llm_evaluation=False)
+    distribution = system.impact_distribution(80)
+    assert abs(sum(distribution.values()) - 1) < 1e-12
+
+    random.seed(11)
+    samples = 40000
+    expected_country = sum(c * p for (c, _), p in distribution.items())
+    expected_shoreline = sum(s * p for (_, s), p in distribution.items())
+    quiet = 0
+    total_country = total_shoreline = 0
+    logging.disable(logging.INFO)
+    try:
+        for _ in range(samples):
+            system.apply_disaster_modifier(80)
+            country, shoreline = system.calculate_total_impact(system.trigger_random_events(1))
+            total_country += country
+            total_shoreline += shoreline
+            quiet += country == 0 and shoreline == 0
+            system.reset_probabilities()
+    finally:
+        logging.disable(logging.NOTSET)
+    print(f"   国家影响期望: {expected_country:.4f} / 抽样 {total_country / samples:.4f}")
+    print(f"   海岸线影响期望: {expected_shoreline:.4f} / 抽样 {total_shoreline / samples:.4f}")
+    assert abs(total_country / samples - expected_country) < 0.03
+    assert abs(total_shoreline / samples - expected_shoreline) < 0.03
+    assert abs(quiet / samples - distribution[(0, 0)]) < 0.01
+
+    print("✅ 随机事件影响分布正常")
+
+def test_deterministic_policies():
+    """测试确定性策略下的精确结果（无随机事件）"""
+    print("🔍 测试确定性策略...")
+
+    table = ReferenceTable.load(TABLE_PATH)
+    # 每年国家+4-3+1=+2，海岸线-5+4+1=0：第20年获胜
+    policy = ActionPolicy(table, weights={"develop industry": 1}, weights_2={"close fisheries": 1})
+    result = solve_outcome_distribution(policy, enable_random_events=False)
+    assert abs(result["victory"] - 1) < 1e-9 and abs(result["expected_years"] - 20) < 1e-9
+
+    # 每年国家+21，海岸线-19：第2年国家到100、海岸线62，胜利判定优先于失败
+    policy = ActionPolicy(table, weights={"urban expansion": 1})
+    result = solve_outcome_distribution(policy, enable_random_events=False)
+    assert abs(result["victory"] - 1) < 1e-9 and abs(result["expected_years"] - 2) < 1e-9
+
+    # 每年国家-3+1+1=-1，海岸线+5-1+1（截断在100）：到达年数上限
+    policy = ActionPolicy(table, weights={"close some factories": 1}, weights_2={"deforestation": 1})
+    result = solve_outcome_distribution(policy, enable_random_events=False, max_years=12)
+    assert abs(result["timeout"] - 1) < 1e-9 and abs(result["expected_years"] - 12) < 1e-9
+
+    print("✅ 确定性策略正常")
+
+def test_matches_simulation():
+    """测试随机策略+随机事件下的精确解与逐局模拟一致"""
+    print("🔍 测试精确解与模拟一致...")
+
+    table = ReferenceTable.load(TABLE_PATH)
+    policy = ActionPolicy(table, weights={"develop industry": 2, "close fisheries": 2,
+                                          "mining operations": 1, "use organic fertilizer": 1})
+    solver = OutcomeSolver(policy)
+    result = solver.solve()
+    num_games = 4000
+    logging.disable(logging.INFO)
+    try:
+        simulated, average_years = _simulate(table, policy, num_games, seed=5)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    print(f"   精确解: 胜利{result['victory']:.4f} 失败{result['failure']:.4f} "
+          f"超时{result['timeout']:.4f} 期望{result['expected_years']:.2f}年 ({result['elapsed_ms']:.1f}ms)")
+    print(f"   模拟: 胜利{simulated['victory']:.4f} 失败{simulated['failure']:.4f} "
+          f"超时{simulated['timeout']:.4f} 平均{average_years:.2f}年")
+    assert abs(result["victory"] + result["failure"] + result["timeout"] - 1) < 1e-9
+    for outcome in ("victory", "failure", "timeout"):
+        p = result[outcome]
+        tolerance = 4 * (p * (1 - p) / num_games) ** 0.5 + 1e-3
+        assert abs(simulated[outcome] - p) < tolerance, outcome
+    assert abs(average_years - result["expected_years"]) < 0.3
+
+    print("✅ 精确解与模拟一致")
+
+def main():
+    """主测试函数"""
+    print("🌊 按表博弈精确结果分布测试")
+    print("=" * 50)
+    test_reference_table()
+    test_event_impact_distribution()
+    test_deterministic_policies()
+    test_matches_simulation()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
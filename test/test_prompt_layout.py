@@ -0,0 +1,141 @@
+"""
+提示词前缀布局与token用量统计测试脚本
+"""
+
+import sys
+import os
+import tempfile
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_fakes import FakeCompletions, REF_TABLE, fake_client
+from src.llm_client import LLMClient
+from src.response_cache import LLMResponseCache
+from src.prompt_packing import PromptPacker
+from src.game_controller import ShorlineEcologyGame
+
+class PrefixCachingCompletions(FakeCompletions):
+    """系统消息与之前相同时按前缀缓存命中计数"""
+    def __init__(self):
+        super().__init__()
+        self.seen_prefixes = set()
+    def reply(self, messages):
+        text = "\n".join(message["content"] for message in messages)
+        if "You are the judge" in text:
+            return "first_country_rank: 1\nfirst_shoreline_rank: -1\nsecond_country_rank: -1\nsecond_shoreline_rank: 2"
+        if "shoreline ecology" in text:
+            return "CHANCES: 旅游\nCHALLENGES: 污染"
+        return "ACTION_1: develop tourism\nACTION_2: restore wetland"
+    def usage(self, messages):
+        system = messages[0]["content"] if messages[0]["role"] == "system" else ""
+        prompt_tokens = (len(system) + len(messages[-1]["content"])) // 4
+        cached = len(system) // 4 if system in self.seen_prefixes else 0
+        self.seen_prefixes.add(system)
+        return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=10,
+                               prompt_tokens_details=SimpleNamespace(cached_tokens=cached))
+
+def _client(layout, cache=None):
+    completions = PrefixCachingCompletions()
+    return fake_client(completions, prompt_layout=layout, response_cache=cache), completions
+
+def test_prefix_layout_messages():
+    """测试前缀布局：固定内容在系统消息中且各年一致，用户消息只含变量"""
+    print("🔍 测试前缀布局...")
+
+    client, completions = _client("prefix")
+    for year in range(3):
+        client.call_human_llm(60 + year, 90, f"机遇{year}", f"挑战{year}", REF_TABLE)
+        client.call_judge_llm(f"ACTION_1: action {year}\nACTION_2: other {year}", REF_TABLE)
+        client.call_shore_llm(f"ACTION_1: action {year}\nACTION_2: other {year}")
+
+    messages = [call["messages"] for call in completions.calls]
+    human_calls = messages[0::3]
+    judge_calls = messages[1::3]
+    for calls in (human_calls, judge_calls, messages[2::3]):
+        assert all(call[0]["role"] == "system" for call in calls)
+        assert len({call[0]["content"] for call in calls}) == 1
+    assert REF_TABLE in human_calls[0][0]["content"] and REF_TABLE in judge_calls[0][0]["content"]
+    assert REF_TABLE not in human_calls[0][1]["content"]
+    assert "(out of 100): 62" in human_calls[2][1]["content"] and "挑战2" in human_calls[2][1]["content"]
+    assert "ACTION_1: action 1" in judge_calls[1][1]["content"]
+    assert len(judge_calls[0][1]["content"]) < len(judge_calls[0][0]["content"]) / 10
+
+    # 内联布局保持原有的单条用户消息
+    inline, inline_completions = _client("inline")
+    inline.call_judge_llm("ACTION_1: a\nACTION_2: b", REF_TABLE)
+    assert [m["role"] for m in inline_completions.calls[0]["messages"]] == ["user"]
+
+    try:
+        LLMClient(api_key="test_key", prompt_layout="suffix")
+        assert False, "未知布局应报错"
+    except ValueError:
+        pass
+
+    print("✅ 前缀布局正常")
+
+def test_usage_reporting():
+    """测试按角色统计token用量与前缀缓存命中"""
+    print("🔍 测试用量统计...")
+
+    client, _ = _client("prefix")
+    for year in range(4):
+        client.call_judge_llm(f"ACTION_1: action {year}\nACTION_2: other", REF_TABLE)
+    stats = client.usage_stats()
+    judge = stats["by_role"]["judge"]
+    print(f"   裁判用量: {judge}")
+    assert stats["prompt_layout"] == "prefix"
+    assert judge["requests"] == 4 and judge["completion_tokens"] == 40
+    # 第一次请求写入前缀缓存，之后三次命中
+    assert 0.6 < judge["cached_rate"] < 0.75
+    assert stats["total"]["cached_tokens"] == judge["cached_tokens"]
+
+    # 兼容字典形式和prompt_cache_hit_tokens字段
+    client._local.role = "event"
+    client._record_usage({"prompt_tokens": 100, "prompt_cache_hit_tokens": 64, "completion_tokens": 5}, 0.5)
+    client._record_usage(None, 0.5)
+    event = client.usage_stats()["by_role"]["event"]
+    assert (event["requests"], event["cached_tokens"], event["mean_latency"]) == (2, 64, 0.5)
+
+    # 打包器的单局缓存键包含系统提示词，与单局请求一致
+    cache = LLMResponseCache()
+    client, completions = _client("prefix", cache)
+    client.call_judge_llm("ACTION_1: a\nACTION_2: b", REF_TABLE)
+    PromptPacker(client).judge_many(["ACTION_1: a\nACTION_2: b"], REF_TABLE)
+    assert len(completions.calls) == 1 and cache.stats()["hits"] == 1
+
+    print("✅ 用量统计正常")
+
+def test_statistics_include_usage():
+    """测试多局统计结果包含LLM用量"""
+    print("🔍 测试统计中的用量...")
+
+    client, _ = _client("prefix")
+    game = ShorlineEcologyGame(llm_client=client, pause_between_years=False, use_llm_for_random_events=False)
+    game.enable_random_events = False
+    game.game_state.max_years = 3
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            statistics = game.run_multiple_games(num_games=1)
+        finally:
+            os.chdir(cwd)
+    usage = statistics["llm_usage"]
+    assert set(usage["by_role"]) == {"human", "judge", "shore"}
+    assert usage["total"]["cached_tokens"] > 0
+    assert list(statistics)[-1] == "detailed_results"
+    game.print_statistics(statistics)
+
+    print("✅ 统计中的用量正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 提示词前缀布局测试")
+    print("=" * 50)
+    test_prefix_layout_messages()
+    test_usage_reporting()
+    test_statistics_include_usage()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+跨游戏提示词打包与多局同步推进测试脚本
+"""
+
+import sys
+import os
+import re
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_fakes import FakeCompletions, REF_TABLE, fake_client
+from src.llm_client import LLMClient
+from src.response_cache import LLMResponseCache
+from src.reference_table import ReferenceTable
+from src.prompt_packing import PromptPacker, split_packed_response
+from src.lockstep import LockstepRunner
+from src.game_controller import ShorlineEcologyGame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TABLE = ReferenceTable.load(os.path.join(ROOT, "prompt", "ref_scoring_table.txt"))
+ACTION_PATTERN = re.compile(r"ACTION_1: (.*)\nACTION_2: (.*)")
+
+def _judge_block(action_1, action_2):
+    scores = TABLE.judge_scores(action_1, action_2)
+    return "\n".join(f"{key}_rank: {value}" for key, value in scores.items())
+
+class FakeEndpoint:
+    """模拟LLM服务：按提示词类型返回回复，记录请求"""
+    def __init__(self, broken_items=()):
+        self.requests = []
+        self.broken_items = set(broken_items)
+        self.year = 0
+    def __call__(self, prompt, system_prompt=None, max_retries=5):
+        if "Several independent games are" in prompt:
+            kind = "judge_packed"
+        elif "Several independent shorelines" in prompt:
+            kind = "shore_packed"
+        elif "You are the judge" in prompt:
+            kind = "judge"
+        elif "expert in shoreline ecology" in prompt or "shoreline ecology expert" in prompt:
+            kind = "shore"
+        else:
+            kind = "human"
+        self.requests.append(kind)
+        pairs = ACTION_PATTERN.findall(prompt)
+        if kind == "judge_packed":
+            blocks = []
+            for number, (a1, a2) in enumerate(pairs, 1):
+                body = "first_country_rank: oops" if (a1, a2) in self.broken_items else _judge_block(a1, a2)
+                blocks.append(f"**ITEM {number}:**\n{body}")
+            return "```\n" + "\n\n".join(blocks) + "\n```"
+        if kind == "shore_packed":
+            return "\n\n".join(f"ITEM {n}\nCHANCES: 机遇{a1}\nCHALLENGES: 挑战{a2}"
+                               for n, (a1, a2) in enumerate(pairs, 1))
+        if kind == "judge":
+            return _judge_block(*pairs[0])
+        if kind == "shore":
+            return f"CHANCES: 机遇{pairs[0][0]}\nCHALLENGES: 挑战{pairs[0][1]}"
+        return "ACTION_1: develop industry\nACTION_2: close fisheries"
+
+def _client(endpoint, cache=None):
+    client = LLMClient(api_key="test_key", model="m", response_cache=cache)
+    client._request_llm = endpoint
+    return client
+
+class EndpointCompletions(FakeCompletions):
+    """把FakeEndpoint包装成chat.completions接口（经过客户端的用量统计）"""
+    def __init__(self, endpoint):
+        super().__init__()
+        self.endpoint = endpoint
+    def reply(self, messages):
+        return self.endpoint("\n\n".join(message["content"] for message in messages))
+
+def test_split_packed_response():
+    """测试按条目标题拆分打包回复"""
+    print("🔍 测试打包回复拆分...")
+
+    response = "ITEM 1\nfirst_country_rank: 1\n\n**Item 2:**\nfirst_country_rank: 2\n### ITEM 3\nx"
+    blocks = split_packed_response(response)
+    assert sorted(blocks) == [1, 2, 3]
+    assert "first_country_rank: 2" in blocks[2] and "first_country_rank: 1" not in blocks[2]
+    assert split_packed_response("no items here") == {}
+
+    print("✅ 打包回复拆分正常")
+
+def test_packer_with_retry_and_cache():
+    """测试打包评分：解析失败的条目单独重试，结果按单局缓存键写入缓存"""
+    print("🔍 测试打包评分...")
+
+    items = [("develop industry", "close fisheries"), ("urban expansion", "deforestation"),
+             ("mining operations", "use organic fertilizer"), ("close some factories", "develop fisheries")]
+    texts = [f"ACTION_1: {a1}\nACTION_2: {a2}" for a1, a2 in items]
+    endpoint = FakeEndpoint(broken_items=[items[2]])
+    cache = LLMResponseCache()
+    client = _client(endpoint, cache)
+    packer = PromptPacker(client, max_items=3)
+
+    results = packer.judge_many(texts, "TABLE")
+    assert results == [TABLE.judge_scores(a1, a2) for a1, a2 in items]
+    # 3个条目一批 + 剩下1个单局请求 + 解析失败的1个单独重试
+    assert endpoint.requests == ["judge_packed", "judge", "judge"]
+    assert packer.stats()["retried_items"] == 1
+
+    # 打包结果写入了单局缓存：逐局调用直接命中
+    endpoint.requests.clear()
+    assert client.call_judge_llm(texts[0], "TABLE") == results[0]
+    assert packer.judge_many(texts, "TABLE") == results
+    assert endpoint.requests == []
+    print(f"   统计: {packer.stats()}, 缓存: {cache.stats()}")
+
+    shore = packer.shore_many(texts[:2])
+    assert shore[1] == {"opportunities": "机遇urban expansion", "challenges": "挑战deforestation"}
+
+    print("✅ 打包评分正常")
+
+def test_packed_roles_and_profiles():
+    """测试打包请求的用量记在对应角色下，compact档位使用精简的打包模板，prefix布局不打包"""
+    print("🔍 测试打包请求的角色与档位...")
+
+    items = [("develop industry", "close fisheries"), ("urban expansion", "deforestation")]
+    texts = [f"ACTION_1: {a1}\nACTION_2: {a2}" for a1, a2 in items]
+    expected = [TABLE.judge_scores(a1, a2) for a1, a2 in items]
+    for profile in ("standard", "compact"):
+        endpoint = FakeEndpoint()
+        completions = EndpointCompletions(endpoint)
+        client = fake_client(completions, prompt_profile=profile)
+        packer = PromptPacker(client)
+        assert packer.judge_many(texts, REF_TABLE) == expected
+        assert packer.shore_many(texts)[0]["opportunities"] == "机遇develop industry"
+        assert endpoint.requests == ["judge_packed", "shore_packed"]
+        assert client.usage["judge"]["requests"] == client.usage["shore"]["requests"] == 1
+        assert "other" not in client.usage
+        judge_prompt = completions.calls[0]["messages"][-1]["content"]
+        # compact档位的打包模板带CSV形式的参考评分表
+        assert ("develop industry,-5,+4" in judge_prompt) == (profile == "compact")
+        assert ("are judged at once" in judge_prompt) == (profile == "compact")
+
+    # prefix布局：系统提示词按单局回复格式编写，条目逐个请求
+    endpoint = FakeEndpoint()
+    client = fake_client(EndpointCompletions(endpoint), prompt_layout="prefix")
+    packer = PromptPacker(client)
+    assert packer.judge_many(texts, REF_TABLE) == expected
+    assert endpoint.requests == ["judge", "judge"] and packer.stats()["packed_requests"] == 0
+
+    print("✅ 打包请求的角色与档位正常")
+
+def test_lockstep_matches_sequential():
+    """测试同步推进（打包请求）与逐局运行的结果一致，且请求数减少"""
+    print("🔍 测试多局同步推进...")
+
+    def make_games(endpoint, count):
+        client = _client(endpoint)
+        games = []
+        for _ in range(count):
+            game = ShorlineEcologyGame(llm_client=client, pause_between_years=False,
+                                       use_llm_for_random_events=False)
+            game.enable_random_events = False
+            games.append(game)
+        return client, games
+
+    sequential_endpoint = FakeEndpoint()
+    _, games = make_games(sequential_endpoint, 3)
+    sequential = [game.run_single_game() for game in games]
+
+    packed_endpoint = FakeEndpoint()
+    client, games = make_games(packed_endpoint, 3)
+    packer = PromptPacker(client, max_items=8)
+    lockstep = LockstepRunner(games, packer=packer).run()
+
+    for a, b in zip(sequential, lockstep):
+        assert (a["total_years"], a["final_scores"]) == (b["total_years"], b["final_scores"])
+    assert len(games[0].game_state.yearly_records) == lockstep[0]["total_years"]
+    years = sum(s["total_years"] for s in sequential)
+    print(f"   逐局请求: {len(sequential_endpoint.requests)}, 同步打包请求: {len(packed_endpoint.requests)}")
+    assert sequential_endpoint.requests.count("judge") == years
+    assert packed_endpoint.requests.count("judge_packed") == lockstep[0]["total_years"]
+    assert packed_endpoint.requests.count("judge") == 0
+    assert packed_endpoint.requests.count("shore_packed") == lockstep[0]["total_years"]
+
+    print("✅ 多局同步推进正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 跨游戏提示词打包测试")
+    print("=" * 50)
+    test_split_packed_response()
+    test_packer_with_retry_and_cache()
+    test_packed_roles_and_profiles()
+    test_lockstep_matches_sequential()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+精简提示词档位测试脚本
+"""
+
+import sys
+import os
+import re
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.llm_client import LLMClient
+from src.prompt_templates import PromptRegistry
+from src.prompt_profiles import (compact_ref_table, bound_text, count_tokens, load_recorded_years,
+                                 measure_token_savings, validate_against_history)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REGISTRY = PromptRegistry(os.path.join(ROOT, "prompt"))
+REF_TABLE = REGISTRY.text("ref_scoring_table")
+RECORDS = load_recorded_years(os.path.join(ROOT, "history"))
+ACTION_PATTERN = re.compile(r"ACTION_1: (.*)\nACTION_2: (.*)")
+
+def _client(profile, layout="inline"):
+    return LLMClient(api_key="test_key", prompt_registry=REGISTRY, prompt_profile=profile, prompt_layout=layout)
+
+def test_compact_encoding():
+    """测试CSV评分表、文本截断和精简模板"""
+    print("🔍 测试精简编码...")
+
+    table = compact_ref_table(REF_TABLE)
+    assert table.splitlines()[0] == "close some factories,+5,-3"
+    assert "|" not in table and len(table) < len(REF_TABLE) / 2
+    assert compact_ref_table("not a table") == "not a table"
+
+    long_text = "Overfishing   leads to depletion of fish stocks, " * 20
+    bounded = bound_text(long_text, 80)
+    assert len(bounded) <= 80 and bounded.endswith("…") and "  " not in bounded
+    assert bound_text("short", 80) == "short" and bound_text(None) == ""
+
+    compact = _client("compact")
+    prompt = compact.build_human_prompt(62, 95, long_text, "", REF_TABLE)
+    assert table in prompt and "country 62/100, shoreline 95/100" in prompt
+    assert "Challenges: none" in prompt and long_text.strip() not in prompt
+    judge_prompt, _ = compact.build_judge_prompt("ACTION_1: a\nACTION_2: b", REF_TABLE)
+    assert "ACTION_1: a\nACTION_2: b" in judge_prompt and "first_shoreline_rank" in judge_prompt
+
+    prefix = _client("compact", "prefix")
+    assert table in prefix.system_prompt("judge", REF_TABLE)
+    assert prefix.build_judge_prompt("ACTION_1: a\nACTION_2: b", REF_TABLE)[0] == "ACTION_1: a\nACTION_2: b"
+
+    try:
+        _client("tiny")
+        assert False, "未知档位应报错"
+    except ValueError:
+        pass
+
+    print("✅ 精简编码正常")
+
+def test_token_savings():
+    """测试按角色统计两个档位的token数"""
+    print("🔍 测试token节省...")
+
+    assert count_tokens("") == 0 and count_tokens("close some factories,+5,-3") > 5
+    report = measure_token_savings(RECORDS, REF_TABLE, _client("standard"), _client("compact"))
+    for role, entry in report.items():
+        print(f"   {role}: {entry['standard']:.0f} -> {entry['compact']:.0f} tokens/年 (节省{entry['saving']:.0%})")
+    assert report["human"]["saving"] > 0.4
+    assert report["judge"]["saving"] > 0.4
+    assert report["shore"]["saving"] > 0.2
+    assert report["total"]["standard"] > report["total"]["compact"]
+
+    print("✅ token节省统计正常")
+
+def test_validate_against_history():
+    """测试用历史记录验证精简档位的裁判评分分布"""
+    print("🔍 测试历史记录验证...")
+
+    recorded = {(r["country_actions"]["action_1"], r["country_actions"]["action_2"]): r["judge_scores"]
+                for r in RECORDS}
+
+    def judge_with(shift):
+        def reply(prompt, system_prompt=None, max_retries=5):
+            scores = recorded[ACTION_PATTERN.search(prompt).groups()]
+            return "\n".join(f"{key}_rank: {value + (shift if key.endswith('shoreline') else 0)}"
+                             for key, value in scores.items())
+        return reply
+
+    consistent = _client("compact")
+    consistent._request_llm = judge_with(0)
+    baseline = validate_against_history(consistent, RECORDS, REF_TABLE)
+    assert baseline["years"] == len(RECORDS) and baseline["within_tolerance"]
+    print(f"   一致裁判: {baseline['scores']['first_country']}")
+    # 历史记录中同一组行动的评分不完全相同
+    assert baseline["scores"]["first_country"]["exact_rate"] > 0.8
+
+    biased = _client("compact")
+    biased._request_llm = judge_with(1)
+    report = validate_against_history(biased, RECORDS, REF_TABLE)
+    print(f"   偏移裁判: {report['scores']['first_shoreline']}")
+    assert not report["within_tolerance"]
+    shift = report["scores"]["first_shoreline"]["rejudged_mean"] - baseline["scores"]["first_shoreline"]["rejudged_mean"]
+    assert abs(shift - 1) < 1e-9
+    assert report["scores"]["first_country"] == baseline["scores"]["first_country"]
+
+    print("✅ 历史记录验证正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 精简提示词档位测试")
+    print("=" * 50)
+    test_compact_encoding()
+    test_token_savings()
+    test_validate_against_history()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
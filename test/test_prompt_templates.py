@@ -0,0 +1,117 @@
+"""
+提示词模板注册表测试脚本
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.prompt_templates import PromptTemplate, PromptRegistry
+from src.llm_client import LLMClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT_DIR = os.path.join(ROOT, "prompt")
+
+def test_render_matches_format():
+    """测试预编译渲染（含预先渲染的常量）与str.format结果一致"""
+    print("🔍 测试模板渲染...")
+
+    registry = PromptRegistry(PROMPT_DIR)
+    ref_table = registry.text("ref_scoring_table")
+    values = {
+        "country_score": 60, "shoreline_score": 85,
+        "shoreline_opportunities": "渔业资源 {不是字段}", "shoreline_challenges": "海岸侵蚀",
+        "country_actions": "ACTION_1: develop industry\nACTION_2: close fisheries",
+        "num_items": 2, "items": "ITEM 1\n...",
+    }
+    for name in ["HumanLLM", "JudgeLLM", "ShoreLLM", "JudgeLLM_packed", "ShoreLLM_packed"]:
+        with open(os.path.join(PROMPT_DIR, f"{name}.txt"), "r", encoding="utf-8") as f:
+            expected = f.read().format(ref_scoring_table=ref_table, **values)
+        assert registry.get(name).render(ref_scoring_table=ref_table, **values) == expected
+        bound = registry.bind(name, ref_scoring_table=ref_table)
+        assert "ref_scoring_table" not in bound.fields
+        assert bound.render(**values) == expected
+        # 同一常量值复用已渲染的模板
+        assert registry.bind(name, ref_scoring_table=ref_table) is bound
+
+    template = PromptTemplate("{{x}} {a!r} {b:>4} {c}")
+    assert template.render(a="q", b=7, c=1.5) == "{{x}} {a!r} {b:>4} {c}".format(a="q", b=7, c=1.5)
+    # 常量值中的花括号不会再被当作字段
+    assert template.partial(a="{c}").render(b=1, c=2) == "{x} '{c}'    1 2"
+    try:
+        template.render(a=1)
+        assert False, "缺少字段应报错"
+    except KeyError:
+        pass
+    assert registry.stats()["loads"] == 6
+
+    print("✅ 模板渲染正常")
+
+def test_hot_reload():
+    """测试模板文件修改后自动重新加载，未修改时不重复读取"""
+    print("🔍 测试模板热重载...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "Greeting.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("Hello {name}, table: {table}")
+        registry = PromptRegistry(tmp, check_interval=0)
+        assert registry.render("Greeting", constants={"table": "T"}, name="a") == "Hello a, table: T"
+        assert registry.render("Greeting.txt", name="b", table="T") == "Hello b, table: T"
+        assert registry.stats() == {"templates": 2, "loads": 2, "reloads": 0}
+        registry.render("Greeting", name="c", table="T")
+        assert registry.stats()["loads"] == 2
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("Hi {name}! {table}")
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+        assert registry.render("Greeting", constants={"table": "T"}, name="a") == "Hi a! T"
+        assert registry.stats()["reloads"] == 1
+
+        # 检查间隔内不查看文件
+        slow = PromptRegistry(tmp, check_interval=3600)
+        assert slow.render("Greeting", name="x", table="") == "Hi x! "
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("changed {name}")
+        assert slow.render("Greeting", name="x", table="") == "Hi x! "
+
+    print("✅ 模板热重载正常")
+
+def test_client_uses_registry():
+    """测试LLM客户端通过注册表构造提示词，不再每次读取文件"""
+    print("🔍 测试客户端提示词构造...")
+
+    registry = PromptRegistry(PROMPT_DIR, check_interval=3600)
+    client = LLMClient(api_key="test_key", prompt_registry=registry)
+    ref_table = registry.text("ref_scoring_table")
+    actions = "ACTION_1: develop industry\nACTION_2: close fisheries"
+    prompt, cache_prompt = client.build_judge_prompt(actions, ref_table)
+    with open(os.path.join(PROMPT_DIR, "JudgeLLM.txt"), "r", encoding="utf-8") as f:
+        assert prompt == f.read().format(country_actions=actions, ref_scoring_table=ref_table)
+    assert cache_prompt == prompt
+
+    sent = []
+    client._request_llm = lambda prompt, system_prompt=None, max_retries=5: sent.append(prompt) or \
+        "ACTION_1: a\nACTION_2: b"
+    for year in range(5):
+        client.call_human_llm(60 + year, 80, "机遇", "挑战", ref_table)
+        client.build_shore_prompt(actions)
+    assert "Current Country Development Score (out of 100): 64" in sent[-1]
+    assert registry.stats()["loads"] == 4
+    print(f"   注册表统计: {registry.stats()}")
+
+    print("✅ 客户端提示词构造正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 提示词模板注册表测试")
+    print("=" * 50)
+    test_render_matches_format()
+    test_hot_reload()
+    test_client_uses_registry()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
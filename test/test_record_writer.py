@@ -0,0 +1,93 @@
+"""
+流式年度记录写入器测试脚本
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.game_state import GameState
+from src.record_writer import JsonlRecordWriter, iter_jsonl_records
+
+def _play_years(game_state, years):
+    """模拟若干年的记录（不调用API）"""
+    for year in range(1, years + 1):
+        game_state.year = year
+        game_state.update_scores(2, -1)
+        game_state.record_year(
+            country_actions={"action_1": f"第{year}年行动1", "action_2": f"第{year}年行动2"},
+            shore_response={"opportunities": "机遇", "challenges": "挑战"},
+            judge_scores={"first_country": 2, "first_shoreline": -1, "second_country": 0, "second_shoreline": 0},
+            random_events=[],
+            country_change=2,
+            shoreline_change=-1,
+            random_country_impact=0,
+            random_shoreline_impact=0
+        )
+
+def test_stream_plain_jsonl():
+    """测试年度记录按批量写入并可在游戏进行中读取"""
+    print("🔍 测试流式JSONL写入...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "records.jsonl")
+        writer = JsonlRecordWriter(path, flush_every=2, flush_interval=3600)
+        game_state = GameState()
+        game_state.attach_record_writer(writer)
+        writer.begin_game(1)
+
+        _play_years(game_state, 3)
+        # 3行中前2行已按批量刷新，第3行仍在缓冲区
+        live_rows = list(iter_jsonl_records(path))
+        print(f"   游戏进行中可读取行数: {len(live_rows)}")
+        assert len(live_rows) == 2
+
+        writer.end_game(game_state.get_game_summary())
+        writer.close()
+
+        rows = list(iter_jsonl_records(path))
+        years = [r for r in rows if r["type"] == "year"]
+        summaries = [r for r in rows if r["type"] == "summary"]
+        print(f"   年度记录: {len(years)}, 游戏总结: {len(summaries)}")
+        assert [r["year"] for r in years] == [1, 2, 3]
+        assert all(r["game_id"] == 1 for r in rows)
+        assert summaries[0]["game_summary"]["yearly_records"] == 3
+        assert years[0]["score_changes"]["country"] == 2
+
+    print("✅ 流式JSONL写入正常")
+
+def test_stream_gzip_without_retained_records():
+    """测试gzip压缩和不保留内存记录模式"""
+    print("🔍 测试gzip压缩与平坦内存模式...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "records.jsonl.gz")
+        with JsonlRecordWriter(path, flush_every=5) as writer:
+            game_state = GameState()
+            game_state.attach_record_writer(writer, retain_records=False)
+            writer.begin_game("g-1")
+            _play_years(game_state, 12)
+            summary = game_state.get_game_summary()
+            writer.end_game(summary)
+
+        print(f"   内存中保留记录数: {len(game_state.yearly_records)}")
+        assert game_state.yearly_records == []
+        assert summary["yearly_records"] == 12
+
+        rows = list(iter_jsonl_records(path))
+        print(f"   压缩文件中读取行数: {len(rows)}")
+        assert len(rows) == 13
+
+    print("✅ gzip压缩与平坦内存模式正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 流式年度记录写入器测试")
+    print("=" * 50)
+    test_stream_plain_jsonl()
+    test_stream_gzip_without_retained_records()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
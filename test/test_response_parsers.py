@@ -0,0 +1,200 @@
+"""
+单遍回复解析器测试脚本
+"""
+
+import sys
+import os
+import re
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.llm_client import LLMClient
+from src.prompt_profiles import load_recorded_years
+from src.response_parsers import (PARSERS, iter_human_tokens, parse_human_response, parse_shore_response,
+                                  parse_judge_response, parse_event_response, build_parser_corpus,
+                                  benchmark_parsers)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = build_parser_corpus(load_recorded_years(os.path.join(ROOT, "history")))
+
+# ---------- 原有的逐行解析实现（作为对照） ----------
+
+def legacy_human(response):
+    cleaned_response = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL)
+    code_block_match = re.search(r'```(.*?)```', cleaned_response, re.DOTALL)
+    if code_block_match:
+        cleaned_response = code_block_match.group(1).strip()
+    actions = {}
+    current_action = None
+    for line in cleaned_response.split('\n'):
+        line = line.strip()
+        if line in ['```', ''] or not line:
+            continue
+        if line.startswith('ACTION_1:'):
+            current_action = 'action_1'
+            actions[current_action] = line.replace('ACTION_1:', '').strip()
+        elif line.startswith('ACTION_2:'):
+            current_action = 'action_2'
+            actions[current_action] = line.replace('ACTION_2:', '').strip()
+        elif current_action and line and not line.startswith('```'):
+            if current_action in actions:
+                actions[current_action] += ' ' + line
+            else:
+                actions[current_action] = line
+    actions.setdefault('action_1', '')
+    actions.setdefault('action_2', '')
+    return actions
+
+def legacy_shore(response):
+    result = {}
+    current_section = None
+    for line in response.split('\n'):
+        line = line.strip()
+        if line.startswith('CHANCES:') or line.startswith('机遇:') or line.startswith('Opportunities:'):
+            current_section = 'opportunities'
+            for prefix in ['CHANCES:', '机遇:', 'Opportunities:']:
+                if line.startswith(prefix):
+                    content = line.replace(prefix, '').strip()
+                    if content:
+                        result['opportunities'] = content
+                    break
+        elif line.startswith('CHALLENGES:') or line.startswith('挑战:') or line.startswith('Challenges:'):
+            current_section = 'challenges'
+            for prefix in ['CHALLENGES:', '挑战:', 'Challenges:']:
+                if line.startswith(prefix):
+                    content = line.replace(prefix, '').strip()
+                    if content:
+                        result['challenges'] = content
+                    break
+        elif current_section and line and not line.startswith('```') and line != '```':
+            if line.startswith('-'):
+                content = line.replace('-', '').strip()
+                if content and current_section not in result:
+                    result[current_section] = content
+            elif not line.startswith('```') and current_section not in result:
+                result[current_section] = line
+    return result
+
+def legacy_judge(response):
+    scores = {}
+    current_action = None
+    for line in response.split('\n'):
+        line = line.strip()
+        try:
+            if line.startswith('first_country_rank:'):
+                scores['first_country'] = int(line.split(':')[1].strip())
+            elif line.startswith('first_shoreline_rank:'):
+                scores['first_shoreline'] = int(line.split(':')[1].strip())
+            elif line.startswith('second_country_rank:'):
+                scores['second_country'] = int(line.split(':')[1].strip())
+            elif line.startswith('second_shoreline_rank:'):
+                scores['second_shoreline'] = int(line.split(':')[1].strip())
+            elif line.startswith('ACTION_1:'):
+                current_action = 'first'
+            elif line.startswith('ACTION_2:'):
+                current_action = 'second'
+            elif current_action and 'Country Score Change:' in line:
+                value_str = line.split('Country Score Change:')[1].strip().replace('+', '').replace(' ', '')
+                scores[f'{current_action}_country'] = int(value_str)
+            elif current_action and 'Shoreline Score Change:' in line:
+                value_str = line.split('Shoreline Score Change:')[1].strip().replace('+', '').replace(' ', '')
+                scores[f'{current_action}_shoreline'] = int(value_str)
+        except (ValueError, IndexError):
+            continue
+    return scores
+
+def legacy_event(response):
+    scores = {"country_impact": 0, "shoreline_impact": 0, "reasoning": ""}
+    for line in response.split('\n'):
+        line = line.strip()
+        for key in ('country_impact', 'shoreline_impact'):
+            if line.startswith(key + ':'):
+                try:
+                    scores[key] = max(-3, min(3, int(line.split(':')[1].strip())))
+                except (ValueError, IndexError):
+                    scores[key] = 0
+        if line.startswith('reasoning:'):
+            scores['reasoning'] = line.replace('reasoning:', '').strip()
+    return scores
+
+LEGACY = {"human": legacy_human, "shore": legacy_shore, "judge": legacy_judge, "event": legacy_event}
+
+EDGE_CASES = [
+    ("human", "```\nACTION_1: build port\nACTION_2: plant mangroves\n```"),
+    ("human", "```ACTION_2: early\nACTION_1: a\nACTION_2: b\n```"),
+    ("human", "``````\nACTION_1: a\nACTION_2: b"),
+    ("human", "ACTION_1: a ACTION_1: b\nACTION_2:"),
+    ("human", "<think>ACTION_1: wrong</think>\nACTION_1: right\nACTION_2: also right"),
+    ("human", "ACTION_1: a\nACTION_2: b\ny```"),
+    ("human", "no actions at all"),
+    ("shore", "CHANCES:\n\n- eco-tourism\n- fishing\nCHALLENGES: erosion"),
+    ("shore", "CHANCES: \n```\nreef restoration\nCHALLENGES:\n- \n- storm surge"),
+    ("shore", "Opportunities: mangroves\nChallenges: CHALLENGES: doubled"),
+    ("shore", "CHANCES: a CHALLENGES: b\nCHALLENGES: c"),
+    ("judge", "first_country_rank: +4\nfirst_shoreline_rank: -2\nsecond_country_rank: 0\nsecond_shoreline_rank: 1"),
+    ("judge", "first_country_rank: four\nfirst_shoreline_rank: -2:extra\nsecond_country_rank:\nsecond_shoreline_rank: 3"),
+    ("judge", "ACTION_1: build port\nCountry Score Change: + 4\nShoreline Score Change: -3\nACTION_2:\n"
+              "Country Score Change: n/a\nShoreline Score Change: +1"),
+    ("judge", "```\nfirst_country_rank: 1\nfirst_shoreline_rank: 2\nsecond_country_rank: 3\nsecond_shoreline_rank: 4\n```\n"),
+    ("event", "country_impact: 7\nshoreline_impact: x\nreasoning: storm reasoning: surge"),
+    ("event", "country_impact: -2:extra\nno colon here\nshoreline_impact:-5"),
+]
+
+def test_matches_legacy_parsers():
+    """测试新解析器与原有实现在历史语料和边界情况上结果一致"""
+    print("🔍 测试解析结果一致性...")
+
+    assert {role for role, _ in CORPUS} == set(PARSERS)
+    for role, response in CORPUS + EDGE_CASES:
+        assert PARSERS[role](response) == LEGACY[role](response), (role, response)
+
+    assert parse_human_response("ACTION_1: a\nwith support\nACTION_2: b") == {"action_1": "a with support",
+                                                                           "action_2": "b"}
+    assert parse_shore_response("CHANCES:\n- eco-tourism\nCHALLENGES: erosion") == {
+        "opportunities": "ecotourism", "challenges": "erosion"}
+    assert parse_judge_response("first_country_rank: bad") == {}
+    assert parse_event_response("country_impact: 9")["country_impact"] == 3
+
+    # 客户端的解析方法使用同一实现
+    assert LLMClient.parse_judge_response(EDGE_CASES[13][1]) == parse_judge_response(EDGE_CASES[13][1])
+    assert LLMClient.parse_shore_response(EDGE_CASES[7][1]) == parse_shore_response(EDGE_CASES[7][1])
+
+    print(f"✅ {len(CORPUS) + len(EDGE_CASES)}条回复解析结果一致")
+
+def test_human_tokens():
+    """测试人类回复的逐行切分结果"""
+    print("🔍 测试逐行切分...")
+
+    tokens = list(iter_human_tokens("Here you go\n```\nACTION_1: a\nmore\n\nACTION_2: b\n```"))
+    assert [kind for kind, _, _ in tokens] == ["action", "continuation", "skip", "action"]
+    tokens = list(iter_human_tokens("intro\nACTION_2: b"))
+    assert tokens == [("ignored", None, "intro"), ("action", "action_2", "b")]
+
+    print("✅ 逐行切分正常")
+
+def test_benchmark():
+    """测试解析基准：按角色比较新旧解析器的每条耗时"""
+    print("🔍 测试解析基准...")
+
+    current = benchmark_parsers(CORPUS, repeat=20)
+    legacy = benchmark_parsers(CORPUS, repeat=20, parsers=LEGACY)
+    for role in sorted(current):
+        assert current[role]["responses"] == legacy[role]["responses"] > 0
+        print(f"   {role}: {legacy[role]['microseconds']:.1f}µs -> {current[role]['microseconds']:.1f}µs "
+              f"({current[role]['responses']}条)")
+    total_current = sum(r["microseconds"] * r["responses"] for r in current.values())
+    total_legacy = sum(r["microseconds"] * r["responses"] for r in legacy.values())
+    print(f"   合计: {total_legacy / 1000:.2f}ms -> {total_current / 1000:.2f}ms")
+
+    print("✅ 解析基准正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 回复解析器测试")
+    print("=" * 50)
+    test_matches_legacy_parsers()
+    test_human_tokens()
+    test_benchmark()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
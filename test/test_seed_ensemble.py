@@ -0,0 +1,99 @@
+"""
+随机事件种子集成测试脚本
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.counterfactual import RecordedGame, load_history_games
+from src.game_state import YearlyRecord
+from src.random_events import RandomEventSystem
+from src.seed_ensemble import SeedEnsemble
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_DIR = os.path.join(ROOT, "history")
+
+def _game(initial_country, initial_shoreline, yearly_scores, outcome="victory"):
+    records = [YearlyRecord(year=year, country_score=0, shoreline_score=0,
+                            country_actions={"action_1": "develop industry", "action_2": "close fisheries"},
+                            shore_response={}, judge_scores=scores, random_events=[],
+                            country_change=0, shoreline_change=0, random_country_impact=0, random_shoreline_impact=0)
+               for year, scores in enumerate(yearly_scores, 1)]
+    return RecordedGame(source="manual", initial_country=initial_country, initial_shoreline=initial_shoreline,
+                        records=records, outcome=outcome, config={"annual_bonus": 1})
+
+def _scores(country, shoreline):
+    return {"first_country": country, "first_shoreline": shoreline, "second_country": 0, "second_shoreline": 0}
+
+def test_matches_exact_distribution():
+    """测试一年的结果概率与随机事件的精确分布一致"""
+    print("🔍 测试与精确分布一致...")
+
+    # 国家97分、行动0分、年度奖励+1：随机事件国家影响≥2时胜利
+    game = _game(97, 88, [_scores(0, 0)])
+    distribution = RandomEventSystem(use_llm_evaluation=False).impact_distribution(88)
+    exact = sum(p for (country, _), p in distribution.items() if country >= 2)
+    ensemble = SeedEnsemble(num_seeds=40000, seed=3)
+    result = ensemble.replay(game)
+    print(f"   胜利概率: 精确{exact:.4f}, 集成{result['outcomes']['victory']:.4f}")
+    assert abs(result["outcomes"]["victory"] - exact) < 4 * np.sqrt(exact * (1 - exact) / 40000)
+    # 记录只有一年：未胜利的种子无法判定
+    assert abs(result["outcomes"]["undetermined"] + result["outcomes"]["victory"] - 1) < 1e-9
+
+    # 同一种子结果相同；继续重复最后一年的行动时没有无法判定的种子
+    again = SeedEnsemble(num_seeds=40000, seed=3).simulate(game)
+    assert np.array_equal(again["outcome"], ensemble.simulate(game)["outcome"])
+    extended = SeedEnsemble(num_seeds=2000, seed=3, extend_trace=True).replay(game)
+    assert extended["outcomes"]["undetermined"] == 0 and extended["outcomes"]["victory"] > 0.99
+
+    print("✅ 与精确分布一致")
+
+def test_disaster_feedback():
+    """测试海岸线越差灾害越多（灾害修正的反馈），以及全局灾害概率系数"""
+    print("🔍 测试灾害修正反馈...")
+
+    trace = [_scores(2, -1)] * 25
+    healthy = SeedEnsemble(num_seeds=5000, seed=1).simulate(_game(60, 100, trace, outcome="timeout"))
+    stressed = SeedEnsemble(num_seeds=5000, seed=1).simulate(_game(60, 80, trace, outcome="timeout"))
+    assert stressed["event_shoreline"].mean() < healthy["event_shoreline"].mean()
+    harsher = SeedEnsemble(num_seeds=5000, seed=1, disaster_probability_modifier=2.0)
+    assert harsher.simulate(_game(60, 80, trace))["event_shoreline"].mean() < stressed["event_shoreline"].mean()
+
+    print("✅ 灾害修正反馈正常")
+
+def test_history_luck_attribution():
+    """测试历史游戏的结果分布和运气归因"""
+    print("🔍 测试历史游戏运气归因...")
+
+    games = load_history_games(HISTORY_DIR)
+    report = SeedEnsemble(num_seeds=5000, seed=0).run(games)
+    print(f"   {report['games']}局 × {report['seeds']}个种子, 耗时{report['elapsed']:.2f}秒, "
+          f"记录胜利率{report['recorded_victory_rate']:.2%}, 期望胜利率{report['expected_victory_rate']:.2%}")
+    assert report["games"] == 8 and report["recorded_victory_rate"] == 0.25
+    assert abs(report["luck"] - (report["recorded_victory_rate"] - report["expected_victory_rate"])) < 1e-12
+    for detail in report["details"]:
+        assert abs(sum(detail["outcomes"].values()) - 1) < 1e-9
+        assert 0 <= detail["event_percentile"]["country"] <= 1
+    # 第3年胜利的游戏运气最好，几乎必胜却超时的游戏运气最差
+    assert report["luckiest"][0]["source"] == "game_record_20250709_172957.json"
+    assert report["luckiest"][0]["victory_luck"] > 0.5
+    assert report["unluckiest"][0]["source"] == "game_record_20250709_172158.json"
+    assert report["unluckiest"][0]["victory_probability"] > 0.9
+    assert report["elapsed"] < 10
+
+    print("✅ 历史游戏运气归因正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 随机事件种子集成测试")
+    print("=" * 50)
+    test_matches_exact_distribution()
+    test_disaster_feedback()
+    test_history_luck_attribution()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
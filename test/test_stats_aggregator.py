@@ -0,0 +1,134 @@
+"""
+在线统计聚合器测试脚本
+"""
+
+import sys
+import os
+import random
+import statistics as pystats
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.stats_aggregator import GameStatsAggregator, RunningStats
+from src.game_controller import ShorlineEcologyGame
+
+def _random_summary(rng):
+    victory = rng.random() < 0.4
+    return {
+        "victory": victory,
+        "outcome": "victory" if victory else rng.choice(["failure", "timeout"]),
+        "total_years": rng.randint(1, 25),
+        "final_scores": {"country": rng.randint(60, 100), "shoreline": rng.randint(70, 100)},
+    }
+
+def test_running_stats_and_merge():
+    """测试Welford统计与分片合并结果一致"""
+    print("🔍 测试Welford统计与合并...")
+
+    rng = random.Random(1)
+    values = [rng.uniform(0, 100) for _ in range(1000)]
+    whole = RunningStats()
+    shards = [RunningStats() for _ in range(3)]
+    for i, value in enumerate(values):
+        whole.update(value)
+        shards[i % 3].update(value)
+    merged = RunningStats()
+    for shard in shards:
+        merged.merge(shard)
+
+    print(f"   均值: {whole.mean:.4f}, 标准差: {whole.std:.4f}")
+    assert abs(whole.mean - pystats.mean(values)) < 1e-9
+    assert abs(whole.variance - pystats.variance(values)) < 1e-6
+    assert abs(merged.mean - whole.mean) < 1e-9
+    assert abs(merged.variance - whole.variance) < 1e-6
+    assert merged.min == min(values) and merged.max == max(values)
+
+    print("✅ Welford统计与合并正常")
+
+def test_game_aggregator():
+    """测试游戏聚合器的分位数、结果计数和序列化合并"""
+    print("🔍 测试游戏聚合器...")
+
+    rng = random.Random(2)
+    summaries = [_random_summary(rng) for _ in range(500)]
+    aggregator = GameStatsAggregator()
+    shard_a, shard_b = GameStatsAggregator(), GameStatsAggregator()
+    for i, summary in enumerate(summaries):
+        aggregator.update(summary)
+        (shard_a if i % 2 else shard_b).update(summary)
+    aggregator.record_error()
+    shard_b.record_error()
+
+    # 跨进程传递时使用字典序列化
+    merged = GameStatsAggregator.from_dict(shard_a.to_dict())
+    merged.merge(GameStatsAggregator.from_dict(shard_b.to_dict()))
+    merged_snapshot, whole_snapshot = merged.snapshot(), aggregator.snapshot()
+    assert merged_snapshot["outcomes"] == whole_snapshot["outcomes"]
+    for name in GameStatsAggregator.METRICS:
+        merged_metric, whole_metric = merged_snapshot["metrics"][name], whole_snapshot["metrics"][name]
+        assert merged_metric["histogram"] == whole_metric["histogram"]
+        assert merged_metric["quantiles"] == whole_metric["quantiles"]
+        assert abs(merged_metric["mean"] - whole_metric["mean"]) < 1e-9
+        assert abs(merged_metric["std"] - whole_metric["std"]) < 1e-9
+
+    snapshot = aggregator.snapshot()
+    durations = sorted(s["total_years"] for s in summaries)
+    print(f"   胜利率: {snapshot['victory_rate']:.2%}, 结果: {snapshot['outcomes']}")
+    print(f"   时长中位数: {snapshot['metrics']['duration']['quantiles']['0.5']}")
+    assert snapshot["total_games"] == 501
+    assert snapshot["victories"] == sum(1 for s in summaries if s["victory"])
+    assert snapshot["outcomes"]["error"] == 1
+    assert snapshot["metrics"]["duration"]["quantiles"]["0.5"] == durations[249]
+    assert sum(snapshot["metrics"]["final_country"]["histogram"].values()) == 500
+
+    print("✅ 游戏聚合器正常")
+
+def test_run_multiple_games_streaming_statistics():
+    """测试多次游戏时统计在运行中可用（使用模拟LLM，不调用API）"""
+    print("🔍 测试多次游戏在线统计...")
+
+    class MockLLMClient:
+        model = "mock"
+        def call_human_llm(self, **kwargs):
+            return {"action_1": "develop industry", "action_2": "close fisheries"}
+        def call_judge_llm(self, **kwargs):
+            return {"first_country": 4, "first_shoreline": -5, "second_country": -3, "second_shoreline": 4}
+        def call_shore_llm(self, country_actions):
+            return {"opportunities": "机遇", "challenges": "挑战"}
+
+    game = ShorlineEcologyGame(api_key="test_key", pause_between_years=False,
+                               use_llm_for_random_events=False, retain_records=False)
+    game.llm_client = MockLLMClient()
+    game.enable_random_events = False
+
+    snapshots = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            statistics = game.run_multiple_games(3, keep_detailed_results=False,
+                                                 progress_callback=snapshots.append)
+        finally:
+            os.chdir(cwd)
+
+    print(f"   运行中快照局数: {[s['total_games'] for s in snapshots]}")
+    assert [s["total_games"] for s in snapshots] == [1, 2, 3]
+    assert statistics["detailed_results"] == []
+    # 含年度奖励每年国家+2、海岸线+0，第20年国家分数达到100获胜
+    assert statistics["aggregates"]["outcomes"] == {"victory": 3}
+    assert statistics["average_duration"] == 20
+    assert statistics["victory_rate"] == 1.0
+
+    print("✅ 多次游戏在线统计正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 在线统计聚合器测试")
+    print("=" * 50)
+    test_running_stats_and_merge()
+    test_game_aggregator()
+    test_run_multiple_games_streaming_statistics()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+JSON结构化回复测试脚本
+"""
+
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_fakes import REF_TABLE, ScriptedCompletions, fake_client
+from src.response_cache import LLMResponseCache
+from src.structured_outputs import (ROLE_SCHEMAS, JSON_RESPONSE_FORMAT, schema_instruction, reask_prompt,
+                                    extract_json, validate, parse_structured)
+
+def _client(replies, cache=None, max_reasks=1):
+    completions = ScriptedCompletions(replies)
+    client = fake_client(completions, response_cache=cache, structured_output=True, max_reasks=max_reasks)
+    return client, completions
+
+def test_schema_validation():
+    """测试字段说明、JSON提取和字段校验"""
+    print("🔍 测试字段校验...")
+
+    instruction = schema_instruction("judge")
+    assert all(f'"{name}"' in instruction for name in ROLE_SCHEMAS["judge"])
+    assert "integer in [-5, 5]" in instruction
+
+    assert extract_json('```json\n{"action_1": "a", "action_2": "b"}\n```') == {"action_1": "a", "action_2": "b"}
+    assert extract_json("ACTION_1: a") is None and extract_json("[1, 2]") is None
+
+    values, problems = validate("judge", {"first_country": "+3", "first_shoreline": -2.0,
+                                          "second_country": 10, "second_shoreline": True})
+    assert values == {"first_country": 3, "first_shoreline": -2}
+    assert problems == {"second_country": "10 is out of range [-3, 4]", "second_shoreline": "not an integer"}
+    values, problems = validate("shore", {"opportunities": ["tourism", "fishing"], "challenges": "  "})
+    assert values == {"opportunities": "tourism; fishing"} and problems == {"challenges": "empty"}
+
+    # 不是JSON时退回文本解析；随机事件只保留回复中出现的字段
+    assert parse_structured("judge", "first_country_rank: 1\nfirst_shoreline_rank: -2\n"
+                                     "second_country_rank: -1\nsecond_shoreline_rank: 3")[1] == {}
+    values, problems = parse_structured("event", "country_impact: -2")
+    assert values == {"country_impact": -2} and set(problems) == {"shoreline_impact", "reasoning"}
+
+    question = reask_prompt("judge", {"second_country": "missing"})
+    assert '"second_country"' in question and '"first_country"' not in question
+
+    print("✅ 字段校验正常")
+
+def test_targeted_reask():
+    """测试只追问缺失或无效的字段"""
+    print("🔍 测试定向追问...")
+
+    client, completions = _client([
+        json.dumps({"first_country": 12, "first_shoreline": -4, "second_country": -1}),
+        json.dumps({"first_country": 4, "second_shoreline": 3}),
+    ])
+    scores = client.call_judge_llm("ACTION_1: build port\nACTION_2: restore wetland", REF_TABLE)
+    assert scores == {"first_country": 4, "first_shoreline": -4, "second_country": -1, "second_shoreline": 3}
+
+    first, second = completions.calls
+    assert first["response_format"] == JSON_RESPONSE_FORMAT
+    assert first["messages"][-1]["content"].endswith(schema_instruction("judge", REF_TABLE))
+    # 追问带上此前的对话，只列出两个问题字段
+    assert [m["role"] for m in second["messages"]] == ["user", "assistant", "user"]
+    question = second["messages"][-1]["content"]
+    assert '"first_country": 12 is out of range [-3, 10]' in question and '"second_shoreline": missing' in question
+    assert '"first_shoreline"' not in question and '"second_country"' not in question
+    assert client.usage_stats()["structured_output"]["judge"] == {
+        "responses": 1, "valid": 0, "reasks": 1, "repaired": 1, "failed": 0}
+
+    # 追问后仍无效：保持原有行为，缺失的评分记0
+    client, _ = _client([json.dumps({"first_country": 1}), "{}"])
+    scores = client.call_judge_llm("ACTION_1: a\nACTION_2: b", REF_TABLE)
+    assert scores == {"first_country": 1, "first_shoreline": 0, "second_country": 0, "second_shoreline": 0}
+    assert client.structured_stats["judge"]["failed"] == 1
+
+    print("✅ 定向追问正常")
+
+def test_judge_range_covers_reference_table():
+    """测试裁判分数范围覆盖参考评分表（urban expansion: 国家+10、海岸线-10）"""
+    print("🔍 测试裁判分数范围...")
+
+    instruction = schema_instruction("judge", REF_TABLE)
+    assert '"first_country": integer in [-3, 10]' in instruction
+    assert '"first_shoreline": integer in [-10, 5]' in instruction
+    values, problems = validate("judge", {"first_country": 10, "first_shoreline": -10,
+                                          "second_country": 11, "second_shoreline": -11}, ref_table=REF_TABLE)
+    assert values == {"first_country": 10, "first_shoreline": -10}
+    assert problems == {"second_country": "11 is out of range [-3, 10]",
+                        "second_shoreline": "-11 is out of range [-10, 5]"}
+
+    # 按表给出urban expansion的评分：一次通过校验，不追问、不记0
+    urban = {"first_country": 10, "first_shoreline": -10, "second_country": -3, "second_shoreline": 4}
+    client, completions = _client([json.dumps(urban)])
+    scores = client.call_judge_llm("ACTION_1: urban expansion\nACTION_2: close fisheries", REF_TABLE)
+    assert scores == urban and len(completions.calls) == 1
+    assert client.structured_stats["judge"] == {"responses": 1, "valid": 1, "reasks": 0, "repaired": 0, "failed": 0}
+
+    # 多采样投票同样按覆盖评分表的范围校验
+    client, completions = _client([json.dumps(urban)] * 3)
+    client.judge_samples = 3
+    client._n_supported = False
+    assert client.call_judge_llm("ACTION_1: urban expansion\nACTION_2: close fisheries", REF_TABLE) == urban
+
+    print("✅ 裁判分数范围覆盖参考评分表")
+
+def test_roles_and_cache():
+    """测试各角色的结构化调用和只缓存校验通过的回复"""
+    print("🔍 测试各角色与缓存...")
+
+    cache = LLMResponseCache(roles=("judge", "event", "shore"))
+    client, completions = _client([
+        "```json\n" + json.dumps({"action_1": "develop tourism", "action_2": "restore wetland"}) + "\n```",
+        "CHANCES: eco-tourism\nCHALLENGES: erosion",
+        json.dumps({"country_impact": -5, "shoreline_impact": -2, "reasoning": "storm"}),
+        json.dumps({"country_impact": -3}),
+        json.dumps({"opportunities": "fishing"}),
+        json.dumps({"challenges": "pollution"}),
+    ], cache=cache)
+
+    assert client.call_human_llm(60, 100, "tourism", "erosion", REF_TABLE) == {
+        "action_1": "develop tourism", "action_2": "restore wetland"}
+    assert client.call_shore_llm("ACTION_1: a\nACTION_2: b") == {"opportunities": "eco-tourism",
+                                                                 "challenges": "erosion"}
+    event = client.call_judge_llm_for_random_event("Storm", "A storm hits", 60, 90)
+    assert event == {"country_impact": -3, "shoreline_impact": -2, "reasoning": "storm"}
+    assert len(completions.calls) == 4
+
+    # 校验通过的回复写入缓存，再次调用不发送请求；修复后的回复以合并后的JSON缓存
+    assert client.call_shore_llm("ACTION_1: a\nACTION_2: b")["challenges"] == "erosion"
+    assert len(completions.calls) == 4
+    assert client.call_shore_llm("ACTION_1: c\nACTION_2: d") == {"opportunities": "fishing",
+                                                                 "challenges": "pollution"}
+    assert client.call_shore_llm("ACTION_1: c\nACTION_2: d")["opportunities"] == "fishing"
+    assert len(completions.calls) == 6 and cache.stats()["hits"] == 2
+
+    # 文本模式的客户端不请求JSON格式
+    plain_completions = ScriptedCompletions(["CHANCES: a\nCHALLENGES: b"])
+    plain = fake_client(plain_completions)
+    plain.call_shore_llm("ACTION_1: a\nACTION_2: b")
+    assert "response_format" not in plain_completions.calls[0]
+    assert "structured_output" not in plain.usage_stats()
+
+    print("✅ 各角色与缓存正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 JSON结构化回复测试")
+    print("=" * 50)
+    test_schema_validation()
+    test_targeted_reask()
+    test_judge_range_covers_reference_table()
+    test_roles_and_cache()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+参数扫描与LLM响应缓存测试脚本
+"""
+
+import sys
+import os
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.llm_client import LLMClient
+from src.response_cache import LLMResponseCache
+from src.random_events import RandomEventSystem
+from src.sweep import ParameterSweep, grid_design, random_design, sweep_from_spec
+
+class MockLLMClient:
+    """模拟LLM客户端：每局行动固定，国家每年+1（加年度奖励）"""
+    def __init__(self, model):
+        self.model = model
+        self.calls = 0
+        self._lock = threading.Lock()
+    def call_human_llm(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+        return {"action_1": "develop industry", "action_2": "close fisheries"}
+    def call_judge_llm(self, **kwargs):
+        return {"first_country": 4, "first_shoreline": -5, "second_country": -3, "second_shoreline": 5}
+    def call_shore_llm(self, country_actions):
+        return {"opportunities": "机遇", "challenges": "挑战"}
+
+def test_designs():
+    """测试网格设计与随机设计"""
+    print("🔍 测试扫描设计...")
+
+    grid = grid_design({"annual_bonus": [0, 1, 2], "model": ["a", "b"]})
+    assert len(grid) == 6
+    assert {"annual_bonus": 2, "model": "b"} in grid
+
+    design = random_design({"max_years": {"min": 10, "max": 30},
+                            "disaster_probability_modifier": {"min": 0.5, "max": 2.0},
+                            "model": ["a", "b"]}, 50, seed=3)
+    assert len(design) == 50
+    assert all(isinstance(c["max_years"], int) and 10 <= c["max_years"] <= 30 for c in design)
+    assert all(0.5 <= c["disaster_probability_modifier"] <= 2.0 for c in design)
+    assert design == random_design({"max_years": {"min": 10, "max": 30},
+                                    "disaster_probability_modifier": {"min": 0.5, "max": 2.0},
+                                    "model": ["a", "b"]}, 50, seed=3)
+
+    try:
+        sweep_from_spec({"parameters": {"pause_duration": [1]}})
+        assert False, "不支持的参数应报错"
+    except ValueError:
+        pass
+
+    print(f"   网格: {len(grid)}个配置, 随机: {len(design)}个配置")
+    print("✅ 扫描设计正常")
+
+def test_response_cache_shared_by_role():
+    """测试响应缓存按角色共享，且可持久化复用"""
+    print("🔍 测试LLM响应缓存...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.jsonl")
+        cache = LLMResponseCache(path=path)
+        requests = []
+        clients = [LLMClient(api_key="test_key", model="m", response_cache=cache) for _ in range(2)]
+        for client in clients:
+            client._request_llm = lambda prompt, system_prompt=None, max_retries=5: requests.append(prompt) or f"reply:{prompt}"
+
+        assert clients[0].call_llm("judge this", cache_role="judge") == "reply:judge this"
+        assert clients[1].call_llm("judge this", cache_role="judge") == "reply:judge this"
+        clients[0].call_llm("decide", cache_role="human")
+        clients[1].call_llm("decide", cache_role="human")
+        print(f"   实际请求: {len(requests)}, 缓存统计: {cache.stats()}")
+        # 评分调用共享缓存；人类LLM默认不缓存
+        assert requests == ["judge this", "decide", "decide"]
+        assert cache.stats()["hits"] == 1
+        cache.close()
+
+        reloaded = LLMResponseCache(path=path)
+        assert len(reloaded) == 1
+        client = LLMClient(api_key="test_key", model="m", response_cache=reloaded)
+        client._request_llm = lambda *args, **kwargs: "should not be called"
+        assert client.call_llm("judge this", cache_role="judge") == "reply:judge this"
+        # 不同模型不共用缓存条目
+        other = LLMClient(api_key="test_key", model="other", response_cache=reloaded)
+        other._request_llm = lambda *args, **kwargs: "fresh"
+        assert other.call_llm("judge this", cache_role="judge") == "fresh"
+        reloaded.close()
+
+    print("✅ LLM响应缓存正常")
+
+def test_disaster_probability_modifier():
+    """测试全局灾害概率系数生效（上限仍为0.1）"""
+    print("🔍 测试灾害概率系数...")
+
+    system = RandomEventSystem(use_llm_evaluation=False, disaster_probability_modifier=2.0)
+    system.apply_disaster_modifier(70)
+    probabilities = {e.name: e.probability for e in system.events}
+    assert abs(probabilities["台风"] - 0.04) < 1e-12
+    assert probabilities["风暴潮"] == 0.08
+    assert probabilities["生态旅游兴起"] == 0.1
+
+    system = RandomEventSystem(use_llm_evaluation=False, disaster_probability_modifier=0.0)
+    system.apply_disaster_modifier(50)
+    assert all(e.probability == 0 for e in system.events if e.country_impact < 0 or e.shoreline_impact < 0)
+
+    print("✅ 灾害概率系数正常")
+
+def test_parameter_sweep_and_resume():
+    """测试参数扫描写入结果表，并在重新运行时跳过已完成任务"""
+    print("🔍 测试参数扫描...")
+
+    clients = {}
+    def client_factory(model):
+        clients[model] = MockLLMClient(model)
+        return clients[model]
+
+    design = grid_design({"annual_bonus": [0, 1], "max_years": [5, 30], "model": ["m1", "m2"]})
+    base_config = {"enable_random_events": False, "use_llm_for_random_events": False}
+    with tempfile.TemporaryDirectory() as tmp:
+        results_path = os.path.join(tmp, "sweep.db")
+        sweep = ParameterSweep(design, replicates=3, base_config=base_config, workers=4,
+                               results_path=results_path, client_factory=client_factory)
+        progress = []
+        result = sweep.run(progress_callback=lambda done, total: progress.append(done))
+        sweep.close()
+
+        print(f"   运行任务: {result['jobs_run']}, 配置数: {result['configs']}")
+        assert result["jobs_run"] == 24 and result["errors"] == 0
+        assert progress[-1] == 24
+        assert set(clients) == {"m1", "m2"}
+
+        rows = {(tuple(sorted((k, row["config"][k]) for k in ("annual_bonus", "max_years", "model")))): row
+                for row in result["by_config"]}
+        assert len(rows) == 8 and all(row["games"] == 3 for row in rows.values())
+        # 每年国家+1+年度奖励：奖励1时20年获胜，奖励0时40年才能获胜
+        assert rows[(("annual_bonus", 1), ("max_years", 30), ("model", "m1"))]["victory_rate"] == 1.0
+        assert rows[(("annual_bonus", 1), ("max_years", 30), ("model", "m1"))]["average_duration"] == 20
+        assert rows[(("annual_bonus", 0), ("max_years", 30), ("model", "m2"))]["victory_rate"] == 0.0
+        assert rows[(("annual_bonus", 0), ("max_years", 5), ("model", "m2"))]["average_duration"] == 5
+
+        # 扩展重复次数后重新运行，只运行新增任务
+        sweep = ParameterSweep(design, replicates=4, base_config=base_config, workers=2,
+                               results_path=results_path, client_factory=client_factory)
+        result = sweep.run()
+        sweep.close()
+        print(f"   扩展后运行任务: {result['jobs_run']}, 跳过: {result['jobs_skipped']}")
+        assert result["jobs_run"] == 8 and result["jobs_skipped"] == 24
+        assert all(row["games"] == 4 for row in result["by_config"])
+
+    print("✅ 参数扫描正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 参数扫描测试")
+    print("=" * 50)
+    test_designs()
+    test_response_cache_shared_by_role()
+    test_disaster_probability_modifier()
+    test_parameter_sweep_and_resume()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
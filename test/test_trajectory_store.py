@@ -0,0 +1,95 @@
+"""
+紧凑轨迹存储测试脚本
+"""
+
+import sys
+import os
+import glob
+import json
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.game_state import GameState
+from src.trajectory_store import TrajectoryStore, TrajectoryStoreWriter, import_export_files
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_import_history_records():
+    """测试导入history目录下的游戏记录"""
+    print("🔍 测试导入历史记录...")
+
+    paths = sorted(glob.glob(os.path.join(ROOT, "history", "game_record_*.json")))
+    with tempfile.TemporaryDirectory() as tmp:
+        with TrajectoryStoreWriter(tmp) as writer:
+            imported = import_export_files(writer, paths)
+
+        store = TrajectoryStore(tmp)
+        print(f"   导入局数: {imported}, 年度行数: {len(store)}, 字符串数: {len(store.strings)}")
+        assert store.num_games == imported == len(paths)
+
+        # 与原始JSON逐项对比第一局
+        with open(paths[0], "r", encoding="utf-8") as f:
+            data = json.load(f)
+        rows = store.game_rows(0)
+        records = data["yearly_records"]
+        assert len(rows) == len(records)
+        assert list(store.years["country_score"][rows]) == [r["country_score"] for r in records]
+        assert list(store.years["first_shoreline"][rows]) == [r["judge_scores"]["first_shoreline"] for r in records]
+        assert store.string(store.years["action_1_id"][rows[0]]) == records[0]["country_actions"]["action_1"]
+        assert bool(store.games["victory"][0]) == data["game_summary"]["victory"]
+
+        # 列式扫描
+        victory_rate = store.games["victory"].mean()
+        mean_shoreline = store.years["shoreline_score"].astype(np.float64).mean()
+        print(f"   胜利率: {victory_rate:.2%}, 平均海岸线分数: {mean_shoreline:.1f}")
+
+    print("✅ 历史记录导入正常")
+
+def test_writer_as_record_sink():
+    """测试轨迹存储作为GameState的记录写入器并支持追加"""
+    print("🔍 测试边玩边写...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(2):
+            writer = TrajectoryStoreWriter(tmp, buffer_rows=3)
+            game_state = GameState()
+            game_state.attach_record_writer(writer, retain_records=False)
+            writer.begin_game()
+            for year in range(1, 6):
+                game_state.year = year
+                game_state.update_scores(1, -1)
+                game_state.record_year(
+                    country_actions={"action_1": "develop fisheries", "action_2": "close fisheries"},
+                    shore_response={"opportunities": "机遇", "challenges": "挑战"},
+                    judge_scores={"first_country": 4, "first_shoreline": -4, "second_country": -3, "second_shoreline": 4},
+                    random_events=[],
+                    country_change=1,
+                    shoreline_change=0,
+                    random_country_impact=0,
+                    random_shoreline_impact=-1
+                )
+            writer.end_game(game_state.get_game_summary())
+            writer.close()
+
+        store = TrajectoryStore(tmp)
+        print(f"   局数: {store.num_games}, 行数: {len(store)}, 字符串数: {len(store.strings)}")
+        assert store.num_games == 2
+        assert len(store) == 10
+        assert sorted(set(store.years["game_id"].tolist())) == [0, 1]
+        # 重复文本只保存一次
+        assert store.strings.count("develop fisheries") == 1
+
+    print("✅ 边玩边写正常")
+
+def main():
+    """主测试函数"""
+    print("🌊 紧凑轨迹存储测试")
+    print("=" * 50)
+    test_import_history_records()
+    test_writer_as_record_sink()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+向量化蒙特卡洛模拟测试脚本
+"""
+
+import sys
+import os
+import logging
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.reference_table import ReferenceTable, ActionPolicy
+from src.random_events import RandomEventSystem
+from src.outcome_solver import OutcomeSolver
+from src.vector_sim import (VectorizedSimulator, VectorizedEventSampler, check_game_over,
+                            OUTCOME_IN_PROGRESS, OUTCOME_VICTORY, OUTCOME_FAILURE, OUTCOME_TIMEOUT)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TABLE_PATH = os.path.join(ROOT, "prompt", "ref_scoring_table.txt")
+
+def test_event_sampler():
+    """测试向量化事件抽样与精确分布一致（含灾害概率修正分档）"""
+    print("🔍 测试向量化事件抽样...")
+
+    logging.disable(logging.INFO)
+    try:
+        sampler = VectorizedEventSampler(disaster_probability_modifier=1.5)
+        system = RandomEventSystem(use_llm_evaluation=False, disaster_probability_modifier=1.5)
+    finally:
+        logging.disable(logging.NOTSET)
+    rng = np.random.default_rng(0)
+    samples = 200000
+    for shoreline_score in (95, 50):
+        country, shoreline = sampler.sample(np.full(samples, shoreline_score), rng)
+        distribution = system.impact_distribution(shoreline_score)
+        expected = sum(s * p for (_, s), p in distribution.items())
+        print(f"   海岸线{shoreline_score}: 海岸线影响期望 {expected:.4f} / 抽样 {shoreline.mean():.4f}")
+        assert abs(shoreline.mean() - expected) < 0.02
+        quiet = np.mean((country == 0) & (shoreline == 0))
+        assert abs(quiet - distribution[(0, 0)]) < 0.005
+
+    print("✅ 向量化事件抽样正常")
+
+def test_deterministic_semantics():
+    """测试确定性策略下与GameState规则逐年一致（截断、判定顺序、年数上限）"""
+    print("🔍 测试确定性策略...")
+
+    table = ReferenceTable.load(TABLE_PATH)
+    cases = [
+        # (策略权重, 第二行动位权重, 参数, 期望结果, 期望年数, 期望最终分数)
+        ({"develop industry": 1}, {"close fisheries": 1}, {}, "victory", 20, (100, 100)),
+        ({"urban expansion": 1}, None, {}, "victory", 2, (100, 62)),
+        ({"close some factories": 1}, {"deforestation": 1}, {"max_years": 12}, "timeout", 12, (48, 100)),
+        ({"develop industry": 1}, None, {}, "failure", 3, (87, 73)),
+    ]
+    for weights, weights_2, params, outcome, years, final_scores in cases:
+        policy = ActionPolicy(table, weights=weights, weights_2=weights_2)
+        simulator = VectorizedSimulator(policy, enable_random_events=False, **params)
+        result = simulator.run(100, seed=1, return_arrays=True)
+        arrays = result["arrays"]
+        assert result[outcome] == 1.0, (weights, result)
+        assert (arrays["years"] == years).all()
+        assert (arrays["final_country"] == final_scores[0]).all()
+        assert (arrays["final_shoreline"] == final_scores[1]).all()
+
+    # 共用的判定函数：胜利优先于失败，到年数上限时其余记为超时；支持二维数组
+    country = np.array([[100, 100, 90], [90, 80, 70]])
+    shoreline = np.array([[70, 90, 90], [74, 75, 100]])
+    assert (check_game_over(country, shoreline, 3, 25, 100, 75) ==
+            [[OUTCOME_VICTORY, OUTCOME_VICTORY, OUTCOME_IN_PROGRESS],
+             [OUTCOME_FAILURE, OUTCOME_IN_PROGRESS, OUTCOME_IN_PROGRESS]]).all()
+    assert (check_game_over(country, shoreline, 25, 25, 100, 75)[:, 2] == OUTCOME_TIMEOUT).all()
+
+    print("✅ 确定性策略正常")
+
+def test_matches_exact_solution():
+    """测试随机策略+随机事件下与精确解一致，并记录模拟速度"""
+    print("🔍 测试与精确解一致...")
+
+    table = ReferenceTable.load(TABLE_PATH)
+    policy = ActionPolicy(table, weights={"develop industry": 2, "close fisheries": 2,
+                                          "mining operations": 1, "use organic fertilizer": 1})
+    params = {"annual_bonus": 1, "max_years": 25, "disaster_probability_modifier": 2.0}
+    exact = OutcomeSolver(policy, **params).solve()
+    num_games = 200000
+    result = VectorizedSimulator(policy, **params).run(num_games, seed=7, batch_size=65536)
+
+    print(f"   精确解: 胜利{exact['victory']:.4f} 失败{exact['failure']:.4f} 超时{exact['timeout']:.4f} "
+          f"期望{exact['expected_years']:.3f}年")
+    print(f"   模拟{num_games}局: 胜利{result['victory']:.4f} 失败{result['failure']:.4f} "
+          f"超时{result['timeout']:.4f} 平均{result['expected_years']:.3f}年 ({result['elapsed']:.2f}秒)")
+    for outcome in ("victory", "failure", "timeout"):
+        p = exact[outcome]
+        assert abs(result[outcome] - p) < 4 * (p * (1 - p) / num_games) ** 0.5 + 1e-4, outcome
+    assert abs(result["expected_years"] - exact["expected_years"]) < 0.05
+    assert sum(result["counts"].values()) == num_games
+    for year in range(1, 26):
+        assert abs(result["end_year_distribution"][year] - exact["end_year_distribution"][year]) < 0.005
+
+    print("✅ 与精确解一致")
+
+def main():
+    """主测试函数"""
+    print("🌊 向量化蒙特卡洛模拟测试")
+    print("=" * 50)
+    test_event_sampler()
+    test_deterministic_semantics()
+    test_matches_exact_solution()
+    print("\n🎉 测试完成!")
+
+if __name__ == "__main__":
+    main()